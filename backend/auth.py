@@ -6,12 +6,12 @@ claims to /auth/oauth-upsert, gets back a JWT, and includes it as
 FastAPI dependency that every protected endpoint will declare.
 """
 from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from typing import Annotated, Any
 
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -26,9 +26,16 @@ JWT_ALGORITHM = "HS256"
 # real OAuth flow — the swagger client doesn't drive it, just labels it.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/oauth-upsert", auto_error=True)
 
-# Shared password hasher — argon2id is the 2026 default; bcrypt kept as fallback
-# verifier in case any legacy hashes ever appear.
-pwd_context = CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+
+@lru_cache()
+def _pwd_context():
+    """Shared password hasher — argon2id is the 2026 default; bcrypt kept as
+    fallback verifier in case any legacy hashes ever appear. Built on first
+    use: only email login/registration needs passlib, not cold start."""
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["argon2", "bcrypt"], deprecated="auto")
+
 
 # Single shared limiter — main.py wires it onto app.state, routers import it
 # to decorate endpoints with @limiter.limit("X/minute").
@@ -86,8 +93,8 @@ async def get_current_user(
 
 
 def hash_password(plain: str) -> str:
-    return pwd_context.hash(plain)
+    return _pwd_context().hash(plain)
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return _pwd_context().verify(plain, hashed)
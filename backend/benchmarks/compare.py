@@ -0,0 +1,63 @@
+"""Porovnání běhu benchmarků s uloženým baseline.json.
+
+    pytest benchmarks --benchmark-json=/tmp/bench.json
+    python -m benchmarks.compare /tmp/bench.json            # porovnat
+    python -m benchmarks.compare /tmp/bench.json --update   # přepsat baseline
+
+Porovnává mediány. Exit code 1, když je některý benchmark pomalejší než
+baseline o víc než --threshold (výchozí 25 %) — absolutní čísla závisí na
+stroji, baseline se proto aktualizuje na stejném stroji jako porovnání.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def medians(report: dict) -> dict[str, float]:
+    """{název benchmarku: medián v sekundách} z výstupu --benchmark-json."""
+    return {b["name"]: b["stats"]["median"] for b in report.get("benchmarks", [])}
+
+
+def compare(current: dict[str, float], baseline: dict[str, float], threshold: float) -> tuple[list[str], bool]:
+    """Řádky reportu a příznak, jestli něco zpomalilo nad threshold."""
+    lines, regressed = [], False
+    for name in sorted(current.keys() | baseline.keys()):
+        now, before = current.get(name), baseline.get(name)
+        if now is None or before is None:
+            state = "new" if before is None else "missing"
+            lines.append(f"{name:45} {state}")
+            continue
+        ratio = now / before if before else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag, regressed = "  REGRESSION", True
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        lines.append(f"{name:45} {before * 1000:10.2f} ms → {now * 1000:10.2f} ms  ({ratio - 1:+.0%}){flag}")
+    return lines, regressed
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("report", type=Path, help="výstup pytest --benchmark-json")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--update", action="store_true", help="uložit mediány jako nový baseline")
+    args = parser.parse_args(argv)
+
+    current = medians(json.loads(args.report.read_text()))
+    if args.update:
+        BASELINE.write_text(json.dumps(current, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline updated ({len(current)} benchmarks)")
+        return 0
+
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    lines, regressed = compare(current, baseline, args.threshold)
+    print("\n".join(lines))
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
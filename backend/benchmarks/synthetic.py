@@ -0,0 +1,299 @@
+"""Deterministický generátor syntetických dat pro benchmarky.
+
+Stejný seed → stejná data (random.Random, žádný globální stav ani čas), takže
+se výsledky benchmarků dají porovnávat mezi commity. Transakce mají tvar
+jako z GoCardless (raw_json s remittanceInformationUnstructured,
+creditorName/debtorName, creditorAccount/debtorAccount s IBANem) a nesou
+sloupce TransactionModel, takže je berou i funkce nad ORM řádky
+(build_wrapped, detekce převodů).
+
+Obsah: 1–10 bankovních účtů, obchodníci s realistickými popisy karet,
+předplatná a inkasa s pevnou periodou, měsíční výplata, převody mezi
+vlastními účty (část jen s jednou stranou), nájem dělený napůl
+(my_share_amount) a vypořádání od partnera.
+"""
+import io
+import json
+import random
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from types import SimpleNamespace
+from typing import Optional
+
+END_DATE = date(2026, 9, 30)
+# GoCardless drží historii řádově roky; starší data generátor nevyrábí
+MAX_HISTORY_DAYS = 5 * 365
+
+# (creditorName, popis karty, kategorie, min. částka, max. částka, relativní četnost)
+MERCHANTS = [
+    ("BILLA s.r.o.", "BILLA {city}", "Food", 80, 1800, 30),
+    ("Albert Česká republika", "ALBERT {city}", "Food", 60, 1500, 25),
+    ("Lidl Česká republika v.o.s.", "LIDL CZ {city}", "Food", 90, 2200, 25),
+    ("Kaufland Česká republika", "KAUFLAND {city}", "Food", 150, 2600, 12),
+    ("Rohlik.cz", "ROHLIK.CZ PRAHA", "Food", 400, 3500, 8),
+    ("Wolt", "WOLT PRAHA", "Food", 180, 650, 10),
+    ("Kavárna Místo", "KAVARNA MISTO {city}", "Food", 60, 240, 12),
+    ("Bolt", "BOLT.EU/O/2603", "Transport", 90, 450, 8),
+    ("Uber BV", "UBER *TRIP HELP.UBER.COM", "Transport", 110, 600, 5),
+    ("Shell Czech Republic", "SHELL {city}", "Transport", 700, 2200, 6),
+    ("MOL Česká republika", "MOL {city}", "Transport", 650, 2100, 5),
+    ("dm drogerie markt", "DM DROGERIE {city}", "Shopping", 90, 900, 8),
+    ("Alza.cz a.s.", "ALZA.CZ PRAHA", "Shopping", 200, 12000, 4),
+    ("IKEA Česká republika", "IKEA {city}", "Shopping", 300, 8000, 2),
+    ("Dr.Max lékárna", "DR.MAX LEKARNA {city}", "Health", 90, 1200, 4),
+    ("Cinestar", "CINESTAR {city}", "Entertainment", 180, 600, 2),
+]
+
+# (creditorName, popis, kategorie, částka, perioda v měsících, den v měsíci)
+RECURRING = [
+    ("Netflix International B.V.", "NETFLIX.COM 866-579-7172 NL", "Entertainment", 329.0, 1, 5),
+    ("Spotify AB", "Spotify P2A4F5C1D2 Stockholm", "Entertainment", 199.0, 1, 12),
+    ("O2 Czech Republic a.s.", "O2 CZECH REPUBLIC inkaso", "Utilities", 649.0, 1, 18),
+    ("ČEZ Prodej, a.s.", "CEZ PRODEJ zaloha elektrina", "Utilities", 1850.0, 1, 20),
+    ("Pražské vodovody a kanalizace", "PVK zaloha voda", "Utilities", 2400.0, 3, 15),
+    ("Kooperativa pojišťovna", "KOOPERATIVA pojistne", "Insurance", 6200.0, 12, 2),
+]
+
+CITIES = ["PRAHA", "PRAHA 5", "BRNO", "OSTRAVA", "PLZEN", "OLOMOUC", "LIBEREC"]
+
+RENT = ("Bytové družstvo Lípa", "Najem byt Lipova 12", 24000.0)
+EMPLOYER = ("Acme Software s.r.o.", "MZDA {month}", 68000.0)
+PARTNER = "Jana Nováková"
+
+
+@dataclass
+class SyntheticAccount:
+    id: str
+    iban: str
+    name: str
+
+    @property
+    def details_json(self) -> str:
+        return json.dumps({"account": {"iban": self.iban}})
+
+
+@dataclass
+class SyntheticTransaction:
+    """Stejné atributy jako TransactionModel (bez ORM)."""
+    id: str
+    user_id: int
+    account_id: str
+    date: str
+    description: str
+    amount: float
+    raw: dict
+    category: Optional[str] = None
+    currency: str = "CZK"
+    account_type: str = "bank"
+    transaction_type: str = "normal"
+    is_excluded: bool = False
+    user_excluded: bool = False
+    category_locked: bool = False
+    my_share_amount: Optional[float] = None
+    settlement_flag: bool = False
+    settlement_note: Optional[str] = None
+    share_counterparty: Optional[str] = None
+    raw_json: str = field(default="", repr=False)
+    search_text: Optional[str] = None
+
+    def __post_init__(self):
+        if not self.raw_json:
+            self.raw_json = json.dumps(self.raw, ensure_ascii=False)
+
+
+@dataclass
+class Dataset:
+    user_id: int
+    accounts: list[SyntheticAccount]
+    transactions: list[SyntheticTransaction]
+    seed: int
+
+    @property
+    def own_ibans(self) -> list[str]:
+        return [a.iban for a in self.accounts]
+
+
+def _iban(rng: random.Random) -> str:
+    bank = rng.choice(["0800", "0100", "0300", "2010", "5500", "3030"])
+    return f"CZ{rng.randint(10, 99)}{bank}{rng.randint(0, 10**16 - 1):016d}"
+
+
+def _fmt_day(d: date) -> str:
+    return f"{d.day}.{d.month}.{d.year}"
+
+
+class _Builder:
+    def __init__(self, rng: random.Random, user_id: int, accounts: list[SyntheticAccount]):
+        self.rng = rng
+        self.user_id = user_id
+        self.accounts = accounts
+        self.items: list[SyntheticTransaction] = []
+
+    def add(self, account: SyntheticAccount, day: date, amount: float, raw: dict, description: str,
+            category: Optional[str] = None, **extra) -> SyntheticTransaction:
+        tx_id = f"tx-{self.user_id}-{len(self.items):07d}"
+        raw = {
+            "transactionId": tx_id,
+            "bookingDate": day.isoformat(),
+            "valueDate": day.isoformat(),
+            "transactionAmount": {"amount": f"{amount:.2f}", "currency": "CZK"},
+            **raw,
+        }
+        tx = SyntheticTransaction(
+            id=tx_id, user_id=self.user_id, account_id=account.id, date=day.isoformat(),
+            description=description, amount=round(amount, 2), raw=raw, category=category, **extra,
+        )
+        self.items.append(tx)
+        return tx
+
+    def card(self, account: SyntheticAccount, day: date) -> None:
+        name, template, category, lo, hi, _ = self.rng.choices(MERCHANTS, weights=[m[5] for m in MERCHANTS])[0]
+        text = f"Nákup {template.format(city=self.rng.choice(CITIES))} dne {_fmt_day(day)}"
+        amount = -round(self.rng.uniform(lo, hi), 2)
+        raw = {"remittanceInformationUnstructured": text, "creditorName": name}
+        if self.rng.random() < 0.3:
+            raw["merchantCategoryCode"] = "5411" if category == "Food" else "5999"
+        self.add(account, day, amount, raw, text, category)
+
+    def recurring(self, account: SyntheticAccount, day: date, spec) -> None:
+        name, text, category, amount, _, _ = spec
+        raw = {"remittanceInformationUnstructured": text, "creditorName": name,
+               "creditorAccount": {"iban": f"CZ55{zlib.crc32(name.encode()):020d}"}}
+        self.add(account, day, -amount, raw, text, category)
+
+    def salary(self, account: SyntheticAccount, day: date) -> None:
+        name, template, amount = EMPLOYER
+        text = template.format(month=day.strftime("%m/%Y"))
+        raw = {"remittanceInformationUnstructured": text, "debtorName": name,
+               "debtorAccount": {"iban": "CZ6508000000192000145399"}}
+        self.add(account, day, amount + self.rng.choice([0, 0, 1500, 3200]), raw, text, "Salary")
+
+    def rent(self, account: SyntheticAccount, day: date) -> None:
+        name, text, amount = RENT
+        raw = {"remittanceInformationUnstructured": text, "creditorName": name,
+               "creditorAccount": {"iban": "CZ2120100000002800123456"}}
+        self.add(account, day, -amount, raw, text, "Housing",
+                 my_share_amount=amount / 2, share_counterparty="Partner")
+        # Partner pošle svou polovinu o pár dní později
+        settle = day + timedelta(days=self.rng.randint(1, 5))
+        raw = {"remittanceInformationUnstructured": "pulka najmu", "debtorName": PARTNER,
+               "debtorAccount": {"iban": "CZ7803000000000123456789"}}
+        self.add(account, settle, amount / 2, raw, "pulka najmu", "Other",
+                 settlement_flag=True, share_counterparty="Partner")
+
+    def transfer(self, day: date) -> None:
+        if len(self.accounts) < 2:
+            return
+        src, dst = self.rng.sample(self.accounts, 2)
+        amount = round(self.rng.choice([1000, 2000, 5000, 10000, 15000]) * self.rng.choice([1, 1, 2]), 2)
+        text = self.rng.choice(["Převod na spoření", "Prevod mezi ucty", "Odklad"])
+        out_raw = {"remittanceInformationUnstructured": text, "creditorAccount": {"iban": dst.iban}}
+        self.add(src, day, -amount, out_raw, text)
+        # Část bank pošle druhou nohu bez protiúčtu — páruje ji detekce ±2 dny
+        in_raw = {"remittanceInformationUnstructured": text}
+        if self.rng.random() < 0.7:
+            in_raw["debtorAccount"] = {"iban": src.iban}
+        self.add(dst, day + timedelta(days=self.rng.choice([0, 0, 1])), amount, in_raw, text)
+
+
+def generate_dataset(transactions: int = 10_000, accounts: int = 3, seed: int = 0, user_id: int = 1) -> Dataset:
+    """Zhruba `transactions` transakcí napříč `accounts` účty (1–10), končí END_DATE.
+
+    Periodické platby (výplata, nájem, předplatná, převody) se rozloží podle
+    délky období; zbytek do počtu doplní nákupy kartou.
+    """
+    if not 1 <= accounts <= 10:
+        raise ValueError("accounts must be between 1 and 10")
+    rng = random.Random(seed)
+    account_list = [
+        SyntheticAccount(id=f"acc-{user_id}-{i}", iban=_iban(rng), name=name)
+        for i, name in enumerate((["Běžný účet", "Spoření", "Společný účet"] + [f"Účet {n}" for n in range(4, 11)])[:accounts])
+    ]
+    main = account_list[0]
+    builder = _Builder(rng, user_id, account_list)
+
+    # ~15 nákupů kartou na účet a týden → délka období podle cílového počtu;
+    # nad MAX_HISTORY_DAYS se už jen zahušťují nákupy (velké datasety)
+    per_day = max(1.0, 2.2 * accounts)
+    days = min(MAX_HISTORY_DAYS, max(60, int(transactions / per_day)))
+    start = END_DATE - timedelta(days=days)
+
+    month = date(start.year, start.month, 1)
+    while month <= END_DATE:
+        def on(day_of_month: int) -> Optional[date]:
+            try:
+                d = month.replace(day=day_of_month)
+            except ValueError:
+                d = month.replace(day=28)
+            return d if start <= d <= END_DATE else None
+
+        if (d := on(10)):
+            builder.salary(main, d)
+        if (d := on(1)):
+            builder.rent(account_list[-1], d)
+        for spec in RECURRING:
+            if (month.month - 1) % spec[4] == 0 and (d := on(spec[5])):
+                builder.recurring(main, d, spec)
+        for _ in range(2 * (accounts - 1)):
+            if (d := on(rng.randint(1, 28))):
+                builder.transfer(d)
+        month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+    while len(builder.items) < transactions:
+        day = start + timedelta(days=rng.randint(0, days))
+        builder.card(rng.choice(account_list), day)
+
+    items = sorted(builder.items[:transactions] if len(builder.items) > transactions else builder.items,
+                   key=lambda t: (t.date, t.id))
+    return Dataset(user_id=user_id, accounts=account_list, transactions=items, seed=seed)
+
+
+def category_rules(user_rules: int = 20, seed: int = 0) -> tuple[list, list]:
+    """(uživatelská, naučená+builtin) pravidla jako objekty s atributy
+    CategoryRuleModel, seřazená podle RULE_ORDER (délka patternu, match_count)."""
+    from services.default_rules import default_category_rules
+
+    rng = random.Random(seed)
+    learned = [
+        SimpleNamespace(pattern=p, category=c, match_count=rng.randint(0, 50), is_user_defined=False)
+        for p, c in default_category_rules()
+    ]
+    names = [m[0].lower() for m in MERCHANTS] + [r[0].lower() for r in RECURRING]
+    user = [
+        SimpleNamespace(pattern=names[i % len(names)], category=rng.choice(["Food", "Fun", "Home"]),
+                        match_count=rng.randint(0, 50), is_user_defined=True)
+        for i in range(user_rules)
+    ]
+    key = lambda r: (-len(r.pattern), -r.match_count)  # noqa: E731
+    return sorted(user, key=key), sorted(learned, key=key)
+
+
+def timesheet_xlsx(year_month: str = "2026-05", seed: int = 0) -> bytes:
+    """Měsíční .xlsx timesheet ve tvaru, který čte services/timesheet_parser."""
+    from openpyxl import Workbook
+
+    rng = random.Random(seed)
+    year, month = (int(p) for p in year_month.split("-"))
+    daynames = ["pondělí", "úterý", "středa", "čtvrtek", "pátek", "sobota", "neděle"]
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(("DEN", "DOBA", "PŘESTÁVKY", "STAV", "DÉLKA"))
+    d = date(year, month, 1)
+    while d.month == month:
+        label = f"{d.day}. {daynames[d.weekday()]}"
+        if d.weekday() < 5:
+            sheet.append((label, "8:00 - 16:30", "0:30", "Flexi", "8:00"))
+            if rng.random() < 0.3:
+                sheet.append((None, "18:00 - 23:00", None, "Přesčas", "5:00"))
+            if rng.random() < 0.2:
+                sheet.append((None, "16:30 - 8:00", None, "Pohotovost - Pracovní den", "15:30"))
+        else:
+            sheet.append((label, None, None, None, None))
+            if rng.random() < 0.3:
+                sheet.append((None, "0:00 - 24:00", None, "Pohotovost - Víkend / Svátek", "24:00"))
+        d += timedelta(days=1)
+    sheet.append(("Celkem", None, None, None, None))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
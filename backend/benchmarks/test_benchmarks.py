@@ -0,0 +1,150 @@
+"""Benchmarky čistě pythonových horkých cest nad syntetickými daty.
+
+Každý benchmark měří jednu funkci, kterou volá sync nebo dashboard, nad
+stejnými daty (benchmarks/synthetic.py, deterministický seed). Funkce
+s DB (detekce převodů) dostanou FakeSession, který vrací připravené
+objekty podle entity v SELECTu — měří se jen Python, ne Postgres.
+"""
+import asyncio
+import copy
+import json
+from collections import defaultdict
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.synthetic import category_rules, timesheet_xlsx
+from models import AccountModel, ManualAccountModel, SettingsModel, TransactionModel
+from routers.budgets import build_trend
+from routers.dashboard import build_wrapped
+from routers.loans import build_schedule
+from services.categorization import categorize_with_preloaded_rules
+from services.loan_engine import Scenario, annuity_payment, compare_scenarios
+from services.recurring_detection import group_charges
+from services.timesheet_parser import parse_timesheet
+from services.transfers import detect_and_mark_transfers
+
+
+def test_categorize_with_preloaded_rules(benchmark, dataset):
+    user_rules, learned_rules = category_rules(user_rules=40)
+    raws = [tx.raw for tx in dataset.transactions]
+
+    def run():
+        return [categorize_with_preloaded_rules(raw, user_rules, learned_rules) for raw in raws]
+
+    categories = benchmark(run)
+    assert len(categories) == len(raws) and all(categories)
+
+
+def test_build_wrapped(benchmark, dataset):
+    year = int(dataset.transactions[-1].date[:4])
+    own_names = frozenset({frozenset({"jana", "novakova"})})
+    result = benchmark(build_wrapped, dataset.transactions, {"Salary"}, year, own_names)
+    assert result["totals"]["expense_count"] > 0
+
+
+def test_group_charges(benchmark, dataset):
+    rows = [
+        (tx.date, tx.description, tx.amount, tx.category, tx.raw.get("creditorName"))
+        for tx in dataset.transactions if tx.amount < 0
+    ]
+    stats = benchmark(group_charges, rows)
+    assert stats
+
+
+class FakeResult:
+    def __init__(self, items):
+        self.items = items
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.items
+
+    def scalar_one_or_none(self):
+        return self.items[0] if self.items else None
+
+
+class FakeSession:
+    """Vrací objekty podle entity v SELECTu; nastavení podle klíče."""
+
+    def __init__(self, by_entity: dict, settings: dict[str, str]):
+        self.by_entity = by_entity
+        self.settings = settings
+
+    async def execute(self, stmt):
+        entity = stmt.column_descriptions[0]["entity"]
+        if entity is SettingsModel:
+            key = next(
+                c.right.value for c in stmt.whereclause.clauses
+                if getattr(c.left, "key", None) == "key"
+            )
+            value = self.settings.get(key)
+            return FakeResult([SimpleNamespace(value=value)] if value is not None else [])
+        return FakeResult(self.by_entity.get(entity, []))
+
+    async def commit(self):
+        pass
+
+
+def test_detect_and_mark_transfers(benchmark, dataset):
+    settings = {"my_account_patterns": json.dumps(["sporeni"])}
+
+    def setup():
+        # Detekce mění transakce na místě — každé kolo dostane čerstvé kopie
+        session = FakeSession(
+            {
+                AccountModel: dataset.accounts,
+                ManualAccountModel: [],
+                TransactionModel: [copy.copy(tx) for tx in dataset.transactions],
+            },
+            settings,
+        )
+        return (session, dataset.user_id), {}
+
+    def run(session, user_id):
+        return asyncio.run(detect_and_mark_transfers(session, user_id))
+
+    result = benchmark.pedantic(run, setup=setup, rounds=5)
+    assert result["marked_internal"] > 0
+
+
+def test_build_schedule(benchmark):
+    rows = benchmark(build_schedule, 4_500_000, 4.89, 360, 23_850, "2026-01-15")
+    assert rows[-1]["remaining_balance"] == 0
+
+
+def test_compare_scenarios(benchmark):
+    # 20 scénářů třicetileté hypotéky — jedno otevření stránky úvěru
+    principal, rate, term = 4_000_000.0, 4.89, 360
+    payment = annuity_payment(principal, rate, term)
+    scenarios = [Scenario(name=str(k), monthly_extra=500.0 * k, rate_changes={61: 3.0 + k / 10}) for k in range(20)]
+    baseline, results = benchmark(compare_scenarios, principal, rate, term, payment, date(2026, 1, 15), scenarios)
+    assert len(results) == 20 and baseline.rows == []
+
+
+def test_build_trend(benchmark, dataset):
+    # Denní útrata nejdelšího měsíce v datech, škálovaná na 1000 rozpočtů
+    by_month: dict[str, dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    for tx in dataset.transactions:
+        if tx.amount < 0:
+            by_month[tx.date[:7]][int(tx.date[8:10])] += -tx.amount
+    daily = dict(max(by_month.values(), key=len))
+
+    def run():
+        return [build_trend(daily, 10_000.0 + i, 20, 31) for i in range(1000)]
+
+    trends = benchmark(run)
+    assert trends[0][0] > 0
+
+
+@pytest.fixture(scope="module")
+def timesheet_bytes():
+    return timesheet_xlsx()
+
+
+def test_parse_timesheet(benchmark, timesheet_bytes):
+    hours = benchmark(parse_timesheet, timesheet_bytes)
+    assert hours is not None
@@ -6,6 +6,31 @@ class Settings(BaseSettings):
     """Centrální konfigurace aplikace."""
     # Database
     database_url: str = Field(..., description="Async PostgreSQL connection string")
+    # Pool pro requesty (database.engine)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0  # s čekání na volné spojení, pak chyba
+    db_pool_recycle: int = 1800  # s; starší spojení se zavře a otevře znovu; -1 = nikdy
+    db_pool_pre_ping: bool = True  # ověřit spojení před výdejem (idle timeout na serveru/LB)
+    # Pool pro dlouhé úlohy (database.background_engine) — sync, přeřazení
+    # kategorií. Běh syncu drží spojení i minuty; z vlastního poolu tak
+    # nevyčerpá spojení requestům dashboardu.
+    db_background_pool_size: int = 2
+    db_background_max_overflow: int = 3
+    # Kolik spojení poolu requestů smí naráz držet database.gather_reads
+    # (souběžná čtení dashboardu) v celém procesu — zbytek zůstane ostatním
+    db_read_fanout: int = 4
+    # Prepared statements v cache na jedno spojení (asyncpg + SQLAlchemy); 0 = vypnuto
+    db_statement_cache_size: int = 100
+    # PgBouncer v transaction módu: bez cache prepared statements a s unikátními
+    # názvy (další transakce může dostat jiné serverové spojení)
+    db_pgbouncer: bool = False
+    # Volitelná read replika pro read-only reporty (database.get_read_db).
+    # Prázdné = vše z primáru. Replika zaostávající víc než READ_REPLICA_MAX_LAG_S
+    # (kontrola nejvýš jednou za READ_REPLICA_CHECK_INTERVAL_S) → fallback na primár.
+    read_database_url: str = ""
+    read_replica_max_lag_s: float = 10.0
+    read_replica_check_interval_s: float = 5.0
     
     # Pojistky pro .env (aby Pydantic neřval)
     postgres_user: str = ""
@@ -16,6 +41,10 @@ class Settings(BaseSettings):
     gocardless_secret_id: str = ""
     gocardless_secret_key: str = ""
     trading212_api_key: str = ""
+    # Základní URL externích API — přepisuje se jen pro zátěžové testy proti
+    # lokálním náhradám (loadtest/fake_banks.py), produkce nechává default.
+    gocardless_base_url: str = "https://bankaccountdata.gocardless.com/api/v2"
+    trading212_base_url: str = "https://live.trading212.com/api/v0"
     frontend_url: str = "http://localhost:3000"
 
     # CORS — čárkami oddělený seznam povolených originů. Default pokrývá
@@ -37,6 +66,33 @@ class Settings(BaseSettings):
     # podle polí), "text" = čitelný formát pro lokální vývoj. Dockerfile nastavuje
     # LOG_FORMAT=json, takže produkce loguje JSON automaticky.
     log_format: str = "text"
+    # /metrics (Prometheus) — prázdné = bez ochrany (lokálně, scrape uvnitř
+    # sítě); jinak scraper posílá `Authorization: Bearer <token>`.
+    metrics_token: str = ""
+    # Stejný SQL dotaz víc než tolikrát v jednom requestu → varování v logu
+    # (podezření na N+1, services/query_stats.py)
+    query_repeat_warn: int = 20
+    # OpenTelemetry tracing (services/tracing.py): "" = vypnuto, "otlp" = OTLP/HTTP
+    # na otel_endpoint (lokální collector, Jaeger, Tempo), "console" = spany na stdout
+    otel_exporter: str = ""
+    otel_endpoint: str = "http://localhost:4318"
+    otel_service_name: str = "budget-backend"
+    # Podíl vzorkovaných traces (1.0 = všechny); rodičovský trace z frontendu má přednost
+    otel_sample_ratio: float = 1.0
+
+    # Event loop zablokovaný déle než tolik ms → varování se zásobníkem
+    # (services/loop_watchdog.py); 0 = watchdog vypnutý
+    loop_block_warn_ms: int = 250
+    # Vlákna sdíleného poolu pro CPU práci (services/cpu_pool.py) — PDF/XLSX,
+    # roční Wrapped, detekce převodů a předplatných, hash hesla
+    cpu_workers: int = 2
+    # Kolik spojení do DB otevřít při startu na pozadí (database.warm_up_pool);
+    # 0 = líně až s prvními requesty
+    db_pool_warmup: int = 2
+
+    # Katalog bank GoCardless (/accounts/institutions) se servíruje z DB cache;
+    # periodický úkol ho po uplynutí této doby stáhne znovu na pozadí.
+    institutions_refresh_hours: int = 24
 
     # Auth (shared HS256 secret with frontend Auth.js)
     # Empty string means /auth/* endpoints will reject — set in .env before enabling auth.
@@ -1,17 +1,25 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Awaitable, Callable, TypeVar
+from uuid import uuid4
+import asyncio
+import logging
+import time
+from sqlalchemy import text
 from config import get_settings
+from services.metrics import REPLICA_LAG, TimedAsyncQueuePool, register_pool
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Validace formátu — musí být async PostgreSQL driver
-if not settings.database_url.startswith("postgresql+asyncpg://"):
-    raise ValueError(
-        f"DATABASE_URL musí začínat 'postgresql+asyncpg://'. "
-        f"Aktuální hodnota začíná: '{settings.database_url[:30]}...'"
-    )
+for _name, _url in (("DATABASE_URL", settings.database_url), ("READ_DATABASE_URL", settings.read_database_url)):
+    if _url and not _url.startswith("postgresql+asyncpg://"):
+        raise ValueError(
+            f"{_name} musí začínat 'postgresql+asyncpg://'. "
+            f"Aktuální hodnota začíná: '{_url[:30]}...'"
+        )
 
 
 class Base(DeclarativeBase):
@@ -19,13 +27,41 @@ class Base(DeclarativeBase):
     pass
 
 
+def _prepared_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def engine_options(settings, background: bool = False) -> dict:
+    """Parametry create_async_engine z Settings (DB_POOL_*, DB_BACKGROUND_*,
+    DB_STATEMENT_CACHE_SIZE, DB_PGBOUNCER)."""
+    cache_size = 0 if settings.db_pgbouncer else settings.db_statement_cache_size
+    connect_args = {
+        # asyncpg cache pro dotazy mimo SQLAlchemy + LRU prepared statements dialektu
+        "statement_cache_size": cache_size,
+        "prepared_statement_cache_size": cache_size,
+    }
+    if settings.db_pgbouncer:
+        connect_args["prepared_statement_name_func"] = _prepared_statement_name
+    return {
+        "echo": False,  # Set to True for SQL debugging
+        "pool_size": settings.db_background_pool_size if background else settings.db_pool_size,
+        "max_overflow": settings.db_background_max_overflow if background else settings.db_max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        # AsyncAdaptedQueuePool + měření čekání na spojení pro /metrics
+        "poolclass": TimedAsyncQueuePool,
+        "connect_args": connect_args,
+    }
+
+
 # Create async engine
-engine = create_async_engine(
-    settings.database_url,
-    echo=False,  # Set to True for SQL debugging
-    pool_size=5,
-    max_overflow=10,
-)
+engine = create_async_engine(settings.database_url, **engine_options(settings))
+register_pool("primary", engine.pool)
+
+# Dlouhé úlohy (sync, přeřazení kategorií) — vlastní pool, requesty nevyhladoví
+background_engine = create_async_engine(settings.database_url, **engine_options(settings, background=True))
+register_pool("background", background_engine.pool)
 
 # Create async session factory
 async_session_maker = async_sessionmaker(
@@ -33,6 +69,78 @@ async_session_maker = async_sessionmaker(
     class_=AsyncSession,
     expire_on_commit=False
 )
+background_session_maker = async_sessionmaker(
+    background_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
+# Zpoždění repliky v sekundách; 0 na primáru (nic nepřehrává) a na replice,
+# která přehrála všechno přijaté WAL (jinak by klidná DB vypadala jako zaostalá)
+_REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReadReplica:
+    """Read replika s hlídáním zpoždění. Stav se zjišťuje nejvýš jednou za
+    `check_interval` s; souběžné requesty mezitím použijí poslední výsledek.
+    Nedostupná replika nebo neznámé zpoždění (nic nepřehráno) = nepoužívat."""
+
+    def __init__(self, session_maker, max_lag: float, check_interval: float):
+        self.session_maker = session_maker
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._checked_at = float("-inf")
+        self._usable = False
+
+    async def measure_lag(self) -> float | None:
+        async with self.session_maker() as session:
+            lag = (await session.execute(_REPLICA_LAG_SQL)).scalar()
+        return None if lag is None else float(lag)
+
+    async def is_usable(self) -> bool:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._usable
+        self._checked_at = now  # před awaitem — souběžné requesty neměří znovu
+        error = None
+        try:
+            lag = await self.measure_lag()
+        except Exception as e:
+            lag, error = None, e
+        if lag is not None:
+            REPLICA_LAG.set(lag)
+        usable = lag is not None and lag <= self.max_lag
+        if usable != self._usable:
+            if usable:
+                logger.info(
+                    "Read replica in use (lag %.1f s)", lag,
+                    extra={"event": "db.replica_ok", "lag_s": lag},
+                )
+            else:
+                logger.warning(
+                    "Read replica unusable (lag=%s, error=%s), reads fall back to primary", lag, error,
+                    extra={"event": "db.replica_fallback", "lag_s": lag},
+                )
+        self._usable = usable
+        return usable
+
+
+read_engine = None
+read_replica: ReadReplica | None = None
+if settings.read_database_url:
+    read_engine = create_async_engine(settings.read_database_url, **engine_options(settings))
+    register_pool("replica", read_engine.pool)
+    read_replica = ReadReplica(
+        async_sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False),
+        max_lag=settings.read_replica_max_lag_s,
+        check_interval=settings.read_replica_check_interval_s,
+    )
 
 
 async def init_db():
@@ -50,6 +158,88 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+async def get_background_db() -> AsyncGenerator[AsyncSession, None]:
+    """Jako get_db, ale z poolu pro dlouhé úlohy (POST /sync/)."""
+    async with background_session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """Session pro read-only reporty: z repliky (READ_DATABASE_URL), když je
+    nastavená a nezaostává, jinak z primáru. Jen pro endpointy, které nic
+    nezapisují — replika zápis odmítne."""
+    session_maker = async_session_maker
+    if read_replica is not None and await read_replica.is_usable():
+        session_maker = read_replica.session_maker
+    async with session_maker() as session:
+        try:
+            yield session
+        finally:
+            await session.close()
+
+
+T = TypeVar("T")
+
+
+_fanout_limit: asyncio.Semaphore | None = None
+_fanout_loop = None
+
+
+def _fanout_semaphore() -> asyncio.Semaphore:
+    # Semafor patří k jednomu loopu (testy s vlastním loopem per modul)
+    global _fanout_limit, _fanout_loop
+    loop = asyncio.get_running_loop()
+    if _fanout_limit is None or _fanout_loop is not loop:
+        _fanout_limit, _fanout_loop = asyncio.Semaphore(max(1, settings.db_read_fanout)), loop
+    return _fanout_limit
+
+
+async def gather_reads(*reads: Callable[[AsyncSession], Awaitable[T]]) -> list[T]:
+    """Run independent read-only queries concurrently, each on its own pooled
+    session (one AsyncSession can't run two statements at once). Use for
+    endpoints composed of several unrelated reads — latency becomes the
+    slowest read instead of the sum.
+
+    Spojení pro souběžná čtení jsou omezená pro celý proces
+    (DB_READ_FANOUT) — pár souběžných dashboardů tak nevyčerpá pool
+    a ostatní endpointy nečekají na pool timeout."""
+    limit = _fanout_semaphore()
+
+    async def run(read):
+        async with limit:
+            async with async_session_maker() as session:
+                return await read(session)
+    return await asyncio.gather(*(run(read) for read in reads))
+
+
+async def warm_up_pool(connections: int) -> None:
+    """Otevře `connections` spojení souběžně a vrátí je do poolu. Lifespan
+    ji pouští jako úlohu na pozadí — první requesty po studeném startu
+    (scale from zero) pak nečekají na TCP + TLS + auth handshake, a přitom
+    warm-up start aplikace nezdržuje."""
+    if connections <= 0:
+        return
+    started = time.perf_counter()
+
+    async def ping():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    results = await asyncio.gather(*(ping() for _ in range(connections)), return_exceptions=True)
+    failed = [r for r in results if isinstance(r, Exception)]
+    if failed:
+        logger.warning(f"DB pool warm-up: {len(failed)}/{connections} connections failed: {failed[0]}")
+        return
+    duration_ms = (time.perf_counter() - started) * 1000
+    logger.info(
+        "DB pool warm-up: %d connection(s) in %.0f ms", connections, duration_ms,
+        extra={"event": "db.pool_warmup", "connections": connections, "duration_ms": round(duration_ms)},
+    )
+
+
 @asynccontextmanager
 async def get_db_context():
     """Context manager for database session (for use in services)"""
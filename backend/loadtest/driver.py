@@ -0,0 +1,178 @@
+"""Asyncio zátěžový driver pro běžící API.
+
+N souběžných „uživatelů" (tokeny z loadtest/seed.py) po dobu --duration
+posílá požadavky na /dashboard/, /transactions/, /sync/, /cashflow/current
+a /monthly-budget/{ym} v poměru podle --mix. Na konci vypíše propustnost,
+chybovost a p50/p95/p99 latence pro každý endpoint.
+
+Usage:
+    cd backend
+    python -m loadtest.driver --base-url http://127.0.0.1:8000 \\
+        --users-file /tmp/loadtest-users.json --concurrency 20 --duration 60 \\
+        --mix dashboard=4,transactions=4,cashflow=2,monthly_budget=2,sync=1 \\
+        [--json /tmp/loadtest-report.json]
+
+/sync/ proti lokálnímu loadtest/fake_banks.py — nikdy proti produkčním
+klíčům GoCardless (denní limit banky 4 požadavky na účet).
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+YEAR_MONTH = time.strftime("%Y-%m")
+
+# název → (metoda, cesta); {ym} = aktuální měsíc
+ENDPOINTS = {
+    "dashboard": ("GET", "/dashboard/"),
+    "transactions": ("GET", "/transactions/?page=1&limit=50"),
+    "cashflow": ("GET", "/cashflow/current"),
+    "monthly_budget": ("GET", "/monthly-budget/{ym}"),
+    "sync": ("POST", "/sync/"),
+}
+DEFAULT_MIX = "dashboard=4,transactions=4,cashflow=2,monthly_budget=2,sync=1"
+
+
+def parse_mix(value: str) -> dict[str, float]:
+    """"dashboard=4,sync=1" → {"dashboard": 4.0, "sync": 1.0}."""
+    mix: dict[str, float] = {}
+    for part in value.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (known: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Mix must contain at least one endpoint with a positive weight")
+    return mix
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Percentil metodou nearest-rank nad seřazenými hodnotami."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@dataclass
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)  # sekundy, jen úspěšné
+    errors: int = 0
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+
+    def summary(self, elapsed: float) -> dict:
+        ordered = sorted(self.latencies)
+        total = len(ordered) + self.errors
+        return {
+            "requests": total,
+            "errors": self.errors,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 1),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+async def _worker(client: httpx.AsyncClient, users: list[dict], mix: dict[str, float],
+                  deadline: float, stats: dict[str, EndpointStats], rng: random.Random) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        method, path = ENDPOINTS[name]
+        user = rng.choice(users)
+        t0 = time.perf_counter()
+        try:
+            response = await client.request(
+                method, path.format(ym=YEAR_MONTH), headers={"Authorization": f"Bearer {user['token']}"},
+            )
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0  # timeout / spojení
+        elapsed = time.perf_counter() - t0
+        entry = stats[name]
+        entry.statuses[status] += 1
+        if 200 <= status < 400:
+            entry.latencies.append(elapsed)
+        else:
+            entry.errors += 1
+
+
+async def run(base_url: str, users: list[dict], mix: dict[str, float], concurrency: int,
+              duration: float, timeout: float, seed: int = 0) -> dict:
+    stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(
+            _worker(client, users, mix, deadline, stats, random.Random(seed + i)) for i in range(concurrency)
+        ))
+        elapsed = time.monotonic() - started
+
+    endpoints = {name: stats[name].summary(elapsed) for name in mix if name in stats}
+    everything = EndpointStats(
+        latencies=[lat for s in stats.values() for lat in s.latencies],
+        errors=sum(s.errors for s in stats.values()),
+    )
+    for s in stats.values():
+        for status, count in s.statuses.items():
+            everything.statuses[status] += count
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "total": everything.summary(elapsed),
+        "endpoints": endpoints,
+    }
+
+
+def format_report(report: dict) -> str:
+    header = f"{'endpoint':16} {'req':>7} {'err':>5} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    lines = [f"concurrency={report['concurrency']} duration={report['duration_s']}s", header, "-" * len(header)]
+    rows = list(report["endpoints"].items()) + [("TOTAL", report["total"])]
+    for name, s in rows:
+        lines.append(
+            f"{name:16} {s['requests']:>7} {s['errors']:>5} {s['throughput_rps']:>8.2f} "
+            f"{s['p50_ms']:>9.1f} {s['p95_ms']:>9.1f} {s['p99_ms']:>9.1f} {s['max_ms']:>9.1f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load driver for the budget API")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--users-file", default="loadtest-users.json", help="výstup loadtest/seed.py")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30.0, help="sekundy")
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--timeout", type=float, default=120.0, help="timeout jednoho požadavku (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_out", help="uložit report i jako JSON")
+    args = parser.parse_args(argv)
+
+    users = json.loads(Path(args.users_file).read_text())
+    if not users:
+        parser.error(f"{args.users_file} contains no users — run loadtest/seed.py first")
+    report = asyncio.run(run(
+        args.base_url, users, parse_mix(args.mix), args.concurrency, args.duration, args.timeout, args.seed,
+    ))
+    print(format_report(report))
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, indent=2))
+    return 1 if report["total"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,238 @@
+"""Lokální náhrada GoCardless a Trading 212 API pro zátěžové testy.
+
+Servíruje endpointy, které volají services/gocardless.py a
+services/trading212.py, s nastavitelnou latencí, velikostí odpovědi a podílem
+odpovědí 429. Transakce účtu `acc-<user>-<n>` generuje
+benchmarks/synthetic.py se seedem podle uživatele — stejná data, jaká do DB
+zapsal loadtest/seed.py, takže sync dělá realistický upsert (většina
+řádků už existuje).
+
+Usage:
+    cd backend
+    python -m loadtest.fake_banks --port 9100 --latency-ms 300 --rate-429 0.02
+
+API se pak spustí s:
+    GOCARDLESS_BASE_URL=http://127.0.0.1:9100/gocardless
+    TRADING212_BASE_URL=http://127.0.0.1:9100/t212
+    GOCARDLESS_SECRET_ID=load GOCARDLESS_SECRET_KEY=load TRADING212_API_KEY=load
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+# Allow running as a top-level script: add backend/ to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.synthetic import END_DATE, generate_dataset
+
+
+@dataclass
+class FakeBankConfig:
+    latency_ms: float = 200.0       # střední latence odpovědi
+    jitter_ms: float = 100.0        # ± rovnoměrný rozptyl kolem latence
+    rate_429: float = 0.0           # podíl odpovědí 429 (0–1)
+    transactions: int = 10_000      # velikost historie na uživatele (celý dataset)
+    accounts: int = 3               # účtů na uživatele — musí sedět se seed.py
+    days: int = 90                  # kolik dní historie vrací /transactions/ (GoCardless default)
+    positions: int = 25             # pozic v T212 portfoliu
+
+
+config = FakeBankConfig()
+_rng = random.Random(0)
+
+
+@lru_cache(maxsize=64)
+def _account(account_id: str) -> tuple[list[dict], float, str]:
+    """(booked transakce v okně `days`, zůstatek, IBAN) pro `acc-<user>-<n>`."""
+    try:
+        _, user, _ = account_id.split("-")
+        user_id = int(user)
+    except ValueError:
+        raise HTTPException(404, {"summary": "Not found", "detail": f"Unknown account {account_id}"})
+    dataset = generate_dataset(config.transactions, config.accounts, seed=user_id, user_id=user_id)
+    since = (END_DATE - timedelta(days=config.days)).isoformat()
+    account = next((a for a in dataset.accounts if a.id == account_id), None)
+    if account is None:
+        raise HTTPException(404, {"summary": "Not found", "detail": f"Unknown account {account_id}"})
+    own = [tx for tx in dataset.transactions if tx.account_id == account_id]
+    booked = [tx.raw for tx in own if tx.date >= since]
+    return booked, round(100_000 + sum(tx.amount for tx in own), 2), account.iban
+
+
+async def _simulate() -> None:
+    """Latence + náhodné 429 (tělo jako u GoCardless)."""
+    delay = max(0.0, config.latency_ms + _rng.uniform(-config.jitter_ms, config.jitter_ms))
+    await asyncio.sleep(delay / 1000)
+    if config.rate_429 and _rng.random() < config.rate_429:
+        raise HTTPException(429, {
+            "summary": "Rate limit exceeded",
+            "detail": "Request was throttled. Expected available in 3600 seconds.",
+        })
+
+
+gocardless = APIRouter(prefix="/gocardless")
+t212 = APIRouter(prefix="/t212")
+
+
+@gocardless.post("/token/new/")
+@gocardless.post("/token/refresh/")
+async def gc_token():
+    await _simulate()
+    return {"access": "fake-access", "access_expires": 86400, "refresh": "fake-refresh", "refresh_expires": 2592000}
+
+
+@gocardless.get("/institutions/")
+async def gc_institutions(country: str = "CZ"):
+    await _simulate()
+    return [
+        {"id": f"FAKE_BANK_{i}", "name": f"Fake Bank {i}", "bic": f"FAKECZ{i:02d}",
+         "transaction_total_days": "730", "countries": [country], "logo": "https://example.invalid/logo.png"}
+        for i in range(40)
+    ]
+
+
+@gocardless.get("/requisitions/")
+async def gc_requisitions():
+    # Bez požadavků → sync přeskočí obnovu expirace souhlasu (žádné /agreements/)
+    await _simulate()
+    return {"count": 0, "next": None, "previous": None, "results": []}
+
+
+@gocardless.get("/accounts/{account_id}/details/")
+async def gc_details(account_id: str):
+    await _simulate()
+    _, _, iban = _account(account_id)
+    return {"account": {"resourceId": account_id, "iban": iban, "currency": "CZK", "name": account_id}}
+
+
+@gocardless.get("/accounts/{account_id}/balances/")
+async def gc_balances(account_id: str):
+    await _simulate()
+    _, balance, _ = _account(account_id)
+    return {"balances": [{
+        "balanceAmount": {"amount": f"{balance:.2f}", "currency": "CZK"},
+        "balanceType": "interimAvailable",
+        "referenceDate": END_DATE.isoformat(),
+    }]}
+
+
+@gocardless.get("/accounts/{account_id}/transactions/")
+async def gc_transactions(account_id: str):
+    await _simulate()
+    booked, _, _ = _account(account_id)
+    return {"transactions": {"booked": booked, "pending": []}}
+
+
+@t212.get("/equity/account/cash")
+async def t212_cash():
+    await _simulate()
+    return {"free": 812.4, "total": 25_310.9, "ppl": 2_140.2, "result": 1_830.5, "invested": 22_358.3,
+            "pieCash": 0.0, "blocked": 0.0, "currency": "EUR"}
+
+
+@t212.get("/equity/portfolio")
+async def t212_portfolio():
+    await _simulate()
+    rng = random.Random(1)
+    return [
+        {"ticker": f"FAKE{i}_US_EQ", "quantity": round(rng.uniform(0.5, 40), 4),
+         "averagePrice": round(rng.uniform(20, 400), 2), "currentPrice": round(rng.uniform(20, 450), 2),
+         "ppl": round(rng.uniform(-200, 600), 2), "fxPpl": round(rng.uniform(-20, 20), 2)}
+        for i in range(config.positions)
+    ]
+
+
+@t212.get("/equity/pies")
+async def t212_pies():
+    await _simulate()
+    return [{"id": pie_id, "result": {"priceAvgInvestedValue": 5000, "priceAvgValue": 5600,
+                                      "priceAvgResult": 600, "priceAvgResultCoef": 0.12}}
+            for pie_id in (1, 2)]
+
+
+@t212.get("/equity/pies/{pie_id}")
+async def t212_pie(pie_id: int):
+    await _simulate()
+    return {"settings": {"name": f"Pie {pie_id}", "icon": "Home", "goal": None},
+            "instruments": [{"ticker": f"FAKE{i}_US_EQ", "currentShare": 0.2, "expectedShare": 0.2,
+                             "ownedQuantity": 1.5, "result": {"priceAvgValue": 1100, "priceAvgResult": 90}}
+                            for i in range(5)]}
+
+
+def _history(kind: str, limit: int) -> dict:
+    start = date(2026, 1, 5)
+    items = []
+    for i in range(limit):
+        day = (start + timedelta(days=3 * i)).isoformat()
+        if kind == "orders":
+            items.append({"id": str(900_000 + i), "type": "MARKET", "ticker": f"FAKE{i % 10}_US_EQ",
+                          "fillPrice": 120.5, "filledQuantity": 0.8, "dateExecuted": f"{day}T14:30:00Z"})
+        else:
+            items.append({"reference": f"div-{i}", "ticker": f"FAKE{i % 10}_US_EQ", "amount": 3.12,
+                          "currency": "EUR", "paidOn": f"{day}T09:00:00Z"})
+    return {"items": items, "nextPagePath": None}
+
+
+@t212.get("/equity/history/orders")
+async def t212_orders(limit: int = 50):
+    await _simulate()
+    return _history("orders", limit)
+
+
+@t212.get("/history/dividends")
+async def t212_dividends(limit: int = 50):
+    await _simulate()
+    return _history("dividends", limit)
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(title="Fake bank APIs (load test)")
+
+    @app.exception_handler(HTTPException)
+    async def _error_body(request: Request, exc: HTTPException):
+        # GoCardless vrací summary/detail přímo v těle, ne pod "detail"
+        body = exc.detail if isinstance(exc.detail, dict) else {"detail": exc.detail}
+        return JSONResponse({**body, "status_code": exc.status_code}, status_code=exc.status_code)
+
+    app.include_router(gocardless)
+    app.include_router(t212)
+    return app
+
+
+app = create_app()
+
+
+def main(argv=None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake GoCardless + Trading 212 server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("FAKE_BANKS_PORT", 9100)))
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--rate-429", type=float, default=config.rate_429)
+    parser.add_argument("--transactions", type=int, default=config.transactions,
+                        help="transakcí na uživatele (jako seed.py --transactions)")
+    parser.add_argument("--accounts", type=int, default=config.accounts)
+    parser.add_argument("--days", type=int, default=config.days,
+                        help="okno historie v odpovědi /transactions/ (velikost payloadu)")
+    parser.add_argument("--positions", type=int, default=config.positions)
+    args = parser.parse_args(argv)
+
+    config.latency_ms, config.jitter_ms, config.rate_429 = args.latency_ms, args.jitter_ms, args.rate_429
+    config.transactions, config.accounts, config.days = args.transactions, args.accounts, args.days
+    config.positions = args.positions
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
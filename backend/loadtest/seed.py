@@ -0,0 +1,128 @@
+"""Naplnění lokálního Postgresu syntetickými uživateli pro zátěžové testy.
+
+Každý uživatel `loadtest-<n>@local` dostane bankovní účty `acc-<id>-<k>`
+a historii z benchmarks/synthetic.py (seed = id uživatele) — stejná data,
+jaká vrací loadtest/fake_banks.py, takže /sync/ proti němu jen upsertuje.
+Do --out se zapíšou JWT tokeny (podepsané AUTH_SECRET jako v API) pro
+loadtest/driver.py.
+
+Usage:
+    cd backend
+    alembic upgrade head
+    python -m loadtest.seed --users 20 --transactions 10000 --accounts 3 --out /tmp/loadtest-users.json
+
+--reset nejdřív smaže dřívější loadtest uživatele (CASCADE maže i jejich data).
+Nikdy nespouštět proti produkční databázi.
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+# Allow running as a top-level script: add backend/ to sys.path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from dotenv import load_dotenv
+load_dotenv()
+
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from auth import create_access_token
+from benchmarks.synthetic import generate_dataset
+from database import async_session_maker
+from models import AccountModel, TransactionModel, UserModel
+from services.categorization import search_text
+from services.timefmt import utcnow
+
+EMAIL_TEMPLATE = "loadtest-{n}@local"
+# 19 sloupců na řádek — pod limitem 32767 parametrů asyncpg
+_INSERT_CHUNK = 1500
+
+
+def _transaction_row(tx) -> dict:
+    return {
+        "id": tx.id,
+        "user_id": tx.user_id,
+        "account_id": tx.account_id,
+        "date": tx.date,
+        "description": tx.description,
+        "amount": tx.amount,
+        "currency": tx.currency,
+        "category": tx.category or "Other",
+        "account_type": tx.account_type,
+        "transaction_type": tx.transaction_type,
+        "is_excluded": tx.is_excluded,
+        "user_excluded": False,
+        "category_locked": False,
+        "my_share_amount": tx.my_share_amount,
+        "settlement_flag": tx.settlement_flag,
+        "settlement_note": tx.settlement_note,
+        "share_counterparty": tx.share_counterparty,
+        "raw_json": tx.raw_json,
+        "search_text": search_text(tx.description, tx.raw),
+    }
+
+
+async def seed_user(db, n: int, transactions: int, accounts: int) -> dict:
+    email = EMAIL_TEMPLATE.format(n=n)
+    now = utcnow()
+    stmt = pg_insert(UserModel).values(
+        email=email, name=f"Load Test {n}", provider="email", is_active=True, created_at=now, updated_at=now,
+    )
+    stmt = stmt.on_conflict_do_update(index_elements=["email"], set_={"updated_at": now}).returning(UserModel.id)
+    user_id = (await db.execute(stmt)).scalar_one()
+
+    dataset = generate_dataset(transactions, accounts, seed=user_id, user_id=user_id)
+    balances: dict[str, float] = {}
+    for tx in dataset.transactions:
+        balances[tx.account_id] = balances.get(tx.account_id, 0.0) + tx.amount
+    account_rows = [
+        {
+            "id": acc.id, "user_id": user_id, "name": acc.name, "type": "bank",
+            "balance": round(100_000 + balances.get(acc.id, 0.0), 2), "currency": "CZK",
+            "institution": "FAKE_BANK_0", "details_json": acc.details_json, "last_synced": now, "is_visible": True,
+        }
+        for acc in dataset.accounts
+    ]
+    await db.execute(pg_insert(AccountModel).values(account_rows).on_conflict_do_nothing(index_elements=["id"]))
+
+    rows = [_transaction_row(tx) for tx in dataset.transactions]
+    for i in range(0, len(rows), _INSERT_CHUNK):
+        await db.execute(
+            pg_insert(TransactionModel).values(rows[i:i + _INSERT_CHUNK]).on_conflict_do_nothing(index_elements=["id"])
+        )
+    await db.commit()
+    return {"user_id": user_id, "email": email, "token": create_access_token(user_id=user_id, email=email)}
+
+
+async def reset(db) -> int:
+    result = await db.execute(
+        delete(UserModel).where(UserModel.email.like(EMAIL_TEMPLATE.format(n="%"))).returning(UserModel.id)
+    )
+    deleted = len(result.all())
+    await db.commit()
+    return deleted
+
+
+async def main(args) -> None:
+    async with async_session_maker() as db:
+        if args.reset:
+            print(f"Deleted {await reset(db)} load-test user(s)")
+        users = []
+        for n in range(1, args.users + 1):
+            users.append(await seed_user(db, n, args.transactions, args.accounts))
+            print(f"Seeded {users[-1]['email']} (id={users[-1]['user_id']})")
+    Path(args.out).write_text(json.dumps(users, indent=2))
+    print(f"Wrote {len(users)} token(s) to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed load-test users into local Postgres")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--transactions", type=int, default=10_000, help="transakcí na uživatele")
+    parser.add_argument("--accounts", type=int, default=3, help="bankovních účtů na uživatele (1–10)")
+    parser.add_argument("--out", default="loadtest-users.json", help="kam zapsat tokeny pro driver.py")
+    parser.add_argument("--reset", action="store_true", help="nejdřív smazat dřívější loadtest uživatele")
+    asyncio.run(main(parser.parse_args()))
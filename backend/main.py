@@ -1,8 +1,15 @@
+import time
+
+# Začátek importů — log app.startup hlásí, kolik trvaly (studený start)
+_STARTED = time.perf_counter()
+
+import asyncio
 import logging
+import secrets
 import sys
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from contextlib import asynccontextmanager
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,7 +18,16 @@ from slowapi.errors import RateLimitExceeded
 from config import get_settings
 from routers import accounts, transactions, dashboard, sync, settings, investments, budgets, monthly_budget, recurring_expenses, categories, manual_accounts, contacts, manual_investments, auth, loans, subscriptions, tags, notifications, cashflow, salary_estimate
 from auth import limiter
-from database import get_db
+from database import background_engine, engine, get_db, read_engine, warm_up_pool
+from services import cpu_pool
+from services.category_retro import resume_loop as category_jobs_resume_loop
+from services.institutions import refresh_loop as institutions_refresh_loop
+from services.loop_watchdog import LoopWatchdog
+from services.push import push_dispatcher
+from services.subscription_matching import backfill_missing_links as subscription_links_backfill
+from services.metrics import MetricsMiddleware, monitor_event_loop_lag
+from services.query_stats import QueryStatsLogFilter, QueryStatsMiddleware
+from services.tracing import TraceContextLogFilter, setup_tracing
 
 settings_config = get_settings()
 
@@ -56,6 +72,8 @@ else:
         '%(asctime)s [%(levelname)s] %(name)s: %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S',
     ))
+# Logy vzniklé během requestu nesou db_queries / db_time_ms (services/query_stats.py)
+_log_handler.addFilter(QueryStatsLogFilter())
 logging.basicConfig(
     level=getattr(logging, settings_config.log_level.upper(), logging.INFO),
     handlers=[_log_handler],
@@ -66,7 +84,40 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    yield
+    # Periodický refresh katalogu bank (services/institutions.py) — běží mimo
+    # requesty, stránka připojení banky pak čte jen cache.
+    institutions_task = asyncio.create_task(institutions_refresh_loop())
+    # Joby zpětného použití pravidel přerušené restartem (services/category_retro.py)
+    category_jobs_task = asyncio.create_task(category_jobs_resume_loop())
+    # Vazby předplatných z doby před migrací 0029 (services/subscription_matching.py)
+    subscription_links_task = asyncio.create_task(subscription_links_backfill())
+    # Lag event loopu pro /metrics (services/metrics.py)
+    loop_lag_task = asyncio.create_task(monitor_event_loop_lag())
+    # Blokující kód v async cestě → varování se zásobníkem (services/loop_watchdog.py)
+    watchdog = None
+    if settings_config.loop_block_warn_ms > 0:
+        watchdog = LoopWatchdog(settings_config.loop_block_warn_ms / 1000)
+        watchdog.start()
+    # Spojení do DB na pozadí — start na ně nečeká, první requesty ano
+    warmup_task = asyncio.create_task(warm_up_pool(settings_config.db_pool_warmup))
+    ready_ms = (time.perf_counter() - _STARTED) * 1000
+    logger.info(
+        "Startup: imports %.0f ms, ready %.0f ms", _IMPORTS_MS, ready_ms,
+        extra={"event": "app.startup", "imports_ms": round(_IMPORTS_MS), "ready_ms": round(ready_ms)},
+    )
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        institutions_task.cancel()
+        category_jobs_task.cancel()
+        subscription_links_task.cancel()
+        loop_lag_task.cancel()
+        if watchdog:
+            watchdog.stop()
+        cpu_pool.shutdown()
+        # Odeslat notifikace, které ještě čekají ve frontě dispatcheru
+        await push_dispatcher.aclose()
 
 
 app = FastAPI(
@@ -90,6 +141,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Počet SQL dotazů a čas v DB na request → Server-Timing + pole v logu
+app.add_middleware(
+    QueryStatsMiddleware,
+    repeat_warn=settings_config.query_repeat_warn,
+    timing_allow_origin=", ".join(settings_config.cors_origins),
+)
+
+# Latence/velikost/chyby per šablona routy pro Prometheus (/metrics). Přidaný
+# jako poslední → nejvnější vrstva, měří i CORS a odpovědi z exception handlerů.
+app.add_middleware(MetricsMiddleware)
+
+# Volitelný OpenTelemetry tracing (OTEL_EXPORTER) — logy pak nesou trace_id
+if setup_tracing(app, [e for e in (engine, background_engine, read_engine) if e], settings_config):
+    _log_handler.addFilter(TraceContextLogFilter())
+
 # Include routers
 app.include_router(accounts.router, prefix="/accounts", tags=["Accounts"])
 app.include_router(transactions.router, prefix="/transactions", tags=["Transactions"])
@@ -112,6 +178,9 @@ app.include_router(tags.router, prefix="/tags", tags=["Tags"])
 app.include_router(notifications.router, prefix="/notifications", tags=["Notifications"])
 app.include_router(cashflow.router, prefix="/cashflow", tags=["Cashflow"])
 
+# Importy + sestavení aplikace; zbytek do "ready" je uvicorn a lifespan
+_IMPORTS_MS = (time.perf_counter() - _STARTED) * 1000
+
 @app.get("/")
 async def root():
     return {"message": "Budget Tracker API", "status": "running"}
@@ -129,3 +198,15 @@ async def health(db: AsyncSession = Depends(get_db)):
             status_code=500,
             content={"status": "unhealthy", "database": "disconnected", "error": str(e)}
         )
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus text format (services/metrics.py). S METRICS_TOKEN jen
+    s `Authorization: Bearer <token>`."""
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+    token = settings_config.metrics_token
+    if token and not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {token}"):
+        return JSONResponse(status_code=401, content={"detail": "Unauthorized"})
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,29 @@
+"""institution_catalog — cache katalogu bank GoCardless per země
+
+Revision ID: 0027
+Revises: 0026
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0027'
+down_revision: Union[str, None] = '0026'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'institution_catalog',
+        sa.Column('country', sa.String(), primary_key=True),
+        sa.Column('payload_json', sa.Text(), nullable=False),
+        sa.Column('etag', sa.String(), nullable=False),
+        sa.Column('institutions_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('fetched_at', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('institution_catalog')
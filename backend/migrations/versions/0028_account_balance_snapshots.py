@@ -0,0 +1,41 @@
+"""account_balance_snapshots — denní zůstatky účtů pro graf vývoje majetku
+
+Revision ID: 0028
+Revises: 0027
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0028'
+down_revision: Union[str, None] = '0027'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'account_balance_snapshots',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('account_key', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('snapshot_date', sa.String(), nullable=False),
+        sa.Column('balance', sa.Float(), nullable=False),
+        sa.Column('source', sa.String(), nullable=False, server_default='sync'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_unique_constraint(
+        'uq_balance_snapshots_user_account_date', 'account_balance_snapshots',
+        ['user_id', 'account_key', 'snapshot_date'],
+    )
+    op.create_index(
+        'ix_balance_snapshots_user_date', 'account_balance_snapshots', ['user_id', 'snapshot_date'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_balance_snapshots_user_date', table_name='account_balance_snapshots')
+    op.drop_constraint('uq_balance_snapshots_user_account_date', 'account_balance_snapshots', type_='unique')
+    op.drop_table('account_balance_snapshots')
@@ -0,0 +1,38 @@
+"""subscription_transactions — uložené vazby předplatné ↔ transakce
+
+Revision ID: 0029
+Revises: 0028
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0029'
+down_revision: Union[str, None] = '0028'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'subscription_transactions',
+        sa.Column('subscription_id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('transaction_id', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('subscription_id', 'kind', 'transaction_id'),
+        sa.ForeignKeyConstraint(['subscription_id'], ['subscriptions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['transaction_id'], ['transactions.id'], ondelete='CASCADE'),
+    )
+    op.create_index(
+        'ix_subscription_transactions_transaction_id', 'subscription_transactions', ['transaction_id'],
+    )
+    # NULL → vazby existujících předplatných dopočte úkol z lifespanu / sync
+    # (services/subscription_matching.build_missing_links), čtení nic nezapisuje
+    op.add_column('subscriptions', sa.Column('links_built_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('subscriptions', 'links_built_at')
+    op.drop_index('ix_subscription_transactions_transaction_id', table_name='subscription_transactions')
+    op.drop_table('subscription_transactions')
@@ -0,0 +1,52 @@
+"""recurring_merchant_stats + recurring_detector_state — inkrementální detektor předplatných
+
+Revision ID: 0030
+Revises: 0029
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0030'
+down_revision: Union[str, None] = '0029'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'recurring_merchant_stats',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('merchant_key', sa.String(), nullable=False),
+        sa.Column('display', sa.String(), nullable=False),
+        sa.Column('charges_json', sa.Text(), nullable=False),
+        sa.Column('categories_json', sa.Text(), nullable=False),
+        sa.Column('interval_histogram_json', sa.Text(), nullable=False),
+        sa.Column('occurrences', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('median_interval', sa.Float(), nullable=True),
+        sa.Column('median_amount', sa.Float(), nullable=True),
+        sa.Column('amount_consistency', sa.Float(), nullable=True),
+        sa.Column('period', sa.String(), nullable=True),
+        sa.Column('top_category', sa.String(), nullable=True),
+        sa.Column('first_date', sa.String(), nullable=True),
+        sa.Column('last_date', sa.String(), nullable=True),
+        sa.Column('last_amount', sa.Float(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_unique_constraint(
+        'uq_recurring_stats_user_key', 'recurring_merchant_stats', ['user_id', 'merchant_key'],
+    )
+    op.create_table(
+        'recurring_detector_state',
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('last_tx_created_at', sa.DateTime(), nullable=True),
+        sa.Column('rebuilt_at', sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('recurring_detector_state')
+    op.drop_constraint('uq_recurring_stats_user_key', 'recurring_merchant_stats', type_='unique')
+    op.drop_table('recurring_merchant_stats')
@@ -0,0 +1,25 @@
+"""loan_payments: částečný index nezaplacených splátek pro párování po syncu
+
+Revision ID: 0031
+Revises: 0030
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0031'
+down_revision: Union[str, None] = '0030'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        'ix_loan_payments_unpaid_due', 'loan_payments', ['loan_id', 'due_date'],
+        postgresql_where=sa.text('is_paid = false'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_loan_payments_unpaid_due', table_name='loan_payments')
@@ -0,0 +1,24 @@
+"""transactions.search_text — foldovaný text pro zpětné použití pravidel v SQL
+
+Dopočítává se při syncu (services/category_retro.ensure_search_text).
+
+Revision ID: 0032
+Revises: 0031
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0032'
+down_revision: Union[str, None] = '0031'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('search_text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transactions', 'search_text')
@@ -0,0 +1,38 @@
+"""category_retro_jobs — stav zpětného použití pravidel kategorií v DB
+
+Revision ID: 0033
+Revises: 0032
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '0033'
+down_revision: Union[str, None] = '0032'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'category_retro_jobs',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('pattern', sa.String(), nullable=False),
+        sa.Column('category', sa.String(), nullable=False),
+        sa.Column('exclude_id', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False, server_default='running'),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('done', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('started_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_category_retro_jobs_user_id', 'category_retro_jobs', ['user_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_category_retro_jobs_user_id', table_name='category_retro_jobs')
+    op.drop_table('category_retro_jobs')
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, Text, Integer, Boolean, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Float, DateTime, Text, Integer, Boolean, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -77,6 +77,8 @@ class TransactionModel(Base):
     settlement_note = Column(String, nullable=True)  # e.g. "nájem + kreditka boty"
     share_counterparty = Column(String, nullable=True)  # who owes / sent the settlement ("Žena", "Sestra"…); NULL = unspecified
     raw_json = Column(Text, nullable=True)  # Original API response
+    # fold(combined_text + popis) — pro zpětné použití pravidel v SQL; NULL = ještě nespočítáno
+    search_text = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationship to account
@@ -463,13 +465,18 @@ class LoanPaymentModel(Base):
 
     loan = relationship("LoanModel", back_populates="payments")
 
+    __table_args__ = (
+        # Párování po syncu hledá jen nezaplacené splátky kolem data transakcí
+        Index("ix_loan_payments_unpaid_due", "loan_id", "due_date", postgresql_where=(is_paid.is_(False))),
+    )
+
 
 class SubscriptionModel(Base):
     """Předplatné — opakovaná platba (Netflix, mobil, pojistka…).
 
-    Ukládáme jen definici (pattern + očekávaná částka + perioda). Poslední platba,
-    příští obnovení a změny ceny se počítají živě z transakcí přes merchant_pattern,
-    takže nikdy nejsou zastaralé.
+    Ukládáme definici (pattern + očekávaná částka + perioda). Poslední platba,
+    příští obnovení a změny ceny se počítají živě z transakcí napárovaných přes
+    merchant_pattern (vazby v subscription_transactions).
     """
     __tablename__ = "subscriptions"
 
@@ -492,10 +499,27 @@ class SubscriptionModel(Base):
     # Pattern pro párování PŘÍCHOZÍCH příspěvků od ostatních (sestra posílá podíl
     # za předplatné) — NULL = příspěvky nesledujeme.
     contribution_pattern = Column(String, nullable=True)
+    # Kdy se naposledy přepočítaly vazby na transakce (subscription_transactions).
+    # NULL = nové předplatné nebo změněný pattern → vazby se dopočtou při čtení.
+    links_built_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
+class SubscriptionTransactionModel(Base):
+    """Vazba předplatné ↔ transakce (platba nebo příchozí příspěvek).
+
+    Plní se při syncu pro nově stažené transakce a celá se přepočítá po
+    vytvoření předplatného / změně patternu — čtení pak místo textového
+    hledání přes všechny transakce jen joinuje tuhle tabulku.
+    """
+    __tablename__ = "subscription_transactions"
+
+    subscription_id = Column(Integer, ForeignKey("subscriptions.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String, primary_key=True)  # "charge" | "contribution"
+    transaction_id = Column(String, ForeignKey("transactions.id", ondelete="CASCADE"), primary_key=True, index=True)
+
+
 class ShareRuleModel(Base):
     """Pravidlo automatického dělení výdaje (VYLEPSENI.md 3.1 — auto-split).
 
@@ -551,3 +575,112 @@ class SalaryEstimateModel(Base):
         UniqueConstraint("user_id", "year_month", name="uq_salary_estimates_user_year_month"),
     )
 
+
+
+class InstitutionCatalogModel(Base):
+    """Cache katalogu bank GoCardless (/institutions/) — jeden řádek na zemi.
+
+    Katalog je globální (ne per-user) a mění se zřídka; drží se jako JSON blob,
+    refreshuje ho periodický úkol (services/institutions.py) a /accounts/institutions
+    ho servíruje bez živého volání GoCardless.
+    """
+    __tablename__ = "institution_catalog"
+
+    country = Column(String, primary_key=True)  # ISO 3166 "CZ"
+    payload_json = Column(Text, nullable=False)  # JSON list Integration dictů
+    etag = Column(String, nullable=False)        # hash payloadu — HTTP ETag
+    institutions_count = Column(Integer, nullable=False, default=0)
+    fetched_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AccountBalanceSnapshotModel(Base):
+    """Denní zůstatek jednoho účtu — zdroj grafu vývoje majetku.
+
+    Pokrývá všechny druhy účtů pod jedním klíčem `account_key`: id bankovního /
+    T212 účtu, "manual-{id}" a "manual-inv-{id}" (stejné klíče jako v seznamu
+    účtů na dashboardu). Řádek vzniká při každém syncu (source="sync") a
+    dopočtem mezer z denních součtů transakcí (source="backfill"). Řádek je
+    jen pro dny, kdy se zůstatek zapsal/změnil — čtení hodnotu mezi nimi
+    přenáší z posledního známého dne.
+    """
+    __tablename__ = "account_balance_snapshots"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    account_key = Column(String, nullable=False)
+    kind = Column(String, nullable=False)  # "bank" | "investment" — řada v grafu
+    snapshot_date = Column(String, nullable=False)  # YYYY-MM-DD, konec dne
+    balance = Column(Float, nullable=False)
+    source = Column(String, nullable=False, default="sync")  # "sync" | "backfill"
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "account_key", "snapshot_date", name="uq_balance_snapshots_user_account_date"),
+        Index("ix_balance_snapshots_user_date", "user_id", "snapshot_date"),
+    )
+
+
+class RecurringMerchantStatsModel(Base):
+    """Průběžné statistiky odchozích plateb jedné protistrany — stav detektoru
+    opakovaných plateb (/subscriptions/detect, services/recurring_detection.py).
+
+    Klíč `merchant_key` je primární token normalizované protistrany. Řádek drží
+    všechny platby (charges_json) a z nich odvozené skóre; doplňuje se jen
+    o transakce přidané od posledního běhu, návrhy se čtou rovnou odsud.
+    """
+    __tablename__ = "recurring_merchant_stats"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    merchant_key = Column(String, nullable=False)
+    display = Column(String, nullable=False)
+    charges_json = Column(Text, nullable=False)              # [[YYYY-MM-DD, částka], …] vzestupně, bez duplicit
+    categories_json = Column(Text, nullable=False)           # {kategorie: počet}
+    interval_histogram_json = Column(Text, nullable=False)   # {perioda: počet intervalů v pásmu}
+    occurrences = Column(Integer, nullable=False, default=0)
+    median_interval = Column(Float, nullable=True)
+    median_amount = Column(Float, nullable=True)
+    amount_consistency = Column(Float, nullable=True)  # podíl plateb do ±25 % mediánu
+    period = Column(String, nullable=True)  # detekovaná perioda; NULL = nevypadá jako předplatné
+    top_category = Column(String, nullable=True)
+    first_date = Column(String, nullable=True)
+    last_date = Column(String, nullable=True)
+    last_amount = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "merchant_key", name="uq_recurring_stats_user_key"),
+    )
+
+
+class RecurringDetectorStateModel(Base):
+    """Kurzor detektoru opakovaných plateb pro uživatele: do kterého
+    transactions.created_at jsou statistiky zpracované a kdy proběhl celý přepočet."""
+    __tablename__ = "recurring_detector_state"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    last_tx_created_at = Column(DateTime, nullable=True)
+    rebuilt_at = Column(DateTime, nullable=False)
+
+
+class CategoryRetroJobModel(Base):
+    """Zpětné použití pravidla kategorie běžící na pozadí (services/category_retro).
+
+    Stav je v DB, ne v paměti procesu: průběh jde číst z kterékoli repliky
+    (dotaz na průběh jen čte) a job přerušený restartem (updated_at přestane
+    přibývat) převezme periodický category_retro.resume_loop některé repliky.
+    """
+    __tablename__ = "category_retro_jobs"
+
+    id = Column(String, primary_key=True)  # uuid4 hex
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    pattern = Column(String, nullable=False)
+    category = Column(String, nullable=False)
+    exclude_id = Column(String, nullable=True)  # transakce, u které uživatel kategorii měnil
+    status = Column(String, nullable=False, default="running")  # "running" | "completed" | "failed"
+    total = Column(Integer, nullable=False, default=0)
+    done = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)  # heartbeat běžícího jobu
+    finished_at = Column(DateTime, nullable=True)
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
 from pydantic import BaseModel
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from services.gocardless import gocardless_service, select_balance
+from services.institutions import get_catalogue
 from services.timefmt import utc_iso, utcnow
 from auth import get_current_user
 from database import get_db
@@ -38,16 +39,28 @@ connected_accounts: dict = {}
 
 @router.get("/institutions")
 async def get_institutions(
+    request: Request,
+    response: Response,
     country: str = "CZ",
+    q: Optional[str] = None,
     current_user: UserModel = Depends(get_current_user),
 ):
-    """Get available banks for connection"""
+    """Get available banks for connection.
+
+    Served from the cached catalogue (services/institutions.py), optionally
+    filtered by `q` (name / BIC). Supports If-None-Match → 304."""
     try:
-        institutions = await gocardless_service.get_institutions(country)
-        return {"institutions": institutions}
+        catalogue = await get_catalogue(country)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    etag = catalogue.etag_for(q)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return {"institutions": catalogue.search(q)}
+
 
 @router.post("/connect/bank")
 async def connect_bank(
@@ -15,6 +15,7 @@ from auth import create_access_token, get_current_user, hash_password, limiter,
 from config import get_settings
 from database import get_db
 from models import UserModel
+from services.cpu_pool import run_cpu
 from services.default_rules import seed_default_rules
 from services.oauth_verify import verify_google_id_token
 from services.timefmt import utcnow
@@ -183,7 +184,7 @@ async def register(
         email=body.email,
         name=body.name,
         provider="email",
-        password_hash=hash_password(body.password),
+        password_hash=await run_cpu(hash_password, body.password),
         is_active=True,
     )
     db.add(user)
@@ -220,7 +221,8 @@ async def login(
 
     if user is None or not user.password_hash:
         raise HTTPException(status_code=401, detail=INVALID_CREDENTIALS_MESSAGE)
-    if not verify_password(body.password, user.password_hash):
+    # argon2 je schválně pomalý (desítky ms CPU) — mimo event loop
+    if not await run_cpu(verify_password, body.password, user.password_hash):
         raise HTTPException(status_code=401, detail=INVALID_CREDENTIALS_MESSAGE)
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Account is disabled")
@@ -3,8 +3,8 @@
 Read-only agregace nad existujícími daty — žádné vlastní tabulky:
   - nezaplacené položky rozpočtu aktuálního měsíce (monthly_expenses + due_day
     ze šablony) a nezaplacené splátky úvěrů splatné tento měsíc
-  - předplatná s příštím stržením do konce měsíce (přes pattern-matching
-    helpery ze subscriptions; deduplikovaná proti položkám rozpočtu)
+  - předplatná s příštím stržením do konce měsíce (přes společné párování
+    plateb services/subscription_matching; deduplikovaná proti položkám rozpočtu)
   - očekávaná výplata (řádek is_salary v rozpočtu; den odhadnutý mediánem
     z minulých transakcí kategorie Salary)
 
@@ -37,11 +37,10 @@ from services.exchange_rates import get_exchange_rate
 from routers.subscriptions import (
     PERIOD_MONTHS,
     _add_months,
-    _load_charges,
     _my_amount,
     _parse_date,
-    _primary_token,
 )
+from services.subscription_matching import load_subscription_matches, primary_token
 
 router = APIRouter()
 
@@ -176,14 +175,23 @@ async def _subscription_events(
         )
     )).scalars().all()
 
+    def covered_by_budget(sub: SubscriptionModel) -> bool:
+        token = primary_token(sub.merchant_pattern.lower())
+        name_lc = sub.name.lower()
+        return any(name_lc in key or key in name_lc or token in key for key in dedup_keys)
+
+    subs = [sub for sub in subs if not covered_by_budget(sub)]
+    # Stačí poslední platba: příští stržení do konce měsíce znamená poslední
+    # platbu nejvýš o periodu (max. rok) zpátky — okno 13 měsíců.
+    window_start = _add_months(today.replace(day=1), -13).strftime("%Y-%m-%d")
+    matches = await load_subscription_matches(
+        db, user_id, subs, date_from=window_start, with_contributions=False, charge_limit=1,
+    )
+
     events: List[CashflowEvent] = []
     for sub in subs:
-        token = _primary_token(sub.merchant_pattern.lower())
-        name_lc = sub.name.lower()
-        if any(name_lc in key or key in name_lc or token in key for key in dedup_keys):
-            continue
-        charges = await _load_charges(db, user_id, sub.merchant_pattern)
-        last_date = _parse_date(charges[0][0]) if charges else None
+        charges = matches[sub.id].charges
+        last_date = _parse_date(charges[0].date) if charges else None
         if not last_date:
             continue
         next_due = _add_months(last_date, PERIOD_MONTHS.get(sub.period, 1))
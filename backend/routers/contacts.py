@@ -3,9 +3,8 @@
 Fills in display names for transactions where the bank omits
 creditorName/debtorName (typical for Czech standing orders, utilities).
 Naming a counterparty once propagates to all past + future transactions
-sharing that IBAN.
+sharing that IBAN. Auto-learned entries come from sync (services/contacts).
 """
-import json
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Optional
@@ -14,19 +13,12 @@ from sqlalchemy import select
 
 from auth import get_current_user
 from database import get_db
-from models import ContactModel, TransactionModel, UserModel
+from models import ContactModel, UserModel
+from services.contacts import invalidate_contact_map, learn_from_history, normalize_iban
 
 router = APIRouter()
 
 
-def normalize_iban(value: Optional[str]) -> Optional[str]:
-    """Upper-case and strip whitespace so lookups are consistent."""
-    if not value:
-        return None
-    cleaned = "".join(value.split()).upper()
-    return cleaned or None
-
-
 class Contact(BaseModel):
     iban: str
     name: str
@@ -101,6 +93,7 @@ async def upsert_contact(
         db.add(contact)
 
     await db.commit()
+    invalidate_contact_map(current_user.id)
     await db.refresh(contact)
     return contact
 
@@ -119,6 +112,7 @@ async def delete_contact(
         raise HTTPException(status_code=404, detail="Contact not found")
     await db.delete(contact)
     await db.commit()
+    invalidate_contact_map(current_user.id)
     return {"deleted": normalized}
 
 
@@ -127,58 +121,11 @@ async def auto_populate(
     current_user: UserModel = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Scan existing transactions and learn IBAN→name pairs from raw_json.
+    """Learn IBAN→name pairs from the whole history (one-off backfill).
 
-    Only fills gaps — never overwrites manual entries. Uses the most recent
-    non-empty name seen for each IBAN.
+    Sync learns contacts from new transactions on its own; this is for
+    history synced before that. Only fills gaps — never overwrites manual
+    entries. Uses the most recent non-empty name seen for each IBAN.
     """
-    result = await db.execute(
-        select(TransactionModel.raw_json, TransactionModel.date)
-        .where(
-            TransactionModel.user_id == current_user.id,
-            TransactionModel.raw_json.isnot(None),
-        )
-        .order_by(TransactionModel.date.desc())
-    )
-    rows = result.all()
-
-    latest_by_iban: dict[str, str] = {}
-    for raw_json, _date in rows:
-        try:
-            raw = json.loads(raw_json)
-        except Exception:
-            continue
-
-        for account_key, name_key in (("creditorAccount", "creditorName"), ("debtorAccount", "debtorName")):
-            acc = raw.get(account_key) or {}
-            iban = normalize_iban(acc.get("iban") or acc.get("bban"))
-            name = (raw.get(name_key) or "").strip()
-            if iban and name and iban not in latest_by_iban:
-                latest_by_iban[iban] = name
-
-    if not latest_by_iban:
-        return {"learned": 0, "skipped": 0, "total_scanned": len(rows)}
-
-    existing_result = await db.execute(
-        select(ContactModel).where(
-            ContactModel.user_id == current_user.id,
-            ContactModel.iban.in_(list(latest_by_iban.keys())),
-        )
-    )
-    existing = {c.iban: c for c in existing_result.scalars().all()}
-
-    learned = 0
-    skipped = 0
-    for iban, name in latest_by_iban.items():
-        contact = existing.get(iban)
-        if contact is None:
-            db.add(ContactModel(user_id=current_user.id, iban=iban, name=name, source="auto"))
-            learned += 1
-        elif contact.source == "auto" and contact.name != name:
-            contact.name = name
-            learned += 1
-        else:
-            skipped += 1
-
-    await db.commit()
-    return {"learned": learned, "skipped": skipped, "total_scanned": len(rows)}
+    result = await learn_from_history(db, current_user.id)
+    return {"learned": result.learned, "skipped": result.skipped, "total_scanned": result.scanned}
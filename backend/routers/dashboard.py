@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Query, Depends
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
 from sqlalchemy.orm import selectinload
 from auth import get_current_user
-from database import get_db
-from models import AccountModel, TransactionModel, ManualAccountModel, ContactModel, ManualInvestmentAccountModel, CategoryModel, UserModel, TagModel, TransactionTagModel, SettingsModel
+from database import get_read_db, gather_reads
+from models import AccountModel, TransactionModel, ManualAccountModel, ManualInvestmentAccountModel, CategoryModel, UserModel, TagModel, TransactionTagModel, SettingsModel
+from services.balance_snapshots import load_net_worth_history
 from services.exchange_rates import get_exchange_rate
 from services.timefmt import utc_iso, utcnow
-from routers.contacts import normalize_iban
+from services.contacts import Contact, contact_map, parse_counterparty_fields
+from services.cpu_pool import run_cpu
 import json
 
 router = APIRouter()
@@ -68,11 +70,62 @@ def _build_recent_tx(parsed, contacts_by_iban):
     return result
 
 
+def summarize_month(rows, income_category_names: set[str]) -> tuple[float, float, dict[str, float]]:
+    """Fold the per-category month aggregates into (income, expenses, categories).
+
+    `rows` are (category, income, expenses, category_spend) from
+    _month_totals_query — income/expenses follow the dashboard conventions
+    (bank only, excluded and settlements out, my_share_amount respected),
+    category_spend covers all accounts. Income categories stay out of the
+    breakdown even if a misclassified negative tx slips through."""
+    income = 0.0
+    expenses = 0.0
+    categories: dict[str, float] = {}
+    for category, cat_income, cat_expenses, cat_spend in rows:
+        income += cat_income or 0.0
+        expenses += cat_expenses or 0.0
+        cat = category or "Other"
+        if cat_spend is None or cat in income_category_names:
+            continue
+        categories[cat] = categories.get(cat, 0.0) + cat_spend
+    return income, expenses, categories
+
+
+def _month_totals_query(user_id: int, month_start: str, include_hidden: bool):
+    """One GROUP BY pass over the month with FILTER clauses — replaces loading
+    up to 1000 ORM rows (which silently truncated heavy months)."""
+    tx = TransactionModel
+    not_excluded = func.coalesce(tx.is_excluded, False) == False
+    my_part = func.least(func.coalesce(tx.my_share_amount, func.abs(tx.amount)), func.abs(tx.amount))
+    q = (
+        select(
+            tx.category,
+            func.sum(tx.amount).filter(
+                tx.amount > 0, tx.account_type == "bank", not_excluded,
+                func.coalesce(tx.settlement_flag, False) == False,
+            ),
+            func.sum(my_part).filter(tx.amount < 0, tx.account_type == "bank", not_excluded),
+            func.sum(my_part).filter(tx.amount < 0, not_excluded),
+        )
+        .where(tx.user_id == user_id, tx.date >= month_start)
+        .group_by(tx.category)
+    )
+    if not include_hidden:
+        q = q.where(
+            tx.account_id.in_(
+                select(AccountModel.id).where(
+                    AccountModel.user_id == user_id,
+                    AccountModel.is_visible == True,
+                )
+            )
+        )
+    return q
+
+
 @router.get("/")
 async def get_dashboard(
     include_hidden: bool = False,
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
 ):
     """Get main dashboard data from database (instant response).
 
@@ -80,19 +133,75 @@ async def get_dashboard(
     the settings account manager can list and un-hide them. The summary/totals are
     only meaningful for the default (visible-only) call — the settings manager
     reads just the `accounts` list.
+
+    The independent reads below run concurrently, each on its own pooled
+    connection (database.gather_reads); the small lookups share one.
     """
+    user_id = current_user.id
 
-    acc_q = select(AccountModel).where(AccountModel.user_id == current_user.id)
-    man_q = select(ManualAccountModel).options(selectinload(ManualAccountModel.items)).where(ManualAccountModel.user_id == current_user.id)
-    inv_q = select(ManualInvestmentAccountModel).options(selectinload(ManualInvestmentAccountModel.positions)).where(ManualInvestmentAccountModel.user_id == current_user.id)
+    acc_q = select(AccountModel).where(AccountModel.user_id == user_id)
+    man_q = select(ManualAccountModel).options(selectinload(ManualAccountModel.items)).where(ManualAccountModel.user_id == user_id)
+    inv_q = select(ManualInvestmentAccountModel).options(selectinload(ManualInvestmentAccountModel.positions)).where(ManualInvestmentAccountModel.user_id == user_id)
     if not include_hidden:
         acc_q = acc_q.where(AccountModel.is_visible == True)
         man_q = man_q.where(ManualAccountModel.is_visible == True)
         inv_q = inv_q.where(ManualInvestmentAccountModel.is_visible == True)
 
-    accounts = (await db.execute(acc_q)).scalars().all()
-    manual_accounts = (await db.execute(man_q)).scalars().all()
-    manual_investment_accounts = (await db.execute(inv_q)).scalars().all()
+    # Get transactions for the CURRENT CALENDAR MONTH (not last 30 days — UI labels these
+    # as "tento měsíc" so they must match what the user sees on a calendar).
+    month_start = datetime.now().replace(day=1).strftime("%Y-%m-%d")
+
+    async def read_accounts(session: AsyncSession):
+        # Malá čtení (účty, manuální účty, kategorie příjmů) za sebou na jednom
+        # spojení — souběh by jen bral spojení z poolu ostatním requestům
+        income_result = await session.execute(
+            select(CategoryModel.name).where(
+                CategoryModel.user_id == user_id,
+                CategoryModel.is_income == True,
+            )
+        )
+        return (
+            (await session.execute(acc_q)).scalars().all(),
+            (await session.execute(man_q)).scalars().all(),
+            (await session.execute(inv_q)).scalars().all(),
+            {row[0] for row in income_result.all()},
+        )
+
+    async def read_recent(session: AsyncSession):
+        # Recent transactions with account name — hidden accounts' transactions
+        # stay out of the dashboard overview.
+        tx_q = (
+            select(TransactionModel, AccountModel.name)
+            .join(AccountModel, TransactionModel.account_id == AccountModel.id)
+            .where(TransactionModel.user_id == user_id)
+        )
+        if not include_hidden:
+            tx_q = tx_q.where(AccountModel.is_visible == True)
+        rows = (await session.execute(tx_q.order_by(TransactionModel.date.desc()).limit(5))).all()
+
+        # Parse raw_json for counterparty fields and bulk-lookup missing names in contacts
+        parsed = []
+        needed_ibans: set[str] = set()
+        for tx, account_name in rows:
+            creditor_name, debtor_name, creditor_iban, debtor_iban = parse_counterparty_fields(tx.raw_json)
+            if not creditor_name and creditor_iban:
+                needed_ibans.add(creditor_iban)
+            if not debtor_name and debtor_iban:
+                needed_ibans.add(debtor_iban)
+            parsed.append((tx, account_name, creditor_name, debtor_name, creditor_iban, debtor_iban))
+
+        contacts_by_iban: dict[str, Contact] = {}
+        if needed_ibans:
+            contacts_by_iban = await contact_map(session, user_id)
+        return _build_recent_tx(parsed, contacts_by_iban)
+
+    async def read_month(session: AsyncSession):
+        return (await session.execute(_month_totals_query(user_id, month_start, include_hidden))).all()
+
+    (
+        (accounts, manual_accounts, manual_investment_accounts, income_category_names),
+        recent_transactions, month_rows,
+    ) = await gather_reads(read_accounts, read_recent, read_month)
 
     # Calculate investment balance — re-convert if sync stored wrong rate (fallback 1.0)
     investment_balance = 0
@@ -133,95 +242,10 @@ async def get_dashboard(
     )
     total_balance += manual_investment_balance
     investment_balance += manual_investment_balance
-    
-    # Get recent transactions from DB with account name — hidden accounts'
-    # transactions stay out of the dashboard overview.
-    tx_q = (
-        select(TransactionModel, AccountModel.name)
-        .join(AccountModel, TransactionModel.account_id == AccountModel.id)
-        .where(TransactionModel.user_id == current_user.id)
-    )
-    if not include_hidden:
-        tx_q = tx_q.where(AccountModel.is_visible == True)
-    tx_result = await db.execute(
-        tx_q.order_by(TransactionModel.date.desc()).limit(5)
-    )
-    recent_tx_rows = tx_result.all()
-
-    # Parse raw_json for counterparty fields and bulk-lookup missing names in contacts
-    recent_tx_parsed = []
-    needed_ibans: set[str] = set()
-    for tx, account_name in recent_tx_rows:
-        raw: dict = {}
-        if tx.raw_json:
-            try:
-                raw = json.loads(tx.raw_json) or {}
-            except Exception:
-                pass
-        creditor_name = raw.get("creditorName")
-        debtor_name = raw.get("debtorName")
-        creditor_iban = normalize_iban((raw.get("creditorAccount") or {}).get("iban") or (raw.get("creditorAccount") or {}).get("bban"))
-        debtor_iban = normalize_iban((raw.get("debtorAccount") or {}).get("iban") or (raw.get("debtorAccount") or {}).get("bban"))
-        if not creditor_name and creditor_iban:
-            needed_ibans.add(creditor_iban)
-        if not debtor_name and debtor_iban:
-            needed_ibans.add(debtor_iban)
-        recent_tx_parsed.append((tx, account_name, creditor_name, debtor_name, creditor_iban, debtor_iban))
-
-    contacts_by_iban: dict[str, ContactModel] = {}
-    if needed_ibans:
-        contact_rows = await db.execute(
-            select(ContactModel).where(
-                ContactModel.user_id == current_user.id,
-                ContactModel.iban.in_(list(needed_ibans)),
-            )
-        )
-        contacts_by_iban = {c.iban: c for c in contact_rows.scalars().all()}
-    
-    # Get transactions for the CURRENT CALENDAR MONTH (not last 30 days — UI labels these
-    # as "tento měsíc" so they must match what the user sees on a calendar).
-    today = datetime.now()
-    month_start = today.replace(day=1).strftime("%Y-%m-%d")
-    all_tx_q = select(TransactionModel).where(
-        TransactionModel.user_id == current_user.id,
-        TransactionModel.date >= month_start,
-    )
-    if not include_hidden:
-        all_tx_q = all_tx_q.where(
-            TransactionModel.account_id.in_(
-                select(AccountModel.id).where(
-                    AccountModel.user_id == current_user.id,
-                    AccountModel.is_visible == True,
-                )
-            )
-        )
-    all_tx_result = await db.execute(all_tx_q.limit(1000))
-    all_tx = all_tx_result.scalars().all()
-    
-    # Calculate income vs expenses (excluding internal/family transfers;
-    # settlement transfers from wife are not income, shared expenses count only my part)
-    income = sum(tx.amount for tx in all_tx if tx.amount > 0 and tx.account_type == "bank" and not tx.is_excluded and not tx.settlement_flag)
-    expenses = sum(_my_expense_amount(tx) for tx in all_tx if tx.amount < 0 and tx.account_type == "bank" and not tx.is_excluded)
-    
-    # Calculate categories (only true expense categories — exclude income categories
-    # like Salary/Dividend even if a misclassified negative tx slips through)
-    income_cat_result = await db.execute(
-        select(CategoryModel.name).where(
-            CategoryModel.user_id == current_user.id,
-            CategoryModel.is_income == True,
-        )
-    )
-    income_category_names = {row[0] for row in income_cat_result.all()}
 
-    categories = {}
-    for tx in all_tx:
-        if tx.amount < 0 and not tx.is_excluded:
-            cat = tx.category or "Other"
-            if cat in income_category_names:
-                continue
-            if cat not in categories:
-                categories[cat] = 0
-            categories[cat] += _my_expense_amount(tx)
+    # Income vs expenses + category breakdown (excluding internal/family transfers;
+    # settlement transfers from wife are not income, shared expenses count only my part)
+    income, expenses, categories = summarize_month(month_rows, income_category_names)
     
     # Build accounts list including manual accounts
     # For investment accounts, re-convert balance if sync stored wrong rate (fallback 1.0)
@@ -298,124 +322,23 @@ async def get_dashboard(
             "savings": income - expenses
         },
         "categories": categories,
-        "recent_transactions": _build_recent_tx(recent_tx_parsed, contacts_by_iban),
+        "recent_transactions": recent_transactions,
         "accounts": accounts_list
     }
 
 
 @router.get("/net-worth-history")
 async def get_net_worth_history(
-    days: int = Query(30, ge=7, le=365),
+    days: int = Query(30, ge=7, le=3650),
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get net worth history (bank + investments + manual accounts) for chart"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=days)
-
-    acc_result = await db.execute(
-        select(AccountModel).where(
-            AccountModel.user_id == current_user.id,
-            AccountModel.is_visible == True,
-        )
-    )
-    accounts = acc_result.scalars().all()
-
-    # Manuální účty nemají transakce, takže se nedají rekonstruovat zpětně —
-    # jejich aktuální zůstatek (jen moje peníze, bez cizích obálek) se přičítá
-    # jako konstanta, aby Banka a Celkem seděly s hlavním dashboardem.
-    man_result = await db.execute(
-        select(ManualAccountModel)
-        .options(selectinload(ManualAccountModel.items))
-        .where(
-            ManualAccountModel.user_id == current_user.id,
-            ManualAccountModel.is_visible == True,
-        )
-    )
-    manual_balance = 0
-    for macc in man_result.scalars().all():
-        borrowed = sum(item.amount for item in macc.items if not getattr(item, 'is_mine', True))
-        manual_balance += macc.balance - borrowed
-
-    # Totéž pro manuální investiční účty — dashboard je počítá do investic.
-    inv_result = await db.execute(
-        select(ManualInvestmentAccountModel)
-        .options(selectinload(ManualInvestmentAccountModel.positions))
-        .where(
-            ManualInvestmentAccountModel.user_id == current_user.id,
-            ManualInvestmentAccountModel.is_visible == True,
-        )
-    )
-    manual_investment_balance = sum(
-        sum(p.current_value for p in acc.positions)
-        for acc in inv_result.scalars().all()
-    )
-
-    current_bank_balance = sum(acc.balance for acc in accounts if acc.type == "bank") + manual_balance
-    current_investment_balance = sum(acc.balance for acc in accounts if acc.type == "investment") + manual_investment_balance
+    """Get net worth history (bank + investments + manual accounts) for chart.
 
-    result = await db.execute(
-        select(TransactionModel).where(
-            TransactionModel.user_id == current_user.id,
-            TransactionModel.date >= start_date.strftime("%Y-%m-%d"),
-            TransactionModel.account_id.in_(
-                select(AccountModel.id).where(
-                    AccountModel.user_id == current_user.id,
-                    AccountModel.is_visible == True,
-                )
-            ),
-        ).limit(2000)
-    )
-    transactions = result.scalars().all()
-    
-    # Group transactions by date and type
-    bank_daily = {}
-    investment_daily = {}
-    
-    for tx in transactions:
-        date = tx.date[:10]
-        if tx.account_type == "bank":
-            bank_daily[date] = bank_daily.get(date, 0) + tx.amount
-        elif tx.account_type == "investment":
-            investment_daily[date] = investment_daily.get(date, 0) + tx.amount
-    
-    # Generate daily points (working BACKWARDS from today to oldest)
-    # Start with current balances and subtract transactions to get historical values
-    history = []
-    bank_balance = current_bank_balance
-    investment_balance = current_investment_balance
-    
-    # First, record today's balance
-    today = end_date.strftime("%Y-%m-%d")
-    history.append({
-        "date": today,
-        "bank": round(bank_balance, 2),
-        "investment": round(investment_balance, 2),
-        "total": round(bank_balance + investment_balance, 2)
-    })
-    
-    # Work backwards from today
-    for i in range(1, days + 1):
-        date = (end_date - timedelta(days=i)).strftime("%Y-%m-%d")
-        next_date = (end_date - timedelta(days=i-1)).strftime("%Y-%m-%d")
-        
-        # Subtract the NEXT day's transactions to get this day's ending balance
-        # (because next_date transactions caused the change FROM this day TO next_date)
-        if next_date in bank_daily:
-            bank_balance -= bank_daily[next_date]
-        if next_date in investment_daily:
-            investment_balance -= investment_daily[next_date]
-        
-        history.append({
-            "date": date,
-            "bank": round(bank_balance, 2),
-            "investment": round(investment_balance, 2),
-            "total": round(bank_balance + investment_balance, 2)
-        })
-    
-    # Reverse to get chronological order (oldest first, newest last)
-    history.reverse()
-    
+    Reads the per-account daily snapshots written on each sync
+    (services/balance_snapshots.py) — an indexed range scan for any window
+    from a week up to 10 years."""
+    history = await load_net_worth_history(db, current_user.id, days)
     return {
         "history": history,
         "currency": "CZK"
@@ -600,7 +523,7 @@ def build_wrapped(
 async def get_spending_wrapped(
     year: Optional[int] = Query(None, ge=2000, le=2100),
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Roční přehled („Spending Wrapped"): top obchodníci, nejdražší měsíc,
     žebříček kategorií, největší výdaj a součty za tagy/projekty."""
@@ -688,8 +611,9 @@ async def get_spending_wrapped(
     )
     transactions = tx_result.scalars().all()
 
-    wrapped = build_wrapped(
-        transactions, income_category_names, year,
+    # Celý rok transakcí v čistém Pythonu — mimo event loop (services/cpu_pool.py)
+    wrapped = await run_cpu(
+        build_wrapped, transactions, income_category_names, year,
         frozenset(own_name_tokens), frozenset(keep_account_ids),
     )
 
@@ -731,7 +655,7 @@ async def get_monthly_report(
     months: int = Query(6, ge=1, le=24),
     full_amounts: bool = Query(False, description="True = bank-statement view: full amounts, settlements count as income"),
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get monthly report with income/expenses and category breakdown.
 
@@ -3,10 +3,17 @@
 Úvěr se zadá parametry (jistina, sazba, počet splátek, datum první splátky).
 Měsíční splátku buď zadá uživatel, nebo ji dopočítáme anuitním vzorcem. Při
 vytvoření/úpravě se vygeneruje splátkový kalendář (LoanPaymentModel) — rozpad
-každé splátky na úrok vs. jistinu a zbývající dluh v čase.
+každé splátky na úrok vs. jistinu a zbývající dluh v čase. Úprava přepisuje
+jen splátky, které se změnily.
+
+/scenarios porovná „co kdyby" varianty (mimořádné splátky, refixace) se
+základním kalendářem — nic se neukládá. Výpočty: services/loan_engine.
+
+Splátky se po syncu párují s transakcemi automaticky (services/loan_matching);
+ruční přepnutí zaplaceno/nezaplaceno zůstává jako oprava.
 """
 from datetime import datetime, date
-from typing import List, Optional
+from typing import List, Literal, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
@@ -16,39 +23,27 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from auth import get_current_user
 from database import get_db
 from models import LoanModel, LoanPaymentModel, UserModel
+from services.loan_engine import (
+    REDUCE_TERM,
+    SCHEDULE_FIELDS,
+    Scenario,
+    amortize,
+    annuity_payment,
+    compare_scenarios,
+    diff_schedule,
+)
+from services.loan_matching import match_loan_payments
 
 router = APIRouter()
 
 
-# === Amortization math ===
-
-def annuity_payment(principal: float, annual_rate_pct: float, term_months: int) -> float:
-    """Anuitní (konstantní) měsíční splátka.
-
-    annual_rate_pct je roční sazba v % (např. 5.9). Při nulové sazbě jde o prosté
-    rozdělení jistiny na počet splátek.
-    """
-    if term_months <= 0:
-        return 0.0
-    monthly_rate = (annual_rate_pct / 100.0) / 12.0
-    if monthly_rate == 0:
-        return round(principal / term_months, 2)
-    factor = (1 + monthly_rate) ** term_months
-    return round(principal * monthly_rate * factor / (factor - 1), 2)
+# === Amortization ===
 
-
-def _add_months(d: date, months: int) -> date:
-    """Add N months to a date, clamping the day to the target month's length."""
-    month_index = d.month - 1 + months
-    year = d.year + month_index // 12
-    month = month_index % 12 + 1
-    # Clamp day (e.g. Jan 31 + 1 month → Feb 28)
-    if month == 12:
-        next_month_first = date(year + 1, 1, 1)
-    else:
-        next_month_first = date(year, month + 1, 1)
-    last_day = (next_month_first - date(year, month, 1)).days
-    return date(year, month, min(d.day, last_day))
+def _parse_start(start_date: str) -> date:
+    try:
+        return datetime.strptime(start_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start_date must be YYYY-MM-DD")
 
 
 def build_schedule(
@@ -58,38 +53,9 @@ def build_schedule(
     monthly_payment: float,
     start_date: str,
 ) -> list[dict]:
-    """Vygeneruj splátkový kalendář. Poslední splátka dorovná případné zaokrouhlení."""
-    schedule: list[dict] = []
-    monthly_rate = (annual_rate_pct / 100.0) / 12.0
-    balance = principal
-    try:
-        start = datetime.strptime(start_date, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="start_date must be YYYY-MM-DD")
-
-    for i in range(1, term_months + 1):
-        interest = round(balance * monthly_rate, 2)
-        principal_part = round(monthly_payment - interest, 2)
-        # Last installment: pay off whatever is left (handles rounding drift).
-        if i == term_months or principal_part >= balance:
-            principal_part = round(balance, 2)
-            payment_amount = round(principal_part + interest, 2)
-        else:
-            payment_amount = monthly_payment
-        balance = round(balance - principal_part, 2)
-        if balance < 0:
-            balance = 0.0
-        schedule.append({
-            "installment_number": i,
-            "due_date": _add_months(start, i - 1).strftime("%Y-%m-%d"),
-            "amount": payment_amount,
-            "principal_part": principal_part,
-            "interest_part": interest,
-            "remaining_balance": balance,
-        })
-        if balance <= 0:
-            break
-    return schedule
+    """Vygeneruj splátkový kalendář (services/loan_engine). Poslední splátka
+    dorovná případné zaokrouhlení."""
+    return amortize(principal, annual_rate_pct, term_months, monthly_payment, _parse_start(start_date)).rows
 
 
 # === Pydantic schemas ===
@@ -158,6 +124,50 @@ class LoanResponse(BaseModel):
     current_paid: bool = False
 
 
+class ExtraPaymentIn(BaseModel):
+    installment_number: int
+    amount: float
+
+
+class RateChangeIn(BaseModel):
+    installment_number: int
+    interest_rate: float  # nová roční sazba v % p.a.
+
+
+class ScenarioIn(BaseModel):
+    name: str
+    extra_payments: List[ExtraPaymentIn] = []
+    rate_changes: List[RateChangeIn] = []
+    monthly_extra: float = 0.0
+    strategy: Literal["reduce_term", "reduce_payment"] = REDUCE_TERM
+
+
+class ScenarioRequest(BaseModel):
+    scenarios: List[ScenarioIn]
+    include_schedule: bool = False
+
+
+class ScenarioResult(BaseModel):
+    name: str
+    installments: int
+    end_date: Optional[str]
+    total_interest: float
+    total_paid: float
+    monthly_payment: float       # řádná splátka na konci (po refixaci / snížení)
+    interest_saved: float        # oproti základnímu kalendáři
+    months_saved: int
+    schedule: Optional[List[dict]] = None
+
+
+class ScenarioResponse(BaseModel):
+    baseline: ScenarioResult
+    scenarios: List[ScenarioResult]
+
+
+# Víc variant v jednom requestu nedává v UI smysl a jen by pálilo CPU
+MAX_SCENARIOS = 50
+
+
 # === Helpers ===
 
 async def _get_user_loan(db: AsyncSession, user_id: int, loan_id: int) -> LoanModel:
@@ -180,14 +190,29 @@ async def _load_payments(db: AsyncSession, loan_id: int) -> list[LoanPaymentMode
 
 
 async def _regenerate_schedule(db: AsyncSession, loan: LoanModel) -> None:
-    """Drop and rebuild the payment schedule for a loan from its current params."""
-    await db.execute(delete(LoanPaymentModel).where(LoanPaymentModel.loan_id == loan.id))
+    """Srovná uložený kalendář s parametry úvěru. Přepisuje jen splátky, které
+    se změnily — řádky (a jejich id, is_paid, spárovaná transakce) zůstávají."""
     schedule = build_schedule(
         loan.principal, loan.interest_rate, loan.term_months,
         loan.monthly_payment, loan.start_date,
     )
-    for row in schedule:
+    by_number = {p.installment_number: p for p in await _load_payments(db, loan.id)}
+    diff = diff_schedule(
+        {n: {k: getattr(p, k) for k in SCHEDULE_FIELDS} for n, p in by_number.items()},
+        schedule,
+    )
+    for number, changed in diff.to_update:
+        for field, value in changed.items():
+            setattr(by_number[number], field, value)
+    for row in diff.to_insert:
         db.add(LoanPaymentModel(loan_id=loan.id, **row))
+    if diff.to_delete:
+        await db.execute(
+            delete(LoanPaymentModel).where(
+                LoanPaymentModel.loan_id == loan.id,
+                LoanPaymentModel.installment_number.in_(diff.to_delete),
+            )
+        )
 
 
 def _build_loan_response(loan: LoanModel, payments: list[LoanPaymentModel]) -> LoanResponse:
@@ -322,6 +347,17 @@ async def get_loans_summary(
     }
 
 
+@router.post("/match-payments")
+async def match_payments(
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Spárovat nezaplacené splátky s transakcemi za poslední ~rok (po syncu
+    se páruje samo — tohle je pro úvěry zadané zpětně)."""
+    matched = await match_loan_payments(db, current_user.id)
+    return {"matched": matched}
+
+
 @router.get("/{loan_id}/schedule", response_model=List[LoanPaymentResponse])
 async def get_loan_schedule(
     loan_id: int,
@@ -347,6 +383,57 @@ async def get_loan_schedule(
     ]
 
 
+@router.post("/{loan_id}/scenarios", response_model=ScenarioResponse)
+async def compare_loan_scenarios(
+    loan_id: int,
+    data: ScenarioRequest,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Porovnat „co kdyby" varianty splácení se základním kalendářem (nic neukládá)."""
+    loan = await _get_user_loan(db, current_user.id, loan_id)
+    if not data.scenarios or len(data.scenarios) > MAX_SCENARIOS:
+        raise HTTPException(status_code=400, detail=f"scenarios must contain 1 to {MAX_SCENARIOS} items")
+
+    scenarios = []
+    for s in data.scenarios:
+        if s.monthly_extra < 0 or any(e.amount < 0 for e in s.extra_payments):
+            raise HTTPException(status_code=400, detail="extra payments must not be negative")
+        extras: dict[int, float] = {}
+        for e in s.extra_payments:
+            extras[e.installment_number] = extras.get(e.installment_number, 0.0) + e.amount
+        scenarios.append(Scenario(
+            name=s.name,
+            extra_payments=extras,
+            rate_changes={r.installment_number: r.interest_rate for r in s.rate_changes},
+            monthly_extra=s.monthly_extra,
+            strategy=s.strategy,
+        ))
+
+    baseline, results = compare_scenarios(
+        loan.principal, loan.interest_rate, loan.term_months, loan.monthly_payment,
+        _parse_start(loan.start_date), scenarios, with_rows=data.include_schedule,
+    )
+
+    def result(name: str, a) -> ScenarioResult:
+        return ScenarioResult(
+            name=name,
+            installments=a.installments,
+            end_date=a.end_date,
+            total_interest=a.total_interest,
+            total_paid=a.total_paid,
+            monthly_payment=a.last_payment,
+            interest_saved=round(baseline.total_interest - a.total_interest, 2),
+            months_saved=baseline.installments - a.installments,
+            schedule=a.rows if data.include_schedule else None,
+        )
+
+    return ScenarioResponse(
+        baseline=result("Základ", baseline),
+        scenarios=[result(s.name, a) for s, a in results],
+    )
+
+
 @router.put("/{loan_id}", response_model=LoanResponse)
 async def update_loan(
     loan_id: int,
@@ -357,11 +444,6 @@ async def update_loan(
     """Upravit úvěr. Změna parametrů přegeneruje kalendář (zachová zaplacené splátky)."""
     loan = await _get_user_loan(db, current_user.id, loan_id)
 
-    # Track which installments were already paid so we can preserve that state.
-    old_payments = await _load_payments(db, loan.id)
-    paid_numbers = {p.installment_number for p in old_payments if p.is_paid}
-    matched_by_number = {p.installment_number: p.matched_transaction_id for p in old_payments if p.is_paid}
-
     schedule_fields = {"principal", "interest_rate", "term_months", "monthly_payment", "start_date"}
     needs_regen = False
     for field, value in data.model_dump(exclude_unset=True).items():
@@ -376,14 +458,8 @@ async def update_loan(
         loan.monthly_payment = annuity_payment(loan.principal, loan.interest_rate, loan.term_months)
 
     if needs_regen:
+        # Splátky se upraví na místě, takže zaplacené zůstanou zaplacené
         await _regenerate_schedule(db, loan)
-        await db.flush()
-        # Re-apply paid flags to the same installment numbers where they still exist.
-        new_payments = await _load_payments(db, loan.id)
-        for p in new_payments:
-            if p.installment_number in paid_numbers:
-                p.is_paid = True
-                p.matched_transaction_id = matched_by_number.get(p.installment_number)
 
     await db.commit()
     await db.refresh(loan)
@@ -1,22 +1,25 @@
 """
 Monthly Budget Router - Měsíční rozpočet
 """
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_
+from sqlalchemy import select, func
 from pydantic import BaseModel
 from typing import List, Optional
 
 from auth import get_current_user
-from database import get_db
+from database import get_db, get_read_db
 from models import (
     MonthlyBudgetModel, MonthlyIncomeItemModel, RecurringExpenseModel, MonthlyExpenseModel,
     TransactionModel, UserModel,
     LoanModel, LoanPaymentModel, AccountModel, SubscriptionModel
 )
 from routers.recurring_expenses import RecurringExpenseCreate
-from routers.subscriptions import PERIOD_MONTHS, _add_months, _my_amount, _parse_date, _primary_token
+from routers.subscriptions import PERIOD_MONTHS, _add_months, _my_amount, _parse_date
+from services.annual_overview import load_expense_breakdown, load_month_totals, month_rows, year_totals
+from services.budget_matching import match_budget_transactions
 from services.categorization import fold
+from services.subscription_matching import load_subscription_matches
 
 router = APIRouter(tags=["Budget & Expenses"])
 
@@ -224,34 +227,23 @@ async def _subscription_expense_rows(
 
     folded_taken = {fold(n).strip() for n in taken_names}
     folded_taken.discard("")
+    subs = [
+        sub for sub in subs
+        if not any(len(t) >= 3 and t in fold(f"{sub.name} {sub.merchant_pattern}") for t in folded_taken)
+    ]
+    # Posledních pár plateb každého předplatného do konce měsíce — jeden
+    # dotaz přes uložené vazby předplatné ↔ transakce
+    matches = await load_subscription_matches(
+        db, user_id, subs, date_to=end_date, with_contributions=False, charge_limit=6,
+    )
 
     for sub in subs:
-        sub_text = fold(f"{sub.name} {sub.merchant_pattern}")
-        if any(len(t) >= 3 and t in sub_text for t in folded_taken):
-            continue
 
         period_months = PERIOD_MONTHS.get(sub.period, 1)
 
-        # Poslední platby patternu do konce měsíce — stejné matchování jako
-        # na stránce Předplatná (_primary_token, popis i raw_json).
-        like = f"%{_primary_token(sub.merchant_pattern)}%"
-        charge_result = await db.execute(
-            select(TransactionModel.id, TransactionModel.date)
-            .where(
-                TransactionModel.user_id == user_id,
-                TransactionModel.account_type == "bank",
-                TransactionModel.amount < 0,
-                TransactionModel.is_excluded.is_(False),
-                TransactionModel.date < end_date,
-                or_(
-                    TransactionModel.description.ilike(like),
-                    TransactionModel.raw_json.ilike(like),
-                ),
-            )
-            .order_by(TransactionModel.date.desc())
-            .limit(6)
-        )
-        charges = charge_result.all()
+        # Platby patternu do konce měsíce (nejnovější první) — stejné
+        # matchování jako na stránce Předplatná.
+        charges = matches[sub.id].charges
         in_month = next((c for c in charges if c.date >= start_date), None)
         last_before = next((c for c in charges if c.date < start_date), None)
 
@@ -606,132 +598,14 @@ async def match_transactions(
     current_user: UserModel = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    """Automaticky spárovat výdaje s transakcemi"""
+    """Automaticky spárovat výdaje s transakcemi (services/budget_matching)"""
     budget = await _require_budget(db, current_user.id, year_month)
-
-    expenses_result = await db.execute(
-        select(MonthlyExpenseModel).where(MonthlyExpenseModel.budget_id == budget.id).order_by(MonthlyExpenseModel.id)
-    )
-    expenses = expenses_result.scalars().all()
-
-    recurring_result = await db.execute(
-        select(RecurringExpenseModel).where(
-            RecurringExpenseModel.user_id == current_user.id,
-            RecurringExpenseModel.match_pattern != None,
-        )
-    )
-    recurring_expenses = recurring_result.scalars().all()
-
-    pattern_by_name = {}
-    for rec in recurring_expenses:
-        pattern_by_name[rec.name.lower()] = rec.match_pattern.lower()
-        if rec.id:
-            pattern_by_name[f"id_{rec.id}"] = rec.match_pattern.lower()
-
-    start_date = f"{year_month}-01"
-    if year_month.endswith("-12"):
-        year = int(year_month[:4]) + 1
-        end_date = f"{year:04d}-01-01"
-    else:
-        year, month = map(int, year_month.split("-"))
-        end_date = f"{year:04d}-{month+1:02d}-01"
-
-    tx_result = await db.execute(
-        select(TransactionModel)
-        .where(TransactionModel.user_id == current_user.id)
-        .where(TransactionModel.date >= start_date)
-        .where(TransactionModel.date < end_date)
-        .where(TransactionModel.amount < 0)
-        # Hidden accounts are excluded from budget matching.
-        .where(TransactionModel.account_id.in_(
-            select(AccountModel.id).where(
-                AccountModel.user_id == current_user.id,
-                AccountModel.is_visible == True,
-            )
-        ))
-    )
-    transactions = tx_result.scalars().all()
-
-    category_by_name = {}
-    for rec in recurring_expenses:
-        if rec.category:
-            category_by_name[rec.name.lower()] = rec.category
-
-    used_tx_ids = set()
-
-    matched_count = 0
-    matched_by_amount = 0
-    matched_by_category = 0
-
-    for expense in expenses:
-        if expense.is_paid:
-            continue
-
-        matched = False
-
-        pattern = None
-        if expense.recurring_expense_id:
-            pattern = pattern_by_name.get(f"id_{expense.recurring_expense_id}")
-        if not pattern:
-            pattern = pattern_by_name.get(expense.name.lower())
-
-        if pattern:
-            for tx in transactions:
-                if tx.id in used_tx_ids:
-                    continue
-                if pattern in tx.description.lower():
-                    expense.is_paid = True
-                    expense.matched_transaction_id = tx.id
-                    used_tx_ids.add(tx.id)
-                    matched_count += 1
-                    matched = True
-                    break
-
-        if matched:
-            continue
-
-        expense_amount = abs(expense.amount)
-        tolerance = expense_amount * 0.05
-
-        for tx in transactions:
-            if tx.id in used_tx_ids:
-                continue
-            tx_amount = abs(tx.amount)
-            if abs(tx_amount - expense_amount) <= tolerance:
-                expense.is_paid = True
-                expense.matched_transaction_id = tx.id
-                used_tx_ids.add(tx.id)
-                matched_by_amount += 1
-                matched = True
-                break
-
-        if matched:
-            continue
-
-        expense_category = category_by_name.get(expense.name.lower())
-        if expense_category:
-            tolerance_wide = expense_amount * 0.20
-            for tx in transactions:
-                if tx.id in used_tx_ids:
-                    continue
-                if tx.category == expense_category:
-                    tx_amount = abs(tx.amount)
-                    if abs(tx_amount - expense_amount) <= tolerance_wide:
-                        expense.is_paid = True
-                        expense.matched_transaction_id = tx.id
-                        used_tx_ids.add(tx.id)
-                        matched_by_category += 1
-                        break
-
+    details = await match_budget_transactions(db, current_user.id, budget)
     await db.commit()
     return {
         "status": "matched",
-        "matched_count": matched_count + matched_by_amount + matched_by_category,
-        "details": {
-            "by_pattern": matched_count,
-            "by_amount": matched_by_amount,
-            "by_category": matched_by_category
-        }
+        "matched_count": sum(details.values()),
+        "details": details,
     }
 
 
@@ -882,132 +756,32 @@ async def delete_monthly_expense(
 
 # === Annual Overview ===
 
-async def _compute_year_totals(year: int, user_id: int, db: AsyncSession):
-    total_income = 0
-    total_expenses = 0
-    total_investments = 0
-    total_savings = 0
-
-    for month in range(1, 13):
-        year_month = f"{year:04d}-{month:02d}"
-        budget = await _get_user_budget(db, user_id, year_month)
-        if not budget:
-            continue
-
-        expenses_result = await db.execute(
-            select(func.sum(MonthlyExpenseModel.amount))
-            .where(MonthlyExpenseModel.budget_id == budget.id)
-        )
-        month_expenses = expenses_result.scalar() or 0
-        income_result = await db.execute(
-            select(func.sum(MonthlyIncomeItemModel.amount))
-            .where(MonthlyIncomeItemModel.budget_id == budget.id)
-        )
-        month_income = income_result.scalar() or 0
-
-        total_income += month_income
-        total_expenses += month_expenses
-        total_investments += budget.investment_amount
-        total_savings += budget.surplus_to_savings
-
-    return {
-        "income": total_income,
-        "expenses": total_expenses,
-        "investments": total_investments,
-        "savings": total_savings,
-        "net": total_income - total_expenses,
-    }
-
-
 @router.get("/annual-overview/{year}")
 async def get_annual_overview(
     year: int,
+    compare_years: int = Query(1, ge=1, le=10),
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Roční přehled"""
-    months_data = []
-    total_income = 0
-    total_expenses = 0
-    total_investments = 0
-    total_savings = 0
-
-    for month in range(1, 13):
-        year_month = f"{year:04d}-{month:02d}"
-
-        budget = await _get_user_budget(db, current_user.id, year_month)
-
-        if budget:
-            expenses_result = await db.execute(
-                select(func.sum(MonthlyExpenseModel.amount))
-                .where(MonthlyExpenseModel.budget_id == budget.id)
-            )
-            month_expenses = expenses_result.scalar() or 0
+    """Roční přehled.
 
-            income_result = await db.execute(
-                select(func.sum(MonthlyIncomeItemModel.amount))
-                .where(MonthlyIncomeItemModel.budget_id == budget.id)
-            )
-            month_income = income_result.scalar() or 0
-
-            months_data.append({
-                "month": month,
-                "year_month": year_month,
-                "income": month_income,
-                "expenses": month_expenses,
-                "investments": budget.investment_amount,
-                "savings": budget.surplus_to_savings,
-                "remaining": month_income - month_expenses - budget.investment_amount - budget.surplus_to_savings
-            })
-
-            total_income += month_income
-            total_expenses += month_expenses
-            total_investments += budget.investment_amount
-            total_savings += budget.surplus_to_savings
-        else:
-            months_data.append({
-                "month": month,
-                "year_month": year_month,
-                "income": 0,
-                "expenses": 0,
-                "investments": 0,
-                "savings": 0,
-                "remaining": 0
-            })
-
-    expense_breakdown = {}
-    for month in range(1, 13):
-        year_month = f"{year:04d}-{month:02d}"
-        budget = await _get_user_budget(db, current_user.id, year_month)
-
-        if budget:
-            expenses_result = await db.execute(
-                select(MonthlyExpenseModel).where(MonthlyExpenseModel.budget_id == budget.id).order_by(MonthlyExpenseModel.id)
-            )
-            expenses = expenses_result.scalars().all()
-
-            for exp in expenses:
-                if exp.name not in expense_breakdown:
-                    expense_breakdown[exp.name] = 0
-                expense_breakdown[exp.name] += exp.amount
-
-    previous_year_totals = await _compute_year_totals(year - 1, current_user.id, db)
+    `compare_years` = kolik předchozích let přidat do `comparison` (součty
+    po rocích, nejstarší první) — stojí to pořád jeden dotaz.
+    """
+    first_year = year - compare_years
+    totals = await load_month_totals(db, current_user.id, first_year, year)
+    year_total = year_totals(year, totals)
 
     return {
         "year": year,
-        "months": months_data,
-        "totals": {
-            "income": total_income,
-            "expenses": total_expenses,
-            "investments": total_investments,
-            "savings": total_savings,
-            "net": total_income - total_expenses
-        },
-        "previous_year": previous_year_totals,
-        "expense_breakdown": expense_breakdown,
+        "months": month_rows(year, totals),
+        "totals": year_total,
+        "previous_year": year_totals(year - 1, totals),
+        "comparison": [{"year": y, **year_totals(y, totals)} for y in range(first_year, year + 1)],
+        "expense_breakdown": await load_expense_breakdown(db, current_user.id, year),
         "averages": {
-            "income": total_income / 12,
-            "expenses": total_expenses / 12,
-            "investments": total_investments / 12
+            "income": year_total["income"] / 12,
+            "expenses": year_total["expenses"] / 12,
+            "investments": year_total["investments"] / 12
         }
     }
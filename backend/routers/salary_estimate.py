@@ -4,7 +4,6 @@ Upload → parse (services/timesheet_parser) → výpočet (services/salary_calc
 → upsert do salary_estimates. Accept zapíše čistou částku na účet jako řádek
 příjmu „Výplata" do měsíčního rozpočtu (zrcadlí sync-income v monthly_budget.py).
 """
-import asyncio
 import json
 import re
 from dataclasses import asdict
@@ -24,6 +23,7 @@ from models import (
     UserModel,
 )
 from routers.settings import get_setting, set_setting
+from services.cpu_pool import run_cpu
 from services.payslip_parser import parse_payslip
 from services.salary_calculator import calculate_salary
 from services.timesheet_parser import compute_fond_days, parse_timesheet
@@ -161,7 +161,7 @@ async def upload_salary_timesheet(
     file_bytes = await file.read()
     try:
         # openpyxl parse je synchronní CPU práce — nesmí blokovat event loop
-        hours = await asyncio.to_thread(parse_timesheet, file_bytes)
+        hours = await run_cpu(parse_timesheet, file_bytes)
     except Exception:
         raise HTTPException(
             status_code=400,
@@ -224,7 +224,7 @@ async def upload_salary_payslip(
 
     file_bytes = await file.read()
     try:
-        data = await asyncio.to_thread(parse_payslip, file_bytes)
+        data = await run_cpu(parse_payslip, file_bytes)
     except Exception:
         raise HTTPException(
             status_code=400,
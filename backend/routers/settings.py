@@ -2,12 +2,12 @@ from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_
+from sqlalchemy import select
 
 from auth import get_current_user
 from database import get_db
-from models import SettingsModel, CategoryRuleModel, UserModel, ShareRuleModel, TransactionModel
-from services.share_rules import compute_my_share
+from models import SettingsModel, CategoryRuleModel, UserModel, ShareRuleModel
+from services.share_rules import apply_share_rule_retroactively
 from services.timefmt import utcnow
 
 router = APIRouter()
@@ -519,31 +519,14 @@ async def create_share_rule(
     applied = 0
     if request.apply_retroactively:
         # Jen normální bankovní výdaje bez ručního rozdělení — ruční hodnoty nepřepisujeme.
-        like = f"%{pattern}%"
-        retro = await db.execute(
-            select(TransactionModel).where(
-                and_(
-                    TransactionModel.user_id == current_user.id,
-                    TransactionModel.account_type == "bank",
-                    TransactionModel.amount < 0,
-                    TransactionModel.transaction_type == "normal",
-                    TransactionModel.is_excluded.isnot(True),
-                    TransactionModel.settlement_flag.isnot(True),
-                    TransactionModel.my_share_amount.is_(None),
-                    or_(
-                        TransactionModel.description.ilike(like),
-                        TransactionModel.raw_json.ilike(like),
-                    ),
-                )
+        await db.flush()  # rule.id → pořadí mezi stejně dlouhými patterny
+        others = await db.execute(
+            select(ShareRuleModel).where(
+                ShareRuleModel.user_id == current_user.id,
+                ShareRuleModel.id != rule.id,
             )
         )
-        for tx in retro.scalars():
-            tx.my_share_amount = compute_my_share(tx.amount, rule)
-            if rule.counterparty and not tx.share_counterparty:
-                tx.share_counterparty = rule.counterparty
-            if rule.note and not tx.settlement_note:
-                tx.settlement_note = rule.note
-            applied += 1
+        applied = await apply_share_rule_retroactively(db, current_user.id, rule, others.scalars())
         rule.match_count = applied
 
     await db.commit()
@@ -1,47 +1,35 @@
 """Subscriptions router — přehled předplatných (opakovaných plateb).
 
 Předplatné je definované patternem (merchant_pattern) — poslední platba, příští
-obnovení, zdražení a „možná zrušené" se počítají živě z transakcí, nic se
-neduplikuje do DB.
+obnovení, zdražení a „možná zrušené" se počítají živě z transakcí napárovaných
+přes subscription_transactions (services/subscription_matching).
 
-Detekce (/detect) projde historii odchozích plateb, seskupí je podle protistrany
-(creditorName z raw_json, fallback normalizovaný popis) a hledá skupiny
-s pravidelným intervalem (~měsíc / kvartál / rok) a konzistentní částkou.
+Detekce (/detect) seskupuje odchozí platby podle protistrany (creditorName
+z raw_json, fallback normalizovaný popis) a hledá skupiny s pravidelným
+intervalem (~měsíc / kvartál / rok) a konzistentní částkou — inkrementálně
+nad uloženými statistikami (services/recurring_detection).
 """
-import json
-import re
 from datetime import date, datetime
-from statistics import median
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from sqlalchemy import select, and_, or_
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from auth import get_current_user
-from database import get_db
-from models import SubscriptionModel, TransactionModel, UserModel
+from database import get_db, get_read_db
+from models import SubscriptionModel, UserModel
+from services.recurring_detection import load_recurring_candidates
+from services.subscription_matching import load_subscription_matches, rebuild_links
 
 router = APIRouter()
 
 VALID_PERIODS = ("monthly", "quarterly", "yearly")
 PERIOD_MONTHS = {"monthly": 1, "quarterly": 3, "yearly": 12}
 
-# Detekční pásma: (perioda, min. interval dní, max. interval dní, min. počet plateb)
-DETECTION_BANDS = [
-    ("monthly", 25, 36, 3),
-    ("quarterly", 80, 102, 3),
-    ("yearly", 330, 400, 2),
-]
-# Podíl intervalů, které musí padnout do pásma, aby skupina platila za pravidelnou
-INTERVAL_CONSISTENCY = 0.6
-# Podíl plateb, jejichž částka musí být do ±25 % mediánu (předplatné ≈ stálá cena)
-AMOUNT_CONSISTENCY = 0.7
-AMOUNT_TOLERANCE = 0.25
 
-
-# === Date/merchant helpers ===
+# === Date helpers ===
 
 def _add_months(d: date, months: int) -> date:
     """Add N months, clamping the day to the target month's length."""
@@ -63,53 +51,6 @@ def _parse_date(s: str) -> Optional[date]:
         return None
 
 
-def _normalize_merchant(s: str) -> str:
-    """Grouping key from a counterparty/description string.
-
-    Strips date fragments and long reference numbers but keeps short digits
-    (O2, Trading 212) so the key stays a substring of the original text and
-    ILIKE matching keeps working.
-    """
-    s = (s or "").lower().strip()
-    s = re.sub(r"\b\d{1,2}\.\s?\d{1,2}\.(\s?\d{2,4})?\b", " ", s)  # 12.5.2026
-    s = re.sub(r"\d{4,}", " ", s)                                   # ref. čísla
-    s = re.sub(r"\s+", " ", s).strip()
-    return s[:60]
-
-
-# Card/transfer descriptors often rotate a secondary detail between charges —
-# a city one month, a phone/reference number the next — while the brand name
-# itself stays put (e.g. "NETFLIX.COM Amsterdam NL" vs "NETFLIX.COM
-# 408-724-9160 NL"). Matching the whole descriptor as one substring silently
-# drops every charge that used the "other" variant. Anchoring on just the
-# single most distinctive token survives that rotation.
-_PURE_DIGIT_HYPHEN_RE = re.compile(r"^[\d\-]+$")
-_GEO_CODE_RE = re.compile(r"^[a-z]{2}$")
-_COMMON_GEO_WORDS = {
-    "amsterdam", "prague", "praha", "london", "dublin", "berlin",
-    "luxembourg", "paris", "madrid", "vienna", "wien", "zurich",
-    "bratislava", "warszawa", "warsaw", "budapest", "brno", "ostrava",
-}
-
-
-def _primary_token(text: str) -> str:
-    """Extract the single most distinctive token from a merchant pattern.
-
-    Picks the longest token that isn't a country code, a digit/reference
-    group, or a common city name. Falls back to the original text if nothing
-    survives the filter (e.g. a pattern that's just a country code).
-    """
-    tokens = [t for t in re.split(r"[^a-z0-9.\-]+", text.lower()) if t]
-    candidates = [
-        t for t in tokens
-        if len(t) >= 4
-        and not _PURE_DIGIT_HYPHEN_RE.match(t)
-        and not _GEO_CODE_RE.match(t)
-        and t not in _COMMON_GEO_WORDS
-    ]
-    return max(candidates, key=len) if candidates else text
-
-
 # === Pydantic schemas ===
 
 class SubscriptionCreate(BaseModel):
@@ -202,62 +143,6 @@ def _my_amount(sub: SubscriptionModel) -> float:
     return round(sub.amount * pct / 100, 2)
 
 
-async def _load_charges(
-    db: AsyncSession, user_id: int, pattern: str
-) -> list[tuple[str, float]]:
-    """Odchozí platby odpovídající patternu — [(date, abs_amount)], nejnovější první.
-
-    Matchuje jen na `_primary_token(pattern)`, ne na celý uložený pattern —
-    tím to funguje i pro už dřív uložená předplatná se „širokým" patternem
-    (obsahujícím rotující město/telefon), aniž by bylo potřeba je opravovat v DB.
-    """
-    like = f"%{_primary_token(pattern)}%"
-    result = await db.execute(
-        select(TransactionModel.date, TransactionModel.amount)
-        .where(
-            and_(
-                TransactionModel.user_id == user_id,
-                TransactionModel.account_type == "bank",
-                TransactionModel.amount < 0,
-                TransactionModel.is_excluded == False,  # noqa: E712
-                or_(
-                    TransactionModel.description.ilike(like),
-                    TransactionModel.raw_json.ilike(like),
-                ),
-            )
-        )
-        .order_by(TransactionModel.date.desc())
-        .limit(120)
-    )
-    return [(row[0], round(abs(row[1]), 2)) for row in result.all()]
-
-
-async def _load_contributions(
-    db: AsyncSession, user_id: int, pattern: Optional[str]
-) -> list[tuple[str, float]]:
-    """Příchozí platby odpovídající contribution_pattern — [(date, amount)], nejnovější první."""
-    if not pattern:
-        return []
-    like = f"%{pattern.lower().strip()}%"
-    result = await db.execute(
-        select(TransactionModel.date, TransactionModel.amount)
-        .where(
-            and_(
-                TransactionModel.user_id == user_id,
-                TransactionModel.account_type == "bank",
-                TransactionModel.amount > 0,
-                or_(
-                    TransactionModel.description.ilike(like),
-                    TransactionModel.raw_json.ilike(like),
-                ),
-            )
-        )
-        .order_by(TransactionModel.date.desc())
-        .limit(24)
-    )
-    return [(row[0], round(row[1], 2)) for row in result.all()]
-
-
 def _build_response(
     sub: SubscriptionModel,
     charges: list[tuple[str, float]],
@@ -343,6 +228,12 @@ def _build_response(
     )
 
 
+async def _build_single_response(db: AsyncSession, user_id: int, sub: SubscriptionModel) -> SubscriptionResponse:
+    """Odpověď po vytvoření/úpravě — vazby na historii už přepočítal handler."""
+    match = (await load_subscription_matches(db, user_id, [sub]))[sub.id]
+    return _build_response(sub, match.charge_pairs(), match.contribution_pairs())
+
+
 async def _get_user_subscription(db: AsyncSession, user_id: int, sub_id: int) -> SubscriptionModel:
     result = await db.execute(
         select(SubscriptionModel).where(
@@ -370,12 +261,11 @@ async def get_subscriptions(
         .order_by(SubscriptionModel.is_active.desc(), SubscriptionModel.amount.desc())
     )
     subs = list(result.scalars().all())
-    out = []
-    for sub in subs:
-        charges = await _load_charges(db, current_user.id, sub.merchant_pattern)
-        contributions = await _load_contributions(db, current_user.id, sub.contribution_pattern)
-        out.append(_build_response(sub, charges, contributions))
-    return out
+    matches = await load_subscription_matches(db, current_user.id, subs)
+    return [
+        _build_response(sub, matches[sub.id].charge_pairs(), matches[sub.id].contribution_pairs())
+        for sub in subs
+    ]
 
 
 @router.get("/summary")
@@ -412,9 +302,14 @@ async def get_subscriptions_summary(
 @router.get("/detect", response_model=List[DetectedSubscription])
 async def detect_subscriptions(
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Najdi v historii transakcí opakované platby, které vypadají jako předplatné."""
+    """Najdi v historii transakcí opakované platby, které vypadají jako předplatné.
+
+    Návrhy se čtou z průběžných statistik per protistrana
+    (services/recurring_detection), které po každém syncu dotáhne fáze
+    "recurring" — endpoint nic nezapisuje.
+    """
     # Patterny už sledovaných předplatných — ty z návrhů vynecháme
     existing_result = await db.execute(
         select(SubscriptionModel.merchant_pattern).where(
@@ -423,105 +318,29 @@ async def detect_subscriptions(
     )
     existing_patterns = [row[0] for row in existing_result.all()]
 
-    tx_result = await db.execute(
-        select(
-            TransactionModel.date,
-            TransactionModel.description,
-            TransactionModel.amount,
-            TransactionModel.category,
-            TransactionModel.raw_json,
-        ).where(
-            and_(
-                TransactionModel.user_id == current_user.id,
-                TransactionModel.account_type == "bank",
-                TransactionModel.amount < 0,
-                TransactionModel.is_excluded == False,  # noqa: E712
-                TransactionModel.transaction_type == "normal",
-            )
-        )
-    )
-    rows = tx_result.all()
-
-    # Seskupení podle protistrany
-    groups: dict[str, dict] = {}
-    for tx_date, description, amount, category, raw_json in rows:
-        creditor = ""
-        if raw_json:
-            try:
-                creditor = (json.loads(raw_json).get("creditorName") or "").strip()
-            except Exception:
-                pass
-        source = creditor if len(creditor) >= 3 else (description or "")
-        # Anchor grouping on the same primary token as _load_charges uses, so
-        # rotating-descriptor merchants (city one month, phone number the
-        # next) form one group instead of being split into weak, under-the-
-        # threshold groups that never reach the occurrence minimum.
-        key = _primary_token(_normalize_merchant(source))
-        if len(key) < 3:
-            continue
-        g = groups.setdefault(key, {"display": source.strip(), "charges": [], "categories": {}})
-        d = _parse_date(tx_date)
-        if not d:
-            continue
-        g["charges"].append((d, round(abs(amount), 2)))
-        if category:
-            g["categories"][category] = g["categories"].get(category, 0) + 1
-
     suggestions: list[DetectedSubscription] = []
-    for key, g in groups.items():
+    for stats in await load_recurring_candidates(db, current_user.id):
+        key = stats.merchant_key
         # Už sledované patterny přeskoč (substring v obou směrech)
         if any(p in key or key in p for p in existing_patterns):
             continue
 
-        charges = sorted(set(g["charges"]))  # dedupe + chronologicky
-        if len(charges) < 2:
-            continue
-
-        intervals = [
-            (charges[i + 1][0] - charges[i][0]).days
-            for i in range(len(charges) - 1)
-        ]
-        intervals = [i for i in intervals if i > 0]
-        if not intervals:
-            continue
-        med_interval = median(intervals)
-
-        period = None
-        for band_period, lo, hi, min_count in DETECTION_BANDS:
-            if lo <= med_interval <= hi and len(charges) >= min_count:
-                in_band = sum(1 for i in intervals if lo <= i <= hi)
-                if in_band >= max(1, round(INTERVAL_CONSISTENCY * len(intervals))):
-                    period = band_period
-                    break
-        if not period:
-            continue
-
-        # Konzistence částek — předplatné má (skoro) stálou cenu
-        amounts = [a for _, a in charges]
-        med_amount = median(amounts)
-        if med_amount <= 0:
-            continue
-        close = sum(1 for a in amounts if abs(a - med_amount) <= AMOUNT_TOLERANCE * med_amount)
-        if close < AMOUNT_CONSISTENCY * len(amounts):
-            continue
-
-        last_date, last_amount = charges[-1]
+        last_date = _parse_date(stats.last_date)
         # Dávno mrtvé vzory nenavrhuj (nic > 2 periody zpátky)
-        if (date.today() - last_date).days > 2 * PERIOD_MONTHS[period] * 31:
+        if not last_date or (date.today() - last_date).days > 2 * PERIOD_MONTHS[stats.period] * 31:
             continue
 
-        top_category = max(g["categories"], key=g["categories"].get) if g["categories"] else None
         suggestions.append(DetectedSubscription(
-            name=g["display"][:60] or key,
+            name=stats.display[:60] or key,
             merchant_pattern=key,
-            amount=last_amount,
-            period=period,
-            category=top_category,
-            occurrences=len(charges),
-            avg_interval_days=int(med_interval),
-            first_seen_date=charges[0][0].strftime("%Y-%m-%d"),
-            last_charged_date=last_date.strftime("%Y-%m-%d"),
-            next_due_estimate=_add_months(last_date, PERIOD_MONTHS[period]).strftime("%Y-%m-%d"),
+            amount=stats.last_amount,
+            period=stats.period,
+            category=stats.top_category,
+            occurrences=stats.occurrences,
+            avg_interval_days=int(stats.median_interval),
+            first_seen_date=stats.first_date,
+            last_charged_date=stats.last_date,
+            next_due_estimate=_add_months(last_date, PERIOD_MONTHS[stats.period]).strftime("%Y-%m-%d"),
         ))
 
     suggestions.sort(key=lambda s: _monthly_equivalent(s.amount, s.period), reverse=True)
@@ -559,12 +378,12 @@ async def create_subscription(
         contribution_pattern=(data.contribution_pattern or "").lower().strip() or None,
     )
     db.add(sub)
+    await db.flush()  # sub.id pro vazby
+    await rebuild_links(db, current_user.id, [sub])
     await db.commit()
     await db.refresh(sub)
 
-    charges = await _load_charges(db, current_user.id, sub.merchant_pattern)
-    contributions = await _load_contributions(db, current_user.id, sub.contribution_pattern)
-    return _build_response(sub, charges, contributions)
+    return await _build_single_response(db, current_user.id, sub)
 
 
 @router.patch("/{sub_id}", response_model=SubscriptionResponse)
@@ -591,15 +410,20 @@ async def update_subscription(
         updates["merchant_pattern"] = updates["merchant_pattern"].lower().strip()
     if "contribution_pattern" in updates:
         updates["contribution_pattern"] = (updates["contribution_pattern"] or "").lower().strip() or None
+    patterns_changed = any(
+        field in updates and updates[field] != getattr(sub, field)
+        for field in ("merchant_pattern", "contribution_pattern")
+    )
     for field, value in updates.items():
         setattr(sub, field, value)
+    if patterns_changed:
+        # Vazby na transakce platí pro starý pattern — přepočítat nad celou historií
+        await rebuild_links(db, current_user.id, [sub])
 
     await db.commit()
     await db.refresh(sub)
 
-    charges = await _load_charges(db, current_user.id, sub.merchant_pattern)
-    contributions = await _load_contributions(db, current_user.id, sub.contribution_pattern)
-    return _build_response(sub, charges, contributions)
+    return await _build_single_response(db, current_user.id, sub)
 
 
 @router.delete("/{sub_id}")
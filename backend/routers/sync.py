@@ -11,19 +11,28 @@ import re
 import time
 
 from auth import get_current_user
-from database import get_db
-from models import AccountModel, TransactionModel, SyncStatusModel, CategoryRuleModel, PortfolioSnapshotModel, UserModel, ShareRuleModel
-from services.share_rules import match_share_rule, compute_my_share
+from database import get_background_db, get_db
+from models import AccountModel, TransactionModel, SyncStatusModel, PortfolioSnapshotModel, UserModel, ShareRuleModel
+from services.balance_snapshots import record_balance_snapshots
+from services.budget_matching import match_current_month
+from services.contacts import collect_counterparties, upsert_learned_contacts
+from services.loan_matching import match_loan_payments
+from services.subscription_matching import build_missing_links, link_new_transactions
+from services.share_rules import SHARE_RULE_ORDER, ShareRuleMatcher, compute_my_share
+from services.sync_profile import SyncProfile, profile_sync, summarize_phases
 from services.transfers import detect_and_mark_transfers
 from services.gocardless import gocardless_service, select_balance, GoCardlessAPIError
-from services.push import send_push_to_user
+from services.push import push_dispatcher
 from services.timefmt import utc_iso, utcnow
+from services.tracing import span
 from services.trading212 import trading212_service
 from services.exchange_rates import get_exchange_rate
+from services.category_retro import ensure_search_text
+from services.recurring_detection import refresh_recurring_stats
 from services.categorization import (
-    RULE_ORDER,
-    categorize_transaction_with_rules,
     categorize_with_preloaded_rules,
+    load_category_rules,
+    search_text,
 )
 
 router = APIRouter()
@@ -93,30 +102,32 @@ async def recategorize_transactions(
         )
     )
     transactions = result.scalars().all()
+    user_rules, learned_rules = await load_category_rules(db, current_user.id)
 
     updated = 0
     categories_count = {}
 
-    for tx in transactions:
-        if tx.account_type == "investment":
-            continue
+    with span("categorization.recategorize", transactions=len(transactions)):
+        for tx in transactions:
+            if tx.account_type == "investment":
+                continue
 
-        raw_data = {}
-        if tx.raw_json:
-            try:
-                raw_data = json.loads(tx.raw_json)
-            except Exception:
+            raw_data = {}
+            if tx.raw_json:
+                try:
+                    raw_data = json.loads(tx.raw_json)
+                except Exception:
+                    raw_data = {"remittanceInformationUnstructured": tx.description}
+            else:
                 raw_data = {"remittanceInformationUnstructured": tx.description}
-        else:
-            raw_data = {"remittanceInformationUnstructured": tx.description}
 
-        new_category = await categorize_transaction_with_rules(raw_data, db, current_user.id)
+            new_category = categorize_with_preloaded_rules(raw_data, user_rules, learned_rules)
 
-        if tx.category != new_category:
-            tx.category = new_category
-            updated += 1
+            if tx.category != new_category:
+                tx.category = new_category
+                updated += 1
 
-        categories_count[new_category] = categories_count.get(new_category, 0) + 1
+            categories_count[new_category] = categories_count.get(new_category, 0) + 1
 
     await db.commit()
 
@@ -131,12 +142,14 @@ async def notify_after_sync(db: AsyncSession, user_id: int, failed_accounts: lis
     """Push notifikace po syncu: selhané účty a souhlasy před vypršením.
 
     Volá se z ručního syncu i (v budoucnu) z automatického — je to jediné
-    místo, kde se vyhodnocují 'po syncu' podmínky.
+    místo, kde se vyhodnocují 'po syncu' podmínky. Samotné odeslání běží
+    mimo request v push_dispatcheru, který zprávy pro uživatele spojí do
+    jedné notifikace.
     """
     if failed_accounts:
         names = ", ".join(failed_accounts)
-        await send_push_to_user(
-            db, user_id,
+        push_dispatcher.enqueue(
+            user_id,
             title="Sync selhal",
             body=f"Nepodařilo se synchronizovat: {names}. Zkontroluj připojení banky.",
             url="/settings",
@@ -156,8 +169,8 @@ async def notify_after_sync(db: AsyncSession, user_id: int, failed_accounts: lis
     for account in result.scalars():
         expired = account.consent_expires_at <= utcnow()
         days_left = max(0, (account.consent_expires_at - utcnow()).days)
-        await send_push_to_user(
-            db, user_id,
+        push_dispatcher.enqueue(
+            user_id,
             title="Souhlas banky " + ("vypršel" if expired else "brzy vyprší"),
             body=(
                 f"{account.name}: souhlas vypršel — obnov připojení v Nastavení."
@@ -171,10 +184,24 @@ async def notify_after_sync(db: AsyncSession, user_id: int, failed_accounts: lis
 @router.post("/")
 async def sync_all_data(
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    request_db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_background_db),
 ):
     """Synchronize all data from external APIs to local database"""
+    # Sync běží na spojení z background poolu (klidně minuty). Session z
+    # get_current_user by jinak celou dobu držela spojení poolu requestů;
+    # dál se z uživatele čte jen už načtené id.
+    await request_db.close()
+    # Fáze běhu (čas, položky, bajty) → details_json["phases"], viz services/sync_profile.py
+    with profile_sync() as profile:
+        return await _run_sync(current_user, db, profile)
+
+
+def _run_details(account_results: list[dict], profile: SyncProfile) -> str:
+    return json.dumps({"accounts": account_results, "phases": profile.to_json(), "total_ms": profile.total_ms()})
+
 
+async def _run_sync(current_user: UserModel, db: AsyncSession, profile: SyncProfile) -> dict:
     sync_status = SyncStatusModel(
         user_id=current_user.id,
         started_at=utcnow(),
@@ -186,6 +213,8 @@ async def sync_all_data(
 
     accounts_synced = 0
     transactions_synced = 0
+    synced_bank_tx_ids: list[str] = []
+    learned_contacts: dict[str, tuple[str, str]] = {}  # IBAN → (datum, jméno) z nových transakcí
     failed_accounts: list[str] = []
     # Per-účtový průběh běhu — ukládá se do sync_status.details_json, aby i na
     # produkci šlo zpětně říct, co přesně se při kterém syncu stalo.
@@ -194,33 +223,20 @@ async def sync_all_data(
 
     # Preload all category rules ONCE so categorization during the sync respects user choices
     # (e.g. "billa → Supermarkets") without N+1 DB roundtrips.
-    user_rules_result = await db.execute(
-        select(CategoryRuleModel)
-        .where(
-            CategoryRuleModel.user_id == current_user.id,
-            CategoryRuleModel.is_user_defined == True,
-        )
-        .order_by(*RULE_ORDER)
-    )
-    preloaded_user_rules = list(user_rules_result.scalars())
-    learned_rules_result = await db.execute(
-        select(CategoryRuleModel)
-        .where(
-            CategoryRuleModel.user_id == current_user.id,
-            CategoryRuleModel.is_user_defined == False,
-        )
-        .order_by(*RULE_ORDER)
-    )
-    preloaded_learned_rules = list(learned_rules_result.scalars())
-
-    # Auto-split rules — new expenses matching a rule get my_share_amount at insert
-    share_rules_result = await db.execute(
-        select(ShareRuleModel).where(
-            ShareRuleModel.user_id == current_user.id,
-            ShareRuleModel.is_active == True,
+    with profile.span("rules.load") as phase:
+        preloaded_user_rules, preloaded_learned_rules = await load_category_rules(db, current_user.id)
+
+        # Auto-split rules — new expenses matching a rule get my_share_amount at insert
+        share_rules_result = await db.execute(
+            select(ShareRuleModel).where(
+                ShareRuleModel.user_id == current_user.id,
+                ShareRuleModel.is_active == True,
+            )
+            .order_by(*SHARE_RULE_ORDER)
         )
-    )
-    preloaded_share_rules = list(share_rules_result.scalars())
+        share_rules = list(share_rules_result.scalars())
+        share_rule_matcher = ShareRuleMatcher(share_rules)
+        phase.items = len(preloaded_user_rules) + len(preloaded_learned_rules) + len(share_rules)
 
     try:
         # Sync bank accounts from GoCardless
@@ -248,10 +264,12 @@ async def sync_all_data(
             for account in bank_accounts:
                 acc_t0 = time.monotonic()
                 try:
-                    balances, clean_transactions = await asyncio.gather(
-                        gocardless_service.get_account_balances(account.id),
-                        gocardless_service.get_account_transactions(account.id),
-                    )
+                    with profile.span("bank.fetch") as phase:
+                        balances, clean_transactions = await asyncio.gather(
+                            gocardless_service.get_account_balances(account.id),
+                            gocardless_service.get_account_transactions(account.id),
+                        )
+                        phase.items += len(clean_transactions)
                     balance_list = balances.balances or []
 
                     if balance_list:
@@ -270,53 +288,73 @@ async def sync_all_data(
                             account.last_synced = utcnow()
                         
                     rows_to_upsert = []
-                    for tx_data in clean_transactions:
-                        tx_id = (
-                            tx_data.transactionId or 
-                            tx_data.internalTransactionId or 
-                            tx_data.entryReference or ""
-                        )
-                        if not tx_id:
-                            continue
+                    # Fáze smyčky se sčítají lokálně a do profilu jdou jednou za účet
+                    parse_s = categorize_s = share_s = 0.0
+                    raw_bytes = 0
+                    with span("categorization.sync_account", account_id=account.id, transactions=len(clean_transactions)):
+                        for tx_data in clean_transactions:
+                            t0 = time.perf_counter()
+                            tx_id = (
+                                tx_data.transactionId or 
+                                tx_data.internalTransactionId or 
+                                tx_data.entryReference or ""
+                            )
+                            if not tx_id:
+                                continue
                         
-                        description = (
-                            tx_data.remittanceInformationUnstructured or 
-                            tx_data.remittanceInformationStructured or
-                            tx_data.creditorName or 
-                            tx_data.debtorName or 
-                            "Transaction"
-                        )
+                            description = (
+                                tx_data.remittanceInformationUnstructured or 
+                                tx_data.remittanceInformationStructured or
+                                tx_data.creditorName or 
+                                tx_data.debtorName or 
+                                "Transaction"
+                            )
                         
-                        tx_dict = tx_data.model_dump(mode="json")
-
-                        tx_amount = float(tx_data.transactionAmount.amount)
-                        # Auto-split: a new shared expense (rent, utilities…) gets my
-                        # share set right away per the user's share rules.
-                        my_share = share_counterparty = share_note = None
-                        share_rule = match_share_rule(tx_dict, tx_amount, preloaded_share_rules)
-                        if share_rule:
-                            my_share = compute_my_share(tx_amount, share_rule)
-                            share_counterparty = share_rule.counterparty
-                            share_note = share_rule.note
-                            share_rule.match_count += 1
-
-                        rows_to_upsert.append({
-                            "id": tx_id,
-                            "user_id": current_user.id,
-                            "account_id": account.id,
-                            "date": str(tx_data.bookingDate) if tx_data.bookingDate else "",
-                            "description": description,
-                            "amount": tx_amount,
-                            "currency": tx_data.transactionAmount.currency,
-                            "category": categorize_with_preloaded_rules(tx_dict, preloaded_user_rules, preloaded_learned_rules),
-                            "account_type": "bank",
-                            "transaction_type": "normal",
-                            "is_excluded": False,
-                            "my_share_amount": my_share,
-                            "share_counterparty": share_counterparty,
-                            "settlement_note": share_note,
-                            "raw_json": json.dumps(tx_dict),
-                        })
+                            tx_dict = tx_data.model_dump(mode="json")
+                            raw_json = json.dumps(tx_dict)
+                            raw_bytes += len(raw_json)
+                            collect_counterparties(learned_contacts, str(tx_data.bookingDate or ""), tx_dict)
+                            t1 = time.perf_counter()
+                            category = categorize_with_preloaded_rules(tx_dict, preloaded_user_rules, preloaded_learned_rules)
+                            t2 = time.perf_counter()
+
+                            tx_amount = float(tx_data.transactionAmount.amount)
+                            # Auto-split: a new shared expense (rent, utilities…) gets my
+                            # share set right away per the user's share rules.
+                            my_share = share_counterparty = share_note = None
+                            share_rule = share_rule_matcher.match(tx_dict, tx_amount)
+                            if share_rule:
+                                my_share = compute_my_share(tx_amount, share_rule)
+                                share_counterparty = share_rule.counterparty
+                                share_note = share_rule.note
+                                share_rule.match_count += 1
+                            t3 = time.perf_counter()
+
+                            rows_to_upsert.append({
+                                "id": tx_id,
+                                "user_id": current_user.id,
+                                "account_id": account.id,
+                                "date": str(tx_data.bookingDate) if tx_data.bookingDate else "",
+                                "description": description,
+                                "amount": tx_amount,
+                                "currency": tx_data.transactionAmount.currency,
+                                "category": category,
+                                "account_type": "bank",
+                                "transaction_type": "normal",
+                                "is_excluded": False,
+                                "my_share_amount": my_share,
+                                "share_counterparty": share_counterparty,
+                                "settlement_note": share_note,
+                                "raw_json": raw_json,
+                                "search_text": search_text(description, tx_dict),
+                            })
+                            parse_s += (t1 - t0) + (time.perf_counter() - t3)
+                            categorize_s += t2 - t1
+                            share_s += t3 - t2
+
+                    profile.add("bank.parse", parse_s, items=len(rows_to_upsert), nbytes=raw_bytes)
+                    profile.add("bank.categorize", categorize_s, items=len(rows_to_upsert))
+                    profile.add("bank.share_rules", share_s, items=len(rows_to_upsert))
                     
                     if rows_to_upsert:
                         stmt = pg_insert(TransactionModel).values(rows_to_upsert)
@@ -325,10 +363,13 @@ async def sync_all_data(
                             set_={
                                 "description": stmt.excluded.description,
                                 "raw_json": stmt.excluded.raw_json,
+                                "search_text": stmt.excluded.search_text,
                             }
                         )
-                        await db.execute(stmt)
+                        with profile.span("bank.upsert", items=len(rows_to_upsert), nbytes=raw_bytes):
+                            await db.execute(stmt)
                         transactions_synced += len(rows_to_upsert)
+                        synced_bank_tx_ids.extend(row["id"] for row in rows_to_upsert)
                     
                     accounts_synced += 1
                     account.last_sync_error = None
@@ -552,7 +593,8 @@ async def sync_all_data(
                         "raw_json": stmt.excluded.raw_json,
                     }
                 )
-                await db.execute(stmt)
+                with profile.span("t212.upsert", items=len(order_rows)):
+                    await db.execute(stmt)
                 transactions_synced += len(order_rows)
             
             # Sync dividends
@@ -597,7 +639,8 @@ async def sync_all_data(
                         "raw_json": stmt.excluded.raw_json,
                     }
                 )
-                await db.execute(stmt)
+                with profile.span("t212.upsert", items=len(div_rows)):
+                    await db.execute(stmt)
                 transactions_synced += len(div_rows)
 
             account_results.append({
@@ -624,7 +667,7 @@ async def sync_all_data(
         sync_status.completed_at = utcnow()
         sync_status.accounts_synced = accounts_synced
         sync_status.transactions_synced = transactions_synced
-        sync_status.details_json = json.dumps({"accounts": account_results})
+        sync_status.details_json = _run_details(account_results, profile)
 
         await db.commit()
 
@@ -645,14 +688,83 @@ async def sync_all_data(
             },
         )
 
-        transfer_result = await detect_and_mark_transfers(db, current_user.id)
+        with profile.span("transfers"):
+            transfer_result = await detect_and_mark_transfers(db, current_user.id)
+
+        # Protistrany nových transakcí → adresář (ruční kontakty zůstávají)
+        try:
+            with profile.span("contacts", items=len(learned_contacts)):
+                await upsert_learned_contacts(db, current_user.id, learned_contacts)
+        except Exception as contacts_e:
+            await db.rollback()
+            logger.warning(f"Contact learning skipped: {contacts_e}")
+
+        # search_text transakcí, které ho nemají (starší, T212) — zpětné
+        # použití pravidel kategorií pak páruje jen v SQL (services/category_retro)
+        try:
+            with profile.span("search_text") as phase:
+                phase.items += await ensure_search_text(db, current_user.id)
+        except Exception as search_e:
+            await db.rollback()
+            logger.warning(f"search_text backfill skipped: {search_e}")
+
+        # Nové/aktualizované transakce → vazby na předplatná (+ předplatná,
+        # kterým vazby ještě nedopočítal úkol z lifespanu)
+        try:
+            with profile.span("subscriptions", items=len(synced_bank_tx_ids)):
+                await build_missing_links(db, current_user.id)
+                await link_new_transactions(db, current_user.id, synced_bank_tx_ids)
+        except Exception as link_e:
+            await db.rollback()
+            logger.warning(f"Subscription links skipped: {link_e}")
+
+        # Statistiky protistran pro návrhy předplatných (/subscriptions/detect)
+        try:
+            with profile.span("recurring") as phase:
+                phase.items += await refresh_recurring_stats(db, current_user.id)
+        except Exception as recurring_e:
+            await db.rollback()
+            logger.warning(f"Recurring detector skipped: {recurring_e}")
+
+        # Nezaplacené položky rozpočtu aktuálního měsíce ↔ nové transakce
+        try:
+            with profile.span("budget_match"):
+                await match_current_month(db, current_user.id)
+        except Exception as match_e:
+            await db.rollback()
+            logger.warning(f"Budget auto-match skipped: {match_e}")
+
+        # Nezaplacené splátky úvěrů ↔ nové transakce
+        try:
+            with profile.span("loan_match"):
+                await match_loan_payments(db, current_user.id, synced_bank_tx_ids)
+        except Exception as loan_e:
+            await db.rollback()
+            logger.warning(f"Loan auto-match skipped: {loan_e}")
+
+        # Denní snapshot zůstatků (+ dopočet mezer) pro graf vývoje majetku
+        try:
+            with profile.span("balance_snapshots"):
+                await record_balance_snapshots(db, current_user.id)
+        except Exception as snap_e:
+            await db.rollback()
+            logger.warning(f"Balance snapshots skipped: {snap_e}")
 
         # Post-sync notifikace (selhané účty, končící souhlasy) — nesmí shodit sync
         try:
-            await notify_after_sync(db, current_user.id, failed_accounts)
+            with profile.span("notify"):
+                await notify_after_sync(db, current_user.id, failed_accounts)
         except Exception as notify_e:
             logger.warning(f"Post-sync notifications failed: {notify_e}")
 
+        # Fáze po commitu (převody, párování, notifikace) — profil uložit znovu
+        try:
+            sync_status.details_json = _run_details(account_results, profile)
+            await db.commit()
+        except Exception as profile_e:
+            await db.rollback()
+            logger.warning(f"Sync profile not saved: {profile_e}")
+
         return {
             "status": "completed",
             "accounts_synced": accounts_synced,
@@ -690,7 +802,7 @@ async def sync_all_data(
             sync_status.status = "failed"
             sync_status.error_message = friendly
             sync_status.completed_at = utcnow()
-            sync_status.details_json = json.dumps({"accounts": account_results})
+            sync_status.details_json = _run_details(account_results, profile)
             await db.commit()
 
         raise HTTPException(status_code=500, detail=friendly)
@@ -741,6 +853,15 @@ async def get_sync_status(
     }
 
 
+def _parse_details(details_json: str | None) -> dict:
+    if not details_json:
+        return {}
+    try:
+        return json.loads(details_json) or {}
+    except Exception:
+        return {}
+
+
 @router.get("/history")
 async def get_sync_history(
     limit: int = Query(10, ge=1, le=50),
@@ -757,12 +878,7 @@ async def get_sync_history(
     )
     runs = []
     for run in result.scalars():
-        accounts = []
-        if run.details_json:
-            try:
-                accounts = (json.loads(run.details_json) or {}).get("accounts", [])
-            except Exception:
-                accounts = []
+        details = _parse_details(run.details_json)
         duration_s = None
         if run.completed_at and run.started_at:
             duration_s = round((run.completed_at - run.started_at).total_seconds(), 1)
@@ -775,11 +891,40 @@ async def get_sync_history(
             "accounts_synced": run.accounts_synced,
             "transactions_synced": run.transactions_synced,
             "error": run.error_message,
-            "accounts": accounts,
+            "accounts": details.get("accounts", []),
+            "phases": details.get("phases", []),
+            "profile_total_ms": details.get("total_ms"),
         })
     return {"runs": runs}
 
 
+@router.get("/perf")
+async def get_sync_perf(
+    limit: int = Query(30, ge=1, le=200),
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """p50/p95 jednotlivých fází syncu za posledních N běhů — kam mizí čas
+    (latence banky, kategorizace, upsert, pies T212, převody, notifikace)."""
+    result = await db.execute(
+        select(SyncStatusModel.details_json)
+        .where(
+            SyncStatusModel.user_id == current_user.id,
+            SyncStatusModel.details_json.is_not(None),
+        )
+        .order_by(SyncStatusModel.id.desc())
+        .limit(limit)
+    )
+    # Běhy před zavedením profilu fáze nemají — nepočítají se
+    runs = [details for details in map(_parse_details, result.scalars()) if details.get("phases")]
+    totals = summarize_phases([{"name": "total", "ms": details.get("total_ms")}] for details in runs)
+    return {
+        "runs": len(runs),
+        "total": totals[0] if totals else None,
+        "phases": summarize_phases(details["phases"] for details in runs),
+    }
+
+
 @router.post("/detect-transfers")
 async def detect_transfers(
     current_user: UserModel = Depends(get_current_user),
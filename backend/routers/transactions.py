@@ -6,10 +6,20 @@ from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func
 from auth import get_current_user
-from database import get_db
+from database import get_db, get_read_db
 from models import TransactionModel, AccountModel, CategoryRuleModel, ContactModel, UserModel, TagModel, TransactionTagModel
-from routers.contacts import normalize_iban
+from services.contacts import Contact, contact_map, normalize_iban, parse_counterparty_fields
 from services.categorization import fold
+from services.category_retro import (
+    EXCLUDED_CATEGORIES,
+    INLINE_LIMIT,
+    apply_category,
+    count_matching,
+    get_job as get_retro_job,
+    job_dict as retro_job_dict,
+    queue_job as queue_retro_job,
+    start_job as start_retro_job,
+)
 
 router = APIRouter()
 
@@ -156,16 +166,7 @@ async def get_transactions(
     parsed = []
     needed_ibans: set[str] = set()
     for tx, account_name in rows:
-        raw: dict = {}
-        if tx.raw_json:
-            try:
-                raw = json.loads(tx.raw_json) or {}
-            except Exception:
-                raw = {}
-        creditor_name = raw.get("creditorName")
-        debtor_name = raw.get("debtorName")
-        creditor_iban = normalize_iban((raw.get("creditorAccount") or {}).get("iban") or (raw.get("creditorAccount") or {}).get("bban"))
-        debtor_iban = normalize_iban((raw.get("debtorAccount") or {}).get("iban") or (raw.get("debtorAccount") or {}).get("bban"))
+        creditor_name, debtor_name, creditor_iban, debtor_iban = parse_counterparty_fields(tx.raw_json)
 
         if not creditor_name and creditor_iban:
             needed_ibans.add(creditor_iban)
@@ -174,15 +175,10 @@ async def get_transactions(
 
         parsed.append((tx, account_name, creditor_name, debtor_name, creditor_iban, debtor_iban))
 
-    contacts_by_iban: dict[str, ContactModel] = {}
+    # Teplá mapa kontaktů uživatele (services/contacts) — jen když je co dohledat
+    contacts_by_iban: dict[str, Contact] = {}
     if needed_ibans:
-        contact_rows = await db.execute(
-            select(ContactModel).where(
-                ContactModel.user_id == current_user.id,
-                ContactModel.iban.in_(list(needed_ibans)),
-            )
-        )
-        contacts_by_iban = {c.iban: c for c in contact_rows.scalars().all()}
+        contacts_by_iban = await contact_map(db, current_user.id)
 
     items = []
     for tx, account_name, creditor_name, debtor_name, creditor_iban, debtor_iban in parsed:
@@ -242,7 +238,7 @@ async def get_transactions(
 async def get_settlement_summary(
     months: int = Query(12, ge=1, le=36),
     current_user: UserModel = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Saldo vypořádání (VYLEPSENI.md 3.1): kolik mi protistrany dluží
     (jejich podíly na rozdělených výdajích) vs. kolik už poslaly (vypořádání).
@@ -340,11 +336,92 @@ async def get_settlement_summary(
     }
 
 
+async def _learn_pattern(db: AsyncSession, user: UserModel, tx: TransactionModel) -> Optional[str]:
+    """Pattern pravidla, které se z ruční kategorizace naučí — None, když
+    by chytal vlastní jméno uživatele (platby na vlastní účty)."""
+    if not tx.description:
+        return None
+    # Prefer creditorName from raw_json — it's cleaner than the full description
+    # (e.g. "Lidl" instead of "Nákup 5465LIDL CZ S.R.O BRNO ref 12345678")
+    pattern = None
+    if tx.raw_json:
+        try:
+            raw = json.loads(tx.raw_json)
+            creditor = (raw.get("creditorName") or "").strip()
+            if creditor and len(creditor) >= 3:
+                pattern = creditor.lower()
+        except Exception:
+            pass
+
+    if not pattern:
+        pattern = tx.description.lower().strip()
+
+    # Pojistka proti vlastnímu jménu: platby na vlastní účty (kreditka,
+    # spoření…) mají v creditorName/description jméno uživatele. Pravidlo
+    # z něj by chytalo každou příchozí platbu bez zprávy — porovnáváme
+    # množiny slov, aby to zablokovalo obě pořadí ("bureš nicolas" i
+    # "nicolas bureš") vůči jménu uživatele a názvům jeho účtů.
+    own_names = [user.name]
+    acc_names = await db.execute(
+        select(AccountModel.name).where(AccountModel.user_id == user.id)
+    )
+    own_names.extend(n for (n,) in acc_names.all())
+    pattern_words = set(fold(pattern).split())
+    if pattern_words and any(
+        pattern_words == set(fold(n).split()) for n in own_names if n
+    ):
+        return None
+    return pattern
+
+
 class CategoryUpdate(BaseModel):
     category: str
     learn: bool = True  # If true, create a rule for this merchant
 
 
+@router.get("/category-jobs/{job_id}")
+async def get_category_job(
+    job_id: str,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Průběh zpětného použití pravidla běžícího na pozadí."""
+    job = await get_retro_job(db, job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return retro_job_dict(job)
+
+
+@router.get("/{transaction_id}/category/preview")
+async def preview_category_rule(
+    transaction_id: str,
+    category: str,
+    current_user: UserModel = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Kolik dalších transakcí by learn=True zpětně překategorizovalo."""
+    tx_result = await db.execute(
+        select(TransactionModel).where(
+            TransactionModel.id == transaction_id,
+            TransactionModel.user_id == current_user.id,
+        )
+    )
+    tx = tx_result.scalar_one_or_none()
+    if not tx:
+        raise HTTPException(status_code=404, detail="Transaction not found")
+
+    pattern = None
+    if category not in EXCLUDED_CATEGORIES:
+        pattern = await _learn_pattern(db, current_user, tx)
+    matching = await count_matching(db, current_user.id, pattern, exclude_id=transaction_id) if pattern else 0
+    return {
+        "pattern": pattern,
+        "learnable": pattern is not None,
+        "matching": matching,
+        "background": matching > INLINE_LIMIT,
+    }
+
+
 @router.patch("/{transaction_id}/category")
 async def update_transaction_category(
     transaction_id: str,
@@ -383,46 +460,19 @@ async def update_transaction_category(
         # Reset to normal if changing away from transfer
         tx.transaction_type = "normal"
     
-    # Extract merchant name for learning.
     # NEVER learn rules for transfer categories: transfers are detected reliably
     # by IBAN matching, while a name pattern (typically the user's OWN name,
     # which every incoming payment without a message gets as description) would
     # retroactively exclude unrelated payments — this exact bug once hid the
     # credit-card repayments and sister's payments (rule "bureš nicolas").
-    learnable = data.category not in excluded_categories
-    if data.learn and learnable and tx.description:
-        # Prefer creditorName from raw_json — it's cleaner than the full description
-        # (e.g. "Lidl" instead of "Nákup 5465LIDL CZ S.R.O BRNO ref 12345678")
-        pattern = None
-        if tx.raw_json:
-            try:
-                raw = json.loads(tx.raw_json)
-                creditor = (raw.get("creditorName") or "").strip()
-                if creditor and len(creditor) >= 3:
-                    pattern = creditor.lower()
-            except Exception:
-                pass
-
-        if not pattern:
-            pattern = tx.description.lower().strip()
-
-        # Pojistka proti vlastnímu jménu: platby na vlastní účty (kreditka,
-        # spoření…) mají v creditorName/description jméno uživatele. Pravidlo
-        # z něj by chytalo každou příchozí platbu bez zprávy — porovnáváme
-        # množiny slov, aby to zablokovalo obě pořadí ("bureš nicolas" i
-        # "nicolas bureš") vůči jménu uživatele a názvům jeho účtů.
-        own_names = [current_user.name]
-        acc_names = await db.execute(
-            select(AccountModel.name).where(AccountModel.user_id == current_user.id)
-        )
-        own_names.extend(n for (n,) in acc_names.all())
-        pattern_words = set(fold(pattern).split())
-        if pattern_words and any(
-            pattern_words == set(fold(n).split()) for n in own_names if n
-        ):
-            learnable = False
+    pattern = None
+    if data.learn and data.category not in excluded_categories:
+        pattern = await _learn_pattern(db, current_user, tx)
+    learnable = pattern is not None
 
-    if data.learn and learnable and tx.description:
+    applied = matching = 0
+    job = None
+    if learnable:
 
         # Check if rule already exists for this pattern (per-user)
         existing = await db.execute(
@@ -450,41 +500,31 @@ async def update_transaction_category(
 
         # Retroactive: apply the rule to all existing transactions matching this pattern
         # so past Billa transactions become Supermarkets too — not just future ones.
-        # Match against description OR raw_json (covers creditorName from bank).
+        # Same folded/word-boundary matching as sync (services/category_retro).
         # Skip category_locked transactions — the user (or transfer detection)
         # already made an explicit call on those; a bulk rule shouldn't override it.
-        like_pattern = f"%{pattern}%"
-        retro_result = await db.execute(
-            select(TransactionModel).where(
-                and_(
-                    TransactionModel.user_id == current_user.id,
-                    TransactionModel.id != transaction_id,
-                    TransactionModel.category_locked == False,
-                    or_(
-                        TransactionModel.description.ilike(like_pattern),
-                        TransactionModel.raw_json.ilike(like_pattern),
-                    ),
-                )
-            )
-        )
-        for matching_tx in retro_result.scalars():
-            matching_tx.category = data.category
-            matching_tx.is_excluded = (data.category in excluded_categories) or bool(matching_tx.user_excluded)
-            if data.category == "Internal Transfer":
-                matching_tx.transaction_type = "internal_transfer"
-            elif data.category == "Family Transfer":
-                matching_tx.transaction_type = "family_transfer"
-            elif matching_tx.transaction_type in ["internal_transfer", "family_transfer"]:
-                matching_tx.transaction_type = "normal"
+        # Velké množiny běží po commitu na pozadí (průběh: /category-jobs/{id});
+        # job se zakládá ve stejné transakci jako pravidlo.
+        matching = await count_matching(db, current_user.id, pattern, exclude_id=transaction_id)
+        if matching <= INLINE_LIMIT:
+            applied = len(await apply_category(
+                db, current_user.id, pattern, data.category, exclude_id=transaction_id,
+            ))
+        else:
+            job = queue_retro_job(db, current_user.id, pattern, data.category, matching, exclude_id=transaction_id)
 
     await db.commit()
+    if job is not None:
+        start_retro_job(job)
     
     return {
         "id": transaction_id,
         "old_category": old_category,
         "new_category": data.category,
         "is_excluded": tx.is_excluded,
-        "rule_created": data.learn and learnable
+        "rule_created": learnable,
+        "applied_to": applied,
+        "job": retro_job_dict(job) if job else None,
     }
 
 
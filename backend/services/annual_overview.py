@@ -0,0 +1,113 @@
+"""Roční přehled rozpočtu — součty za měsíce a roky z jednoho dotazu.
+
+Dřív se pro každý měsíc zvlášť načetl rozpočet a pustily dva SUM dotazy
+(výdaje, příjmy) — 36 round-tripů na rok, další desítky za srovnání
+s minulým rokem. Teď jeden dotaz vrátí pro celý rozsah let všechny
+rozpočty s předem sečtenými výdaji a příjmy (GROUP BY budget_id),
+takže srovnání pěti let vedle sebe stojí stejně jako jeden rok.
+"""
+from dataclasses import dataclass
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import MonthlyBudgetModel, MonthlyExpenseModel, MonthlyIncomeItemModel
+
+
+@dataclass
+class MonthTotals:
+    income: float = 0.0
+    expenses: float = 0.0
+    investments: float = 0.0
+    savings: float = 0.0
+
+    @property
+    def remaining(self) -> float:
+        return self.income - self.expenses - self.investments - self.savings
+
+
+def _user_budgets_in_range(user_id: int, first_year: int, last_year: int):
+    return (
+        MonthlyBudgetModel.user_id == user_id,
+        MonthlyBudgetModel.year_month >= f"{first_year:04d}-01",
+        MonthlyBudgetModel.year_month <= f"{last_year:04d}-12",
+    )
+
+
+async def load_month_totals(
+    db: AsyncSession, user_id: int, first_year: int, last_year: int,
+) -> dict[str, MonthTotals]:
+    """{year_month: MonthTotals} pro všechny rozpočty v letech first_year..last_year."""
+    budget_ids = select(MonthlyBudgetModel.id).where(*_user_budgets_in_range(user_id, first_year, last_year))
+    expense_sums = (
+        select(MonthlyExpenseModel.budget_id, func.sum(MonthlyExpenseModel.amount).label("total"))
+        .where(MonthlyExpenseModel.budget_id.in_(budget_ids))
+        .group_by(MonthlyExpenseModel.budget_id)
+        .subquery()
+    )
+    income_sums = (
+        select(MonthlyIncomeItemModel.budget_id, func.sum(MonthlyIncomeItemModel.amount).label("total"))
+        .where(MonthlyIncomeItemModel.budget_id.in_(budget_ids))
+        .group_by(MonthlyIncomeItemModel.budget_id)
+        .subquery()
+    )
+    rows = await db.execute(
+        select(
+            MonthlyBudgetModel.year_month,
+            func.coalesce(income_sums.c.total, 0),
+            func.coalesce(expense_sums.c.total, 0),
+            MonthlyBudgetModel.investment_amount,
+            MonthlyBudgetModel.surplus_to_savings,
+        )
+        .outerjoin(expense_sums, expense_sums.c.budget_id == MonthlyBudgetModel.id)
+        .outerjoin(income_sums, income_sums.c.budget_id == MonthlyBudgetModel.id)
+        .where(*_user_budgets_in_range(user_id, first_year, last_year))
+    )
+    return {
+        ym: MonthTotals(float(income), float(expenses), float(investments or 0), float(savings or 0))
+        for ym, income, expenses, investments, savings in rows.all()
+    }
+
+
+async def load_expense_breakdown(db: AsyncSession, user_id: int, year: int) -> dict[str, float]:
+    """Součet výdajů podle názvu položky za rok (v pořadí prvního výskytu)."""
+    rows = await db.execute(
+        select(MonthlyExpenseModel.name, func.sum(MonthlyExpenseModel.amount))
+        .join(MonthlyBudgetModel, MonthlyExpenseModel.budget_id == MonthlyBudgetModel.id)
+        .where(*_user_budgets_in_range(user_id, year, year))
+        .group_by(MonthlyExpenseModel.name)
+        .order_by(func.min(MonthlyBudgetModel.year_month), func.min(MonthlyExpenseModel.id))
+    )
+    return {name: total for name, total in rows.all()}
+
+
+def month_rows(year: int, totals: dict[str, MonthTotals]) -> list[dict]:
+    """12 řádků měsíců roku; měsíc bez rozpočtu = samé nuly."""
+    months = []
+    for month in range(1, 13):
+        year_month = f"{year:04d}-{month:02d}"
+        t = totals.get(year_month, MonthTotals())
+        months.append({
+            "month": month,
+            "year_month": year_month,
+            "income": t.income,
+            "expenses": t.expenses,
+            "investments": t.investments,
+            "savings": t.savings,
+            "remaining": t.remaining,
+        })
+    return months
+
+
+def year_totals(year: int, totals: dict[str, MonthTotals]) -> dict:
+    prefix = f"{year:04d}-"
+    months = [t for ym, t in totals.items() if ym.startswith(prefix)]
+    income = sum(t.income for t in months)
+    expenses = sum(t.expenses for t in months)
+    return {
+        "income": income,
+        "expenses": expenses,
+        "investments": sum(t.investments for t in months),
+        "savings": sum(t.savings for t in months),
+        "net": income - expenses,
+    }
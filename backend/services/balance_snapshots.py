@@ -0,0 +1,323 @@
+"""Denní snapshoty zůstatků účtů — podklad grafu vývoje majetku.
+
+Dřív se historie skládala při každém requestu zpětně od dnešního zůstatku
+odečítáním denních součtů transakcí (max. 2000 řádků → u delších období nebo
+aktivních účtů tiše špatná křivka) a manuální účty se braly jako konstanta.
+
+Teď se při každém syncu zapíše dnešní zůstatek každého účtu (banka, T212,
+manuální účty i manuální investice) a mezery od posledního snapshotu se
+dopočtou z denních součtů transakcí (GROUP BY v SQL, bez limitu). Historie
+libovolné délky je pak indexovaný range scan po (user_id, snapshot_date).
+
+Tabulka je řídká: řádek existuje jen pro dny syncu a dny s pohybem na účtu,
+hodnota mezi nimi se při čtení přenáší z posledního známého dne.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from models import (
+    AccountBalanceSnapshotModel,
+    AccountModel,
+    ManualAccountModel,
+    ManualInvestmentAccountModel,
+    PortfolioSnapshotModel,
+    TransactionModel,
+)
+
+logger = logging.getLogger(__name__)
+
+# asyncpg má limit 32767 parametrů na statement — 8 sloupců × 2000 řádků je pod ním.
+_INSERT_CHUNK = 2000
+
+
+@dataclass
+class CurrentBalance:
+    key: str        # account_key ve snapshotech (stejný jako id v seznamu účtů dashboardu)
+    kind: str       # "bank" | "investment"
+    balance: float
+    is_visible: bool
+    source_type: str  # "bank" | "trading212" | "manual" | "manual_investment"
+
+
+async def load_current_balances(db: AsyncSession, user_id: int) -> list[CurrentBalance]:
+    """Aktuální zůstatky všech účtů uživatele (včetně skrytých) ve stejné
+    sémantice jako dashboard — u manuálních účtů jen moje peníze."""
+    balances: list[CurrentBalance] = []
+
+    accounts = await db.execute(select(AccountModel).where(AccountModel.user_id == user_id))
+    for acc in accounts.scalars():
+        is_bank = acc.type == "bank"
+        balances.append(CurrentBalance(
+            key=acc.id,
+            kind="bank" if is_bank else "investment",
+            balance=float(acc.balance or 0),
+            is_visible=bool(acc.is_visible),
+            source_type="bank" if is_bank else "trading212",
+        ))
+
+    manual = await db.execute(
+        select(ManualAccountModel)
+        .options(selectinload(ManualAccountModel.items))
+        .where(ManualAccountModel.user_id == user_id)
+    )
+    for macc in manual.scalars():
+        borrowed = sum(item.amount for item in macc.items if not getattr(item, 'is_mine', True))
+        balances.append(CurrentBalance(
+            key=f"manual-{macc.id}",
+            kind="bank",
+            balance=float((macc.balance or 0) - borrowed),
+            is_visible=bool(macc.is_visible),
+            source_type="manual",
+        ))
+
+    investments = await db.execute(
+        select(ManualInvestmentAccountModel)
+        .options(selectinload(ManualInvestmentAccountModel.positions))
+        .where(ManualInvestmentAccountModel.user_id == user_id)
+    )
+    for macc in investments.scalars():
+        balances.append(CurrentBalance(
+            key=f"manual-inv-{macc.id}",
+            kind="investment",
+            balance=float(sum(p.current_value for p in macc.positions)),
+            is_visible=bool(macc.is_visible),
+            source_type="manual_investment",
+        ))
+
+    return balances
+
+
+def derive_end_of_day_balances(
+    end_balance: float,
+    end_date: str,
+    daily_deltas: dict[str, float],
+    after_date: Optional[str] = None,
+) -> dict[str, float]:
+    """Zůstatky na konci dnů s pohybem, dopočtené zpětně od `end_balance`.
+
+    `end_balance` je zůstatek na konci `end_date` (dnešek ze syncu). Vrací
+    hodnoty pro dny s pohybem v intervalu (after_date, end_date); bez
+    `after_date` (první backfill účtu) navíc den před nejstarším pohybem,
+    aby křivka začínala zůstatkem před první známou transakcí. Pohyby
+    zaúčtované dopředu (po end_date) se ignorují.
+    """
+    result: dict[str, float] = {}
+    running = end_balance
+    days = sorted((d for d in daily_deltas if d <= end_date), reverse=True)
+    for day in days:
+        if after_date is not None and day <= after_date:
+            break
+        if day < end_date:
+            result[day] = round(running, 2)
+        running -= daily_deltas[day]
+    if after_date is None and days:
+        before_first = (date.fromisoformat(days[-1]) - timedelta(days=1)).isoformat()
+        result[before_first] = round(running, 2)
+    return result
+
+
+def build_history(
+    start: date,
+    end: date,
+    accounts: list[CurrentBalance],
+    snapshots: dict[str, list[tuple[str, float]]],
+) -> list[dict]:
+    """Denní body grafu (nejstarší první) ze řídkých snapshotů.
+
+    Hodnota účtu v den D = poslední snapshot ≤ D; před prvním snapshotem se
+    bere ten nejstarší (účet bez historie = konstanta, jako dřív manuální
+    účty). Poslední den (dnešek) je vždy živý zůstatek, ať graf sedí
+    s dashboardem i mezi synchronizacemi. `snapshots` musí být seřazené
+    vzestupně podle data.
+    """
+    n_days = (end - start).days + 1
+    bank = [0.0] * n_days
+    investment = [0.0] * n_days
+    day_strs = [(start + timedelta(days=i)).isoformat() for i in range(n_days)]
+
+    for acc in accounts:
+        series = bank if acc.kind == "bank" else investment
+        points = snapshots.get(acc.key) or []
+        idx = 0
+        value = points[0][1] if points else acc.balance
+        for i, day in enumerate(day_strs[:-1]):
+            while idx < len(points) and points[idx][0] <= day:
+                value = points[idx][1]
+                idx += 1
+            series[i] += value
+        series[-1] += acc.balance
+
+    return [
+        {
+            "date": day,
+            "bank": round(bank[i], 2),
+            "investment": round(investment[i], 2),
+            "total": round(bank[i] + investment[i], 2),
+        }
+        for i, day in enumerate(day_strs)
+    ]
+
+
+async def _insert_rows(db: AsyncSession, rows: list[dict], overwrite: bool) -> None:
+    for i in range(0, len(rows), _INSERT_CHUNK):
+        stmt = pg_insert(AccountBalanceSnapshotModel).values(rows[i:i + _INSERT_CHUNK])
+        if overwrite:
+            stmt = stmt.on_conflict_do_update(
+                constraint="uq_balance_snapshots_user_account_date",
+                set_={
+                    "balance": stmt.excluded.balance,
+                    "kind": stmt.excluded.kind,
+                    "source": stmt.excluded.source,
+                },
+            )
+        else:
+            # Backfill nikdy nepřepisuje skutečný zůstatek ze syncu
+            stmt = stmt.on_conflict_do_nothing(constraint="uq_balance_snapshots_user_account_date")
+        await db.execute(stmt)
+
+
+async def _snapshot_rows(
+    db: AsyncSession, user_id: int, balances: list[CurrentBalance], today: str,
+) -> tuple[list[dict], list[dict]]:
+    """Řádky k zápisu: (dopočet mezer od posledního snapshotu, dnešní
+    zůstatky). Jen čte."""
+    last_rows = await db.execute(
+        select(AccountBalanceSnapshotModel.account_key, func.max(AccountBalanceSnapshotModel.snapshot_date))
+        .where(AccountBalanceSnapshotModel.user_id == user_id)
+        .group_by(AccountBalanceSnapshotModel.account_key)
+    )
+    last_by_key = {key: last for key, last in last_rows.all()}
+
+    def row(acc: CurrentBalance, day: str, balance: float, source: str) -> dict:
+        return {
+            "user_id": user_id, "account_key": acc.key, "kind": acc.kind,
+            "snapshot_date": day, "balance": balance, "source": source,
+        }
+
+    backfill: list[dict] = []
+    for acc in balances:
+        last = last_by_key.get(acc.key)
+        if last is not None and last >= today:
+            continue
+        if acc.source_type == "bank":
+            # Mezera od posledního snapshotu (u nového účtu celá historie) —
+            # denní součty v SQL, žádný limit na počet transakcí
+            delta_q = (
+                select(TransactionModel.date, func.sum(TransactionModel.amount))
+                .where(
+                    TransactionModel.user_id == user_id,
+                    TransactionModel.account_id == acc.key,
+                    TransactionModel.date != "",
+                    TransactionModel.date <= today,
+                )
+                .group_by(TransactionModel.date)
+            )
+            if last is not None:
+                delta_q = delta_q.where(TransactionModel.date > last)
+            deltas = {d[:10]: float(total or 0) for d, total in (await db.execute(delta_q)).all()}
+            derived = derive_end_of_day_balances(acc.balance, today, deltas, after_date=last)
+            backfill.extend(row(acc, day, value, "backfill") for day, value in derived.items())
+        elif acc.source_type == "trading212" and last is None:
+            # T212 má vlastní denní historii hodnoty portfolia — převzít ji
+            portfolio = await db.execute(
+                select(PortfolioSnapshotModel.snapshot_date, PortfolioSnapshotModel.total_value_czk)
+                .where(
+                    PortfolioSnapshotModel.user_id == user_id,
+                    PortfolioSnapshotModel.snapshot_date < today,
+                )
+            )
+            backfill.extend(row(acc, day, float(value), "backfill") for day, value in portfolio.all())
+
+    todays = [row(acc, today, round(acc.balance, 2), "sync") for acc in balances]
+    return backfill, todays
+
+
+async def record_balance_snapshots(db: AsyncSession, user_id: int, today: Optional[str] = None) -> int:
+    """Zapíše dnešní zůstatky všech účtů a dopočte mezery od posledního
+    snapshotu. Volá se na konci syncu; commituje. Vrací počet zapsaných řádků."""
+    today = today or datetime.now().strftime("%Y-%m-%d")
+    balances = await load_current_balances(db, user_id)
+    if not balances:
+        return 0
+
+    backfill, todays = await _snapshot_rows(db, user_id, balances, today)
+    if backfill:
+        await _insert_rows(db, backfill, overwrite=False)
+    await _insert_rows(db, todays, overwrite=True)
+    await db.commit()
+
+    logger.info(
+        "Balance snapshots for user %s: %d accounts, %d backfilled days",
+        user_id, len(todays), len(backfill),
+        extra={"event": "balance_snapshots.recorded", "user_id": user_id, "backfilled": len(backfill)},
+    )
+    return len(todays) + len(backfill)
+
+
+async def load_net_worth_history(db: AsyncSession, user_id: int, days: int) -> list[dict]:
+    """Historie viditelných účtů za posledních `days` dní z tabulky snapshotů.
+    Jen čte (jde i na read repliku) — snapshoty zapisuje sync."""
+    end = date.today()
+    start = end - timedelta(days=days)
+    accounts = [acc for acc in await load_current_balances(db, user_id) if acc.is_visible]
+    if not accounts:
+        return build_history(start, end, [], {})
+
+    has_any = await db.execute(
+        select(AccountBalanceSnapshotModel.id)
+        .where(AccountBalanceSnapshotModel.user_id == user_id)
+        .limit(1)
+    )
+    if has_any.scalar_one_or_none() is None:
+        # Uživatel ještě nesyncoval po nasazení — stejná historie, jakou zapíše
+        # první sync, jen dopočtená v paměti
+        backfill, todays = await _snapshot_rows(db, user_id, accounts, end.isoformat())
+        derived: dict[str, list[tuple[str, float]]] = {}
+        for r in sorted(backfill + todays, key=lambda r: r["snapshot_date"]):
+            derived.setdefault(r["account_key"], []).append((r["snapshot_date"], r["balance"]))
+        return build_history(start, end, accounts, derived)
+
+    keys = [acc.key for acc in accounts]
+    in_range = await db.execute(
+        select(
+            AccountBalanceSnapshotModel.account_key,
+            AccountBalanceSnapshotModel.snapshot_date,
+            AccountBalanceSnapshotModel.balance,
+        )
+        .where(
+            AccountBalanceSnapshotModel.user_id == user_id,
+            AccountBalanceSnapshotModel.account_key.in_(keys),
+            AccountBalanceSnapshotModel.snapshot_date >= start.isoformat(),
+            AccountBalanceSnapshotModel.snapshot_date <= end.isoformat(),
+        )
+        .order_by(AccountBalanceSnapshotModel.snapshot_date)
+    )
+    # Poslední známá hodnota před začátkem okna (DISTINCT ON = jeden řádek na účet)
+    before_start = await db.execute(
+        select(
+            AccountBalanceSnapshotModel.account_key,
+            AccountBalanceSnapshotModel.snapshot_date,
+            AccountBalanceSnapshotModel.balance,
+        )
+        .where(
+            AccountBalanceSnapshotModel.user_id == user_id,
+            AccountBalanceSnapshotModel.account_key.in_(keys),
+            AccountBalanceSnapshotModel.snapshot_date < start.isoformat(),
+        )
+        .order_by(AccountBalanceSnapshotModel.account_key, AccountBalanceSnapshotModel.snapshot_date.desc())
+        .distinct(AccountBalanceSnapshotModel.account_key)
+    )
+
+    snapshots: dict[str, list[tuple[str, float]]] = {}
+    for key, day, balance in before_start.all():
+        snapshots.setdefault(key, []).append((day, balance))
+    for key, day, balance in in_range.all():
+        snapshots.setdefault(key, []).append((day, balance))
+    return build_history(start, end, accounts, snapshots)
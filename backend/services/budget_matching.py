@@ -0,0 +1,242 @@
+"""Automatické párování položek měsíčního rozpočtu s transakcemi.
+
+Nezaplacená položka se páruje s odchozí transakcí měsíce třemi způsoby
+(od nejsilnějšího): match_pattern šablony v popisu, částka ±5 %, kategorie
+šablony + částka ±20 %.
+
+Transakce měsíce se jednou zaindexují — podle tokenů foldovaného popisu
+(diakritika nehraje roli) a podle seřazené absolutní částky (bisect pro
+okna ±5 % / ±20 %) — takže se pro každou položku neprochází celý měsíc.
+Přiřazení je globální: všechny kandidátní dvojice se seřadí podle skóre
+a páruje se od nejlepší, takže položka zpracovaná dřív „nevyžere"
+transakci, která patří jiné položce přesněji.
+
+Běží na tlačítko v rozpočtu i automaticky po syncu pro aktuální měsíc.
+"""
+import logging
+import re
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import AccountModel, MonthlyBudgetModel, MonthlyExpenseModel, RecurringExpenseModel, TransactionModel
+from services.categorization import fold
+
+logger = logging.getLogger(__name__)
+
+AMOUNT_TOLERANCE = 0.05
+CATEGORY_AMOUNT_TOLERANCE = 0.20
+
+# Síla způsobu párování — vyšší vyhrává nad lepší shodou částky
+TIER_PATTERN, TIER_AMOUNT, TIER_CATEGORY = 3, 2, 1
+TIER_NAMES = {TIER_PATTERN: "by_pattern", TIER_AMOUNT: "by_amount", TIER_CATEGORY: "by_category"}
+
+_TOKEN_SPLIT = re.compile(r"[^0-9a-z]+")
+
+
+@dataclass(frozen=True)
+class MonthTransaction:
+    id: str
+    date: str
+    description: str
+    amount: float  # absolutní hodnota
+    category: Optional[str]
+
+
+@dataclass(frozen=True)
+class ExpenseToMatch:
+    id: int
+    amount: float  # absolutní hodnota
+    pattern: Optional[str]
+    category: Optional[str]
+
+
+@dataclass(frozen=True)
+class Match:
+    expense_id: int
+    transaction_id: str
+    tier: int
+
+
+def _tokens(text: str) -> list[str]:
+    return [t for t in _TOKEN_SPLIT.split(text) if t]
+
+
+class MonthIndex:
+    """Index odchozích transakcí jednoho měsíce."""
+
+    def __init__(self, transactions: Iterable[MonthTransaction]):
+        self.transactions = list(transactions)
+        self._folded = [fold(tx.description) for tx in self.transactions]
+        self._by_token: dict[str, set[int]] = {}
+        for i, text in enumerate(self._folded):
+            for token in _tokens(text):
+                self._by_token.setdefault(token, set()).add(i)
+        order = sorted(range(len(self.transactions)), key=lambda i: self.transactions[i].amount)
+        self._amount_order = order
+        self._amounts = [self.transactions[i].amount for i in order]
+        self._containing: dict[str, set[int]] = {}
+
+    def _with_token_containing(self, part: str) -> set[int]:
+        # Část patternu může být jen kusem tokenu popisu ("flix" v "netflix") —
+        # projde se slovník tokenů (řádově menší než transakce × položky).
+        if part not in self._containing:
+            hits: set[int] = set()
+            for token, ids in self._by_token.items():
+                if part in token:
+                    hits |= ids
+            self._containing[part] = hits
+        return self._containing[part]
+
+    def by_pattern(self, pattern: str) -> list[int]:
+        """Transakce, jejichž foldovaný popis obsahuje foldovaný pattern."""
+        folded = fold(pattern).strip()
+        parts = _tokens(folded)
+        if not parts:
+            return []
+        candidates = set.intersection(*(self._with_token_containing(p) for p in parts))
+        return [i for i in candidates if folded in self._folded[i]]
+
+    def by_amount(self, amount: float, tolerance: float) -> list[int]:
+        """Transakce s částkou v okně amount ± amount*tolerance."""
+        delta = amount * tolerance
+        lo = bisect_left(self._amounts, amount - delta)
+        hi = bisect_right(self._amounts, amount + delta)
+        return self._amount_order[lo:hi]
+
+
+def assign_matches(
+    expenses: Iterable[ExpenseToMatch],
+    index: MonthIndex,
+    taken: Optional[set[str]] = None,
+) -> list[Match]:
+    """Globální přiřazení položka ↔ transakce podle skóre (každá nejvýš jednou).
+
+    Skóre = (způsob párování, blízkost částky); při shodě rozhoduje dřívější
+    transakce a nižší id položky, ať je výsledek deterministický.
+    """
+    taken = set(taken or ())
+    candidates: list[tuple] = []
+    for expense in expenses:
+        found: dict[int, int] = {}
+        if expense.pattern:
+            for i in index.by_pattern(expense.pattern):
+                found[i] = TIER_PATTERN
+        for i in index.by_amount(expense.amount, AMOUNT_TOLERANCE):
+            found.setdefault(i, TIER_AMOUNT)
+        if expense.category:
+            for i in index.by_amount(expense.amount, CATEGORY_AMOUNT_TOLERANCE):
+                if index.transactions[i].category == expense.category:
+                    found.setdefault(i, TIER_CATEGORY)
+        for i, tier in found.items():
+            tx = index.transactions[i]
+            diff = abs(tx.amount - expense.amount) / expense.amount if expense.amount else abs(tx.amount)
+            candidates.append((-tier, diff, tx.date, expense.id, tx.id, tier))
+
+    candidates.sort()
+    matched_expenses: set[int] = set()
+    matches: list[Match] = []
+    for _, _, _, expense_id, tx_id, tier in candidates:
+        if expense_id in matched_expenses or tx_id in taken:
+            continue
+        matched_expenses.add(expense_id)
+        taken.add(tx_id)
+        matches.append(Match(expense_id, tx_id, tier))
+    return matches
+
+
+def _month_end(year_month: str) -> str:
+    year, month = map(int, year_month.split("-"))
+    return f"{year + 1:04d}-01-01" if month == 12 else f"{year:04d}-{month + 1:02d}-01"
+
+
+async def match_budget_transactions(db: AsyncSession, user_id: int, budget: MonthlyBudgetModel) -> dict:
+    """Spáruje nezaplacené položky rozpočtu s transakcemi jeho měsíce.
+    Necommituje. Vrací počty podle způsobu párování."""
+    counts = {name: 0 for name in TIER_NAMES.values()}
+
+    expenses = list((await db.execute(
+        select(MonthlyExpenseModel).where(MonthlyExpenseModel.budget_id == budget.id)
+    )).scalars())
+    unpaid = [e for e in expenses if not e.is_paid]
+    if not unpaid:
+        return counts
+    # Transakce už přiřazené zaplaceným položkám se znovu nepoužijí
+    taken = {e.matched_transaction_id for e in expenses if e.is_paid and e.matched_transaction_id}
+
+    recurring = (await db.execute(
+        select(RecurringExpenseModel.id, RecurringExpenseModel.name,
+               RecurringExpenseModel.match_pattern, RecurringExpenseModel.category)
+        .where(RecurringExpenseModel.user_id == user_id)
+    )).all()
+    pattern_by_id = {rid: p.lower() for rid, _, p, _ in recurring if p}
+    pattern_by_name = {name.lower(): p.lower() for _, name, p, _ in recurring if p}
+    category_by_name = {name.lower(): c for _, name, p, c in recurring if p and c}
+
+    rows = (await db.execute(
+        select(
+            TransactionModel.id, TransactionModel.date, TransactionModel.description,
+            TransactionModel.amount, TransactionModel.category,
+        )
+        .where(
+            TransactionModel.user_id == user_id,
+            TransactionModel.date >= f"{budget.year_month}-01",
+            TransactionModel.date < _month_end(budget.year_month),
+            TransactionModel.amount < 0,
+            # Hidden accounts are excluded from budget matching.
+            TransactionModel.account_id.in_(
+                select(AccountModel.id).where(
+                    AccountModel.user_id == user_id,
+                    AccountModel.is_visible.is_(True),
+                )
+            ),
+        )
+    )).all()
+    index = MonthIndex(
+        MonthTransaction(tx_id, d, desc or "", abs(amount), category)
+        for tx_id, d, desc, amount, category in rows
+    )
+
+    to_match = [
+        ExpenseToMatch(
+            id=e.id,
+            amount=abs(e.amount),
+            pattern=pattern_by_id.get(e.recurring_expense_id) or pattern_by_name.get(e.name.lower()),
+            category=category_by_name.get(e.name.lower()),
+        )
+        for e in unpaid
+    ]
+    by_id = {e.id: e for e in unpaid}
+    for match in assign_matches(to_match, index, taken):
+        expense = by_id[match.expense_id]
+        expense.is_paid = True
+        expense.matched_transaction_id = match.transaction_id
+        counts[TIER_NAMES[match.tier]] += 1
+    return counts
+
+
+async def match_current_month(db: AsyncSession, user_id: int) -> int:
+    """Po syncu: spáruje rozpočet aktuálního měsíce (pokud existuje). Commituje."""
+    year_month = datetime.now().strftime("%Y-%m")
+    budget = (await db.execute(
+        select(MonthlyBudgetModel).where(
+            MonthlyBudgetModel.user_id == user_id,
+            MonthlyBudgetModel.year_month == year_month,
+        )
+    )).scalar_one_or_none()
+    if budget is None or budget.is_closed:
+        return 0
+    counts = await match_budget_transactions(db, user_id, budget)
+    await db.commit()
+    matched = sum(counts.values())
+    if matched:
+        logger.info(
+            "Budget %s for user %s: %d expense(s) auto-matched after sync",
+            year_month, user_id, matched,
+            extra={"event": "budget.auto_matched", "user_id": user_id, "matched": matched, **counts},
+        )
+    return matched
@@ -180,6 +180,13 @@ def combined_text(tx: dict) -> str:
     return " ".join(str(p) for p in parts if p)
 
 
+def search_text(description: str | None, tx: dict | None) -> str:
+    """Foldovaný text, proti kterému se matchují pravidla — combined_text +
+    popis (investiční transakce raw s protistranou nemají). Ukládá se do
+    transactions.search_text, aby šlo pravidla aplikovat zpětně v SQL."""
+    return fold(" ".join(p for p in (combined_text(tx or {}), description) if p))
+
+
 def categorize_by_purpose_code(tx: dict) -> str | None:
     """Return category based on ISO 20022 purposeCode, or None if not applicable"""
     purpose = tx.get("purposeCode") or tx.get("purpose_code") or ""
@@ -234,6 +241,15 @@ async def _load_rules(db: AsyncSession, user_id: int, is_user_defined: bool) ->
     return list(result.scalars())
 
 
+async def load_category_rules(db: AsyncSession, user_id: int) -> tuple[list[CategoryRuleModel], list[CategoryRuleModel]]:
+    """(uživatelská, naučená) pravidla seřazená podle RULE_ORDER — pro
+    categorize_with_preloaded_rules ve smyčkách (dva dotazy místo dvou na transakci)."""
+    return (
+        await _load_rules(db, user_id, is_user_defined=True),
+        await _load_rules(db, user_id, is_user_defined=False),
+    )
+
+
 async def categorize_transaction_with_rules(tx: dict, db: AsyncSession, user_id: int) -> str:
     """Smart category detection with priority: user rules > purposeCode > MCC > keywords"""
     desc = fold(combined_text(tx))
@@ -0,0 +1,324 @@
+"""Zpětné použití naučeného pravidla kategorie na historii transakcí.
+
+Když uživatel překategorizuje transakci s learn=True, nové pravidlo se
+aplikuje i na starší transakce stejného obchodníka. Dřív to byl ILIKE přes
+description a celý raw_json (chytal i klíče JSONu, ignoroval diakritiku
+a hranice slov) a každý nalezený řádek se měnil přes ORM v Pythonu.
+
+Teď se páruje proti transactions.search_text — foldovanému textu, proti
+kterému páruje i sync (services/categorization.search_text) — regexem se
+stejnou sémantikou jako pattern_matches (pattern nesmí být uprostřed slova).
+Počet se dá zjistit předem (preview), samotná změna je jeden
+UPDATE … RETURNING. Když by se měnilo víc než INLINE_LIMIT transakcí,
+běží to na pozadí po dávkách; stav jobu je v tabulce category_retro_jobs,
+takže průběh (get_job) jde číst z kterékoli repliky a job přerušený
+restartem dokončí resume_loop.
+
+search_text transakcí, které ho ještě nemají (z doby před migrací, T212),
+dopočítá sync (ensure_search_text na spojení z background poolu) a před
+během i job na pozadí. Request (preview, PATCH kategorie) nic nedopočítává
+ani necommituje — řádky bez search_text páruje stejnou logikou v Pythonu
+(_unindexed_matches), takže PATCH zůstává jedna transakce.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import Executable, and_, case, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import background_session_maker
+from models import CategoryRetroJobModel, TransactionModel
+from services.categorization import fold, pattern_matches, search_text
+from services.subscription_matching import regex_escape
+from services.timefmt import utcnow
+from services.tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Kategorie, které transakci vyřazují z příjmů/výdajů (stejné jako v routeru)
+EXCLUDED_CATEGORIES = ("Internal Transfer", "Family Transfer")
+TRANSFER_TYPES = {"Internal Transfer": "internal_transfer", "Family Transfer": "family_transfer"}
+
+# Nad tímto počtem se změna pouští na pozadí po dávkách
+INLINE_LIMIT = 5000
+JOB_CHUNK = 2000
+# Dávka pro dopočet search_text
+_BACKFILL_CHUNK = 2000
+# Jak dlouho se drží hotové joby (pro poslední dotaz na průběh)
+_JOB_TTL_SECS = 3600
+# Běžící job bez heartbeatu (updated_at) déle než tohle je přerušený
+# (restart, pád repliky) — převezme ho resume_loop kterékoli repliky
+_STALE_SECS = 120
+_RESUME_INTERVAL_SECS = 60
+
+
+def pattern_regex(pattern: str) -> str:
+    """Postgres ARE se sémantikou pattern_matches: foldovaný pattern jako
+    podřetězec, před ním i za ním ne-písmeno nebo kraj textu."""
+    return f"(^|[^[:alpha:]]){regex_escape(fold(pattern))}([^[:alpha:]]|$)"
+
+
+def _row_search_text(description: Optional[str], raw_json: Optional[str]) -> str:
+    try:
+        raw = json.loads(raw_json) if raw_json else None
+    except ValueError:
+        raw = None
+    return search_text(description, raw if isinstance(raw, dict) else None)
+
+
+async def ensure_search_text(
+    db: AsyncSession, user_id: int, touch: Optional[Callable[[], Executable]] = None,
+) -> int:
+    """Dopočítá search_text transakcím, které ho ještě nemají. Commituje
+    po dávkách — jen mimo request (sync, job na pozadí); `touch` dává příkaz
+    (heartbeat jobu) zapsaný v commitu každé dávky. Vrací počet doplněných."""
+    filled = 0
+    while True:
+        rows = (await db.execute(
+            select(TransactionModel.id, TransactionModel.description, TransactionModel.raw_json)
+            .where(TransactionModel.user_id == user_id, TransactionModel.search_text.is_(None))
+            .limit(_BACKFILL_CHUNK)
+        )).all()
+        if not rows:
+            return filled
+        params = [
+            {"id": tx_id, "search_text": _row_search_text(description, raw_json)}
+            for tx_id, description, raw_json in rows
+        ]
+        # ORM bulk UPDATE podle primárního klíče (executemany)
+        await db.execute(update(TransactionModel), params)
+        if touch is not None:
+            await db.execute(touch())
+        await db.commit()
+        filled += len(rows)
+
+
+def _candidates(user_id: int, exclude_id: Optional[str]) -> list:
+    conditions = [
+        TransactionModel.user_id == user_id,
+        # Ruční volby (i detekce převodů) pravidlo nepřepisuje
+        TransactionModel.category_locked.is_(False),
+    ]
+    if exclude_id is not None:
+        conditions.append(TransactionModel.id != exclude_id)
+    return conditions
+
+
+def _matching(user_id: int, pattern: str, exclude_id: Optional[str], unindexed: list[str] = ()):
+    matches = TransactionModel.search_text.op("~")(pattern_regex(pattern))
+    if unindexed:
+        matches = or_(matches, TransactionModel.id.in_(unindexed))
+    return and_(*_candidates(user_id, exclude_id), matches)
+
+
+async def _unindexed_matches(db: AsyncSession, user_id: int, pattern: str, exclude_id: Optional[str]) -> list[str]:
+    """Id transakcí bez search_text (ještě je nedopočítal sync), které
+    pattern zachytí — párování v Pythonu se stejnou sémantikou. Nic nezapisuje."""
+    rows = (await db.execute(
+        select(TransactionModel.id, TransactionModel.description, TransactionModel.raw_json)
+        .where(*_candidates(user_id, exclude_id), TransactionModel.search_text.is_(None))
+    )).all()
+    folded = fold(pattern)
+    return [
+        tx_id for tx_id, description, raw_json in rows
+        if pattern_matches(_row_search_text(description, raw_json), folded)
+    ]
+
+
+async def count_matching(db: AsyncSession, user_id: int, pattern: str, exclude_id: Optional[str] = None) -> int:
+    """Kolik transakcí by pravidlo zpětně překategorizovalo. Jen čte."""
+    unindexed = await _unindexed_matches(db, user_id, pattern, exclude_id)
+    return (await db.execute(
+        select(func.count()).select_from(TransactionModel).where(_matching(user_id, pattern, exclude_id))
+    )).scalar_one() + len(unindexed)
+
+
+def _category_values(category: str) -> dict:
+    values = {
+        "category": category,
+        # Ruční vyřazení má přednost (stejně jako u jedné transakce)
+        "is_excluded": True if category in EXCLUDED_CATEGORIES else func.coalesce(TransactionModel.user_excluded, False),
+    }
+    if category in TRANSFER_TYPES:
+        values["transaction_type"] = TRANSFER_TYPES[category]
+    else:
+        values["transaction_type"] = case(
+            (TransactionModel.transaction_type.in_(TRANSFER_TYPES.values()), "normal"),
+            else_=TransactionModel.transaction_type,
+        )
+    return values
+
+
+@traced("categorization.retro_apply")
+async def apply_category(
+    db: AsyncSession, user_id: int, pattern: str, category: str,
+    exclude_id: Optional[str] = None, tx_ids: Optional[list[str]] = None,
+) -> list[str]:
+    """Překategorizuje odpovídající transakce jedním UPDATE … RETURNING
+    (volitelně jen v dávce tx_ids). Necommituje. Vrací id změněných."""
+    if tx_ids is not None:
+        where = and_(_matching(user_id, pattern, exclude_id), TransactionModel.id.in_(tx_ids))
+    else:
+        unindexed = await _unindexed_matches(db, user_id, pattern, exclude_id)
+        where = _matching(user_id, pattern, exclude_id, unindexed)
+    result = await db.execute(
+        update(TransactionModel)
+        .where(where)
+        .values(**_category_values(category))
+        .returning(TransactionModel.id)
+        .execution_options(synchronize_session=False)
+    )
+    return list(result.scalars())
+
+
+def job_dict(job: CategoryRetroJobModel) -> dict:
+    return {
+        "id": job.id,
+        "pattern": job.pattern,
+        "category": job.category,
+        "status": job.status,
+        "total": job.total,
+        "done": job.done,
+        "error": job.error,
+    }
+
+
+_tasks: set[asyncio.Task] = set()
+
+
+async def get_job(db: AsyncSession, job_id: str, user_id: int) -> Optional[CategoryRetroJobModel]:
+    return (await db.execute(
+        select(CategoryRetroJobModel).where(
+            CategoryRetroJobModel.id == job_id,
+            CategoryRetroJobModel.user_id == user_id,
+        )
+    )).scalar_one_or_none()
+
+
+def _heartbeat(job_id: str, **values):
+    return (
+        update(CategoryRetroJobModel)
+        .where(CategoryRetroJobModel.id == job_id)
+        .values(updated_at=utcnow(), **values)
+    )
+
+
+async def _run_job(job_id: str) -> None:
+    job = None
+    try:
+        async with background_session_maker() as db:
+            job = await db.get(CategoryRetroJobModel, job_id)
+            # Stav se zapisuje explicitně (_heartbeat), objekt je jen lokální kopie
+            db.expunge(job)
+            # Dávky níž párují jen podle search_text. Dopočet i sběr id můžou
+            # na velké historii trvat déle než _STALE_SECS — heartbeat po každé
+            # dávce a před sběrem, jinak by job převzal resume_loop podruhé
+            await ensure_search_text(db, job.user_id, touch=lambda: _heartbeat(job_id))
+            await db.execute(_heartbeat(job_id))
+            await db.commit()
+            ids = list((await db.execute(
+                select(TransactionModel.id)
+                .where(_matching(job.user_id, job.pattern, job.exclude_id))
+                .order_by(TransactionModel.id)
+            )).scalars())
+            # Po převzetí přerušeného jobu se počítá znovu — UPDATE je idempotentní
+            job.total, job.done = len(ids), 0
+            await db.execute(_heartbeat(job_id, total=job.total, done=0))
+            await db.commit()
+            for i in range(0, len(ids), JOB_CHUNK):
+                changed = await apply_category(
+                    db, job.user_id, job.pattern, job.category, job.exclude_id, ids[i:i + JOB_CHUNK],
+                )
+                job.done += len(changed)
+                # Průběh ve stejném commitu jako dávka
+                await db.execute(_heartbeat(job_id, done=job.done))
+                await db.commit()
+            job.status = "completed"
+            await db.execute(_heartbeat(job_id, status=job.status, finished_at=utcnow()))
+            await db.commit()
+    except Exception as e:
+        logger.warning("Retroactive category job %s failed: %s", job_id, e)
+        async with background_session_maker() as db:
+            await db.execute(_heartbeat(job_id, status="failed", error=str(e), finished_at=utcnow()))
+            await db.commit()
+        if job is not None:
+            job.status = "failed"
+    finally:
+        if job is not None:
+            logger.info(
+                "Retroactive category job %s for user %s: %s, %d/%d transaction(s)",
+                job_id, job.user_id, job.status, job.done, job.total,
+                extra={
+                    "event": "category_retro.job", "user_id": job.user_id, "status": job.status,
+                    "done": job.done, "total": job.total,
+                },
+            )
+
+
+def _launch(job_id: str) -> None:
+    task = asyncio.create_task(_run_job(job_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+
+def queue_job(
+    db: AsyncSession, user_id: int, pattern: str, category: str, total: int, exclude_id: Optional[str] = None,
+) -> CategoryRetroJobModel:
+    """Založí job ve stejné transakci jako změnu kategorie (necommituje).
+    Po commitu ho spustí start_job."""
+    job = CategoryRetroJobModel(
+        id=uuid.uuid4().hex, user_id=user_id, pattern=pattern, category=category,
+        exclude_id=exclude_id, status="running", total=total, done=0,
+        started_at=utcnow(), updated_at=utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+def start_job(job: CategoryRetroJobModel) -> None:
+    """Spustí zpětné použití pravidla na pozadí (po dávkách, commit po každé)."""
+    _launch(job.id)
+
+
+async def _claim_stale_jobs() -> list[str]:
+    """Převezme běžící joby bez heartbeatu déle než _STALE_SECS. UPDATE
+    s podmínkou na updated_at je atomický — z více replik vyhraje jedna."""
+    now = utcnow()
+    async with background_session_maker() as db:
+        claimed = list((await db.execute(
+            update(CategoryRetroJobModel)
+            .where(
+                CategoryRetroJobModel.status == "running",
+                CategoryRetroJobModel.updated_at < now - timedelta(seconds=_STALE_SECS),
+            )
+            .values(updated_at=now)
+            .returning(CategoryRetroJobModel.id)
+        )).scalars())
+        # Hotové joby se drží jen pro poslední dotazy na průběh
+        await db.execute(
+            delete(CategoryRetroJobModel).where(
+                CategoryRetroJobModel.finished_at < now - timedelta(seconds=_JOB_TTL_SECS),
+            )
+        )
+        await db.commit()
+    return claimed
+
+
+async def resume_loop() -> None:
+    """Periodický úkol z lifespanu — dokončí joby přerušené restartem nebo
+    pádem repliky. Chyby jednoho kola smyčku nezastaví."""
+    while True:
+        try:
+            for job_id in await _claim_stale_jobs():
+                logger.info(
+                    "Resuming interrupted category job %s", job_id,
+                    extra={"event": "category_retro.resumed", "job_id": job_id},
+                )
+                _launch(job_id)
+        except Exception as e:
+            logger.warning(f"Category job resume check failed: {e}")
+        await asyncio.sleep(_RESUME_INTERVAL_SECS)
@@ -0,0 +1,223 @@
+"""Adresář protistran (IBAN → jméno) — učení ze syncu a teplá mapa pro čtení.
+
+Banka u části plateb (trvalé příkazy, inkasa) jméno protistrany nepošle,
+u jiných plateb na stejný IBAN ano. Dřív se adresář plnil tlačítkem
+/contacts/auto-populate, které pokaždé načetlo a rozparsovalo raw_json celé
+historie. Teď sync sbírá dvojice IBAN → jméno z právě stažených transakcí
+(collect_counterparties) a jedním INSERT … ON CONFLICT je zapíše; ručně
+zadané kontakty (source="manual") se nikdy nepřepisují.
+
+Seznam transakcí a dashboard jména dohledávají z mapy kontaktů uživatele
+držené v paměti (contact_map) — invaliduje se při každém zápisu do
+adresáře, TTL kryje změny z jiných procesů.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import NamedTuple, Optional
+
+from sqlalchemy import and_, cast, func, select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ContactModel, TransactionModel
+from services.timefmt import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Jak dlouho platí mapa kontaktů v paměti (změny z jiného workeru)
+_MAP_TTL_SECS = 300.0
+# 5 sloupců na řádek — pod limitem 32767 parametrů asyncpg
+_INSERT_CHUNK = 5000
+
+_SIDES = (("creditorAccount", "creditorName"), ("debtorAccount", "debtorName"))
+
+
+def normalize_iban(value: Optional[str]) -> Optional[str]:
+    """Upper-case and strip whitespace so lookups are consistent."""
+    if not value:
+        return None
+    cleaned = "".join(value.split()).upper()
+    return cleaned or None
+
+
+def counterparties(raw: dict) -> list[tuple[str, str]]:
+    """(IBAN, jméno) protistran transakce, u kterých banka poslala obojí."""
+    pairs = []
+    for account_key, name_key in _SIDES:
+        acc = raw.get(account_key) or {}
+        if not isinstance(acc, dict):
+            continue
+        iban = normalize_iban(acc.get("iban") or acc.get("bban"))
+        name = (raw.get(name_key) or "").strip()
+        if iban and name:
+            pairs.append((iban, name))
+    return pairs
+
+
+def _keep_latest(into: dict[str, tuple[str, str]], iban: str, tx_date: str, name: str) -> None:
+    seen = into.get(iban)
+    if seen is None or tx_date > seen[0]:
+        into[iban] = (tx_date, name)
+
+
+def collect_counterparties(into: dict[str, tuple[str, str]], tx_date: str, raw: dict) -> None:
+    """Přidá dvojice z transakce do {iban: (datum, jméno)} — vyhrává nejnovější jméno."""
+    for iban, name in counterparties(raw):
+        _keep_latest(into, iban, tx_date or "", name)
+
+
+async def upsert_learned_contacts(db: AsyncSession, user_id: int, learned: dict[str, tuple[str, str]]) -> int:
+    """INSERT … ON CONFLICT pro naučené dvojice; ruční kontakty zůstávají.
+    Commituje. Vrací počet nových/přejmenovaných kontaktů."""
+    if not learned:
+        return 0
+    now = utcnow()
+    rows = [
+        {"user_id": user_id, "iban": iban, "name": name, "source": "auto", "created_at": now, "updated_at": now}
+        for iban, (_, name) in sorted(learned.items())
+    ]
+    changed = 0
+    for i in range(0, len(rows), _INSERT_CHUNK):
+        stmt = pg_insert(ContactModel).values(rows[i:i + _INSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "iban"],
+            set_={"name": stmt.excluded.name, "updated_at": stmt.excluded.updated_at},
+            where=and_(ContactModel.source == "auto", ContactModel.name != stmt.excluded.name),
+        ).returning(ContactModel.iban)
+        changed += len((await db.execute(stmt)).all())
+    await db.commit()
+    if changed:
+        invalidate_contact_map(user_id)
+    return changed
+
+
+class HistoryLearnResult(NamedTuple):
+    learned: int   # nové/přejmenované kontakty
+    skipped: int   # IBANy z historie, které už v adresáři byly (nebo jsou ruční)
+    scanned: int   # prohledané transakce s raw_json
+
+
+async def _history_pairs_sql(db: AsyncSession, user_id: int) -> dict[str, tuple[str, str]]:
+    """Dvojice vytažené v SQL — raw_json se nepřenáší. Selže na řádku, který
+    jsonb nepřijme (rozbitý JSON, escape \\u0000)."""
+    raw = cast(TransactionModel.raw_json, JSONB)
+    learned: dict[str, tuple[str, str]] = {}
+    for account_key, name_key in _SIDES:
+        iban = func.upper(func.regexp_replace(
+            func.coalesce(raw[(account_key, "iban")].astext, raw[(account_key, "bban")].astext),
+            r"\s", "", "g",
+        ))
+        name = func.trim(raw[name_key].astext)
+        rows = (await db.execute(
+            select(iban, name, TransactionModel.date)
+            .where(
+                TransactionModel.user_id == user_id,
+                TransactionModel.raw_json.isnot(None),
+                TransactionModel.account_type == "bank",
+                iban != "",
+                name != "",
+            )
+        )).all()
+        for iban_value, name_value, tx_date in rows:
+            _keep_latest(learned, iban_value, tx_date or "", name_value)
+    return learned
+
+
+async def _history_pairs_python(db: AsyncSession, user_id: int) -> dict[str, tuple[str, str]]:
+    """Záloha pro historii s řádky, které jsonb odmítne — parsování po
+    dávkách v Pythonu, nečitelné řádky se přeskočí."""
+    learned: dict[str, tuple[str, str]] = {}
+    result = await db.stream(
+        select(TransactionModel.raw_json, TransactionModel.date)
+        .where(
+            TransactionModel.user_id == user_id,
+            TransactionModel.raw_json.isnot(None),
+            TransactionModel.account_type == "bank",
+        )
+        .execution_options(yield_per=2000)
+    )
+    async for raw_json, tx_date in result:
+        try:
+            raw = json.loads(raw_json)
+        except ValueError:
+            continue
+        if isinstance(raw, dict):
+            collect_counterparties(learned, tx_date, raw)
+    return learned
+
+
+async def learn_from_history(db: AsyncSession, user_id: int) -> HistoryLearnResult:
+    """Jednorázové doplnění adresáře z celé historie (pro účty synchronizované
+    před učením během syncu). Commituje."""
+    scanned = (await db.execute(
+        select(func.count()).select_from(TransactionModel).where(
+            TransactionModel.user_id == user_id,
+            TransactionModel.raw_json.isnot(None),
+        )
+    )).scalar_one()
+    try:
+        pairs = await _history_pairs_sql(db, user_id)
+    except DBAPIError as e:
+        await db.rollback()
+        logger.warning(
+            "Contact history: raw_json rejected by jsonb (%s), parsing in Python", e.orig,
+            extra={"event": "contacts.history_fallback", "user_id": user_id},
+        )
+        pairs = await _history_pairs_python(db, user_id)
+    learned = await upsert_learned_contacts(db, user_id, pairs)
+    return HistoryLearnResult(learned, len(pairs) - learned, scanned)
+
+
+class Contact(NamedTuple):
+    name: str
+    source: str
+
+
+@dataclass
+class _ContactMap:
+    by_iban: dict[str, Contact]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+
+_maps: dict[int, _ContactMap] = {}
+
+
+def invalidate_contact_map(user_id: int) -> None:
+    _maps.pop(user_id, None)
+
+
+async def contact_map(db: AsyncSession, user_id: int) -> dict[str, Contact]:
+    """{IBAN: Contact(name, source)} uživatele — z paměti, jinak jeden dotaz."""
+    cached = _maps.get(user_id)
+    if cached is not None and time.monotonic() - cached.loaded_at < _MAP_TTL_SECS:
+        return cached.by_iban
+    rows = await db.execute(
+        select(ContactModel.iban, ContactModel.name, ContactModel.source)
+        .where(ContactModel.user_id == user_id)
+    )
+    by_iban = {iban: Contact(name, source or "manual") for iban, name, source in rows.all()}
+    _maps[user_id] = _ContactMap(by_iban)
+    return by_iban
+
+
+def parse_counterparty_fields(raw_json: Optional[str]) -> tuple:
+    """(creditor_name, debtor_name, creditor_iban, debtor_iban) z raw_json."""
+    raw: dict = {}
+    if raw_json:
+        try:
+            raw = json.loads(raw_json) or {}
+        except Exception:
+            raw = {}
+    if not isinstance(raw, dict):
+        raw = {}
+    creditor = raw.get("creditorAccount") or {}
+    debtor = raw.get("debtorAccount") or {}
+    return (
+        raw.get("creditorName"),
+        raw.get("debtorName"),
+        normalize_iban(creditor.get("iban") or creditor.get("bban")) if isinstance(creditor, dict) else None,
+        normalize_iban(debtor.get("iban") or debtor.get("bban")) if isinstance(debtor, dict) else None,
+    )
@@ -0,0 +1,59 @@
+"""Sdílený pool pro CPU práci mimo event loop.
+
+Parsování PDF/XLSX, roční Wrapped, seskupení plateb detektoru předplatných,
+JSON protiúčtů v detekci převodů a hash hesla (argon2) běžely přímo
+v handleru — jeden uživatel s velkým ročním reportem tak zdržel requesty
+všech ostatních. `run_cpu` je pošle do vlastního ThreadPoolExecutoru
+s velikostí settings.cpu_workers: oddělený od výchozího poolu
+asyncio.to_thread (push notifikace, ověření OAuth), takže těžké reporty
+nevyčerpají vlákna rychlým úlohám, a omezený, takže je nepustí všechny
+naráz.
+
+Vlákna, ne procesy: vstupy jsou často ORM objekty (nejdou rozumně
+picklovat) a část práce (argon2, pypdf/zlib) uvolňuje GIL. Čistý Python
+GIL drží, ale interpreter ho event loopu vrací každých ~5 ms
+(sys.getswitchinterval) — místo zablokování na stovky ms tak loop dál
+obsluhuje ostatní requesty. Funkce předané do poolu nesmí sahat do DB
+(žádné líné načítání atributů ORM — v jiném vlákně není greenlet).
+"""
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, TypeVar
+
+from config import get_settings
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(1, get_settings().cpu_workers), thread_name_prefix="cpu",
+                )
+    return _executor
+
+
+async def run_cpu(fn: Callable[..., T], /, *args, **kwargs) -> T:
+    """Jako asyncio.to_thread, jen ve sdíleném CPU poolu. ContextVars se
+    předávají (počítadlo dotazů, tracing span, profil syncu)."""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(contextvars.copy_context().run, fn, *args, **kwargs)
+    return await loop.run_in_executor(get_executor(), call)
+
+
+def shutdown() -> None:
+    """Volá lifespan při ukončení — rozpracované úlohy se nečekají."""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
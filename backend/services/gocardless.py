@@ -1,18 +1,23 @@
+import asyncio
 import httpx
 import logging
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
 from typing import Optional
+from sqlalchemy import text
 from config import get_settings
 from schemas import (
     TransactionSchema, Integration, SpectacularRequisition,
     Requisition, AccountDetail, AccountBalance, BalanceSchema
 )
+from services.sync_profile import record_http
 from services.timefmt import utcnow
 
 settings = get_settings()
 logger = logging.getLogger(__name__)
 
-BASE_URL = "https://bankaccountdata.gocardless.com/api/v2"
+BASE_URL = settings.gocardless_base_url.rstrip("/")
 
 # GoCardless přeposílá dotazy do banky — /transactions/ běžně trvá přes 5 s
 # (httpx default), což shazovalo sync prázdnými ReadTimeouty. Neretryujeme:
@@ -74,6 +79,10 @@ _KEY_REFRESH_EXPIRES = "gocardless_refresh_expires"  # ISO-8601 UTC datetime str
 # How many seconds before expiry we consider the token "expired" (safety buffer)
 _EXPIRY_BUFFER_SECS = 60
 
+# Klíč Postgres advisory locku pro refresh tokenu — sdílený všemi replikami.
+# Libovolná pevná 64bit konstanta; jen nesmí kolidovat s jiným advisory lockem.
+_TOKEN_ADVISORY_LOCK_KEY = 0x6763_746F_6B65_6E  # "gctoken"
+
 # Berlin Group balance types, best first: "available now" figures before booked
 # ones. Some banks omit interimAvailable entirely (Česká spořitelna sends only
 # expected + closingBooked), so expected must rank above the booked types or we
@@ -136,6 +145,10 @@ class GoCardlessService:
         self.refresh_token: Optional[str] = None
         self.refresh_expires: Optional[datetime] = None
         self._loaded_from_db: bool = False  # lazy flag — load once
+        # Single-flight: při vypršení tokenu refreshuje jen jeden caller, ostatní
+        # (paralelní gather v syncu, víc tabů) počkají a vezmou jeho výsledek.
+        # GoCardless má na /token/ přísné kvóty, souběžné refreshe je pálí zbytečně.
+        self._refresh_lock = asyncio.Lock()
 
     # ------------------------------------------------------------------ #
     #  DB persistence helpers                                              #
@@ -215,46 +228,88 @@ class GoCardlessService:
             self.access_expires = utcnow() + timedelta(seconds=access_secs)
             logger.info("GC access token refreshed — expires in ~%ds", access_secs)
 
-    # ------------------------------------------------------------------ #
-    #  Public API                                                          #
-    # ------------------------------------------------------------------ #
-
-    async def get_access_token(self) -> str:
-        """Return a valid access token, refreshing or fetching new one as needed."""
-        # 1. Lazy-load from DB on first call after process start
-        if not self._loaded_from_db:
-            await self._load_from_db()
-
-        # 2. Access token still valid → nothing to do
-        if _is_valid(self.access_expires) and self.access_token:
-            return self.access_token
+    def _has_valid_access(self) -> bool:
+        return bool(self.access_token) and _is_valid(self.access_expires)
+
+    @asynccontextmanager
+    async def _replica_lock(self):
+        """Cross-replica mutex: transaction-scoped Postgres advisory lock.
+
+        Drží se po dobu refreshe na vlastním spojení; uvolní se sám commitem /
+        rollbackem na konci bloku (i když replika spadne, Postgres ho pustí
+        se zavřením spojení)."""
+        from database import get_db_context
+        async with get_db_context() as db:
+            await db.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": _TOKEN_ADVISORY_LOCK_KEY},
+            )
+            yield
 
-        # 3. Access expired but refresh token valid → use refresh endpoint
+    async def _acquire_token(self):
+        """Refresh (or fetch new) token and persist it. Caller holds both locks."""
+        # Access expired but refresh token valid → use refresh endpoint
         if _is_valid(self.refresh_expires) and self.refresh_token:
             logger.info("GC access token expired — refreshing via refresh token")
             try:
                 await self._refresh_access_token()
                 await self._save_to_db()
-                return self.access_token  # type: ignore[return-value]
+                return
             except Exception as e:
                 logger.warning("Refresh failed (%s) — falling back to new token", e)
 
-        # 4. Both expired (or no refresh token at all) → fetch brand-new token
+        # Both expired (or no refresh token at all) → fetch brand-new token
         logger.info("GC tokens missing/expired — fetching new token from credentials")
         await self._fetch_new_token()
         await self._save_to_db()
-        return self.access_token  # type: ignore[return-value]
+
+    # ------------------------------------------------------------------ #
+    #  Public API                                                          #
+    # ------------------------------------------------------------------ #
+
+    async def get_access_token(self) -> str:
+        """Return a valid access token, refreshing or fetching new one as needed.
+
+        Single-flight: within the process an asyncio lock serialises refreshes,
+        across replicas a Postgres advisory lock does. Whoever waited re-reads
+        the DB first — if another replica already refreshed, its token is reused
+        instead of spending another /token/ call."""
+        # Fast path — valid token in memory, no locking
+        if self._loaded_from_db and self._has_valid_access():
+            return self.access_token  # type: ignore[return-value]
+
+        async with self._refresh_lock:
+            # 1. Lazy-load from DB on first call after process start
+            if not self._loaded_from_db:
+                await self._load_from_db()
+            # 2. Another coroutine refreshed while we waited → nothing to do
+            if self._has_valid_access():
+                return self.access_token  # type: ignore[return-value]
+
+            async with self._replica_lock():
+                # 3. Another replica may have refreshed while we waited on the
+                #    advisory lock — pick its token up from the DB
+                await self._load_from_db()
+                if self._has_valid_access():
+                    logger.info("GC token refreshed by another replica — reusing it from DB")
+                    return self.access_token  # type: ignore[return-value]
+
+                # 4. Nobody did → refresh / fetch new token ourselves
+                await self._acquire_token()
+                return self.access_token  # type: ignore[return-value]
 
     async def _request(self, method: str, path: str, **kwargs) -> dict:
         """Central HTTP method for all GoCardless API calls."""
         token = await self.get_access_token()
         async with httpx.AsyncClient(timeout=_HTTP_TIMEOUT) as client:
+            started = time.perf_counter()
             response = await client.request(
                 method,
                 f"{BASE_URL}{path}",
                 headers={"Authorization": f"Bearer {token}"},
                 **kwargs,
             )
+            record_http("gocardless", path, time.perf_counter() - started, len(response.content))
             _raise_for_status_with_body(response, path)
             return response.json()
 
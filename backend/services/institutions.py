@@ -0,0 +1,223 @@
+"""Cache katalogu bank GoCardless pro stránku připojení banky.
+
+Katalog (/institutions/?country=XX) má stovky položek a mění se zřídka, přitom
+ho dřív každé otevření stránky stahovalo živě z GoCardless. Teď:
+
+- katalog se drží per země v tabulce institution_catalog (sdílené replikami),
+  v procesu navíc krátce v paměti, ať se nečte DB při každém requestu;
+- zastaralý katalog se vrátí hned a refresh se spustí na pozadí
+  (stale-while-revalidate), živě se čeká jen u úplně prvního dotazu na zemi;
+- `refresh_loop` v lifespanu obnovuje všechny známé země periodicky;
+- hledání podle názvu / BIC běží na serveru nad předem složenými klíči;
+- ETag je hash payloadu → prohlížeč dostane 304 bez přenosu katalogu.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from config import get_settings
+from models import InstitutionCatalogModel
+from services.categorization import fold
+from services.timefmt import utcnow
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Jak dlouho proces věří své paměťové kopii, než se podívá do DB, jestli katalog
+# mezitím neobnovila jiná replika (jeden řádek podle PK — levné).
+_MEMORY_TTL_SECS = 300.0
+# Jak často refresh_loop kontroluje, které země jsou zastaralé.
+_LOOP_INTERVAL_SECS = 3600.0
+
+
+@dataclass
+class Catalogue:
+    country: str
+    institutions: list[dict]
+    etag: str
+    fetched_at: datetime
+    loaded_at: float = field(default_factory=time.monotonic)
+    search_keys: list[str] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        # Složené (lowercase, bez diakritiky) klíče pro hledání — spočtené jednou
+        # při načtení, ne při každém dotazu.
+        self.search_keys = [
+            fold(" ".join(str(inst.get(k) or "") for k in ("name", "bic", "id")))
+            for inst in self.institutions
+        ]
+
+    def is_stale(self) -> bool:
+        return utcnow() - self.fetched_at > timedelta(hours=settings.institutions_refresh_hours)
+
+    def search(self, q: str | None) -> list[dict]:
+        """Instituce, jejichž název / BIC / id obsahuje všechna slova dotazu."""
+        terms = fold(q).split() if q else []
+        if not terms:
+            return self.institutions
+        return [
+            inst for inst, key in zip(self.institutions, self.search_keys)
+            if all(term in key for term in terms)
+        ]
+
+    def etag_for(self, q: str | None) -> str:
+        """Silný ETag odpovědi — závisí na verzi katalogu i na hledaném textu."""
+        terms = " ".join(fold(q).split()) if q else ""
+        if not terms:
+            return f'"{self.etag}"'
+        digest = hashlib.sha256(f"{self.etag}|{terms}".encode()).hexdigest()[:32]
+        return f'"{digest}"'
+
+
+_memory: dict[str, Catalogue] = {}
+_inflight: dict[str, asyncio.Task] = {}
+# Kdy se naposledy zkoušel refresh na pozadí — při výpadku GoCardless by jinak
+# každý request spouštěl nový pokus. Drží se i reference na běžící úkoly,
+# ať je garbage collector neukončí předčasně.
+_last_background_attempt: dict[str, float] = {}
+_background_tasks: set[asyncio.Task] = set()
+
+
+def compute_etag(payload_json: str) -> str:
+    return hashlib.sha256(payload_json.encode()).hexdigest()[:32]
+
+
+async def _load_from_db(country: str) -> Catalogue | None:
+    from database import get_db_context
+    async with get_db_context() as db:
+        row = await db.get(InstitutionCatalogModel, country)
+        if row is None:
+            return None
+        return Catalogue(
+            country=country,
+            institutions=json.loads(row.payload_json),
+            etag=row.etag,
+            fetched_at=row.fetched_at,
+        )
+
+
+async def _fetch_and_store(country: str) -> Catalogue:
+    """Stáhne katalog z GoCardless a uloží ho do DB (upsert podle země)."""
+    from database import get_db_context
+    from services.gocardless import gocardless_service
+
+    t0 = time.monotonic()
+    institutions = await gocardless_service.get_institutions(country)
+    items = sorted(
+        (inst.model_dump(mode="json") for inst in institutions),
+        key=lambda inst: fold(inst.get("name")),
+    )
+    payload_json = json.dumps(items, ensure_ascii=False, sort_keys=True)
+    etag = compute_etag(payload_json)
+    fetched_at = utcnow()
+
+    async with get_db_context() as db:
+        stmt = pg_insert(InstitutionCatalogModel).values(
+            country=country,
+            payload_json=payload_json,
+            etag=etag,
+            institutions_count=len(items),
+            fetched_at=fetched_at,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["country"],
+            set_={
+                "payload_json": stmt.excluded.payload_json,
+                "etag": stmt.excluded.etag,
+                "institutions_count": stmt.excluded.institutions_count,
+                "fetched_at": stmt.excluded.fetched_at,
+            },
+        )
+        await db.execute(stmt)
+
+    logger.info(
+        "Institution catalogue %s refreshed: %d banks in %.1fs",
+        country, len(items), time.monotonic() - t0,
+        extra={"event": "institutions.refresh", "country": country, "count": len(items)},
+    )
+    catalogue = Catalogue(country=country, institutions=items, etag=etag, fetched_at=fetched_at)
+    _memory[country] = catalogue
+    return catalogue
+
+
+async def refresh_catalogue(country: str) -> Catalogue:
+    """Single-flight refresh — souběžné requesty na stejnou zemi sdílí jeden fetch."""
+    task = _inflight.get(country)
+    if task is None or task.done():
+        task = asyncio.create_task(_fetch_and_store(country))
+        _inflight[country] = task
+
+        def _forget(done: asyncio.Task) -> None:
+            if _inflight.get(country) is done:
+                del _inflight[country]
+
+        task.add_done_callback(_forget)
+    # shield — zrušený request (odpojený klient) nesmí zrušit fetch ostatním
+    return await asyncio.shield(task)
+
+
+def _refresh_in_background(country: str) -> None:
+    if country in _inflight:
+        return
+    now = time.monotonic()
+    if now - _last_background_attempt.get(country, float("-inf")) < _MEMORY_TTL_SECS:
+        return
+    _last_background_attempt[country] = now
+
+    async def run():
+        try:
+            await refresh_catalogue(country)
+        except Exception as e:
+            # Zastaralý katalog je pořád lepší než žádný — jen zalogovat
+            logger.warning("Background refresh of institutions %s failed: %s", country, e)
+
+    task = asyncio.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def get_catalogue(country: str) -> Catalogue:
+    """Katalog pro zemi: paměť → DB → GoCardless (jen úplně poprvé)."""
+    country = country.upper()
+    catalogue = _memory.get(country)
+    if catalogue is None or time.monotonic() - catalogue.loaded_at > _MEMORY_TTL_SECS:
+        from_db = await _load_from_db(country)
+        if from_db is not None:
+            catalogue = from_db
+            _memory[country] = catalogue
+
+    if catalogue is None:
+        return await refresh_catalogue(country)
+    if catalogue.is_stale():
+        _refresh_in_background(country)
+    return catalogue
+
+
+async def _known_countries() -> list[str]:
+    from database import get_db_context
+    async with get_db_context() as db:
+        result = await db.execute(select(InstitutionCatalogModel.country))
+        return list(result.scalars())
+
+
+async def refresh_loop() -> None:
+    """Periodický úkol z lifespanu — obnovuje zastaralé katalogy všech zemí,
+    které si už někdo otevřel. Chyby jednoho kola smyčku nezastaví."""
+    while True:
+        try:
+            for country in await _known_countries():
+                catalogue = await _load_from_db(country)
+                if catalogue is None or catalogue.is_stale():
+                    await refresh_catalogue(country)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Institution catalogue refresh loop failed: %s", e)
+        await asyncio.sleep(_LOOP_INTERVAL_SECS)
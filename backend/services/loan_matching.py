@@ -0,0 +1,256 @@
+"""Automatické párování splátek úvěrů s transakcemi.
+
+Po syncu se nové odchozí transakce přiřadí nejbližší nezaplacené splátce
+aktivního úvěru: splátka je zaplacená (is_paid + matched_transaction_id),
+takže úvěry, rozpočet i cashflow ukazují skutečný stav bez ručního
+odklikávání v kalendáři.
+
+Transakce platí za splátku, když datum padne do okna kolem splatnosti
+(DUE_WINDOW_BEFORE dní před až DUE_WINDOW_AFTER dní po) a:
+  - úvěr má match_pattern, popis ho obsahuje (bez diakritiky) a částka je
+    do ±PATTERN_AMOUNT_TOLERANCE splátky (refixace, poplatky), nebo
+  - úvěr pattern nemá a částka sedí do ±AMOUNT_TOLERANCE.
+
+Nezaplacené splátky se načtou jen v rozsahu dat nových transakcí (částečný
+index ix_loan_payments_unpaid_due) a zaindexují podle měsíce splatnosti,
+takže se pro transakci prochází jen pár splátek z okolních měsíců.
+Přiřazení je globální jako u rozpočtu — kandidátní dvojice se seřadí
+(pattern před částkou, dřívější splátka, blíž splatnosti) a páruje se od
+nejlepší, takže dvě platby po sobě zaplatí dvě splátky po sobě.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import LoanModel, LoanPaymentModel, TransactionModel
+from services.categorization import fold
+from services.timefmt import utcnow
+
+logger = logging.getLogger(__name__)
+
+DUE_WINDOW_BEFORE = 7
+DUE_WINDOW_AFTER = 15
+AMOUNT_TOLERANCE = 0.01
+PATTERN_AMOUNT_TOLERANCE = 0.10
+
+TIER_PATTERN, TIER_AMOUNT = 2, 1
+
+# Bez seznamu transakcí (ruční spuštění) se páruje jen tolik dní zpátky
+BACKFILL_DAYS = 400
+
+# asyncpg má limit 32767 parametrů na statement
+_CHUNK = 5000
+
+
+@dataclass(frozen=True)
+class Installment:
+    id: int
+    loan_id: int
+    due_date: str
+    amount: float
+    pattern: Optional[str]  # foldovaný match_pattern úvěru
+
+
+@dataclass(frozen=True)
+class LoanTransaction:
+    id: str
+    date: str
+    description: str
+    amount: float  # absolutní hodnota
+
+
+@dataclass(frozen=True)
+class InstallmentMatch:
+    payment_id: int
+    transaction_id: str
+    tier: int
+
+
+def _month_key(d: date) -> str:
+    return f"{d.year:04d}-{d.month:02d}"
+
+
+class InstallmentIndex:
+    """Nezaplacené splátky podle měsíce splatnosti (YYYY-MM)."""
+
+    def __init__(self, installments: Iterable[Installment]):
+        self._by_month: dict[str, list[Installment]] = {}
+        for inst in installments:
+            self._by_month.setdefault(inst.due_date[:7], []).append(inst)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._by_month.values())
+
+    def around(self, day: date) -> list[tuple[Installment, int]]:
+        """Splátky, v jejichž okně leží `day`, s odchylkou (dny po splatnosti)."""
+        first = day - timedelta(days=DUE_WINDOW_AFTER)
+        last = day + timedelta(days=DUE_WINDOW_BEFORE)
+        months = {_month_key(first), _month_key(day), _month_key(last)}
+        result = []
+        for month in months:
+            for inst in self._by_month.get(month, ()):
+                due = date.fromisoformat(inst.due_date)
+                if first <= due <= last:
+                    result.append((inst, (day - due).days))
+        return result
+
+
+def due_range(days: Iterable[date]) -> tuple[str, str]:
+    """Rozsah splatností (ISO, včetně), který může padnout do okna některého
+    z `days` — zrcadlo InstallmentIndex.around: platba je až DUE_WINDOW_AFTER
+    dní po splatnosti, nejvýš DUE_WINDOW_BEFORE dní před ní."""
+    days = list(days)
+    return (
+        (min(days) - timedelta(days=DUE_WINDOW_AFTER)).isoformat(),
+        (max(days) + timedelta(days=DUE_WINDOW_BEFORE)).isoformat(),
+    )
+
+
+def _tier(inst: Installment, tx: LoanTransaction, folded_description: str) -> Optional[int]:
+    diff = abs(tx.amount - inst.amount)
+    if inst.pattern:
+        if inst.pattern in folded_description and diff <= inst.amount * PATTERN_AMOUNT_TOLERANCE:
+            return TIER_PATTERN
+        return None
+    if diff <= inst.amount * AMOUNT_TOLERANCE:
+        return TIER_AMOUNT
+    return None
+
+
+def assign_installments(
+    transactions: Iterable[LoanTransaction],
+    index: InstallmentIndex,
+    taken: Optional[set[str]] = None,
+) -> list[InstallmentMatch]:
+    """Globální přiřazení transakce ↔ splátka (každá nejvýš jednou).
+
+    Pořadí kandidátů: pattern před částkou, dřívější splatnost, menší
+    odchylka data, menší odchylka částky; při shodě id — deterministicky.
+    """
+    taken = set(taken or ())
+    candidates: list[tuple] = []
+    for tx in transactions:
+        if tx.id in taken:
+            continue
+        try:
+            day = date.fromisoformat(tx.date[:10])
+        except ValueError:
+            continue
+        folded = fold(tx.description)
+        for inst, days_off in index.around(day):
+            tier = _tier(inst, tx, folded)
+            if tier is None:
+                continue
+            candidates.append((
+                -tier, inst.due_date, abs(days_off), abs(tx.amount - inst.amount),
+                inst.id, tx.date, tx.id, tier,
+            ))
+
+    candidates.sort()
+    matched_payments: set[int] = set()
+    matches: list[InstallmentMatch] = []
+    for *_, payment_id, _, tx_id, tier in candidates:
+        if payment_id in matched_payments or tx_id in taken:
+            continue
+        matched_payments.add(payment_id)
+        taken.add(tx_id)
+        matches.append(InstallmentMatch(payment_id, tx_id, tier))
+    return matches
+
+
+async def _load_transactions(
+    db: AsyncSession, user_id: int, tx_ids: Optional[list[str]],
+) -> list[LoanTransaction]:
+    base = select(
+        TransactionModel.id, TransactionModel.date, TransactionModel.description, TransactionModel.amount,
+    ).where(
+        TransactionModel.user_id == user_id,
+        TransactionModel.account_type == "bank",
+        TransactionModel.amount < 0,
+        TransactionModel.is_excluded.is_(False),
+    )
+    if tx_ids is None:
+        since = (utcnow().date() - timedelta(days=BACKFILL_DAYS)).isoformat()
+        chunks = [(await db.execute(base.where(TransactionModel.date >= since))).all()]
+    else:
+        chunks = [
+            (await db.execute(base.where(TransactionModel.id.in_(tx_ids[i:i + _CHUNK])))).all()
+            for i in range(0, len(tx_ids), _CHUNK)
+        ]
+    return [
+        LoanTransaction(tx_id, d, desc or "", abs(amount))
+        for rows in chunks for tx_id, d, desc, amount in rows
+        if d
+    ]
+
+
+async def match_loan_payments(db: AsyncSession, user_id: int, tx_ids: Optional[list[str]] = None) -> int:
+    """Spáruje transakce (nové ze syncu, bez tx_ids celou nedávnou historii)
+    s nezaplacenými splátkami aktivních úvěrů. Commituje. Vrací počet spárovaných."""
+    if tx_ids is not None and not tx_ids:
+        return 0
+    loans = (await db.execute(
+        select(LoanModel.id, LoanModel.match_pattern).where(
+            LoanModel.user_id == user_id,
+            LoanModel.is_active.is_(True),
+        )
+    )).all()
+    if not loans:
+        return 0
+
+    transactions = await _load_transactions(db, user_id, tx_ids)
+    if not transactions:
+        return 0
+    due_from, due_to = due_range(date.fromisoformat(tx.date[:10]) for tx in transactions)
+
+    loan_ids = [loan_id for loan_id, _ in loans]
+    patterns = {loan_id: fold(p).strip() or None for loan_id, p in loans if p}
+    unpaid = (await db.execute(
+        select(
+            LoanPaymentModel.id, LoanPaymentModel.loan_id,
+            LoanPaymentModel.due_date, LoanPaymentModel.amount,
+        ).where(
+            LoanPaymentModel.loan_id.in_(loan_ids),
+            LoanPaymentModel.is_paid.is_(False),
+            LoanPaymentModel.due_date >= due_from,
+            LoanPaymentModel.due_date <= due_to,
+        )
+    )).all()
+    if not unpaid:
+        return 0
+    index = InstallmentIndex(
+        Installment(pid, loan_id, due, amount, patterns.get(loan_id))
+        for pid, loan_id, due, amount in unpaid
+    )
+
+    # Transakce už přiřazené jiné splátce se znovu nepoužijí
+    taken = set((await db.execute(
+        select(LoanPaymentModel.matched_transaction_id).where(
+            LoanPaymentModel.loan_id.in_(loan_ids),
+            LoanPaymentModel.matched_transaction_id.is_not(None),
+        )
+    )).scalars())
+
+    matches = assign_installments(transactions, index, taken)
+    if not matches:
+        return 0
+    by_id = {
+        p.id: p for p in (await db.execute(
+            select(LoanPaymentModel).where(LoanPaymentModel.id.in_([m.payment_id for m in matches]))
+        )).scalars()
+    }
+    for match in matches:
+        payment = by_id[match.payment_id]
+        payment.is_paid = True
+        payment.matched_transaction_id = match.transaction_id
+    await db.commit()
+    logger.info(
+        "Loans for user %s: %d installment(s) auto-matched",
+        user_id, len(matches),
+        extra={"event": "loans.auto_matched", "user_id": user_id, "matched": len(matches)},
+    )
+    return len(matches)
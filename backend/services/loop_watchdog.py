@@ -0,0 +1,85 @@
+"""Hlídač zablokovaného event loopu se vzorkem zásobníku.
+
+Histogram event_loop_lag_seconds (services/metrics.py) řekne, že loop byl
+zablokovaný, ale ne čím — zpoždění se změří až po odblokování. Watchdog
+běží ve vlastním vlákně: úloha v loopu pravidelně obnovuje heartbeat,
+a když je heartbeat starší než práh (settings.loop_block_warn_ms), vlákno
+vezme aktuální zásobník vlákna s loopem (sys._current_frames) a zaloguje
+ho (event=loop.blocked) — přesně ten kód, který loop drží. Po odblokování
+zaloguje celkovou délku bloku (event=loop.unblocked).
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from services.metrics import LOOP_BLOCKS
+
+logger = logging.getLogger(__name__)
+
+# Posledních N rámců zásobníku — hlubší je jen asyncio/uvicorn
+_STACK_LIMIT = 25
+
+
+class LoopWatchdog:
+    def __init__(self, threshold: float, interval: Optional[float] = None):
+        self.threshold = threshold  # sekundy
+        self.interval = interval or max(threshold / 4, 0.01)
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._beat_task: Optional[asyncio.Task] = None
+
+    async def _beat(self) -> None:
+        while True:
+            self._heartbeat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Volat z běžícího loopu (lifespan)."""
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._beat_task = asyncio.get_running_loop().create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._beat_task is not None:
+            self._beat_task.cancel()
+
+    def blocked_for(self) -> float:
+        """Jak dlouho už loop neobnovil heartbeat (nad rámec intervalu)."""
+        return max(0.0, time.monotonic() - self._heartbeat - self.interval)
+
+    def stack_sample(self) -> str:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return ""
+        return "".join(traceback.format_stack(frame)[-_STACK_LIMIT:])
+
+    def _watch(self) -> None:
+        stalled_since: Optional[float] = None  # heartbeat před nahlášeným blokem
+        while not self._stop.wait(self.interval):
+            blocked = self.blocked_for()
+            if blocked > self.threshold and stalled_since is None:
+                stalled_since = self._heartbeat
+                LOOP_BLOCKS.inc()
+                stack = self.stack_sample()
+                logger.warning(
+                    "Event loop blocked for %.0f ms, stack of the loop thread:\n%s",
+                    blocked * 1000, stack,
+                    extra={"event": "loop.blocked", "blocked_ms": round(blocked * 1000)},
+                )
+            elif stalled_since is not None and self._heartbeat != stalled_since:
+                # Celková délka bloku (přesnost ± interval)
+                total = max(0.0, self._heartbeat - stalled_since - self.interval)
+                stalled_since = None
+                logger.info(
+                    "Event loop unblocked after %.0f ms", total * 1000,
+                    extra={"event": "loop.unblocked", "blocked_ms": round(total * 1000)},
+                )
@@ -0,0 +1,175 @@
+"""Prometheus metriky API — latence requestů, pool spojení, lag event loopu.
+
+Dřív jediná data o rychlosti byla `duration_ms` v account_results syncu.
+Teď ASGI middleware (MetricsMiddleware) měří každý request: histogram
+latence a velikosti odpovědi, počet rozpracovaných requestů a chyby (5xx
+i nezachycené výjimky). Jako label route se bere šablona cesty z routeru
+(`/transactions/{transaction_id}`), ne skutečná URL — id uživatelů
+a transakcí tak nerozbijí kardinalitu. Nenamatchované cesty (404) sdílí
+jeden label.
+
+Pool spojení: stav poolu (checked-out, overflow, velikost) čte collector
+až při scrapu, čekání na volné spojení měří TimedAsyncQueuePool (poolclass
+enginu v database.py). Lag event loopu měří úloha v lifespanu — o kolik se
+pravidelný sleep probudí později, než měl (blokující kód v async cestě).
+
+Vše se servíruje na /metrics v textovém formátu Promethea. Uvicorn běží
+s jedním workerem na kontejner, multiprocess režim prometheus_client proto
+není potřeba.
+"""
+import asyncio
+import time
+from typing import Optional
+
+from prometheus_client import REGISTRY, Counter, Gauge, Histogram
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+# Label pro cesty, které žádná routa nechytila (404, skenery)
+UNMATCHED_ROUTE = "<unmatched>"
+# Scrape sám sebe neměří (jinak by každý scrape posunul vlastní histogram)
+_SKIP_PATHS = frozenset({"/metrics"})
+
+# Sync trvá desítky sekund, běžné čtení jednotky až stovky ms
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+_SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+_POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route", "status"), buckets=_LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "HTTP response body size by route template",
+    ("method", "route"), buckets=_SIZE_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled", ("method",),
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total", "HTTP requests that ended with 5xx or an unhandled exception",
+    ("method", "route", "status"),
+)
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=_POOL_WAIT_BUCKETS,
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Connection checkouts that failed waiting for the pool",
+)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke up a periodic timer",
+    buckets=_LAG_BUCKETS,
+)
+REPLICA_LAG = Gauge("db_replica_lag_seconds", "Read replica replication lag at the last check")
+LOOP_LAG_LAST = Gauge("event_loop_lag_last_seconds", "Most recent event loop lag sample")
+LOOP_BLOCKS = Counter(
+    "event_loop_blocked_total", "Times the loop watchdog saw the event loop blocked over the threshold",
+)
+
+
+def route_template(scope: dict) -> str:
+    """Šablona cesty namatchované routy (po zpracování requestu routerem)."""
+    route = scope.get("route")
+    path = getattr(route, "path_format", None) or getattr(route, "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """Čistý ASGI middleware (bez BaseHTTPMiddleware — nezdržuje streamování
+    odpovědi a nevytváří další task na request)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in _SKIP_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            status = 500
+            raise
+        finally:
+            in_progress.dec()
+            route = route_template(scope)
+            REQUEST_LATENCY.labels(method, route, str(status)).observe(time.perf_counter() - started)
+            RESPONSE_SIZE.labels(method, route).observe(size)
+            if status >= 500:
+                REQUEST_ERRORS.labels(method, route, str(status)).inc()
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool, který měří čekání na spojení (včetně otevření
+    nového, když pool ještě není plný)."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        POOL_WAIT.observe(time.perf_counter() - started)
+        return connection
+
+
+class PoolCollector:
+    """Stav poolu enginu čtený až při scrapu (žádná práce mezi scrapy)."""
+
+    def __init__(self, pools: dict):
+        self.pools = pools  # název enginu → Pool
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections currently checked out", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections opened above pool_size", labels=["engine"])
+        size = GaugeMetricFamily("db_pool_size", "Configured pool size", labels=["engine"])
+        for name, pool in self.pools.items():
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], max(0, pool.overflow()))
+            size.add_metric([name], pool.size())
+        yield checked_out
+        yield overflow
+        yield size
+
+
+_pool_collector: Optional[PoolCollector] = None
+
+
+def register_pool(name: str, pool) -> None:
+    """Přidá pool enginu do /metrics (idempotentní — reload/testy)."""
+    global _pool_collector
+    if _pool_collector is None:
+        _pool_collector = PoolCollector({})
+        REGISTRY.register(_pool_collector)
+    _pool_collector.pools[name] = pool
+
+
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """Běží v lifespanu: měří, o kolik se periodický sleep probudí pozdě."""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
@@ -11,8 +11,6 @@ import re
 from dataclasses import dataclass, field
 from typing import Optional
 
-from pypdf import PdfReader
-
 
 @dataclass
 class PayslipData:
@@ -69,6 +67,9 @@ def parse_payslip_text(text: str) -> PayslipData:
 
 
 def parse_payslip(file_bytes: bytes) -> PayslipData:
+    # Import až při prvním uploadu (pypdf + cryptography ~60 ms studeného startu)
+    from pypdf import PdfReader
+
     reader = PdfReader(io.BytesIO(file_bytes))
     text = "\n".join(page.extract_text() or "" for page in reader.pages)
     return parse_payslip_text(text)
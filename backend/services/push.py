@@ -1,14 +1,21 @@
 """Web Push notifikace (PWA) přes pywebpush + VAPID.
 
 Odběry žijí v tabulce push_subscriptions (jeden řádek na prohlížeč).
-Mrtvé odběry (404/410 z push služby) se mažou automaticky.
+Mrtvé odběry (404/410 z push služby) se mažou automaticky — jedním
+hromadným DELETE na konci rozeslání.
 Bez nastavených VAPID klíčů je služba neaktivní (is_configured() == False).
+
+Rozesílání na zařízení běží souběžně (pywebpush je blokující → vlákna),
+omezené semaforem. Notifikace ze syncu jdou přes `push_dispatcher`: request
+je jen zařadí do fronty a vrátí se, dispatcher je krátce posbírá, víc zpráv
+pro stejného uživatele spojí do jedné notifikace a odešle je na pozadí.
 """
 import asyncio
 import json
 import logging
+from dataclasses import dataclass
 
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from config import get_settings
@@ -17,6 +24,16 @@ from models import PushSubscriptionModel
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Max. souběžných odeslání (vláken) napříč celým procesem — push služby
+# (FCM, Mozilla, Apple) odpovídají ~100–500 ms, sériově to u víc zařízení
+# a víc notifikací rychle dělá sekundy.
+_SEND_CONCURRENCY = 8
+_send_semaphore = asyncio.Semaphore(_SEND_CONCURRENCY)
+
+# Jak dlouho dispatcher čeká na další notifikace pro stejného uživatele, než
+# je spojí a odešle (sync jich vyrobí několik během pár ms).
+_COALESCE_WINDOW_SECS = 2.0
+
 
 def is_configured() -> bool:
     return bool(settings.vapid_private_key and settings.vapid_public_key)
@@ -49,13 +66,14 @@ def _send_one(subscription: PushSubscriptionModel, payload: dict) -> bool:
         return False
 
 
-async def send_push_to_user(
-    db: AsyncSession, user_id: int, title: str, body: str, url: str = "/"
-) -> int:
-    """Pošle notifikaci na všechna zařízení uživatele. Vrací počet doručení."""
-    if not is_configured():
-        return 0
+async def _send_bounded(subscription: PushSubscriptionModel, payload: dict) -> bool:
+    async with _send_semaphore:
+        return await asyncio.to_thread(_send_one, subscription, payload)
 
+
+async def _fan_out(db: AsyncSession, user_id: int, payload: dict) -> int:
+    """Odešle payload na všechna zařízení uživatele souběžně; mrtvé odběry
+    smaže jedním DELETE. Vrací počet doručení."""
     result = await db.execute(
         select(PushSubscriptionModel).where(PushSubscriptionModel.user_id == user_id)
     )
@@ -63,14 +81,103 @@ async def send_push_to_user(
     if not subscriptions:
         return 0
 
-    payload = {"title": title, "body": body, "url": url}
-    sent = 0
-    for sub in subscriptions:
-        alive = await asyncio.to_thread(_send_one, sub, payload)
-        if alive:
-            sent += 1
-        else:
-            logger.info(f"Removing dead push subscription {sub.id}")
-            await db.delete(sub)
-    await db.commit()
-    return sent
+    alive = await asyncio.gather(*(_send_bounded(sub, payload) for sub in subscriptions))
+    dead_ids = [sub.id for sub, ok in zip(subscriptions, alive) if not ok]
+    if dead_ids:
+        logger.info(f"Removing {len(dead_ids)} dead push subscription(s): {dead_ids}")
+        await db.execute(
+            delete(PushSubscriptionModel).where(PushSubscriptionModel.id.in_(dead_ids))
+        )
+        await db.commit()
+    return len(subscriptions) - len(dead_ids)
+
+
+async def send_push_to_user(
+    db: AsyncSession, user_id: int, title: str, body: str, url: str = "/"
+) -> int:
+    """Pošle notifikaci na všechna zařízení uživatele. Vrací počet doručení."""
+    if not is_configured():
+        return 0
+    return await _fan_out(db, user_id, {"title": title, "body": body, "url": url})
+
+
+@dataclass
+class PushMessage:
+    title: str
+    body: str
+    url: str = "/"
+
+
+def coalesce(messages: list[PushMessage]) -> dict:
+    """Spojí víc notifikací pro jednoho uživatele do jednoho payloadu.
+
+    Jedna zpráva projde beze změny; víc zpráv dostane souhrnný titulek a
+    těla pod sebou. URL zůstane, jen pokud je u všech stejná."""
+    if len(messages) == 1:
+        m = messages[0]
+        return {"title": m.title, "body": m.body, "url": m.url}
+    urls = {m.url for m in messages}
+    return {
+        "title": f"Koruna — {len(messages)} upozornění",
+        "body": "\n".join(f"{m.title}: {m.body}" for m in messages),
+        "url": urls.pop() if len(urls) == 1 else "/",
+    }
+
+
+class PushDispatcher:
+    """Fronta notifikací odesílaná mimo request.
+
+    `enqueue` je okamžitý; první zpráva pro uživatele naplánuje flush za
+    _COALESCE_WINDOW_SECS, všechno, co mezitím přijde, se přidá ke stejné
+    notifikaci. Flush si otevírá vlastní DB session — request session mezitím
+    dávno skončila."""
+
+    def __init__(self, window_secs: float = _COALESCE_WINDOW_SECS):
+        self.window_secs = window_secs
+        self._pending: dict[int, list[PushMessage]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def enqueue(self, user_id: int, title: str, body: str, url: str = "/") -> None:
+        if not is_configured():
+            return
+        self._pending.setdefault(user_id, []).append(PushMessage(title, body, url))
+        if user_id not in self._tasks:
+            self._tasks[user_id] = asyncio.create_task(self._flush_later(user_id))
+
+    async def _flush_later(self, user_id: int) -> None:
+        try:
+            await asyncio.sleep(self.window_secs)
+        finally:
+            # I při zrušení (shutdown) zprávy odeslat, ne zahodit
+            await self._flush(user_id)
+
+    async def _flush(self, user_id: int) -> None:
+        self._tasks.pop(user_id, None)
+        messages = self._pending.pop(user_id, [])
+        if not messages:
+            return
+        from database import get_db_context
+        try:
+            async with get_db_context() as db:
+                sent = await _fan_out(db, user_id, coalesce(messages))
+            logger.info(
+                "Push sent to user %s: %d message(s) → %d device(s)",
+                user_id, len(messages), sent,
+                extra={"event": "push.sent", "user_id": user_id, "messages": len(messages), "devices": sent},
+            )
+        except Exception as e:
+            logger.warning(f"Push dispatch for user {user_id} failed: {e}")
+
+    async def aclose(self) -> None:
+        """Shutdown (lifespan): odeslat vše, co čeká ve frontě."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        # Úkol zrušený dřív, než se rozběhl, svůj finally neprovede
+        for user_id in list(self._pending):
+            await self._flush(user_id)
+
+
+# Singleton instance
+push_dispatcher = PushDispatcher()
@@ -0,0 +1,156 @@
+"""Počítání SQL dotazů a času v DB na jeden request (odhalování N+1).
+
+Skryté N+1 (dotaz na řádek ve smyčce) se v kódu špatně hledají a v logu
+nejsou vidět. SQLAlchemy eventy before/after_cursor_execute na všech
+enginech připisují každý dotaz do QueryStats aktuálního requestu
+(ContextVar — platí i pro sessions z gather_reads a greenlety asyncpg
+dialektu). QueryStatsMiddleware výsledek vrací v hlavičce Server-Timing
+(vidět v DevTools → Network → Timing), QueryStatsLogFilter přidá pole
+db_queries a db_time_ms do každého logu vzniklého během requestu (včetně
+access logu uvicornu) a stejný dotaz opakovaný víc než
+settings.query_repeat_warn× v jednom requestu se zaloguje jako podezření
+na N+1.
+
+V testech stejné počítadlo používá fixture `query_budget` (tests/conftest.py).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+# Literály v textu dotazu nahradit, ať se „stejný dotaz s jiným id" sečte
+# (bind parametry asyncpg `$1` zůstávají)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|(?<![\w$])\d+\b")
+
+
+def normalize_statement(statement: str) -> str:
+    return " ".join(_LITERALS.sub("?", statement).split())
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    db_time: float = 0.0  # sekundy
+    statements: Counter = field(default_factory=Counter)
+    # Vnější počítadlo (test s query_budget kolem requestu, který má vlastní)
+    parent: Optional["QueryStats"] = field(default=None, repr=False)
+
+    def record(self, statement: str, elapsed: float) -> None:
+        stats: Optional[QueryStats] = self
+        while stats is not None:
+            stats.count += 1
+            stats.db_time += elapsed
+            stats.statements[statement] += 1
+            stats = stats.parent
+
+    @property
+    def db_time_ms(self) -> float:
+        return round(self.db_time * 1000, 1)
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        """Dotazy spuštěné víc než `threshold`× — kandidáti na N+1."""
+        return [(stmt, n) for stmt, n in self.statements.most_common() if n > threshold]
+
+
+def current_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Počítá dotazy všech enginů v rámci bloku (request, test). Vnořené
+    bloky se připisují i do vnějšího."""
+    stats = QueryStats(parent=_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context._query_stats_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_stats_started", None)
+    if stats is None or started is None:
+        return
+    stats.record(normalize_statement(statement), time.perf_counter() - started)
+
+
+class QueryStatsLogFilter(logging.Filter):
+    """Přidá db_queries / db_time_ms k logům vzniklým během requestu."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        stats = _current.get()
+        if stats is not None and not hasattr(record, "db_queries"):
+            record.db_queries = stats.count
+            record.db_time_ms = stats.db_time_ms
+        return True
+
+
+def server_timing(stats: QueryStats, total_seconds: float) -> str:
+    return f'db;dur={stats.db_time_ms};desc="{stats.count} queries", app;dur={round(total_seconds * 1000, 1)}'
+
+
+class QueryStatsMiddleware:
+    """Čistý ASGI middleware: QueryStats na request, Server-Timing v odpovědi,
+    varování při opakovaném dotazu (N+1)."""
+
+    def __init__(self, app, repeat_warn: int = 20, timing_allow_origin: str = ""):
+        self.app = app
+        self.repeat_warn = repeat_warn
+        # Bez Timing-Allow-Origin prohlížeč Server-Timing cross-origin
+        # (frontend na jiné doméně) neukáže
+        self.extra_headers = [(b"timing-allow-origin", timing_allow_origin.encode())] if timing_allow_origin else []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        with track_queries() as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", server_timing(stats, time.perf_counter() - started).encode()))
+                    headers.extend(self.extra_headers)
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._warn_repeated(scope, stats)
+
+    def _warn_repeated(self, scope, stats: QueryStats) -> None:
+        repeated = stats.repeated(self.repeat_warn)
+        if not repeated:
+            return
+        statement, times = repeated[0]
+        route = getattr(scope.get("route"), "path", None) or scope.get("path")
+        logger.warning(
+            "Possible N+1: %s %s ran the same query %d× (%d queries total): %s",
+            scope.get("method"), route, times, stats.count, statement[:200],
+            extra={
+                "event": "db.repeated_query", "route": route, "repeat_count": times,
+                "db_queries": stats.count, "db_time_ms": stats.db_time_ms, "statement": statement[:500],
+            },
+        )
@@ -0,0 +1,338 @@
+"""Detektor opakovaných plateb (návrhy předplatných pro /subscriptions/detect).
+
+Odchozí platby se seskupují podle protistrany (creditorName z raw_json,
+fallback normalizovaný popis), klíčem je její primární token. Skupina je
+návrh předplatného, když většina intervalů mezi platbami padne do jednoho
+pásma (~měsíc / kvartál / rok) a částka je (skoro) stálá.
+
+Dřív se při každém otevření návrhů načetla celá historie odchozích plateb
+včetně raw_json, na každé se pustil json.loads a všechny skupiny se
+přepočítaly. Teď má každá protistrana řádek v recurring_merchant_stats
+(platby, kategorie, histogram intervalů, medián a rozptyl částek, výsledná
+perioda) a kurzor v recurring_detector_state (transactions.created_at).
+Běh detektoru načte jen transakce přidané od posledního běhu, přepočítá
+jen dotčené protistrany. creditorName se vytahuje v SQL (->>), raw_json
+se nepřenáší; historie s řádkem, který jsonb odmítne, se parsuje v Pythonu.
+
+Statistiky dotahuje sync (fáze "recurring"), /subscriptions/detect je jen
+čte — GET nic nezapisuje.
+
+Vyloučení transakcí a označení převodů se může změnit i zpětně, proto se
+statistiky jednou za REBUILD_AFTER přepočítají celé znovu.
+"""
+import json
+import logging
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from statistics import median
+from typing import Iterable, Optional
+
+from sqlalchemy import cast, delete, select
+from sqlalchemy.dialects.postgresql import JSONB, insert as pg_insert
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
+
+from models import RecurringDetectorStateModel, RecurringMerchantStatsModel, TransactionModel
+from services.cpu_pool import run_cpu
+from services.subscription_matching import primary_token
+from services.timefmt import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Detekční pásma: (perioda, min. interval dní, max. interval dní, min. počet plateb)
+DETECTION_BANDS = [
+    ("monthly", 25, 36, 3),
+    ("quarterly", 80, 102, 3),
+    ("yearly", 330, 400, 2),
+]
+# Podíl intervalů, které musí padnout do pásma, aby skupina platila za pravidelnou
+INTERVAL_CONSISTENCY = 0.6
+# Podíl plateb, jejichž částka musí být do ±25 % mediánu (předplatné ≈ stálá cena)
+AMOUNT_CONSISTENCY = 0.7
+AMOUNT_TOLERANCE = 0.25
+
+# Jak často se statistiky přepočítají celé (zpětné změny vyloučení/převodů)
+REBUILD_AFTER = timedelta(days=7)
+
+# 17 sloupců na řádek — pod limitem 32767 parametrů asyncpg
+_INSERT_CHUNK = 1000
+
+
+def normalize_merchant(s: str) -> str:
+    """Grouping key from a counterparty/description string.
+
+    Strips date fragments and long reference numbers but keeps short digits
+    (O2, Trading 212) so the key stays a substring of the original text and
+    pattern matching keeps working.
+    """
+    s = (s or "").lower().strip()
+    s = re.sub(r"\b\d{1,2}\.\s?\d{1,2}\.(\s?\d{2,4})?\b", " ", s)  # 12.5.2026
+    s = re.sub(r"\d{4,}", " ", s)                                   # ref. čísla
+    s = re.sub(r"\s+", " ", s).strip()
+    return s[:60]
+
+
+@dataclass
+class MerchantStats:
+    key: str
+    display: str
+    charges: list[tuple[str, float]] = field(default_factory=list)  # vzestupně, bez duplicit
+    categories: Counter = field(default_factory=Counter)
+    # Odvozené — přepočítává score()
+    interval_histogram: dict[str, int] = field(default_factory=dict)
+    median_interval: Optional[float] = None
+    median_amount: Optional[float] = None
+    amount_consistency: Optional[float] = None
+    period: Optional[str] = None
+
+    def add(self, charges: Iterable[tuple[str, float]], categories: Counter) -> None:
+        self.charges = sorted(set(self.charges) | set(charges))
+        self.categories.update(categories)
+        self.score()
+
+    def score(self) -> None:
+        """Histogram intervalů, mediány a výsledná perioda z aktuálních plateb."""
+        self.interval_histogram = {}
+        self.median_interval = self.median_amount = self.amount_consistency = None
+        self.period = None
+        if not self.charges:
+            return
+
+        amounts = [a for _, a in self.charges]
+        self.median_amount = median(amounts)
+        tolerance = AMOUNT_TOLERANCE * self.median_amount
+        close = sum(1 for a in amounts if abs(a - self.median_amount) <= tolerance)
+        self.amount_consistency = close / len(amounts)
+
+        days = [date.fromisoformat(d).toordinal() for d, _ in self.charges]
+        intervals = [b - a for a, b in zip(days, days[1:]) if b > a]
+        if not intervals:
+            return
+        self.median_interval = median(intervals)
+        self.interval_histogram = {
+            band: sum(1 for i in intervals if lo <= i <= hi) for band, lo, hi, _ in DETECTION_BANDS
+        }
+
+        if self.median_amount <= 0 or self.amount_consistency < AMOUNT_CONSISTENCY:
+            return
+        for band, lo, hi, min_count in DETECTION_BANDS:
+            if lo <= self.median_interval <= hi and len(self.charges) >= min_count:
+                if self.interval_histogram[band] >= max(1, round(INTERVAL_CONSISTENCY * len(intervals))):
+                    self.period = band
+                    break
+
+    @property
+    def top_category(self) -> Optional[str]:
+        return max(self.categories, key=self.categories.get) if self.categories else None
+
+    def to_row(self, user_id: int) -> dict:
+        return {
+            "user_id": user_id,
+            "merchant_key": self.key,
+            "display": self.display,
+            "charges_json": json.dumps(self.charges),
+            "categories_json": json.dumps(self.categories, ensure_ascii=False),
+            "interval_histogram_json": json.dumps(self.interval_histogram),
+            "occurrences": len(self.charges),
+            "median_interval": self.median_interval,
+            "median_amount": self.median_amount,
+            "amount_consistency": self.amount_consistency,
+            "period": self.period,
+            "top_category": self.top_category,
+            "first_date": self.charges[0][0] if self.charges else None,
+            "last_date": self.charges[-1][0] if self.charges else None,
+            "last_amount": self.charges[-1][1] if self.charges else None,
+            "updated_at": utcnow(),
+        }
+
+    @classmethod
+    def from_model(cls, m: RecurringMerchantStatsModel) -> "MerchantStats":
+        stats = cls(
+            key=m.merchant_key,
+            display=m.display,
+            charges=[(d, a) for d, a in json.loads(m.charges_json)],
+            categories=Counter(json.loads(m.categories_json)),
+        )
+        stats.score()
+        return stats
+
+
+def group_charges(rows: Iterable[tuple]) -> dict[str, MerchantStats]:
+    """(date, description, amount, category, creditor_name) → statistiky per protistrana."""
+    groups: dict[str, tuple[str, set, Counter]] = {}
+    for tx_date, description, amount, category, creditor in rows:
+        creditor = (creditor or "").strip()
+        source = creditor if len(creditor) >= 3 else (description or "")
+        # Anchor grouping on the same primary token as charge matching uses, so
+        # rotating-descriptor merchants (city one month, phone number the
+        # next) form one group instead of being split into weak, under-the-
+        # threshold groups that never reach the occurrence minimum.
+        key = primary_token(normalize_merchant(source))
+        if len(key) < 3:
+            continue
+        display, charges, categories = groups.setdefault(key, (source.strip(), set(), Counter()))
+        try:
+            day = date.fromisoformat((tx_date or "")[:10]).isoformat()
+        except ValueError:
+            continue
+        charges.add((day, round(abs(amount), 2)))
+        if category:
+            categories[category] += 1
+
+    result = {}
+    for key, (display, charges, categories) in groups.items():
+        if not charges:
+            continue
+        stats = MerchantStats(key=key, display=display, charges=sorted(charges), categories=categories)
+        stats.score()
+        result[key] = stats
+    return result
+
+
+def _charge_rows_stmt(user_id: int, created_after: Optional[datetime], creditor):
+    stmt = select(
+        TransactionModel.date,
+        TransactionModel.description,
+        TransactionModel.amount,
+        TransactionModel.category,
+        creditor,
+        TransactionModel.created_at,
+    ).where(
+        TransactionModel.user_id == user_id,
+        TransactionModel.account_type == "bank",
+        TransactionModel.amount < 0,
+        TransactionModel.is_excluded.is_(False),
+        TransactionModel.transaction_type == "normal",
+    )
+    if created_after is not None:
+        stmt = stmt.where(TransactionModel.created_at > created_after)
+    return stmt
+
+
+def creditor_name(raw_json: Optional[str]) -> Optional[str]:
+    """creditorName z raw_json; nečitelný JSON → None (platba se seskupí podle popisu)."""
+    try:
+        raw = json.loads(raw_json) if raw_json else None
+    except ValueError:
+        return None
+    name = raw.get("creditorName") if isinstance(raw, dict) else None
+    return name if isinstance(name, str) else None
+
+
+async def _load_charge_rows(
+    db: AsyncSession, user_id: int, created_after: Optional[datetime],
+) -> tuple[list[tuple], Optional[datetime]]:
+    """Odchozí platby (volitelně jen přidané po `created_after`) + nejnovější created_at."""
+    creditor = cast(TransactionModel.raw_json, JSONB)["creditorName"].astext
+    try:
+        # Savepoint — stav detektoru načtený v téže transakci zůstane platný
+        async with db.begin_nested():
+            rows = (await db.execute(_charge_rows_stmt(user_id, created_after, creditor))).all()
+    except DBAPIError as e:
+        logger.warning(
+            "Recurring detector: raw_json rejected by jsonb (%s), parsing in Python", e.orig,
+            extra={"event": "recurring_detection.json_fallback", "user_id": user_id},
+        )
+        result = await db.stream(
+            _charge_rows_stmt(user_id, created_after, TransactionModel.raw_json)
+            .execution_options(yield_per=2000)
+        )
+        rows = [(*r[:4], creditor_name(r[4]), r[5]) async for r in result]
+    newest = max((r[5] for r in rows if r[5] is not None), default=None)
+    return [tuple(r[:5]) for r in rows], newest
+
+
+async def _upsert_stats(db: AsyncSession, user_id: int, stats: Iterable[MerchantStats]) -> None:
+    rows = [s.to_row(user_id) for s in stats]
+    for i in range(0, len(rows), _INSERT_CHUNK):
+        stmt = pg_insert(RecurringMerchantStatsModel).values(rows[i:i + _INSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_recurring_stats_user_key",
+            set_={col: stmt.excluded[col] for col in rows[0] if col not in ("user_id", "merchant_key")},
+        )
+        await db.execute(stmt)
+
+
+async def _detector_state(db: AsyncSession, user_id: int) -> tuple[RecurringDetectorStateModel, bool]:
+    """Stav detektoru uživatele; první běh ho založí přes ON CONFLICT DO NOTHING
+    (souběžné syncy nespadnou na primárním klíči). Vrací (stav, nový)."""
+    state = await db.get(RecurringDetectorStateModel, user_id)
+    if state is not None:
+        return state, False
+    created = (await db.execute(
+        pg_insert(RecurringDetectorStateModel)
+        .values(user_id=user_id, rebuilt_at=utcnow())
+        .on_conflict_do_nothing(index_elements=["user_id"])
+        .returning(RecurringDetectorStateModel.user_id)
+    )).first()
+    state = await db.get(RecurringDetectorStateModel, user_id, populate_existing=True)
+    return state, created is not None
+
+
+async def refresh_recurring_stats(db: AsyncSession, user_id: int, full: bool = False) -> int:
+    """Dotáhne statistiky o nové transakce (nebo je přepočítá celé). Commituje.
+    Vrací počet přepočítaných protistran."""
+    state, created = await _detector_state(db, user_id)
+    now = utcnow()
+    full = full or created or now - state.rebuilt_at > REBUILD_AFTER
+
+    if full:
+        rows, newest = await _load_charge_rows(db, user_id, None)
+        groups = await run_cpu(group_charges, rows)
+        await db.execute(
+            delete(RecurringMerchantStatsModel).where(RecurringMerchantStatsModel.user_id == user_id)
+        )
+        await _upsert_stats(db, user_id, groups.values())
+        state.rebuilt_at = now
+        state.last_tx_created_at = newest
+        touched = len(groups)
+    else:
+        rows, newest = await _load_charge_rows(db, user_id, state.last_tx_created_at)
+        if not rows:
+            return 0
+        new_groups = await run_cpu(group_charges, rows)
+        existing = await db.execute(
+            select(RecurringMerchantStatsModel).where(
+                RecurringMerchantStatsModel.user_id == user_id,
+                RecurringMerchantStatsModel.merchant_key.in_(list(new_groups)),
+            )
+        )
+        merged = {m.merchant_key: MerchantStats.from_model(m) for m in existing.scalars()}
+        for key, fresh in new_groups.items():
+            if key in merged:
+                merged[key].add(fresh.charges, fresh.categories)
+            else:
+                merged[key] = fresh
+        await _upsert_stats(db, user_id, merged.values())
+        if newest is not None:
+            state.last_tx_created_at = max(newest, state.last_tx_created_at or newest)
+        touched = len(merged)
+
+    await db.commit()
+    logger.info(
+        "Recurring detector for user %s: %s, %d merchant(s) rescored",
+        user_id, "full rebuild" if full else "incremental", touched,
+        extra={"event": "recurring_detection.refreshed", "user_id": user_id, "full": full, "merchants": touched},
+    )
+    return touched
+
+
+async def load_recurring_candidates(db: AsyncSession, user_id: int) -> list[RecurringMerchantStatsModel]:
+    """Protistrany, které vypadají jako předplatné (period IS NOT NULL) z uložených
+    statistik (dotahuje je sync). Jen čte; seznam plateb se nenačítá."""
+    result = await db.execute(
+        select(RecurringMerchantStatsModel)
+        .options(
+            defer(RecurringMerchantStatsModel.charges_json),
+            defer(RecurringMerchantStatsModel.categories_json),
+            defer(RecurringMerchantStatsModel.interval_histogram_json),
+        )
+        .where(
+            RecurringMerchantStatsModel.user_id == user_id,
+            RecurringMerchantStatsModel.period.is_not(None),
+        )
+    )
+    return list(result.scalars())
@@ -4,10 +4,47 @@ Pravidlo = pattern (podřetězec popisu / protistrany / IBANu) + moje část
 (procentem nebo pevnou částkou). Sync jím při INSERTu nové transakce rovnou
 vyplní `my_share_amount`, takže nájem/energie se dělí samy. Ruční hodnoty se
 nikdy nepřepisují — pravidla se aplikují jen tam, kde `my_share_amount` chybí.
+
+Pravidla uživatele se zkompilují jednou (jeden regex přes všechny patterny,
+cache podle sady patternů) — transakce se neprochází pravidlo po pravidle.
+Když sedí víc pravidel, vyhrává delší (specifičtější) pattern, při shodě
+starší pravidlo — stejně jako RULE_ORDER u kategorií, jen deterministicky.
+
+Zpětné použití nového pravidla je jeden UPDATE … RETURNING nad stejnými
+poli raw_json, ze kterých se skládá haystack při syncu. Když jsonb některý
+raw_json odmítne (rozbitý JSON, \\u0000), páruje se v Pythonu a UPDATE jde
+po dávkách id.
 """
-from typing import Optional
+import json
+import logging
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from sqlalchemy import Float, Numeric, and_, case, cast, func, literal, not_, or_, select, update
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import ShareRuleModel, TransactionModel
+from services.subscription_matching import MultiPatternMatcher
 
-from models import ShareRuleModel
+logger = logging.getLogger(__name__)
+
+# Dávka id pro UPDATE v záložní cestě — pod limitem 32767 parametrů asyncpg
+_UPDATE_CHUNK = 5000
+
+# Pořadí pravidel: delší pattern první, při shodě starší pravidlo
+SHARE_RULE_ORDER = (func.length(ShareRuleModel.pattern).desc(), ShareRuleModel.id)
+
+# Pole transakce, ze kterých se skládá haystack (v tomto pořadí)
+_HAYSTACK_FIELDS = (
+    ("remittanceInformationUnstructured",),
+    ("remittanceInformationStructured",),
+    ("creditorName",),
+    ("debtorName",),
+    ("creditorAccount", "iban"),
+    ("debtorAccount", "iban"),
+)
 
 
 def haystack_from_tx_dict(tx: dict) -> str:
@@ -23,6 +60,39 @@ def haystack_from_tx_dict(tx: dict) -> str:
     return " ".join(str(p) for p in parts).lower()
 
 
+def haystack_sql():
+    """SQL obdoba haystack_from_tx_dict nad transactions.raw_json (+ popis
+    pro transakce bez raw_json)."""
+    raw = cast(TransactionModel.raw_json, JSONB)
+    parts = []
+    for path in _HAYSTACK_FIELDS:
+        node = raw[path[0]] if len(path) == 1 else raw[path]  # ->> / #>>
+        parts.append(func.coalesce(node.astext, ""))
+    parts.append(func.coalesce(TransactionModel.description, ""))
+    return func.lower(func.concat_ws(" ", *parts))
+
+
+def haystack_from_raw_json(raw_json: Optional[str], description: Optional[str]) -> str:
+    """Python obdoba haystack_sql; nečitelný raw_json se bere jako prázdný."""
+    try:
+        raw = json.loads(raw_json) if raw_json else {}
+    except ValueError:
+        raw = {}
+    parts = []
+    for path in _HAYSTACK_FIELDS:
+        node = raw
+        for key in path:
+            node = node.get(key) if isinstance(node, dict) else None
+        parts.append("" if node is None else str(node))
+    parts.append(description or "")
+    return " ".join(parts).lower()
+
+
+def rule_sort_key(rule: ShareRuleModel) -> tuple:
+    """Python obdoba SHARE_RULE_ORDER (nové pravidlo bez id jde za stejně dlouhá)."""
+    return (-len(rule.pattern or ""), rule.id if rule.id is not None else float("inf"))
+
+
 def compute_my_share(amount: float, rule: ShareRuleModel) -> Optional[float]:
     """Moje část výdaje podle pravidla; nikdy víc než plná částka."""
     full = abs(amount)
@@ -33,12 +103,119 @@ def compute_my_share(amount: float, rule: ShareRuleModel) -> Optional[float]:
     return None
 
 
+@lru_cache(maxsize=256)
+def _compile(patterns: tuple[str, ...]) -> MultiPatternMatcher:
+    return MultiPatternMatcher(patterns)
+
+
+class ShareRuleMatcher:
+    """Aktivní pravidla uživatele zkompilovaná do jednoho matcheru."""
+
+    def __init__(self, rules: Iterable[ShareRuleModel]):
+        active = sorted((r for r in rules if r.is_active and r.pattern), key=rule_sort_key)
+        self._rank: dict[str, tuple[int, ShareRuleModel]] = {}
+        for i, rule in enumerate(active):
+            self._rank.setdefault(rule.pattern, (i, rule))
+        self._matcher = _compile(tuple(sorted(self._rank)))
+
+    def __bool__(self) -> bool:
+        return bool(self._rank)
+
+    def match(self, tx_dict: dict, amount: float) -> Optional[ShareRuleModel]:
+        """Nejspecifičtější pravidlo odpovídající transakci — jen pro výdaje."""
+        if amount >= 0 or not self._rank:
+            return None
+        found = self._matcher.find(haystack_from_tx_dict(tx_dict))
+        if not found:
+            return None
+        return min((self._rank[p] for p in found), key=lambda r: r[0])[1]
+
+
 def match_share_rule(tx_dict: dict, amount: float, rules) -> Optional[ShareRuleModel]:
-    """První aktivní pravidlo odpovídající transakci — jen pro výdaje."""
+    """Nejspecifičtější aktivní pravidlo odpovídající transakci — jen pro výdaje.
+    Pro víc transakcí najednou je levnější postavit ShareRuleMatcher jednou."""
     if amount >= 0 or not rules:
         return None
-    haystack = haystack_from_tx_dict(tx_dict)
-    for rule in rules:
-        if rule.is_active and rule.pattern and rule.pattern in haystack:
-            return rule
-    return None
+    if not isinstance(rules, ShareRuleMatcher):
+        rules = ShareRuleMatcher(rules)
+    return rules.match(tx_dict, amount)
+
+
+def _my_share_sql(rule: ShareRuleModel):
+    full = func.abs(TransactionModel.amount)
+    if rule.my_amount_override is not None:
+        value = func.least(literal(rule.my_amount_override, Float), full)
+    else:
+        value = full * literal(rule.my_percentage, Float) / 100.0
+    # round(double precision, int) v Postgresu není — přes numeric
+    return cast(func.round(cast(value, Numeric), 2), Float)
+
+
+def _fill_if_empty(column, value: str):
+    return case((func.coalesce(column, "") == "", value), else_=column)
+
+
+async def _matching_ids_python(db: AsyncSession, conditions: list, pattern: str, stronger: list[str]) -> list[str]:
+    """Záloha pro historii s řádky, které jsonb odmítne — haystack v Pythonu."""
+    result = await db.stream(
+        select(TransactionModel.id, TransactionModel.raw_json, TransactionModel.description)
+        .where(and_(*conditions))
+        .execution_options(yield_per=2000)
+    )
+    ids = []
+    async for tx_id, raw_json, description in result:
+        haystack = haystack_from_raw_json(raw_json, description)
+        if pattern in haystack and not any(p in haystack for p in stronger):
+            ids.append(tx_id)
+    return ids
+
+
+async def apply_share_rule_retroactively(
+    db: AsyncSession, user_id: int, rule: ShareRuleModel, other_rules: Iterable[ShareRuleModel] = (),
+) -> int:
+    """Vyplní my_share_amount existujícím výdajům odpovídajícím pravidlu
+    jedním UPDATE. Přeskočí výdaje, na které sedí specifičtější aktivní
+    pravidlo (to by vyhrálo i při syncu). Pravidlo bez procenta i pevné
+    částky nic nevyplní. Necommituje. Vrací počet řádků."""
+    if rule.my_amount_override is None and rule.my_percentage is None:
+        return 0
+    haystack = haystack_sql()
+    own_key = rule_sort_key(rule)
+    stronger = [
+        r.pattern for r in other_rules
+        if r.is_active and r.pattern and r.pattern != rule.pattern and rule_sort_key(r) < own_key
+    ]
+    base = [
+        TransactionModel.user_id == user_id,
+        TransactionModel.account_type == "bank",
+        TransactionModel.amount < 0,
+        TransactionModel.transaction_type == "normal",
+        TransactionModel.is_excluded.isnot(True),
+        TransactionModel.settlement_flag.isnot(True),
+        TransactionModel.my_share_amount.is_(None),
+    ]
+    conditions = [*base, haystack.contains(rule.pattern, autoescape=True)]
+    if stronger:
+        conditions.append(not_(or_(*(haystack.contains(p, autoescape=True) for p in stronger))))
+    values = {"my_share_amount": _my_share_sql(rule)}
+    if rule.counterparty:
+        values["share_counterparty"] = _fill_if_empty(TransactionModel.share_counterparty, rule.counterparty)
+    if rule.note:
+        values["settlement_note"] = _fill_if_empty(TransactionModel.settlement_note, rule.note)
+    stmt = update(TransactionModel).values(**values).returning(TransactionModel.id)
+    stmt = stmt.execution_options(synchronize_session=False)
+    try:
+        # Savepoint — pravidlo flushnuté v téže transakci zůstane
+        async with db.begin_nested():
+            return len((await db.execute(stmt.where(and_(*conditions)))).all())
+    except DBAPIError as e:
+        logger.warning(
+            "Share rule: raw_json rejected by jsonb (%s), matching in Python", e.orig,
+            extra={"event": "share_rules.retro_fallback", "user_id": user_id},
+        )
+    ids = await _matching_ids_python(db, base, rule.pattern, stronger)
+    updated = 0
+    for i in range(0, len(ids), _UPDATE_CHUNK):
+        chunk = ids[i:i + _UPDATE_CHUNK]
+        updated += len((await db.execute(stmt.where(*base, TransactionModel.id.in_(chunk)))).all())
+    return updated
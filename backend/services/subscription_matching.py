@@ -0,0 +1,390 @@
+"""Párování transakcí na předplatná — jeden dotaz pro všechna předplatná.
+
+Předplatné je definované patternem; jeho platby jsou odchozí bankovní
+transakce, jejichž popis nebo raw_json obsahuje primární token patternu
+(příspěvky ostatních stejně přes contribution_pattern u příchozích).
+
+Textové párování běží jen při zápisu: všechny tokeny uživatele se složí do
+jednoho regexu, databáze jím v jediném dotazu předfiltruje kandidáty a
+v paměti se každá transakce jedním průchodem přiřadí všem předplatným,
+jejichž token obsahuje. Výsledek se ukládá do subscription_transactions —
+při syncu jen pro nově stažené transakce, po vytvoření předplatného nebo
+změně patternu (POST/PATCH) celý znovu. Předplatná z doby před migrací 0029
+(links_built_at = NULL) dopočítá úkol z lifespanu a případně sync
+(build_missing_links).
+
+Čtení (Předplatná, měsíční rozpočet, cashflow) je pak indexovaný join přes
+vazby s limitem plateb na předplatné, žádné hledání v textu — nic nezapisuje.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, NamedTuple, Optional
+
+from sqlalchemy import and_, delete, distinct, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import background_session_maker
+from models import SubscriptionModel, SubscriptionTransactionModel, TransactionModel
+from services.timefmt import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Kolik posledních plateb / příspěvků se na předplatné načítá pro stránku Předplatná
+CHARGE_LIMIT = 120
+CONTRIBUTION_LIMIT = 24
+
+# asyncpg má limit 32767 parametrů na statement
+_CHUNK = 5000
+
+# Card/transfer descriptors often rotate a secondary detail between charges —
+# a city one month, a phone/reference number the next — while the brand name
+# itself stays put (e.g. "NETFLIX.COM Amsterdam NL" vs "NETFLIX.COM
+# 408-724-9160 NL"). Matching the whole descriptor as one substring silently
+# drops every charge that used the "other" variant. Anchoring on just the
+# single most distinctive token survives that rotation.
+_PURE_DIGIT_HYPHEN_RE = re.compile(r"^[\d\-]+$")
+_GEO_CODE_RE = re.compile(r"^[a-z]{2}$")
+_COMMON_GEO_WORDS = {
+    "amsterdam", "prague", "praha", "london", "dublin", "berlin",
+    "luxembourg", "paris", "madrid", "vienna", "wien", "zurich",
+    "bratislava", "warszawa", "warsaw", "budapest", "brno", "ostrava",
+}
+
+# Znaky se zvláštním významem v regexu — escapují se tak, aby výsledný vzor
+# platil stejně v Pythonu i v Postgresu (ARE: „\" + nealfanumerický znak =
+# literál). re.escape by escapoval i mezery a diakritiku, což ARE neumí.
+_REGEX_SPECIAL = set("\\.^$|?*+()[]{}")
+
+
+def primary_token(text: str) -> str:
+    """Extract the single most distinctive token from a merchant pattern.
+
+    Picks the longest token that isn't a country code, a digit/reference
+    group, or a common city name. Falls back to the original text if nothing
+    survives the filter (e.g. a pattern that's just a country code).
+    """
+    tokens = [t for t in re.split(r"[^a-z0-9.\-]+", text.lower()) if t]
+    candidates = [
+        t for t in tokens
+        if len(t) >= 4
+        and not _PURE_DIGIT_HYPHEN_RE.match(t)
+        and not _GEO_CODE_RE.match(t)
+        and t not in _COMMON_GEO_WORDS
+    ]
+    return max(candidates, key=len) if candidates else text
+
+
+def regex_escape(needle: str) -> str:
+    return "".join(f"\\{c}" if c in _REGEX_SPECIAL else c for c in needle)
+
+
+class MultiPatternMatcher:
+    """Najde všechny needles (lowercase podřetězce) obsažené v textu jedním průchodem.
+
+    Alternace nejdelší-první uvnitř lookaheadu najde na každé pozici nejdelší
+    needle; kratší needles začínající na stejné pozici (jeho prefixy) se
+    doplní z předpočítané tabulky — výsledek je tedy totožný s testem
+    `needle in text` pro každý needle zvlášť.
+    """
+
+    def __init__(self, needles: Iterable[str]):
+        self.needles = sorted({n for n in needles if n}, key=lambda n: (-len(n), n))
+        self.alternation = "|".join(regex_escape(n) for n in self.needles)
+        self._regex = re.compile(f"(?=({self.alternation}))") if self.needles else None
+        self._prefixes = {
+            n: [p for p in self.needles if n.startswith(p)] for n in self.needles
+        }
+
+    def __bool__(self) -> bool:
+        return bool(self.needles)
+
+    def find(self, text: str) -> set[str]:
+        if self._regex is None or not text:
+            return set()
+        found: set[str] = set()
+        for m in self._regex.finditer(text.lower()):
+            found.update(self._prefixes[m.group(1)])
+        return found
+
+
+class MatchedTransaction(NamedTuple):
+    id: str
+    date: str
+    amount: float  # kladná částka (u plateb absolutní hodnota)
+
+
+@dataclass
+class SubscriptionMatch:
+    charges: list[MatchedTransaction] = field(default_factory=list)        # nejnovější první
+    contributions: list[MatchedTransaction] = field(default_factory=list)  # nejnovější první
+
+    def charge_pairs(self) -> list[tuple[str, float]]:
+        return [(c.date, c.amount) for c in self.charges]
+
+    def contribution_pairs(self) -> list[tuple[str, float]]:
+        return [(c.date, c.amount) for c in self.contributions]
+
+
+def _charge_needle(sub: SubscriptionModel) -> str:
+    return primary_token(sub.merchant_pattern).lower()
+
+
+def _contribution_needle(sub: SubscriptionModel) -> str:
+    return (sub.contribution_pattern or "").lower().strip()
+
+
+def match_subscriptions(
+    subs: list[SubscriptionModel],
+    rows: Iterable[tuple],
+    charge_limit: Optional[int] = CHARGE_LIMIT,
+    contribution_limit: Optional[int] = CONTRIBUTION_LIMIT,
+) -> dict[int, SubscriptionMatch]:
+    """Přiřadí transakce předplatným (čistá funkce, bez DB).
+
+    `rows` = (id, date, amount, description, raw_json, is_excluded) seřazené
+    od nejnovější. Platba = amount < 0 a ne vyloučená transakce, příspěvek =
+    amount > 0. Jedna transakce může patřit víc předplatným. Limit None =
+    všechny shody (plnění vazeb).
+    """
+    by_charge: dict[str, list[int]] = {}
+    by_contribution: dict[str, list[int]] = {}
+    for sub in subs:
+        by_charge.setdefault(_charge_needle(sub), []).append(sub.id)
+        needle = _contribution_needle(sub)
+        if needle:
+            by_contribution.setdefault(needle, []).append(sub.id)
+
+    charge_matcher = MultiPatternMatcher(by_charge)
+    contribution_matcher = MultiPatternMatcher(by_contribution)
+    result = {sub.id: SubscriptionMatch() for sub in subs}
+
+    for tx_id, tx_date, amount, description, raw_json, is_excluded in rows:
+        if amount < 0 and not is_excluded:
+            matcher, index, limit, attr = charge_matcher, by_charge, charge_limit, "charges"
+        elif amount > 0:
+            matcher, index, limit, attr = contribution_matcher, by_contribution, contribution_limit, "contributions"
+        else:
+            continue
+        if not matcher:
+            continue
+        text = f"{description or ''}\n{raw_json or ''}"
+        for needle in matcher.find(text):
+            for sub_id in index[needle]:
+                bucket = getattr(result[sub_id], attr)
+                if limit is None or len(bucket) < limit:
+                    bucket.append(MatchedTransaction(tx_id, tx_date, round(abs(amount), 2)))
+    return result
+
+
+async def scan_subscription_matches(
+    db: AsyncSession,
+    user_id: int,
+    subs: list[SubscriptionModel],
+    tx_ids: Optional[list[str]] = None,
+) -> dict[int, SubscriptionMatch]:
+    """Textové párování jedním dotazem — všechny shody (bez limitů).
+
+    `tx_ids` omezí hledání na dané transakce (sync), jinak celá historie.
+    Databáze předfiltruje kandidáty regexem ze všech tokenů (~*), přesné
+    přiřazení k předplatným proběhne v paměti přes `match_subscriptions`.
+    """
+    if not subs:
+        return {}
+    needles = {_charge_needle(sub) for sub in subs}
+    needles.update(n for n in (_contribution_needle(sub) for sub in subs) if n)
+    prefilter = MultiPatternMatcher(needles).alternation
+    if not prefilter:
+        return {sub.id: SubscriptionMatch() for sub in subs}
+
+    stmt = (
+        select(
+            TransactionModel.id,
+            TransactionModel.date,
+            TransactionModel.amount,
+            TransactionModel.description,
+            TransactionModel.raw_json,
+            TransactionModel.is_excluded,
+        )
+        .where(
+            TransactionModel.user_id == user_id,
+            TransactionModel.account_type == "bank",
+            TransactionModel.amount != 0,
+            or_(
+                TransactionModel.description.op("~*")(prefilter),
+                TransactionModel.raw_json.op("~*")(prefilter),
+            ),
+        )
+        .order_by(TransactionModel.date.desc())
+    )
+    if tx_ids is not None:
+        stmt = stmt.where(TransactionModel.id.in_(tx_ids))
+    rows = (await db.execute(stmt)).all()
+    # Vyloučení transakce se může později změnit → vazba vzniká vždy,
+    # filtr is_excluded se aplikuje až při čtení.
+    rows = [(tx_id, d, amount, desc, raw, False) for tx_id, d, amount, desc, raw, _ in rows]
+    return match_subscriptions(subs, rows, charge_limit=None, contribution_limit=None)
+
+
+def link_rows(matches: dict[int, SubscriptionMatch]) -> list[dict]:
+    """Řádky subscription_transactions z výsledku párování."""
+    rows = []
+    for sub_id, match in matches.items():
+        rows.extend({"subscription_id": sub_id, "kind": "charge", "transaction_id": c.id} for c in match.charges)
+        rows.extend(
+            {"subscription_id": sub_id, "kind": "contribution", "transaction_id": c.id}
+            for c in match.contributions
+        )
+    return rows
+
+
+async def _insert_links(db: AsyncSession, rows: list[dict]) -> None:
+    for i in range(0, len(rows), _CHUNK):
+        stmt = pg_insert(SubscriptionTransactionModel).values(rows[i:i + _CHUNK])
+        await db.execute(stmt.on_conflict_do_nothing())
+
+
+async def rebuild_links(db: AsyncSession, user_id: int, subs: list[SubscriptionModel]) -> int:
+    """Přepočítá všechny vazby `subs` nad celou historií (nové předplatné,
+    změněný pattern). Necommituje. Vrací počet vazeb."""
+    if not subs:
+        return 0
+    sub_ids = [sub.id for sub in subs]
+    await db.execute(
+        delete(SubscriptionTransactionModel).where(SubscriptionTransactionModel.subscription_id.in_(sub_ids))
+    )
+    rows = link_rows(await scan_subscription_matches(db, user_id, subs))
+    await _insert_links(db, rows)
+    now = utcnow()
+    for sub in subs:
+        sub.links_built_at = now
+    return len(rows)
+
+
+async def build_missing_links(db: AsyncSession, user_id: int) -> int:
+    """Dopočítá vazby předplatným uživatele, která je ještě nemají
+    (links_built_at NULL — z doby před migrací 0029). Řádky se zamknou
+    (SKIP LOCKED), takže souběžný sync a úkol z lifespanu nepočítají totéž.
+    Commituje. Vrací počet dopočtených předplatných."""
+    subs = list((await db.execute(
+        select(SubscriptionModel)
+        .where(SubscriptionModel.user_id == user_id, SubscriptionModel.links_built_at.is_(None))
+        .with_for_update(skip_locked=True)
+    )).scalars())
+    if subs:
+        await rebuild_links(db, user_id, subs)
+    await db.commit()
+    return len(subs)
+
+
+async def backfill_missing_links() -> None:
+    """Jednorázový úkol z lifespanu — vazby všech předplatných bez
+    links_built_at, aby je čtení (Předplatná, cashflow, rozpočet) nemuselo
+    dopočítávat. Chyba jen zaloguje, zbytek dořeší sync."""
+    try:
+        async with background_session_maker() as db:
+            user_ids = list((await db.execute(
+                select(distinct(SubscriptionModel.user_id)).where(SubscriptionModel.links_built_at.is_(None))
+            )).scalars())
+            built = 0
+            for user_id in user_ids:
+                built += await build_missing_links(db, user_id)
+        if built:
+            logger.info(
+                "Subscription links built for %d subscription(s) of %d user(s)", built, len(user_ids),
+                extra={"event": "subscriptions.links_backfilled", "subscriptions": built, "users": len(user_ids)},
+            )
+    except Exception as e:
+        logger.warning(f"Subscription links backfill failed: {e}")
+
+
+async def link_new_transactions(db: AsyncSession, user_id: int, tx_ids: list[str]) -> int:
+    """Sync: přiřadí právě upsertnuté transakce předplatným uživatele.
+
+    Vazby těchto transakcí se nejdřív smažou — upsert mohl změnit popis,
+    takže platí jen aktuální shoda. Commituje. Vrací počet vazeb."""
+    if not tx_ids:
+        return 0
+    subs = list((await db.execute(
+        select(SubscriptionModel).where(SubscriptionModel.user_id == user_id)
+    )).scalars())
+    if not subs:
+        return 0
+
+    rows: list[dict] = []
+    for i in range(0, len(tx_ids), _CHUNK):
+        chunk = tx_ids[i:i + _CHUNK]
+        await db.execute(
+            delete(SubscriptionTransactionModel).where(SubscriptionTransactionModel.transaction_id.in_(chunk))
+        )
+        rows.extend(link_rows(await scan_subscription_matches(db, user_id, subs, tx_ids=chunk)))
+    await _insert_links(db, rows)
+    await db.commit()
+    return len(rows)
+
+
+def group_linked_rows(sub_ids: Iterable[int], rows: Iterable[tuple]) -> dict[int, SubscriptionMatch]:
+    """(subscription_id, kind, tx_id, date, amount) nejnovější první → SubscriptionMatch per předplatné."""
+    result = {sub_id: SubscriptionMatch() for sub_id in sub_ids}
+    for sub_id, kind, tx_id, tx_date, amount in rows:
+        bucket = result[sub_id].charges if kind == "charge" else result[sub_id].contributions
+        bucket.append(MatchedTransaction(tx_id, tx_date, round(abs(amount), 2)))
+    return result
+
+
+async def load_subscription_matches(
+    db: AsyncSession,
+    user_id: int,
+    subs: list[SubscriptionModel],
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    with_contributions: bool = True,
+    charge_limit: int = CHARGE_LIMIT,
+    contribution_limit: int = CONTRIBUTION_LIMIT,
+) -> dict[int, SubscriptionMatch]:
+    """Platby (a příspěvky) všech `subs` jedním dotazem přes uložené vazby.
+
+    Okno dat: date_from včetně, date_to exkluzivně (None = bez omezení).
+    Na předplatné se vrací nejvýš `charge_limit` nejnovějších plateb
+    (vyloučené transakce se nepočítají) a `contribution_limit` příspěvků.
+    Jen čte — vazby zapisuje sync, POST/PATCH předplatného a build_missing_links.
+    """
+    if not subs:
+        return {}
+
+    link = SubscriptionTransactionModel
+    rank = func.row_number().over(
+        partition_by=(link.subscription_id, link.kind),
+        order_by=(TransactionModel.date.desc(), TransactionModel.id.desc()),
+    )
+    ranked = (
+        select(
+            link.subscription_id, link.kind,
+            TransactionModel.id.label("tx_id"), TransactionModel.date, TransactionModel.amount,
+            rank.label("rn"),
+        )
+        .join(TransactionModel, TransactionModel.id == link.transaction_id)
+        .where(
+            link.subscription_id.in_([sub.id for sub in subs]),
+            TransactionModel.user_id == user_id,
+            or_(link.kind == "contribution", TransactionModel.is_excluded.is_(False)),
+        )
+    )
+    if not with_contributions:
+        ranked = ranked.where(link.kind == "charge")
+    if date_from:
+        ranked = ranked.where(TransactionModel.date >= date_from)
+    if date_to:
+        ranked = ranked.where(TransactionModel.date < date_to)
+    ranked = ranked.subquery()
+
+    stmt = (
+        select(ranked.c.subscription_id, ranked.c.kind, ranked.c.tx_id, ranked.c.date, ranked.c.amount)
+        .where(or_(
+            and_(ranked.c.kind == "charge", ranked.c.rn <= charge_limit),
+            and_(ranked.c.kind == "contribution", ranked.c.rn <= contribution_limit),
+        ))
+        .order_by(ranked.c.date.desc(), ranked.c.tx_id.desc())
+    )
+    return group_linked_rows([sub.id for sub in subs], (await db.execute(stmt)).all())
@@ -0,0 +1,144 @@
+"""Profil jednoho běhu synchronizace po fázích.
+
+Dřív details_json běhu neslo jen `duration_ms` a status na účet — u syncu,
+který trval 90 s, nešlo říct, kolik z toho byla latence GoCardless, dump
+JSONu, kategorizace, upsert, pies Trading 212, detekce převodů nebo
+notifikace. Teď sync_all_data běží uvnitř `profile_sync()` a měří fáze
+(`bank.fetch`, `bank.parse`, `bank.categorize`, `bank.share_rules`,
+`bank.upsert`, `t212 /equity/pies/{id}`, `transfers`, `notify`, …) — čas,
+počet volání, položky a bajty. HTTP klienti GoCardless a Trading 212 hlásí
+každé volání přes `record_http` (ContextVar — mimo sync nic nedělá,
+platí i pro requesty z asyncio.gather).
+
+Výsledek se ukládá do details_json pod klíč "phases", /sync/history ho
+vrací u každého běhu a /sync/perf z posledních běhů počítá p50/p95 na fázi.
+"""
+import math
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional
+
+from services.tracing import span as trace_span
+
+_current: ContextVar[Optional["SyncProfile"]] = ContextVar("sync_profile", default=None)
+
+# Segment cesty s číslicí (UUID účtu GoCardless, id pie) → jeden název fáze
+# na endpoint; statické části cest obou API číslice neobsahují
+_PATH_IDS = re.compile(r"/[^/]*\d[^/]*(?=/|$)")
+
+
+@dataclass
+class Phase:
+    name: str
+    seconds: float = 0.0
+    calls: int = 0
+    items: int = 0
+    bytes: int = 0
+
+    def to_json(self) -> dict:
+        return {
+            "name": self.name,
+            "ms": round(self.seconds * 1000, 1),
+            "calls": self.calls,
+            "items": self.items,
+            "bytes": self.bytes,
+        }
+
+
+class SyncProfile:
+    """Fáze běhu v pořadí prvního výskytu; opakovaná fáze (fetch na každý
+    účet) se sčítá."""
+
+    def __init__(self):
+        self.phases: dict[str, Phase] = {}
+        self.started = time.perf_counter()
+
+    def add(self, name: str, seconds: float, items: int = 0, nbytes: int = 0, calls: int = 1) -> Phase:
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(name)
+        phase.seconds += seconds
+        phase.calls += calls
+        phase.items += items
+        phase.bytes += nbytes
+        return phase
+
+    @contextmanager
+    def span(self, name: str, items: int = 0, nbytes: int = 0) -> Iterator[Phase]:
+        """Změří blok; položky známé až uvnitř se přičtou přes `phase.items`.
+        Se zapnutým tracingem je blok zároveň span `sync.<name>`."""
+        phase = self.add(name, 0.0, items, nbytes)
+        started = time.perf_counter()
+        try:
+            with trace_span(f"sync.{name}"):
+                yield phase
+        finally:
+            phase.seconds += time.perf_counter() - started
+
+    def total_ms(self) -> float:
+        return round((time.perf_counter() - self.started) * 1000, 1)
+
+    def to_json(self) -> list[dict]:
+        return [phase.to_json() for phase in self.phases.values()]
+
+
+@contextmanager
+def profile_sync() -> Iterator[SyncProfile]:
+    profile = SyncProfile()
+    token = _current.set(profile)
+    try:
+        yield profile
+    finally:
+        _current.reset(token)
+
+
+def endpoint_template(path: str) -> str:
+    """`/accounts/<uuid>/transactions/` → `/accounts/{id}/transactions/`."""
+    return _PATH_IDS.sub("/{id}", path)
+
+
+def record_http(service: str, path: str, seconds: float, nbytes: int) -> None:
+    """Volá HTTP klient banky/brokera; mimo sync (ruční volání API) no-op."""
+    profile = _current.get()
+    if profile is not None:
+        profile.add(f"{service} {endpoint_template(path)}", seconds, items=1, nbytes=nbytes)
+
+
+def _percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentil (stejná metoda jako loadtest/driver.py)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize_phases(runs: Iterable[list[dict]]) -> list[dict]:
+    """Fáze z details_json více běhů → p50/p95/max času na fázi.
+
+    Fáze chybějící v některém běhu (např. bez Trading 212) se počítá jen
+    z běhů, kde proběhla (`runs` u výsledku). Řazeno od nejdražší p95.
+    """
+    samples: dict[str, list[dict]] = {}
+    for phases in runs:
+        for phase in phases or []:
+            name = phase.get("name")
+            if name:
+                samples.setdefault(name, []).append(phase)
+
+    summary = []
+    for name, entries in samples.items():
+        ms = sorted(float(p.get("ms") or 0) for p in entries)
+        summary.append({
+            "name": name,
+            "runs": len(entries),
+            "p50_ms": _percentile(ms, 50),
+            "p95_ms": _percentile(ms, 95),
+            "max_ms": ms[-1],
+            "avg_items": round(sum(p.get("items") or 0 for p in entries) / len(entries), 1),
+            "avg_bytes": round(sum(p.get("bytes") or 0 for p in entries) / len(entries)),
+        })
+    summary.sort(key=lambda s: s["p95_ms"], reverse=True)
+    return summary
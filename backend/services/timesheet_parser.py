@@ -11,8 +11,6 @@ import re
 from dataclasses import dataclass
 from typing import Optional
 
-from openpyxl import load_workbook
-
 WEEKEND_DAYNAMES = ("sobota", "neděle")
 
 # Noční pásmo 22:00–06:00 vyjádřené dvěma okny v dekadických hodinách od půlnoci.
@@ -101,6 +99,9 @@ def compute_fond_days(year_month: str) -> int:
 
 
 def parse_timesheet(file_bytes: bytes) -> TimesheetHours:
+    # Import až při prvním uploadu — openpyxl jinak přidává ~90 ms ke studenému startu
+    from openpyxl import load_workbook
+
     workbook = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
     sheet = workbook.worksheets[0]
 
@@ -0,0 +1,101 @@
+"""Volitelný OpenTelemetry tracing (FastAPI, SQLAlchemy, odchozí httpx).
+
+Pomalý /sync/ šlo dřív spojit s konkrétním voláním GoCardless nebo SQL
+dotazem jen ručním čtením logů. S OTEL_EXPORTER=otlp (lokální collector
+na OTEL_ENDPOINT, Jaeger/Tempo…) nebo OTEL_EXPORTER=console vznikne pro
+každý request trace: span routy FastAPI, pod ním SQL dotazy enginu
+z database.py a HTTP volání GoCardless / Trading 212 / Frankfurter (httpx
+instrumentace platí pro každý AsyncClient). Vlastní spany mají fáze syncu
+(services/sync_profile.py), kategorizace a detekce převodů. Logy vzniklé
+uvnitř spanu dostanou pole trace_id / span_id, takže se v Log Analytics dá
+skočit z logu na trace.
+
+Bez OTEL_EXPORTER (default) se nic z opentelemetry neimportuje a `span()`
+je prázdný context manager.
+"""
+import functools
+import logging
+from contextlib import nullcontext
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_tracer: Optional[Any] = None
+
+
+def span(name: str, **attributes):
+    """Vlastní span; bez zapnutého tracingu no-op."""
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def traced(name: str):
+    """Dekorátor pro async funkce — celé volání jako jeden span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class TraceContextLogFilter(logging.Filter):
+    """Přidá trace_id / span_id aktuálního spanu k záznamu logu."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        from opentelemetry import trace
+
+        context = trace.get_current_span().get_span_context()
+        if context.is_valid:
+            record.trace_id = format(context.trace_id, "032x")
+            record.span_id = format(context.span_id, "016x")
+        return True
+
+
+def _exporter(settings):
+    kind = settings.otel_exporter.lower()
+    if kind == "console":
+        from opentelemetry.sdk.trace.export import ConsoleSpanExporter
+        return ConsoleSpanExporter()
+    if kind == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        return OTLPSpanExporter(endpoint=f"{settings.otel_endpoint.rstrip('/')}/v1/traces")
+    raise ValueError(f"Unknown OTEL_EXPORTER '{settings.otel_exporter}' (expected otlp or console)")
+
+
+def setup_tracing(app, engines, settings) -> bool:
+    """Zapne tracing podle Settings; vrací False, když je vypnutý."""
+    global _tracer
+    if not settings.otel_exporter:
+        return False
+
+    from opentelemetry import trace
+    from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
+    from opentelemetry.instrumentation.httpx import HTTPXClientInstrumentor
+    from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": settings.otel_service_name}),
+        sampler=ParentBased(TraceIdRatioBased(settings.otel_sample_ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(_exporter(settings)))
+    trace.set_tracer_provider(provider)
+
+    # /metrics scrapuje Prometheus každých pár sekund — do traces nepatří
+    FastAPIInstrumentor.instrument_app(app, tracer_provider=provider, excluded_urls="metrics")
+    SQLAlchemyInstrumentor().instrument(engines=[e.sync_engine for e in engines], tracer_provider=provider)
+    HTTPXClientInstrumentor().instrument(tracer_provider=provider)
+
+    _tracer = trace.get_tracer("budget")
+    logger.info(
+        "OpenTelemetry tracing enabled (exporter=%s, sample_ratio=%s)",
+        settings.otel_exporter, settings.otel_sample_ratio,
+        extra={"event": "tracing.enabled", "exporter": settings.otel_exporter},
+    )
+    return True
@@ -1,11 +1,14 @@
+import time
+
 import httpx
 from typing import Optional, List
 from config import get_settings
+from services.sync_profile import record_http
 
 settings = get_settings()
 
-# Use live or demo based on API key
-BASE_URL = "https://live.trading212.com/api/v0"
+# Live API; demo nebo lokální náhrada přes TRADING212_BASE_URL
+BASE_URL = settings.trading212_base_url.rstrip("/")
 
 # Delší timeout než httpx default (5 s) — stejný důvod jako u GoCardless,
 # pomalá odpověď shazovala sync prázdným ReadTimeoutem.
@@ -34,12 +37,14 @@ class Trading212Service:
             raise Exception("Trading 212 API key not configured")
         
         async with httpx.AsyncClient(timeout=_HTTP_TIMEOUT) as client:
+            started = time.perf_counter()
             response = await client.request(
                 method,
                 f"{BASE_URL}{path}",
                 headers={"Authorization": api_key},
                 **kwargs
             )
+            record_http("t212", path, time.perf_counter() - started, len(response.content))
             response.raise_for_status()
             return response.json()
     
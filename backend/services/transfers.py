@@ -12,11 +12,65 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from models import AccountModel, ManualAccountModel, SettingsModel, TransactionModel
-from services.categorization import categorize_transaction, categorize_transaction_with_rules
+from services.categorization import categorize_transaction, categorize_with_preloaded_rules, load_category_rules
+from services.cpu_pool import run_cpu
+from services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
 
+def extract_account_number(value: str) -> set:
+    """Extract account number from IBAN, BBAN or plain account number"""
+    result = set()
+    if not value:
+        return result
+
+    value = value.upper().strip()
+    result.add(value)
+
+    if value.startswith("CZ") and len(value) == 24:
+        bank_code = value[4:8]
+        account_num = value[8:].lstrip("0")
+        result.add(account_num)
+        result.add(f"{account_num}/{bank_code}")
+
+    if "/" in value:
+        parts = value.split("/")
+        account_num = parts[0].lstrip("0")
+        result.add(account_num)
+        result.add(parts[0])
+
+    return result
+
+
+def parse_counterparties(rows: list[tuple[str, str | None]]) -> dict[str, tuple[set, set]]:
+    """(id, raw_json) → id: (identifikátory creditora, debtora).
+
+    Jeden json.loads na transakci pro všechny průchody detekce (dřív až tři)
+    — celá historie uživatele, proto běží v CPU poolu mimo event loop.
+    Nečitelný raw_json → prázdné množiny.
+    """
+    parsed: dict[str, tuple[set, set]] = {}
+    for tx_id, raw_json in rows:
+        creditor_ids: set = set()
+        debtor_ids: set = set()
+        try:
+            raw = json.loads(raw_json) if raw_json else {}
+            if isinstance(raw, dict):
+                creditor_acc = raw.get("creditorAccount") or {}
+                creditor_ids.update(extract_account_number(creditor_acc.get("iban", "") or ""))
+                creditor_ids.update(extract_account_number(creditor_acc.get("bban", "") or ""))
+                debtor_acc = raw.get("debtorAccount") or {}
+                debtor_ids.update(extract_account_number(debtor_acc.get("iban", "") or ""))
+                debtor_ids.update(extract_account_number(debtor_acc.get("bban", "") or ""))
+        except Exception as e:
+            logger.error(f"Error parsing raw_json for tx {tx_id}: {e}")
+        creditor_ids.discard("")
+        debtor_ids.discard("")
+        parsed[tx_id] = (creditor_ids, debtor_ids)
+    return parsed
+
+
 async def get_family_account_pattern(db: AsyncSession, user_id: int) -> str | None:
     """Get the configured family account pattern from settings"""
     result = await db.execute(
@@ -59,33 +113,11 @@ async def get_transfer_excluded_accounts(db: AsyncSession, user_id: int) -> list
     return []
 
 
+@traced("transfers.detect")
 async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
     """Detect and mark internal transfers based on creditor/debtor account matching.
     Also updates manual account balances when transfers to/from manual accounts are detected."""
 
-    def extract_account_number(value: str) -> set:
-        """Extract account number from IBAN, BBAN or plain account number"""
-        result = set()
-        if not value:
-            return result
-        
-        value = value.upper().strip()
-        result.add(value)
-        
-        if value.startswith("CZ") and len(value) == 24:
-            bank_code = value[4:8]
-            account_num = value[8:].lstrip("0")
-            result.add(account_num)
-            result.add(f"{account_num}/{bank_code}")
-        
-        if "/" in value:
-            parts = value.split("/")
-            account_num = parts[0].lstrip("0")
-            result.add(account_num)
-            result.add(parts[0])
-        
-        return result
-    
     # Build set of all my account identifiers (bank + manual)
     my_account_identifiers = set()
     # Identifikátory VLASTNÍHO účtu každé transakce — banka často pošle jen
@@ -141,18 +173,8 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
 
     def tx_counterparty_ids(tx) -> set:
         """All account identifiers (creditor + debtor) of a transaction."""
-        ids: set = set()
-        try:
-            raw = json.loads(tx.raw_json) if tx.raw_json else {}
-            if isinstance(raw, dict):
-                for side in ("creditorAccount", "debtorAccount"):
-                    acc = raw.get(side) or {}
-                    ids.update(extract_account_number(acc.get("iban", "") or ""))
-                    ids.update(extract_account_number(acc.get("bban", "") or ""))
-        except Exception:
-            pass
-        ids.discard("")
-        return ids
+        creditor_ids, debtor_ids = counterparties[tx.id]
+        return creditor_ids | debtor_ids
 
     logger.debug(f"My account identifiers for transfer detection: {my_account_identifiers}")
     logger.debug(f"My account text patterns: {my_account_patterns}")
@@ -167,6 +189,7 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
         )
     )
     transactions = tx_result.scalars().all()
+    counterparties = await run_cpu(parse_counterparties, [(tx.id, tx.raw_json) for tx in transactions])
     
     marked_internal = 0
     marked_family = 0
@@ -179,6 +202,7 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
     # expenses. Runs every detection, so the exclusion is self-healing even if a
     # category rule keeps re-labelling new payments on insert.
     if excluded_identifiers:
+        preloaded_rules = None  # načtou se jednou, až je poprvé potřeba
         for tx in transactions:
             if tx.user_excluded:
                 continue  # ruční vyřazení uživatele detekce nikdy nemění
@@ -196,8 +220,10 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
                     raw = json.loads(tx.raw_json) if tx.raw_json else {}
                 except Exception:
                     raw = {}
-                new_category = await categorize_transaction_with_rules(
-                    raw if isinstance(raw, dict) else {}, db, user_id
+                if preloaded_rules is None:
+                    preloaded_rules = await load_category_rules(db, user_id)
+                new_category = categorize_with_preloaded_rules(
+                    raw if isinstance(raw, dict) else {}, *preloaded_rules
                 )
                 # The whole point of this pass is to strip the transfer label —
                 # never let a rule re-apply it here.
@@ -241,23 +267,7 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
         
         # Check account number matching (creditor/debtor)
         try:
-                raw_data = json.loads(tx.raw_json)
-                
-                if not isinstance(raw_data, dict):
-                    continue
-                
-                creditor_acc = raw_data.get("creditorAccount") or {}
-                creditor_ids = set()
-                creditor_ids.update(extract_account_number(creditor_acc.get("iban", "")))
-                creditor_ids.update(extract_account_number(creditor_acc.get("bban", "")))
-                
-                debtor_acc = raw_data.get("debtorAccount") or {}
-                debtor_ids = set()
-                debtor_ids.update(extract_account_number(debtor_acc.get("iban", "")))
-                debtor_ids.update(extract_account_number(debtor_acc.get("bban", "")))
-
-                creditor_ids.discard("")
-                debtor_ids.discard("")
+                creditor_ids, debtor_ids = counterparties[tx.id]
 
                 if not creditor_ids and not debtor_ids:
                     continue
@@ -320,6 +330,13 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
         t for t in transactions
         if t.transaction_type == "internal_transfer" and not t.user_excluded
     ]
+    # Nohy podle částky v haléřích — dřív se pro každou jednostrannou
+    # transakci procházely všechny nohy (O(n × nohy), sekundy blokovaného
+    # loopu u delší historie). Tolerance 0,01 + zaokrouhlení → koše ±2 haléře,
+    # kandidáti v původním pořadí pair_legs (stejná noha vyhraje jako dřív).
+    legs_by_cents: dict[int, list[tuple[int, TransactionModel]]] = {}
+    for i, leg in enumerate(pair_legs):
+        legs_by_cents.setdefault(round(float(leg.amount) * 100), []).append((i, leg))
     used_leg_ids: set = set()
     for tx in transactions:
         if tx.user_excluded or tx.is_excluded or tx.transaction_type != "normal":
@@ -330,7 +347,12 @@ async def detect_and_mark_transfers(db: AsyncSession, user_id: int):
         tx_dt = _tx_date(tx)
         if tx_dt is None:
             continue
-        for leg in pair_legs:
+        target = round(-float(tx.amount) * 100)
+        candidates = sorted(
+            (c for cents in range(target - 2, target + 3) for c in legs_by_cents.get(cents, ())),
+            key=lambda c: c[0],
+        )
+        for _, leg in candidates:
             if leg.id in used_leg_ids or leg.account_id == tx.account_id:
                 continue
             if (leg.currency or "CZK") != (tx.currency or "CZK"):
@@ -0,0 +1,26 @@
+"""Testy skládání ročního přehledu (services/annual_overview.py) — bez DB."""
+from services.annual_overview import MonthTotals, month_rows, year_totals
+
+TOTALS = {
+    "2025-12": MonthTotals(income=50000, expenses=30000, investments=5000, savings=2000),
+    "2026-01": MonthTotals(income=60000, expenses=40000, investments=5000, savings=1000),
+    "2026-03": MonthTotals(income=60000, expenses=35000),
+}
+
+
+def test_months_without_budget_are_zero():
+    months = month_rows(2026, TOTALS)
+    assert len(months) == 12
+    assert months[0]["remaining"] == 14000
+    assert months[1] == {
+        "month": 2, "year_month": "2026-02", "income": 0.0, "expenses": 0.0,
+        "investments": 0.0, "savings": 0.0, "remaining": 0.0,
+    }
+
+
+def test_year_totals_only_count_that_year():
+    assert year_totals(2026, TOTALS) == {
+        "income": 120000, "expenses": 75000, "investments": 5000, "savings": 1000, "net": 45000,
+    }
+    assert year_totals(2025, TOTALS)["net"] == 20000
+    assert year_totals(2024, TOTALS)["income"] == 0
@@ -0,0 +1,62 @@
+"""Tests for the net-worth snapshot math (services.balance_snapshots).
+
+Pure-function tests — no DB. Covers the gap fill from daily transaction
+deltas and the carry-forward of sparse snapshots into daily chart points.
+"""
+from datetime import date
+
+from services.balance_snapshots import CurrentBalance, build_history, derive_end_of_day_balances
+
+
+def acc(key, kind="bank", balance=0.0):
+    return CurrentBalance(key=key, kind=kind, balance=balance, is_visible=True, source_type="bank")
+
+
+def test_first_backfill_walks_back_from_today():
+    # dnes 1000; 3. den +500, 2. den -200 → konec 2. dne 500, konec 1. dne 700
+    deltas = {"2026-01-02": -200.0, "2026-01-03": 500.0}
+    derived = derive_end_of_day_balances(1000.0, "2026-01-03", deltas)
+    assert derived == {"2026-01-02": 500.0, "2026-01-01": 700.0}
+
+
+def test_gap_fill_stops_at_last_snapshot():
+    deltas = {"2026-01-02": -200.0, "2026-01-05": -100.0, "2026-01-06": 50.0}
+    derived = derive_end_of_day_balances(1000.0, "2026-01-07", deltas, after_date="2026-01-03")
+    assert derived == {"2026-01-06": 1000.0, "2026-01-05": 950.0}
+
+
+def test_forward_booked_deltas_ignored():
+    derived = derive_end_of_day_balances(1000.0, "2026-01-03", {"2026-01-02": -100.0, "2026-01-20": -999.0})
+    assert derived == {"2026-01-02": 1000.0, "2026-01-01": 1100.0}
+
+
+def test_no_transactions_no_rows():
+    assert derive_end_of_day_balances(1000.0, "2026-01-03", {}) == {}
+
+
+def test_history_carries_snapshots_forward():
+    history = build_history(
+        date(2026, 1, 1), date(2026, 1, 5),
+        [acc("a", balance=900.0)],
+        {"a": [("2025-12-30", 100.0), ("2026-01-03", 300.0)]},
+    )
+    assert [p["bank"] for p in history] == [100.0, 100.0, 300.0, 300.0, 900.0]
+    assert history[0]["date"] == "2026-01-01"
+    assert history[-1]["date"] == "2026-01-05"
+
+
+def test_history_before_first_snapshot_uses_earliest():
+    history = build_history(
+        date(2026, 1, 1), date(2026, 1, 3),
+        [acc("m", balance=50.0), acc("inv", kind="investment", balance=10.0)],
+        {"m": [("2026-01-02", 40.0)]},
+    )
+    assert [p["bank"] for p in history] == [40.0, 40.0, 50.0]
+    # účet bez snapshotů = konstanta aktuálního zůstatku
+    assert [p["investment"] for p in history] == [10.0, 10.0, 10.0]
+    assert [p["total"] for p in history] == [50.0, 50.0, 60.0]
+
+
+def test_ten_year_window_has_point_per_day():
+    history = build_history(date(2016, 1, 1), date(2025, 12, 31), [acc("a", balance=1.0)], {})
+    assert len(history) == (date(2025, 12, 31) - date(2016, 1, 1)).days + 1
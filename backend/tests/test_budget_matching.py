@@ -0,0 +1,63 @@
+"""Testy párování položek rozpočtu s transakcemi (services/budget_matching.py).
+
+Čisté funkce bez DB: index měsíce (tokeny popisu, okna částek) a globální
+přiřazení podle skóre.
+"""
+from services.budget_matching import (
+    TIER_AMOUNT,
+    TIER_CATEGORY,
+    TIER_PATTERN,
+    ExpenseToMatch,
+    MonthIndex,
+    MonthTransaction,
+    assign_matches,
+)
+
+
+def tx(id, amount, description="Platba kartou", category=None, date="2026-03-10"):
+    return MonthTransaction(id=id, date=date, description=description, amount=amount, category=category)
+
+
+def exp(id, amount, pattern=None, category=None):
+    return ExpenseToMatch(id=id, amount=amount, pattern=pattern, category=category)
+
+
+def pairs(matches):
+    return {(m.expense_id, m.transaction_id, m.tier) for m in matches}
+
+
+def test_pattern_is_diacritics_insensitive_substring():
+    index = MonthIndex([tx("a", 15000, "Nájem byt Vinohrady"), tx("b", 300, "NETFLIX.COM Amsterdam")])
+    assert index.by_pattern("najem") == [0]
+    assert index.by_pattern("flix.com") == [1]
+    assert index.by_pattern("najem netflix") == []
+
+
+def test_amount_window_uses_bisect_bounds():
+    index = MonthIndex([tx("a", 94), tx("b", 100), tx("c", 105), tx("d", 106)])
+    assert sorted(index.transactions[i].id for i in index.by_amount(100, 0.05)) == ["b", "c"]
+
+
+def test_pattern_beats_amount_and_best_score_wins_globally():
+    index = MonthIndex([
+        tx("rent", 15000, "Nájem"),
+        tx("close", 499, "Mobil O2"),
+        tx("exact", 500, "Karta"),
+    ])
+    matches = assign_matches([
+        # první položka by v pořadí „kdo dřív přijde" sebrala přesnou částku 500
+        exp(1, 495),
+        exp(2, 500),
+        exp(3, 14000, pattern="najem"),
+    ], index)
+    assert pairs(matches) == {
+        (3, "rent", TIER_PATTERN),
+        (2, "exact", TIER_AMOUNT),
+        (1, "close", TIER_AMOUNT),
+    }
+
+
+def test_category_window_and_taken_transactions():
+    index = MonthIndex([tx("a", 850, category="Utilities"), tx("b", 1000, category="Utilities")])
+    matches = assign_matches([exp(1, 1000, category="Utilities")], index, taken={"b"})
+    assert pairs(matches) == {(1, "a", TIER_CATEGORY)}
@@ -0,0 +1,113 @@
+"""Joby zpětného použití pravidel (services/category_retro) se stavem v DB.
+
+Potřebuje migrovaný Postgres (viz test_query_budgets.py):
+
+    DB_TESTS=1 DATABASE_URL=postgresql+asyncpg://…/budget_test \\
+        AUTH_SECRET=… python -m pytest tests/test_category_jobs_db.py
+"""
+import asyncio
+import os
+from datetime import timedelta
+
+import pytest
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get("DB_TESTS"), reason="needs a migrated Postgres (DB_TESTS=1)"),
+    pytest.mark.asyncio(loop_scope="module"),
+]
+
+
+@pytest.fixture(scope="module")
+async def user():
+    from sqlalchemy import delete
+
+    from database import async_session_maker, background_engine, engine
+    from loadtest.seed import seed_user
+    from models import UserModel
+
+    async with async_session_maker() as db:
+        seeded = await seed_user(db, "category-jobs", transactions=300, accounts=1)
+    yield seeded
+    async with async_session_maker() as db:
+        await db.execute(delete(UserModel).where(UserModel.id == seeded["user_id"]))
+        await db.commit()
+    await engine.dispose()
+    await background_engine.dispose()
+
+
+async def _wait_finished(job_id, user_id):
+    from database import async_session_maker
+    from services.category_retro import get_job
+
+    for _ in range(100):
+        async with async_session_maker() as db:
+            job = await get_job(db, job_id, user_id)
+        if job.status != "running":
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"job {job_id} still running")
+
+
+async def test_job_progress_is_readable_from_db(user):
+    from database import async_session_maker
+    from services import category_retro
+
+    async with async_session_maker() as db:
+        job = category_retro.queue_job(db, user["user_id"], "billa", "Groceries", total=0)
+        await db.commit()
+    category_retro.start_job(job)
+    finished = await _wait_finished(job.id, user["user_id"])
+    assert finished.status == "completed"
+    assert finished.done == finished.total > 0
+
+    async with async_session_maker() as db:
+        assert await category_retro.get_job(db, job.id, user["user_id"] + 1) is None
+
+
+async def test_interrupted_job_is_claimed_once_and_finished(user):
+    from database import async_session_maker
+    from services import category_retro
+    from services.timefmt import utcnow
+
+    async with async_session_maker() as db:
+        job = category_retro.queue_job(db, user["user_id"], "albert", "Groceries", total=0)
+        # Replika s jobem spadla: heartbeat je starý
+        job.updated_at = utcnow() - timedelta(seconds=category_retro._STALE_SECS + 1)
+        await db.commit()
+
+    claims = await asyncio.gather(category_retro._claim_stale_jobs(), category_retro._claim_stale_jobs())
+    assert sorted(len([j for j in c if j == job.id]) for c in claims) == [0, 1]
+
+    category_retro._launch(job.id)
+    finished = await _wait_finished(job.id, user["user_id"])
+    assert finished.status == "completed"
+
+
+async def test_backfill_keeps_job_heartbeat_fresh(user, monkeypatch):
+    from sqlalchemy import update
+
+    from database import async_session_maker
+    from models import TransactionModel
+    from services import category_retro
+
+    async with async_session_maker() as db:
+        await db.execute(
+            update(TransactionModel).where(TransactionModel.user_id == user["user_id"]).values(search_text=None)
+        )
+        job = category_retro.queue_job(db, user["user_id"], "lidl", "Groceries", total=0)
+        await db.commit()
+
+    beats = []
+    heartbeat = category_retro._heartbeat
+
+    def counting_heartbeat(job_id, **values):
+        beats.append(values)
+        return heartbeat(job_id, **values)
+
+    monkeypatch.setattr(category_retro, "_heartbeat", counting_heartbeat)
+    monkeypatch.setattr(category_retro, "_BACKFILL_CHUNK", 50)
+    category_retro.start_job(job)
+    finished = await _wait_finished(job.id, user["user_id"])
+    assert finished.status == "completed"
+    # 300 transakcí po 50 → heartbeat po každé dávce dopočtu + jeden před sběrem id
+    assert beats[:7] == [{}] * 7
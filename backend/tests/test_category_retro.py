@@ -0,0 +1,81 @@
+"""Testy zpětného použití pravidla kategorie (services/category_retro.py).
+
+Bez DB: regex, který běží v Postgresu nad transactions.search_text, musí
+dávat totéž co pattern_matches při syncu (diakritika, hranice slova).
+[^[:alpha:]] z ARE se pro Python přeloží na ekvivalentní [\\W\\d_].
+"""
+import re
+
+from services.categorization import fold, pattern_matches, search_text
+from services.category_retro import _category_values, _row_search_text, count_matching, pattern_regex
+
+
+def py_regex(pattern: str) -> re.Pattern:
+    return re.compile(pattern_regex(pattern).replace("[^[:alpha:]]", r"[\W\d_]"))
+
+
+def test_search_text_folds_counterparty_and_description():
+    raw = {"creditorName": "Kavárna Fra", "creditorAccount": {"iban": "CZ65 0800"}}
+    assert search_text("Platba kartou", raw) == "kavarna fra cz65 0800 platba kartou"
+    assert search_text("BUY AAPL", None) == "buy aapl"
+
+
+def test_regex_equals_pattern_matches():
+    patterns = ["billa", "kavárna", "o2", "lidl cz s.r.o", "a+b (x)"]
+    texts = [
+        "nakup billa praha", "sbilla", "billa123 brno", "kavarna fra", "o2 czech", "go2 shop",
+        "lidl cz s.r.o brno", "lidl cz sxrxo", "pay a+b (x) now", "", "billa",
+    ]
+    for pattern in patterns:
+        regex = py_regex(pattern)
+        for text in texts:
+            assert bool(regex.search(text)) == pattern_matches(text, fold(pattern)), (pattern, text)
+
+
+def test_category_values_keep_manual_exclusion():
+    values = _category_values("Groceries")
+    assert values["category"] == "Groceries"
+    assert "transaction_type" in values and values["is_excluded"] is not True
+    assert _category_values("Internal Transfer")["transaction_type"] == "internal_transfer"
+
+
+def test_row_search_text_tolerates_malformed_raw_json():
+    assert _row_search_text("Billa Praha", "{not json") == "billa praha"
+    assert _row_search_text("Billa", '["list"]') == "billa"
+    assert _row_search_text(None, '{"creditorName": "Kavárna"}') == "kavarna"
+
+
+class _Result:
+    def __init__(self, value):
+        self.value = value
+
+    def all(self):
+        return self.value
+
+    def scalar_one(self):
+        return self.value
+
+
+class _ReadOnlySession:
+    """Nejdřív řádky bez search_text, pak COUNT z SQL; zápis = chyba."""
+
+    def __init__(self, unindexed_rows, indexed_count):
+        self.results = [unindexed_rows, indexed_count]
+
+    async def execute(self, statement, *args):
+        return _Result(self.results.pop(0))
+
+    async def commit(self):
+        raise AssertionError("count_matching must not commit")
+
+    def add(self, *args):
+        raise AssertionError("count_matching must not write")
+
+
+async def test_count_matching_is_read_only_and_matches_unindexed_rows_in_python():
+    rows = [
+        ("t1", "Nákup BILLA Brno", None),
+        ("t2", "sbilla", None),  # uprostřed slova — nepáruje
+        ("t3", None, '{"creditorName": "Billa s.r.o."}'),
+    ]
+    assert await count_matching(_ReadOnlySession(rows, 4), user_id=1, pattern="billa") == 6
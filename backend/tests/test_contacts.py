@@ -0,0 +1,59 @@
+"""Testy adresáře protistran (services/contacts.py).
+
+Bez DB: dvojice IBAN → jméno ze syncu (nejnovější jméno vyhrává), parsování
+raw_json pro seznam transakcí a teplá mapa kontaktů (jeden dotaz, invalidace).
+"""
+import asyncio
+import json
+
+from services import contacts
+from services.contacts import collect_counterparties, contact_map, counterparties, parse_counterparty_fields
+
+
+def test_counterparties_need_both_iban_and_name():
+    raw = {
+        "creditorName": " ČEZ Prodej ", "creditorAccount": {"iban": "cz65 0800 0000"},
+        "debtorName": "Jan Novák", "debtorAccount": None,
+    }
+    assert counterparties(raw) == [("CZ6508000000", "ČEZ Prodej")]
+    assert counterparties({"creditorAccount": {"bban": "123/0800"}}) == []
+
+
+def test_collect_keeps_latest_name_per_iban():
+    learned: dict = {}
+    for day, name in (("2026-03-01", "Old s.r.o."), ("2026-05-01", "New s.r.o."), ("2026-04-01", "Mid s.r.o.")):
+        collect_counterparties(learned, day, {"creditorName": name, "creditorAccount": {"iban": "CZ1"}})
+    assert learned == {"CZ1": ("2026-05-01", "New s.r.o.")}
+
+
+def test_parse_counterparty_fields_tolerates_garbage():
+    raw = json.dumps({"debtorName": "Sestra", "debtorAccount": {"bban": "19-123 / 0100"}})
+    assert parse_counterparty_fields(raw) == (None, "Sestra", None, "19-123/0100")
+    assert parse_counterparty_fields("not json") == (None, None, None, None)
+    assert parse_counterparty_fields(None) == (None, None, None, None)
+
+
+class FakeDB:
+    def __init__(self, rows):
+        self.rows, self.queries = rows, 0
+
+    async def execute(self, stmt):
+        self.queries += 1
+        rows = self.rows
+
+        class Result:
+            def all(self):
+                return rows
+        return Result()
+
+
+def test_contact_map_is_cached_until_invalidated():
+    db = FakeDB([("CZ1", "Nájem", "manual"), ("CZ2", "Voda", None)])
+    contacts.invalidate_contact_map(42)
+    first = asyncio.run(contact_map(db, 42))
+    assert first["CZ1"].name == "Nájem" and first["CZ2"].source == "manual"
+    asyncio.run(contact_map(db, 42))
+    assert db.queries == 1
+    contacts.invalidate_contact_map(42)
+    asyncio.run(contact_map(db, 42))
+    assert db.queries == 2
@@ -0,0 +1,70 @@
+"""POST /contacts/auto-populate nad skutečným Postgresem (viz test_query_budgets.py):
+
+    DB_TESTS=1 DATABASE_URL=postgresql+asyncpg://…/budget_test \\
+        AUTH_SECRET=… python -m pytest tests/test_contacts_db.py
+"""
+import json
+import os
+
+import pytest
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get("DB_TESTS"), reason="needs a migrated Postgres (DB_TESTS=1)"),
+    pytest.mark.asyncio(loop_scope="module"),
+]
+
+
+@pytest.fixture(scope="module")
+async def client():
+    import httpx
+    from sqlalchemy import delete, select
+
+    from database import async_session_maker, background_engine, engine
+    from loadtest.seed import seed_user
+    from main import app
+    from models import AccountModel, TransactionModel, UserModel
+
+    async with async_session_maker() as db:
+        user = await seed_user(db, "contacts-history", transactions=200, accounts=1)
+        account_id = (await db.execute(
+            select(AccountModel.id).where(AccountModel.user_id == user["user_id"]).limit(1)
+        )).scalar_one()
+        good = {"creditorName": "Jan Novák", "creditorAccount": {"iban": "CZ65 0800 0000 1920 0014 5399"}}
+        for i, raw_json in enumerate([
+            json.dumps(good),
+            "{not json",  # rozbitý řádek
+            json.dumps({**good, "remittanceInformationUnstructured": "a\u0000b"}),  # jsonb odmítne \\u0000
+        ]):
+            db.add(TransactionModel(
+                id=f"contacts-history-{user['user_id']}-{i}", user_id=user["user_id"], account_id=account_id,
+                account_type="bank", date=f"2026-01-0{i + 1}", amount=-10.0, currency="CZK",
+                description="x", raw_json=raw_json,
+            ))
+        await db.commit()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {user['token']}"},
+    ) as http:
+        yield http
+    async with async_session_maker() as db:
+        await db.execute(delete(UserModel).where(UserModel.id == user["user_id"]))
+        await db.commit()
+    await engine.dispose()
+    await background_engine.dispose()
+
+
+async def test_auto_populate_survives_rows_jsonb_rejects(client):
+    first = await client.post("/contacts/auto-populate")
+    assert first.status_code == 200, first.text
+    body = first.json()
+    assert set(body) == {"learned", "skipped", "total_scanned"}
+    assert body["learned"] >= 1
+
+    contacts = (await client.get("/contacts/")).json()
+    assert any(c["iban"] == "CZ6508000000192000145399" for c in contacts)
+
+    # Druhý běh nic nového nenaučí — všechno je „skipped“
+    again = (await client.post("/contacts/auto-populate")).json()
+    assert again["learned"] == 0
+    assert again["skipped"] == body["learned"] + body["skipped"]
+    assert again["total_scanned"] == body["total_scanned"]
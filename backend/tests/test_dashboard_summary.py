@@ -0,0 +1,47 @@
+"""Tests for folding the dashboard month aggregates (routers.dashboard.summarize_month).
+
+Pure-function tests — no DB. The rows mimic the single GROUP BY ... FILTER
+query: (category, income, expenses, category_spend).
+"""
+from routers.dashboard import summarize_month
+
+
+def test_totals_sum_across_categories():
+    income, expenses, categories = summarize_month([
+        ("Food", None, 300.0, 300.0),
+        ("Salary", 40000.0, None, None),
+        ("Transport", None, 120.0, 120.0),
+    ], income_category_names={"Salary"})
+    assert income == 40000.0
+    assert expenses == 420.0
+    assert categories == {"Food": 300.0, "Transport": 120.0}
+
+
+def test_null_category_counts_as_other():
+    _, _, categories = summarize_month([
+        (None, None, 50.0, 50.0),
+        ("Other", None, 25.0, 25.0),
+    ], income_category_names=set())
+    assert categories == {"Other": 75.0}
+
+
+def test_income_category_kept_out_of_breakdown():
+    # omylem záporná transakce v kategorii Salary nesmí do grafu výdajů
+    _, expenses, categories = summarize_month([
+        ("Salary", 1000.0, 10.0, 10.0),
+    ], income_category_names={"Salary"})
+    assert expenses == 10.0
+    assert categories == {}
+
+
+def test_investment_spend_in_breakdown_not_in_expenses():
+    # category_spend zahrnuje i investiční účty, expenses jen banku
+    _, expenses, categories = summarize_month([
+        ("Investment", None, None, 500.0),
+    ], income_category_names=set())
+    assert expenses == 0.0
+    assert categories == {"Investment": 500.0}
+
+
+def test_empty_month():
+    assert summarize_month([], income_category_names=set()) == (0.0, 0.0, {})
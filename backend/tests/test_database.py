@@ -0,0 +1,66 @@
+"""database.engine_options — pool a cache prepared statements z Settings."""
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import database
+from database import engine_options, gather_reads
+
+
+def _settings(**overrides):
+    values = dict(
+        db_pool_size=5, db_max_overflow=10, db_pool_timeout=30.0, db_pool_recycle=1800,
+        db_pool_pre_ping=True, db_background_pool_size=2, db_background_max_overflow=3,
+        db_statement_cache_size=100, db_pgbouncer=False,
+    )
+    values.update(overrides)
+    return SimpleNamespace(**values)
+
+
+def test_request_and_background_pools_are_sized_separately():
+    settings = _settings(db_pool_size=8, db_max_overflow=4)
+    request = engine_options(settings)
+    background = engine_options(settings, background=True)
+    assert (request["pool_size"], request["max_overflow"]) == (8, 4)
+    assert (background["pool_size"], background["max_overflow"]) == (2, 3)
+    assert background["pool_recycle"] == request["pool_recycle"] == 1800
+    assert background["pool_pre_ping"] is True
+
+
+def test_statement_cache_size_applies_to_both_caches():
+    connect_args = engine_options(_settings(db_statement_cache_size=500))["connect_args"]
+    assert connect_args == {"statement_cache_size": 500, "prepared_statement_cache_size": 500}
+
+
+def test_pgbouncer_mode_disables_caches_and_uses_unique_names():
+    connect_args = engine_options(_settings(db_pgbouncer=True))["connect_args"]
+    assert connect_args["statement_cache_size"] == 0
+    assert connect_args["prepared_statement_cache_size"] == 0
+    name_func = connect_args["prepared_statement_name_func"]
+    assert name_func() != name_func()
+
+
+async def test_gather_reads_caps_concurrent_sessions(monkeypatch):
+    active = peak = 0
+
+    @asynccontextmanager
+    async def session_maker():
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        try:
+            yield None
+        finally:
+            active -= 1
+
+    async def read(session):
+        await asyncio.sleep(0.01)
+        return "ok"
+
+    monkeypatch.setattr(database, "async_session_maker", session_maker)
+    monkeypatch.setattr(database.settings, "db_read_fanout", 2)
+    monkeypatch.setattr(database, "_fanout_limit", None)
+    # Dva souběžné „dashboardy“ po třech čteních
+    results = await asyncio.gather(gather_reads(read, read, read), gather_reads(read, read, read))
+    assert results == [["ok"] * 3] * 2
+    assert peak == 2
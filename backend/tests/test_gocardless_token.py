@@ -0,0 +1,102 @@
+"""Testy single-flight refreshe GoCardless tokenu — bez sítě i DB.
+
+DB persistence (_load_from_db/_save_to_db) a advisory lock (_replica_lock) se
+nahrazují in-memory "sdílenou tabulkou", takže jde simulovat i druhou repliku.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import timedelta
+
+import pytest
+
+from services.gocardless import GoCardlessService
+from services.timefmt import utcnow
+
+
+class FakeStore:
+    """Stand-in za settings tabulku + advisory lock sdílený mezi replikami."""
+
+    def __init__(self):
+        self.data = {
+            "access_token": None, "access_expires": None,
+            "refresh_token": "refresh-1", "refresh_expires": utcnow() + timedelta(days=10),
+        }
+        self.lock = asyncio.Lock()
+        self.token_calls = 0
+
+
+def make_service(store: FakeStore, monkeypatch) -> GoCardlessService:
+    svc = GoCardlessService()
+
+    async def load():
+        for key, value in store.data.items():
+            setattr(svc, key, value)
+        svc._loaded_from_db = True
+
+    async def save():
+        for key in store.data:
+            store.data[key] = getattr(svc, key)
+
+    @asynccontextmanager
+    async def replica_lock():
+        async with store.lock:
+            yield
+
+    async def refresh():
+        store.token_calls += 1
+        await asyncio.sleep(0.01)  # simulace latence GoCardless
+        svc.access_token = f"access-{store.token_calls}"
+        svc.access_expires = utcnow() + timedelta(hours=24)
+
+    monkeypatch.setattr(svc, "_load_from_db", load)
+    monkeypatch.setattr(svc, "_save_to_db", save)
+    monkeypatch.setattr(svc, "_replica_lock", replica_lock)
+    monkeypatch.setattr(svc, "_refresh_access_token", refresh)
+    return svc
+
+
+@pytest.fixture
+def store():
+    return FakeStore()
+
+
+async def test_concurrent_callers_refresh_once(store, monkeypatch):
+    svc = make_service(store, monkeypatch)
+    tokens = await asyncio.gather(*(svc.get_access_token() for _ in range(10)))
+    assert store.token_calls == 1
+    assert set(tokens) == {"access-1"}
+
+
+async def test_second_replica_reuses_token_from_db(store, monkeypatch):
+    replica_a = make_service(store, monkeypatch)
+    replica_b = make_service(store, monkeypatch)
+    token_a, token_b = await asyncio.gather(
+        replica_a.get_access_token(), replica_b.get_access_token(),
+    )
+    assert store.token_calls == 1
+    assert token_a == token_b == "access-1"
+
+
+async def test_valid_token_skips_refresh(store, monkeypatch):
+    store.data["access_token"] = "still-good"
+    store.data["access_expires"] = utcnow() + timedelta(hours=1)
+    svc = make_service(store, monkeypatch)
+    assert await svc.get_access_token() == "still-good"
+    assert store.token_calls == 0
+
+
+async def test_expired_refresh_fetches_new_token(store, monkeypatch):
+    store.data["refresh_expires"] = utcnow() - timedelta(days=1)
+    svc = make_service(store, monkeypatch)
+    calls = {"n": 0}
+
+    async def fetch_new():
+        calls["n"] += 1
+        svc.access_token = "brand-new"
+        svc.access_expires = utcnow() + timedelta(hours=24)
+
+    monkeypatch.setattr(svc, "_fetch_new_token", fetch_new)
+    await asyncio.gather(svc.get_access_token(), svc.get_access_token())
+    assert calls["n"] == 1
+    assert store.token_calls == 0
+    assert store.data["access_token"] == "brand-new"
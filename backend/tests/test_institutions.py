@@ -0,0 +1,89 @@
+"""Testy cache katalogu bank (services/institutions.py) — bez sítě i DB.
+
+_load_from_db a _fetch_and_store se nahrazují monkeypatchem; ověřuje se
+hledání, ETag, single-flight a stale-while-revalidate.
+"""
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from services import institutions
+from services.institutions import Catalogue
+from services.timefmt import utcnow
+
+BANKS = [
+    {"id": "CSOB_CEKOCZPP", "name": "ČSOB", "bic": "CEKOCZPP"},
+    {"id": "FIO_FIOBCZPP", "name": "Fio banka", "bic": "FIOBCZPP"},
+    {"id": "KB_KOMBCZPP", "name": "Komerční banka", "bic": "KOMBCZPP"},
+]
+
+
+def catalogue(fetched_at=None, etag="v1"):
+    return Catalogue(country="CZ", institutions=BANKS, etag=etag, fetched_at=fetched_at or utcnow())
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    institutions._memory.clear()
+    institutions._inflight.clear()
+    institutions._last_background_attempt.clear()
+    yield
+    institutions._memory.clear()
+    institutions._inflight.clear()
+    institutions._last_background_attempt.clear()
+
+
+def test_search_is_diacritics_insensitive():
+    assert [i["id"] for i in catalogue().search("komercni")] == ["KB_KOMBCZPP"]
+    assert [i["id"] for i in catalogue().search("csob")] == ["CSOB_CEKOCZPP"]
+
+
+def test_search_by_bic_and_multiple_terms():
+    assert [i["id"] for i in catalogue().search("fiobczpp")] == ["FIO_FIOBCZPP"]
+    assert [i["id"] for i in catalogue().search("banka fio")] == ["FIO_FIOBCZPP"]
+    assert catalogue().search("  ") == BANKS
+
+
+def test_etag_depends_on_version_and_query():
+    assert catalogue().etag_for(None) == '"v1"'
+    assert catalogue().etag_for("Fio") == catalogue().etag_for("fio ")
+    assert catalogue().etag_for("fio") != catalogue(etag="v2").etag_for("fio")
+
+
+async def test_first_request_fetches_once_for_concurrent_callers(monkeypatch):
+    calls = {"n": 0}
+
+    async def load(country):
+        return None
+
+    async def fetch(country):
+        calls["n"] += 1
+        await asyncio.sleep(0.01)
+        return catalogue()
+
+    monkeypatch.setattr(institutions, "_load_from_db", load)
+    monkeypatch.setattr(institutions, "_fetch_and_store", fetch)
+
+    results = await asyncio.gather(*(institutions.get_catalogue("cz") for _ in range(5)))
+    assert calls["n"] == 1
+    assert all(r.etag == "v1" for r in results)
+
+
+async def test_stale_catalogue_served_while_refreshing(monkeypatch):
+    stale = catalogue(fetched_at=utcnow() - timedelta(days=30))
+    refreshed = asyncio.Event()
+
+    async def load(country):
+        return stale
+
+    async def fetch(country):
+        refreshed.set()
+        return catalogue(etag="v2")
+
+    monkeypatch.setattr(institutions, "_load_from_db", load)
+    monkeypatch.setattr(institutions, "_fetch_and_store", fetch)
+
+    served = await institutions.get_catalogue("CZ")
+    assert served is stale
+    await asyncio.wait_for(refreshed.wait(), timeout=1)
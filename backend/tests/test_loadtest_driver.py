@@ -0,0 +1,30 @@
+"""Testy vyhodnocení zátěžového driveru (loadtest/driver.py) — bez sítě."""
+import pytest
+
+from loadtest.driver import EndpointStats, parse_mix, percentile
+
+
+def test_parse_mix_weights_and_unknown_endpoint():
+    assert parse_mix("dashboard=4, sync=1,") == {"dashboard": 4.0, "sync": 1.0}
+    assert parse_mix("cashflow") == {"cashflow": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("dashbord=1")
+    with pytest.raises(ValueError):
+        parse_mix("sync=0")
+
+
+def test_percentile_nearest_rank():
+    values = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+    assert percentile(values, 50) == 0.050
+    assert percentile(values, 95) == 0.095
+    assert percentile(values, 99) == 0.099
+    assert percentile([0.2], 99) == 0.2
+    assert percentile([], 50) == 0.0
+
+
+def test_summary_counts_errors_separately():
+    stats = EndpointStats(latencies=[0.01, 0.02, 0.03], errors=1)
+    summary = stats.summary(elapsed=2.0)
+    assert summary["requests"] == 4 and summary["errors"] == 1
+    assert summary["throughput_rps"] == 2.0
+    assert summary["p50_ms"] == 20.0 and summary["max_ms"] == 30.0
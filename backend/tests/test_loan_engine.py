@@ -0,0 +1,96 @@
+"""Testy amortizace a scénářů úvěru (services/loan_engine.py) — bez DB.
+
+Rychlost 20 scénářů měří benchmarks/test_benchmarks.py::test_compare_scenarios.
+"""
+from datetime import date
+
+from services.loan_engine import (
+    REDUCE_PAYMENT,
+    Scenario,
+    add_months,
+    amortize,
+    annuity_payment,
+    compare_scenarios,
+    diff_schedule,
+)
+
+START = date(2026, 1, 15)
+MORTGAGE = (4_000_000.0, 4.89, 360)
+
+
+def reference_schedule(principal, annual_rate_pct, term_months, monthly_payment, start):
+    """Původní build_schedule z routers/loans.py — kalendář se nesmí změnit."""
+    schedule = []
+    monthly_rate = (annual_rate_pct / 100.0) / 12.0
+    balance = principal
+    for i in range(1, term_months + 1):
+        interest = round(balance * monthly_rate, 2)
+        principal_part = round(monthly_payment - interest, 2)
+        if i == term_months or principal_part >= balance:
+            principal_part = round(balance, 2)
+            payment_amount = round(principal_part + interest, 2)
+        else:
+            payment_amount = monthly_payment
+        balance = round(balance - principal_part, 2)
+        if balance < 0:
+            balance = 0.0
+        schedule.append({
+            "installment_number": i,
+            "due_date": add_months(start, i - 1).strftime("%Y-%m-%d"),
+            "amount": payment_amount,
+            "principal_part": principal_part,
+            "interest_part": interest,
+            "remaining_balance": balance,
+        })
+        if balance <= 0:
+            break
+    return schedule
+
+
+def test_baseline_matches_previous_schedule():
+    payment = annuity_payment(*MORTGAGE)
+    for args in [(*MORTGAGE, payment), (150_000.0, 0.0, 24, annuity_payment(150_000.0, 0.0, 24)),
+                 (100_000.0, 9.9, 36, 5000.0)]:
+        assert amortize(*args, START).rows == reference_schedule(*args, START)
+
+
+def test_extra_payment_shortens_term_or_lowers_payment():
+    payment = annuity_payment(*MORTGAGE)
+    extra = {12: 500_000.0}
+    baseline = amortize(*MORTGAGE, payment, START, with_rows=False)
+    shorter = amortize(*MORTGAGE, payment, START, Scenario(extra_payments=extra), with_rows=False)
+    lower = amortize(*MORTGAGE, payment, START, Scenario(extra_payments=extra, strategy=REDUCE_PAYMENT))
+
+    assert shorter.installments < baseline.installments
+    assert shorter.last_payment == payment
+    assert lower.installments == baseline.installments
+    assert lower.last_payment < payment
+    assert lower.rows[11]["extra_principal"] == 500_000.0
+    assert shorter.total_interest < lower.total_interest < baseline.total_interest
+
+
+def test_refixation_recomputes_annuity_for_remaining_term():
+    payment = annuity_payment(*MORTGAGE)
+    refix = amortize(*MORTGAGE, payment, START, Scenario(rate_changes={61: 3.5}))
+    assert refix.installments == 360
+    balance_before = refix.rows[59]["remaining_balance"]
+    assert refix.rows[60]["amount"] == annuity_payment(balance_before, 3.5, 300)
+    assert refix.rows[-1]["remaining_balance"] == 0.0
+
+
+def test_twenty_scenarios_of_thirty_year_mortgage():
+    payment = annuity_payment(*MORTGAGE)
+    scenarios = [Scenario(name=str(k), monthly_extra=500.0 * k, rate_changes={61: 3.0 + k / 10}) for k in range(20)]
+    baseline, results = compare_scenarios(*MORTGAGE, payment, START, scenarios)
+    assert len(results) == 20 and baseline.rows == []
+
+
+def test_diff_schedule_rewrites_only_changed_installments():
+    old = amortize(100_000.0, 5.0, 12, annuity_payment(100_000.0, 5.0, 12), START).rows
+    new = amortize(100_000.0, 5.0, 10, annuity_payment(100_000.0, 5.0, 12), START).rows
+    existing = {r["installment_number"]: r for r in old}
+    diff = diff_schedule(existing, new)
+    assert diff.to_insert == []
+    assert diff.to_delete == [11, 12]
+    assert [n for n, _ in diff.to_update] == [10]  # jen poslední splátka doplácí zbytek
+    assert diff_schedule(existing, old).to_update == []
@@ -0,0 +1,76 @@
+"""Testy párování splátek úvěrů s transakcemi (services/loan_matching.py).
+
+Čisté funkce bez DB: okno kolem splatnosti, pattern + tolerance částky,
+globální přiřazení (dvě platby → dvě splátky po sobě, nic dvakrát).
+"""
+from datetime import date
+
+import pytest
+
+from services.loan_matching import (
+    DUE_WINDOW_AFTER,
+    DUE_WINDOW_BEFORE,
+    TIER_AMOUNT,
+    TIER_PATTERN,
+    Installment,
+    InstallmentIndex,
+    LoanTransaction,
+    assign_installments,
+    due_range,
+)
+
+
+def inst(id, due, amount=10_000.0, pattern="hypoteka kb", loan_id=1):
+    return Installment(id, loan_id, due, amount, pattern)
+
+
+def tx(id, d, amount=10_000.0, description="Splatka Hypotéka KB"):
+    return LoanTransaction(id, d, description, amount)
+
+
+def test_index_window_crosses_month_boundary():
+    index = InstallmentIndex([inst(1, "2026-03-01"), inst(2, "2026-04-01"), inst(3, "2026-05-01")])
+    # 28. 2. je 1 den před splatností 1. 3.; duben je mimo okno
+    assert [(i.id, off) for i, off in index.around(date(2026, 2, 28))] == [(1, -1)]
+    assert sorted(i.id for i, _ in index.around(date(2026, 4, 10))) == [2]
+
+
+def test_pattern_match_tolerates_amount_change_and_diacritics():
+    index = InstallmentIndex([inst(1, "2026-03-15")])
+    matches = assign_installments([tx("t1", "2026-03-16", 10_800.0)], index)
+    assert [(m.payment_id, m.transaction_id, m.tier) for m in matches] == [(1, "t1", TIER_PATTERN)]
+    # jiná protistrana se stejnou částkou se nepáruje, když úvěr pattern má
+    assert assign_installments([tx("t2", "2026-03-16", description="Najem")], index) == []
+
+
+def test_amount_only_without_pattern_is_strict():
+    index = InstallmentIndex([inst(1, "2026-03-15", 4_321.0, pattern=None)])
+    assert assign_installments([tx("t1", "2026-03-20", 4_500.0, "x")], index) == []
+    matches = assign_installments([tx("t1", "2026-03-20", 4_321.0, "x")], index)
+    assert [(m.payment_id, m.tier) for m in matches] == [(1, TIER_AMOUNT)]
+
+
+def test_late_payments_fill_installments_in_order_and_skip_taken():
+    index = InstallmentIndex([inst(1, "2026-03-01"), inst(2, "2026-03-10")])
+    transactions = [tx("late", "2026-03-12"), tx("ontime", "2026-03-02"), tx("old", "2026-03-03")]
+    matches = assign_installments(transactions, index, taken={"old"})
+    assert {(m.payment_id, m.transaction_id) for m in matches} == {(1, "ontime"), (2, "late")}
+
+
+@pytest.mark.parametrize("days_late", [10, 12, DUE_WINDOW_AFTER])
+def test_late_single_payment_is_loaded_and_matched(days_late):
+    # Jediná platba syncu, zaplacená pozdě: splátku musí načíst už dotaz
+    # podle due_range, ne jen najít index
+    due = date(2026, 3, 15)
+    paid = date.fromordinal(due.toordinal() + days_late)
+    due_from, due_to = due_range([paid])
+    loaded = [i for i in [inst(1, due.isoformat())] if due_from <= i.due_date <= due_to]
+    matches = assign_installments([tx("t1", paid.isoformat())], InstallmentIndex(loaded))
+    assert [(m.payment_id, m.transaction_id) for m in matches] == [(1, "t1")]
+
+
+def test_due_range_matches_index_window():
+    assert due_range([date(2026, 3, 20), date(2026, 3, 1)]) == (
+        date.fromordinal(date(2026, 3, 1).toordinal() - DUE_WINDOW_AFTER).isoformat(),
+        date.fromordinal(date(2026, 3, 20).toordinal() + DUE_WINDOW_BEFORE).isoformat(),
+    )
@@ -0,0 +1,58 @@
+"""services/loop_watchdog.py a services/cpu_pool.py — blokovaný loop se
+zaloguje se zásobníkem, CPU práce běží mimo loop."""
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+
+from services.cpu_pool import run_cpu
+from services.loop_watchdog import LoopWatchdog
+
+
+def _blocking_report():
+    time.sleep(0.3)
+
+
+async def test_watchdog_logs_stack_of_blocking_code(caplog):
+    watchdog = LoopWatchdog(threshold=0.05)
+    with caplog.at_level(logging.INFO, logger="services.loop_watchdog"):
+        watchdog.start()
+        try:
+            await asyncio.sleep(0.05)
+            _blocking_report()  # blokuje loop
+            await asyncio.sleep(0.1)
+        finally:
+            watchdog.stop()
+
+    events = [r for r in caplog.records if getattr(r, "event", None)]
+    assert [r.event for r in events] == ["loop.blocked", "loop.unblocked"]
+    assert "_blocking_report" in events[0].getMessage()
+    assert events[1].blocked_ms >= 150
+
+
+async def test_watchdog_quiet_when_loop_is_responsive(caplog):
+    watchdog = LoopWatchdog(threshold=0.1)
+    with caplog.at_level(logging.INFO, logger="services.loop_watchdog"):
+        watchdog.start()
+        try:
+            for _ in range(10):
+                await asyncio.sleep(0.02)
+        finally:
+            watchdog.stop()
+    assert not [r for r in caplog.records if getattr(r, "event", None)]
+
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+async def test_run_cpu_uses_pool_thread_and_keeps_context():
+    _request_id.set("req-1")
+
+    def work(x):
+        return x * 2, threading.current_thread().name, _request_id.get()
+
+    result, thread_name, request_id = await run_cpu(work, 21)
+    assert result == 42
+    assert thread_name.startswith("cpu")
+    assert request_id == "req-1"
@@ -0,0 +1,58 @@
+"""Testy Prometheus metrik (services/metrics.py) — malá aplikace, bez DB.
+
+Label route musí být šablona cesty (ne id z URL), nenamatchované cesty
+sdílí jeden label a nezachycená výjimka se počítá jako 500.
+"""
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from services.metrics import UNMATCHED_ROUTE, MetricsMiddleware, TimedAsyncQueuePool
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: str):
+        return {"id": item_id}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def _count(route: str, status: str) -> float:
+    value = REGISTRY.get_sample_value(
+        "http_request_duration_seconds_count", {"method": "GET", "route": route, "status": status},
+    )
+    return value or 0.0
+
+
+def test_route_template_label_and_unmatched():
+    client = TestClient(_app())
+    before = _count("/items/{item_id}", "200")
+    before_unmatched = _count(UNMATCHED_ROUTE, "404")
+    for item_id in ("a1", "b2", "c3"):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    client.get("/does-not-exist/123")
+    assert _count("/items/{item_id}", "200") == before + 3
+    assert _count(UNMATCHED_ROUTE, "404") == before_unmatched + 1
+    assert REGISTRY.get_sample_value("http_requests_in_progress", {"method": "GET"}) == 0
+
+
+def test_unhandled_exception_counts_as_error():
+    client = TestClient(_app(), raise_server_exceptions=False)
+    labels = {"method": "GET", "route": "/boom", "status": "500"}
+    before = REGISTRY.get_sample_value("http_request_errors_total", labels) or 0.0
+    assert client.get("/boom").status_code == 500
+    assert REGISTRY.get_sample_value("http_request_errors_total", labels) == before + 1
+
+
+def test_engine_uses_timed_pool():
+    from database import engine
+    assert isinstance(engine.pool, TimedAsyncQueuePool)
+    assert REGISTRY.get_sample_value("db_pool_size", {"engine": "primary"}) == engine.pool.size()
@@ -0,0 +1,72 @@
+"""Testy push dispatcheru — spojování notifikací a odeslání mimo request.
+
+Bez VAPID, sítě i DB: is_configured a _fan_out se nahrazují monkeypatchem.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from services import push
+from services.push import PushDispatcher, PushMessage, coalesce
+
+
+def test_single_message_passes_through():
+    assert coalesce([PushMessage("Sync selhal", "Fio", "/settings")]) == {
+        "title": "Sync selhal", "body": "Fio", "url": "/settings",
+    }
+
+
+def test_multiple_messages_are_merged():
+    payload = coalesce([
+        PushMessage("Sync selhal", "Fio", "/settings"),
+        PushMessage("Souhlas banky vypršel", "KB", "/settings"),
+    ])
+    assert payload["title"] == "Koruna — 2 upozornění"
+    assert payload["body"] == "Sync selhal: Fio\nSouhlas banky vypršel: KB"
+    assert payload["url"] == "/settings"
+
+
+def test_mixed_urls_fall_back_to_root():
+    payload = coalesce([PushMessage("A", "a", "/settings"), PushMessage("B", "b", "/loans")])
+    assert payload["url"] == "/"
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    calls = []
+
+    async def fan_out(db, user_id, payload):
+        calls.append((user_id, payload))
+        return 1
+
+    @asynccontextmanager
+    async def fake_db_context():
+        yield None
+
+    import database
+    monkeypatch.setattr(push, "is_configured", lambda: True)
+    monkeypatch.setattr(push, "_fan_out", fan_out)
+    monkeypatch.setattr(database, "get_db_context", fake_db_context)
+    return calls
+
+
+async def test_dispatcher_coalesces_per_user(sent):
+    dispatcher = PushDispatcher(window_secs=0.01)
+    dispatcher.enqueue(1, "A", "a")
+    dispatcher.enqueue(1, "B", "b")
+    dispatcher.enqueue(2, "C", "c")
+    assert sent == []  # enqueue nic neodesílá — běží mimo request
+    await asyncio.sleep(0.05)
+
+    by_user = dict(sent)
+    assert len(sent) == 2
+    assert by_user[1]["title"] == "Koruna — 2 upozornění"
+    assert by_user[2]["title"] == "C"
+
+
+async def test_aclose_flushes_pending(sent):
+    dispatcher = PushDispatcher(window_secs=60)
+    dispatcher.enqueue(1, "A", "a")
+    await dispatcher.aclose()
+    assert [user_id for user_id, _ in sent] == [1]
@@ -0,0 +1,75 @@
+"""Rozpočty SQL dotazů hlavních endpointů (ochrana proti N+1).
+
+Potřebuje skutečný Postgres — v CI ho má job test-be-db (.github/workflows/ci.yml),
+v běžném `pytest -q` se přeskakuje. Lokálně proti jednorázové databázi po
+`alembic upgrade head`:
+
+    DB_TESTS=1 DATABASE_URL=postgresql+asyncpg://…/budget_test \\
+        AUTH_SECRET=… python -m pytest tests/test_query_budgets.py
+
+Uživatel se syntetickými daty (loadtest/seed.py) se na konci smaže.
+Rozpočty zahrnují i dotaz na uživatele v get_current_user a nesmí záviset
+na počtu transakcí — když endpoint rozpočet přesáhne, hláška vypíše
+nejčastěji opakované dotazy.
+"""
+import os
+
+import pytest
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get("DB_TESTS"), reason="needs a migrated Postgres (DB_TESTS=1)"),
+    pytest.mark.asyncio(loop_scope="module"),
+]
+
+YEAR_MONTH = "2026-09"  # benchmarks/synthetic.py END_DATE
+
+BUDGETS = [
+    ("GET", "/dashboard/", 7),
+    ("GET", "/transactions/?page=1&limit=50", 5),
+    ("GET", "/cashflow/current", 9),
+    ("GET", f"/monthly-budget/{YEAR_MONTH}", 9),
+    ("GET", "/subscriptions/", 2),
+    ("GET", "/dashboard/wrapped", 7),
+    ("GET", "/dashboard/monthly-report", 3),
+    ("GET", "/budgets/", 2),
+    ("GET", "/loans/", 2),
+    ("GET", "/recurring-expenses", 2),
+    ("GET", "/accounts/", 2),
+]
+
+
+@pytest.fixture(scope="module")
+async def client():
+    import httpx
+    from sqlalchemy import delete
+
+    from database import async_session_maker, engine
+    from loadtest.seed import seed_user
+    from main import app
+    from models import UserModel
+
+    async with async_session_maker() as db:
+        user = await seed_user(db, "query-budget", transactions=2000, accounts=2)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {user['token']}"},
+    ) as http:
+        yield http
+    async with async_session_maker() as db:
+        await db.execute(delete(UserModel).where(UserModel.id == user["user_id"]))
+        await db.commit()
+    await engine.dispose()
+
+
+@pytest.mark.parametrize(("method", "path", "budget"), BUDGETS, ids=[p for _, p, _ in BUDGETS])
+async def test_endpoint_query_budget(client, query_budget, method, path, budget):
+    with query_budget(budget):
+        response = await client.request(method, path)
+    assert response.status_code == 200, response.text
+
+
+async def test_recategorize_does_not_query_per_transaction(client, query_budget):
+    # Dřív 2 dotazy na každou transakci (pravidla uživatele + naučená pravidla)
+    with query_budget(10):
+        response = await client.post("/sync/recategorize")
+    assert response.status_code == 200, response.text
@@ -0,0 +1,107 @@
+"""services/query_stats.py — počítání dotazů, normalizace, Server-Timing.
+
+Bez Postgresu: eventy visí na třídě Engine, takže stačí in-memory SQLite.
+"""
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from services.query_stats import (
+    QueryStats, QueryStatsLogFilter, QueryStatsMiddleware, normalize_statement, server_timing, track_queries,
+)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    yield engine
+    engine.dispose()
+
+
+def test_normalize_statement_merges_literals_and_whitespace():
+    a = normalize_statement("SELECT * FROM t WHERE id = 12 AND name = 'it''s'")
+    b = normalize_statement("SELECT *  FROM t\n WHERE id = 7 AND name = 'x'")
+    assert a == b == "SELECT * FROM t WHERE id = ? AND name = ?"
+
+
+def test_normalize_keeps_bind_placeholders_and_identifiers():
+    assert normalize_statement("SELECT col1 FROM t2 WHERE x = $1") == "SELECT col1 FROM t2 WHERE x = $1"
+
+
+def test_track_queries_counts_and_detects_repeats(engine):
+    with engine.connect() as conn, track_queries() as stats:
+        for i in range(5):
+            conn.execute(text(f"SELECT {i}"))
+        conn.execute(text("SELECT 'other', 1"))
+    assert stats.count == 6
+    assert stats.db_time > 0
+    assert stats.repeated(4) == [("SELECT ?", 5)]
+    assert stats.repeated(5) == []
+
+
+def test_queries_outside_block_are_not_counted(engine):
+    with engine.connect() as conn:
+        with track_queries() as stats:
+            conn.execute(text("SELECT 1"))
+        conn.execute(text("SELECT 2"))
+    assert stats.count == 1
+
+
+def test_nested_blocks_count_into_outer(engine):
+    with engine.connect() as conn, track_queries() as outer:
+        conn.execute(text("SELECT 1"))
+        with track_queries() as inner:
+            conn.execute(text("SELECT 2"))
+    assert inner.count == 1
+    assert outer.count == 2
+
+
+def test_query_budget_fixture_fails_over_budget(engine, query_budget):
+    with engine.connect() as conn:
+        with query_budget(2):
+            conn.execute(text("SELECT 1"))
+        with pytest.raises(pytest.fail.Exception, match="3 SQL queries, budget 2"):
+            with query_budget(2):
+                for i in range(3):
+                    conn.execute(text(f"SELECT {i}"))
+
+
+def test_server_timing_header():
+    stats = QueryStats(count=3, db_time=0.0123)
+    assert server_timing(stats, 0.05) == 'db;dur=12.3;desc="3 queries", app;dur=50.0'
+
+
+def test_log_filter_adds_fields_only_inside_block():
+    record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+    QueryStatsLogFilter().filter(record)
+    assert not hasattr(record, "db_queries")
+    with track_queries() as stats:
+        stats.record("SELECT ?", 0.002)
+        QueryStatsLogFilter().filter(record)
+    assert record.db_queries == 1
+    assert record.db_time_ms == 2.0
+
+
+async def test_middleware_adds_server_timing_and_warns(engine, caplog):
+    async def app(scope, receive, send):
+        with engine.connect() as conn:
+            for i in range(4):
+                conn.execute(text(f"SELECT {i}"))
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = QueryStatsMiddleware(app, repeat_warn=3, timing_allow_origin="https://app.example")
+    with caplog.at_level(logging.WARNING, logger="services.query_stats"):
+        await middleware({"type": "http", "method": "GET", "path": "/x"}, None, send)
+
+    headers = dict(sent[0]["headers"])
+    assert headers[b"server-timing"].startswith(b"db;dur=")
+    assert b'desc="4 queries"' in headers[b"server-timing"]
+    assert headers[b"timing-allow-origin"] == b"https://app.example"
+    assert [r.event for r in caplog.records] == ["db.repeated_query"]
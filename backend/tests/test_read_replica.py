@@ -0,0 +1,62 @@
+"""database.get_read_db / ReadReplica — směrování reportů na read repliku."""
+import logging
+
+import pytest
+
+import database
+from database import ReadReplica
+
+
+class FakeReplica(ReadReplica):
+    def __init__(self, lags, **kwargs):
+        super().__init__(session_maker="replica-sessions", **{"max_lag": 10.0, "check_interval": 0.0, **kwargs})
+        self.lags = list(lags)
+        self.checks = 0
+
+    async def measure_lag(self):
+        self.checks += 1
+        lag = self.lags.pop(0)
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+
+async def test_replica_used_only_within_lag_threshold():
+    replica = FakeReplica([0.5, 30.0, None, ConnectionError("down"), 2.0])
+    assert [await replica.is_usable() for _ in range(5)] == [True, False, False, False, True]
+
+
+async def test_lag_is_checked_at_most_once_per_interval():
+    replica = FakeReplica([0.0, 99.0], check_interval=60.0)
+    assert await replica.is_usable()
+    assert await replica.is_usable()
+    assert replica.checks == 1
+
+
+async def test_fallback_logs_only_state_changes(caplog):
+    caplog.set_level(logging.INFO, logger="database")
+    replica = FakeReplica([50.0, 60.0, 0.0])
+    replica._usable = True
+    for _ in range(3):
+        await replica.is_usable()
+    events = [r.event for r in caplog.records if hasattr(r, "event")]
+    assert events == ["db.replica_fallback", "db.replica_ok"]
+
+
+async def test_get_read_db_without_replica_uses_primary(monkeypatch):
+    monkeypatch.setattr(database, "read_replica", None)
+    sessions = database.get_read_db()
+    session = await anext(sessions)
+    assert session.bind is database.engine
+    await sessions.aclose()
+
+
+@pytest.mark.parametrize(("lag", "expected"), [(0.0, "replica"), (None, "primary")])
+async def test_get_read_db_routes_by_replica_health(monkeypatch, lag, expected):
+    replica = FakeReplica([lag])
+    replica.session_maker = database.background_session_maker  # jiný engine než primár
+    monkeypatch.setattr(database, "read_replica", replica)
+    sessions = database.get_read_db()
+    session = await anext(sessions)
+    assert (session.bind is database.background_engine) == (expected == "replica")
+    await sessions.aclose()
@@ -0,0 +1,108 @@
+"""Reporty přes get_read_db proti skutečné „replice“.
+
+Jedna databáze, dvě role: replika je role s default_transaction_read_only,
+takže každý zápis z reportu přes repliku selže stejně jako na hot standby.
+Potřebuje migrovaný Postgres a práva na CREATE ROLE (viz
+test_query_budgets.py):
+
+    DB_TESTS=1 DATABASE_URL=postgresql+asyncpg://…/budget_test \\
+        AUTH_SECRET=… python -m pytest tests/test_read_replica_db.py
+"""
+import os
+from types import SimpleNamespace
+
+import pytest
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get("DB_TESTS"), reason="needs a migrated Postgres (DB_TESTS=1)"),
+    pytest.mark.asyncio(loop_scope="module"),
+]
+
+REPLICA_ROLE = "budget_replica_test"
+
+REPORTS = [
+    "/dashboard/wrapped",
+    "/dashboard/monthly-report",
+    # Uživatel bez snapshotů — historie se dopočte v paměti, nic se nezapisuje
+    "/dashboard/net-worth-history?days=90",
+    "/transactions/settlement-summary",
+    "/annual-overview/2026",
+    # Návrhy předplatných jen čtou statistiky, které dotahuje sync
+    "/subscriptions/detect",
+]
+
+
+@pytest.fixture(scope="module")
+async def replica():
+    from sqlalchemy import event, text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from database import engine
+
+    async with engine.begin() as conn:
+        exists = (await conn.execute(text("SELECT 1 FROM pg_roles WHERE rolname = :r"), {"r": REPLICA_ROLE})).scalar()
+        if not exists:
+            await conn.execute(text(f"CREATE ROLE {REPLICA_ROLE} LOGIN PASSWORD '{REPLICA_ROLE}'"))
+        await conn.execute(text(f"ALTER ROLE {REPLICA_ROLE} SET default_transaction_read_only = on"))
+        await conn.execute(text(f"GRANT SELECT ON ALL TABLES IN SCHEMA public TO {REPLICA_ROLE}"))
+
+    replica = SimpleNamespace(
+        engine=create_async_engine(engine.url.set(username=REPLICA_ROLE, password=REPLICA_ROLE)), statements=0,
+    )
+
+    @event.listens_for(replica.engine.sync_engine, "before_cursor_execute")
+    def count(*args):
+        replica.statements += 1
+
+    yield replica
+    await replica.engine.dispose()
+
+
+@pytest.fixture(scope="module")
+async def client():
+    import httpx
+    from sqlalchemy import delete
+
+    from database import async_session_maker, background_engine, engine
+    from loadtest.seed import seed_user
+    from main import app
+    from models import UserModel
+
+    async with async_session_maker() as db:
+        user = await seed_user(db, "read-replica", transactions=500, accounts=2)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {user['token']}"},
+    ) as http:
+        yield http
+    async with async_session_maker() as db:
+        await db.execute(delete(UserModel).where(UserModel.id == user["user_id"]))
+        await db.commit()
+    await engine.dispose()
+    await background_engine.dispose()
+
+
+def _use_replica(monkeypatch, replica, max_lag):
+    import database
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+    sessions = async_sessionmaker(replica.engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(database, "read_replica", database.ReadReplica(sessions, max_lag=max_lag, check_interval=0))
+
+
+@pytest.mark.parametrize("path", REPORTS)
+async def test_report_is_served_read_only_from_replica(client, replica, monkeypatch, path):
+    _use_replica(monkeypatch, replica, max_lag=10.0)
+    before = replica.statements
+    response = await client.get(path)
+    assert response.status_code == 200, response.text
+    # Kontrola zpoždění + aspoň jeden dotaz reportu
+    assert replica.statements - before >= 2
+
+
+async def test_lagging_replica_falls_back_to_primary(client, replica, monkeypatch):
+    _use_replica(monkeypatch, replica, max_lag=-1.0)  # i nulové zpoždění je „moc“
+    before = replica.statements
+    response = await client.get("/dashboard/monthly-report")
+    assert response.status_code == 200, response.text
+    assert replica.statements - before == 1  # jen měření zpoždění
@@ -0,0 +1,68 @@
+"""Testy detektoru opakovaných plateb (services/recurring_detection.py).
+
+Čisté funkce bez DB: seskupení podle protistrany, skóre periody a
+inkrementální doplnění statistik musí dát totéž co přepočet od nuly.
+"""
+from collections import Counter
+
+from services.recurring_detection import MerchantStats, group_charges
+
+
+def monthly(n, amount=199.0, start_month=1, year=2026):
+    return [(f"{year}-{m:02d}-05", "Karta", -amount, "Entertainment", "Spotify AB")
+            for m in range(start_month, start_month + n)]
+
+
+def test_monthly_charges_detected():
+    stats = group_charges(monthly(4))
+    assert list(stats) == ["spotify"]
+    s = stats["spotify"]
+    assert s.period == "monthly"
+    assert s.interval_histogram["monthly"] == 3
+    assert s.median_amount == 199.0
+    assert s.top_category == "Entertainment"
+    assert s.to_row(1)["occurrences"] == 4
+
+
+def test_creditor_name_wins_over_description():
+    rows = [
+        ("2026-01-03", "NETFLIX.COM Amsterdam NL", -199.0, None, None),
+        ("2026-02-03", "NETFLIX.COM 408-724-9160 NL", -199.0, None, ""),
+    ]
+    assert list(group_charges(rows)) == ["netflix.com"]
+
+
+def test_inconsistent_amounts_not_a_subscription():
+    rows = [(f"2026-{m:02d}-10", "Albert", -a, None, None) for m, a in [(1, 100), (2, 900), (3, 40), (4, 1500)]]
+    s = group_charges(rows)["albert"]
+    assert s.period is None
+    assert s.amount_consistency < 0.7
+
+
+def test_incremental_add_matches_full_rebuild():
+    history = monthly(3) + [("2026-02-05", "Karta", -199.0, "Entertainment", "Spotify AB")]
+    newer = monthly(2, start_month=4)
+
+    full = group_charges(history + newer)["spotify"]
+    incremental = group_charges(history)["spotify"]
+    fresh = group_charges(newer)["spotify"]
+    incremental.add(fresh.charges, fresh.categories)
+
+    assert incremental.charges == full.charges  # duplicitní platba se nezapočte dvakrát
+    assert incremental.to_row(1) | {"updated_at": None} == full.to_row(1) | {"updated_at": None}
+
+
+def test_yearly_needs_two_charges():
+    s = MerchantStats(key="icloud", display="iCloud", charges=[("2025-03-01", 990.0), ("2026-03-02", 990.0)],
+                      categories=Counter())
+    s.score()
+    assert s.period == "yearly"
+
+
+def test_creditor_name_tolerates_bad_raw_json():
+    from services.recurring_detection import creditor_name
+
+    assert creditor_name('{"creditorName": "Spotify AB"}') == "Spotify AB"
+    assert creditor_name("{not json") is None
+    assert creditor_name('["creditorName"]') is None
+    assert creditor_name(None) is None
@@ -0,0 +1,68 @@
+"""Testy pravidel dělení výdajů (services/share_rules.py).
+
+Čisté funkce bez DB: zkompilovaný matcher dává totéž co dřívější lineární
+průchod, při víc shodách deterministicky vyhrává specifičtější pravidlo.
+"""
+import json
+from types import SimpleNamespace
+
+from services.share_rules import (
+    ShareRuleMatcher,
+    apply_share_rule_retroactively,
+    compute_my_share,
+    haystack_from_raw_json,
+    match_share_rule,
+)
+
+
+def rule(id, pattern, pct=50.0, override=None, active=True):
+    return SimpleNamespace(
+        id=id, pattern=pattern, my_percentage=pct, my_amount_override=override, is_active=active,
+    )
+
+
+def tx(text, iban=None):
+    return {"remittanceInformationUnstructured": text, "creditorAccount": {"iban": iban} if iban else None}
+
+
+def test_matches_description_and_iban_only_for_expenses():
+    matcher = ShareRuleMatcher([rule(1, "najem"), rule(2, "cz6508000000192000145399")])
+    assert matcher.match(tx("Nájem byt NAJEM 03"), -15000.0).id == 1
+    assert matcher.match(tx("Platba", iban="CZ6508000000192000145399"), -100.0).id == 2
+    assert matcher.match(tx("najem vratka"), 500.0) is None
+    assert matcher.match(tx("billa"), -100.0) is None
+
+
+def test_overlapping_rules_longest_then_oldest_regardless_of_input_order():
+    rules = [rule(5, "cez"), rule(3, "cez prodej"), rule(4, "prodej"), rule(9, "cez distr")]
+    for ordering in (rules, list(reversed(rules))):
+        matcher = ShareRuleMatcher(ordering)
+        assert matcher.match(tx("CEZ Prodej zaloha"), -2000.0).id == 3
+        assert matcher.match(tx("CEZ Distribuce"), -800.0).id == 9
+        assert matcher.match(tx("prodej cez"), -1.0).id == 4
+    # stejně dlouhé patterny → nižší id (starší pravidlo)
+    assert ShareRuleMatcher([rule(8, "abcd"), rule(2, "bcde")]).match(tx("abcde"), -1.0).id == 2
+
+
+def test_inactive_rules_ignored_and_compat_wrapper():
+    rules = [rule(1, "netflix", active=False), rule(2, "net")]
+    assert match_share_rule(tx("NETFLIX.COM"), -299.0, rules).id == 2
+    assert match_share_rule(tx("NETFLIX.COM"), -299.0, []) is None
+
+
+def test_compute_my_share_caps_override():
+    assert compute_my_share(-1000.0, rule(1, "x", pct=33.333)) == 333.33
+    assert compute_my_share(-100.0, rule(1, "x", pct=None, override=250.0)) == 100.0
+
+
+def test_haystack_from_raw_json_tolerates_bad_rows():
+    raw = json.dumps({**tx("Nájem 03", iban="CZ65"), "creditorAccount": "not-a-dict"})
+    assert "nájem 03" in haystack_from_raw_json(raw, "TRVALÝ PŘÍKAZ")
+    assert "trvalý příkaz" in haystack_from_raw_json(raw, "TRVALÝ PŘÍKAZ")
+    assert haystack_from_raw_json("{not json", "Najem").strip() == "najem"
+    assert haystack_from_raw_json(None, None).strip() == ""
+
+
+async def test_rule_without_share_updates_nothing():
+    # Bez procenta i pevné částky by my_share_amount skončil NULL — do DB se nesahá
+    assert await apply_share_rule_retroactively(None, 1, rule(1, "najem", pct=None)) == 0
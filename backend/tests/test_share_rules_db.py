@@ -0,0 +1,81 @@
+"""POST /settings/share-rules se zpětným použitím nad skutečným Postgresem
+(viz test_query_budgets.py):
+
+    DB_TESTS=1 DATABASE_URL=postgresql+asyncpg://…/budget_test \\
+        AUTH_SECRET=… python -m pytest tests/test_share_rules_db.py
+"""
+import json
+import os
+
+import pytest
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get("DB_TESTS"), reason="needs a migrated Postgres (DB_TESTS=1)"),
+    pytest.mark.asyncio(loop_scope="module"),
+]
+
+
+@pytest.fixture(scope="module")
+async def client():
+    import httpx
+    from sqlalchemy import delete, select
+
+    from database import async_session_maker, background_engine, engine
+    from loadtest.seed import seed_user
+    from main import app
+    from models import AccountModel, TransactionModel, UserModel
+
+    async with async_session_maker() as db:
+        user = await seed_user(db, "share-rules-retro", transactions=50, accounts=1)
+        account_id = (await db.execute(
+            select(AccountModel.id).where(AccountModel.user_id == user["user_id"]).limit(1)
+        )).scalar_one()
+        rent = {"remittanceInformationUnstructured": "Najem byt Vinohrady"}
+        for i, (raw_json, description) in enumerate([
+            (json.dumps(rent), "Trvalý příkaz"),
+            ("{not json", "Najem byt Vinohrady"),  # rozbitý řádek — páruje se podle popisu
+            (json.dumps({**rent, "creditorName": "a\u0000b"}), "Trvalý příkaz"),  # jsonb odmítne \\u0000
+        ]):
+            db.add(TransactionModel(
+                id=f"share-rules-retro-{user['user_id']}-{i}", user_id=user["user_id"], account_id=account_id,
+                account_type="bank", date=f"2026-0{i + 1}-01", amount=-20000.0, currency="CZK",
+                description=description, raw_json=raw_json,
+            ))
+        await db.commit()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {user['token']}"},
+    ) as http:
+        yield http, user
+    async with async_session_maker() as db:
+        await db.execute(delete(UserModel).where(UserModel.id == user["user_id"]))
+        await db.commit()
+    await engine.dispose()
+    await background_engine.dispose()
+
+
+async def test_retroactive_rule_survives_rows_jsonb_rejects(client):
+    from sqlalchemy import select
+
+    from database import async_session_maker
+    from models import TransactionModel
+
+    http, user = client
+    response = await http.post("/settings/share-rules", json={"pattern": "najem byt vinohrady", "my_percentage": 50})
+    assert response.status_code == 200, response.text
+    assert response.json()["applied_to"] == 3
+    assert response.json()["rule"]["match_count"] == 3
+
+    async with async_session_maker() as db:
+        shares = (await db.execute(
+            select(TransactionModel.my_share_amount).where(
+                TransactionModel.id.like(f"share-rules-retro-{user['user_id']}-%")
+            )
+        )).scalars().all()
+    assert shares == [10000.0] * 3
+
+
+async def test_rule_without_share_is_rejected(client):
+    http, _ = client
+    response = await http.post("/settings/share-rules", json={"pattern": "elektrina"})
+    assert response.status_code == 400
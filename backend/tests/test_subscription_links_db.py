@@ -0,0 +1,92 @@
+"""Vazby předplatné ↔ transakce nad skutečným Postgresem (viz test_query_budgets.py):
+
+    DB_TESTS=1 DATABASE_URL=postgresql+asyncpg://…/budget_test \\
+        AUTH_SECRET=… python -m pytest tests/test_subscription_links_db.py
+"""
+import os
+
+import pytest
+
+pytestmark = [
+    pytest.mark.skipif(not os.environ.get("DB_TESTS"), reason="needs a migrated Postgres (DB_TESTS=1)"),
+    pytest.mark.asyncio(loop_scope="module"),
+]
+
+
+@pytest.fixture(scope="module")
+async def client():
+    import httpx
+    from sqlalchemy import delete, select
+
+    from database import async_session_maker, background_engine, engine
+    from loadtest.seed import seed_user
+    from main import app
+    from models import AccountModel, TransactionModel, UserModel
+
+    async with async_session_maker() as db:
+        user = await seed_user(db, "subscription-links", transactions=50, accounts=1)
+        account_id = (await db.execute(
+            select(AccountModel.id).where(AccountModel.user_id == user["user_id"]).limit(1)
+        )).scalar_one()
+        for month in range(1, 4):
+            db.add(TransactionModel(
+                id=f"subscription-links-{user['user_id']}-{month}", user_id=user["user_id"],
+                account_id=account_id, account_type="bank", date=f"2026-{month:02d}-07", amount=-259.0,
+                currency="CZK", description="KINOTEKA AERO Praha",
+            ))
+        await db.commit()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://test", headers={"Authorization": f"Bearer {user['token']}"},
+    ) as http:
+        yield http, user
+    async with async_session_maker() as db:
+        await db.execute(delete(UserModel).where(UserModel.id == user["user_id"]))
+        await db.commit()
+    await engine.dispose()
+    await background_engine.dispose()
+
+
+async def test_post_and_patch_build_links(client):
+    http, _ = client
+    created = await http.post("/subscriptions/", json={
+        "name": "Kinoteka", "merchant_pattern": "kinoteka", "amount": 259.0, "period": "monthly",
+    })
+    assert created.status_code == 200, created.text
+    assert created.json()["last_charged_date"] == "2026-03-07"
+
+    patched = await http.patch(f"/subscriptions/{created.json()['id']}", json={"merchant_pattern": "bioskop"})
+    assert patched.status_code == 200, patched.text
+    assert patched.json()["last_charged_date"] is None
+    await http.delete(f"/subscriptions/{created.json()['id']}")
+
+
+async def test_reads_do_not_build_missing_links(client):
+    from sqlalchemy import select
+
+    from database import async_session_maker
+    from models import SubscriptionModel
+    from services.subscription_matching import backfill_missing_links
+
+    http, user = client
+    # Předplatné z doby před migrací 0029 — vazby ještě nemá
+    async with async_session_maker() as db:
+        sub = SubscriptionModel(
+            user_id=user["user_id"], name="Kinoteka", merchant_pattern="kinoteka", amount=259.0,
+            currency="CZK", period="monthly", my_percentage=100,
+        )
+        db.add(sub)
+        await db.commit()
+        sub_id = sub.id
+
+    for path in ("/subscriptions/", "/subscriptions/summary", "/cashflow/current"):
+        response = await http.get(path)
+        assert response.status_code == 200, response.text
+    async with async_session_maker() as db:
+        assert (await db.get(SubscriptionModel, sub_id)).links_built_at is None
+
+    await backfill_missing_links()
+    async with async_session_maker() as db:
+        assert (await db.get(SubscriptionModel, sub_id)).links_built_at is not None
+    listed = {s["id"]: s for s in (await http.get("/subscriptions/")).json()}
+    assert listed[sub_id]["last_charged_date"] == "2026-03-07"
@@ -0,0 +1,80 @@
+"""Testy párování plateb na předplatná (services/subscription_matching.py).
+
+Čisté funkce bez DB: multi-pattern matcher musí dávat totéž co samostatný
+`needle in text` pro každé předplatné (dřívější ILIKE dotazy); vazby
+subscription_transactions se z výsledku skládají a zpátky čtou beze ztrát.
+"""
+from types import SimpleNamespace
+
+from services.subscription_matching import (
+    MultiPatternMatcher,
+    group_linked_rows,
+    link_rows,
+    match_subscriptions,
+    primary_token,
+)
+
+
+def sub(id, pattern, contribution=None):
+    return SimpleNamespace(id=id, merchant_pattern=pattern, contribution_pattern=contribution)
+
+
+def tx(id, date, amount, description, raw_json=None, is_excluded=False):
+    return (id, date, amount, description, raw_json, is_excluded)
+
+
+def test_primary_token_skips_city_and_reference():
+    assert primary_token("netflix.com amsterdam nl") == "netflix.com"
+    assert primary_token("cz") == "cz"
+
+
+def test_matcher_equals_individual_substring_checks():
+    needles = ["spot", "spotify", "tify", "o2", "a.b(c)"]
+    matcher = MultiPatternMatcher(needles)
+    for text in ["SPOTIFY AB Stockholm", "platba O2 Czech", "x a.b(c) y", "nic", ""]:
+        assert matcher.find(text) == {n for n in needles if n in text.lower()}
+
+
+def test_charges_and_contributions_assigned_per_subscription():
+    subs = [sub(1, "netflix.com amsterdam nl"), sub(2, "spotify", contribution="jan novak")]
+    rows = [
+        tx("t4", "2026-03-05", -299.0, "NETFLIX.COM 408-724-9160 NL"),
+        tx("t3", "2026-03-02", 80.0, "Prichozi platba", '{"debtorName": "Jan Novak"}'),
+        tx("t2", "2026-02-20", -169.0, "Karta", '{"creditorName": "Spotify AB"}'),
+        tx("t1", "2026-02-05", -299.0, "NETFLIX.COM Amsterdam NL", is_excluded=True),
+    ]
+    matches = match_subscriptions(subs, rows)
+
+    assert [c.id for c in matches[1].charges] == ["t4"]  # vyloučená transakce se nepočítá
+    assert matches[1].contributions == []
+    assert matches[2].charge_pairs() == [("2026-02-20", 169.0)]
+    assert matches[2].contribution_pairs() == [("2026-03-02", 80.0)]
+
+
+def test_shared_token_and_limit():
+    subs = [sub(1, "google"), sub(2, "google one")]
+    rows = [tx(f"t{i}", f"2026-01-{i:02d}", -10.0, "GOOGLE *Storage") for i in range(9, 0, -1)]
+    matches = match_subscriptions(subs, rows, charge_limit=3)
+    # stejný token → stejné platby, max. charge_limit nejnovějších
+    assert [c.id for c in matches[1].charges] == ["t9", "t8", "t7"]
+    assert matches[2].charges == matches[1].charges
+
+
+def test_links_round_trip_without_limits():
+    subs = [sub(1, "spotify", contribution="jan novak")]
+    rows = [
+        tx("t3", "2026-03-02", 80.0, "Jan Novak podil"),
+        tx("t2", "2026-02-20", -169.0, "SPOTIFY"),
+        tx("t1", "2026-01-20", -169.0, "SPOTIFY"),
+    ]
+    links = link_rows(match_subscriptions(subs, rows, charge_limit=None, contribution_limit=None))
+    assert sorted((r["kind"], r["transaction_id"]) for r in links) == [
+        ("charge", "t1"), ("charge", "t2"), ("contribution", "t3"),
+    ]
+
+    # čtení přes join: (subscription_id, kind, tx_id, date, amount) nejnovější první
+    joined = [(1, "contribution", "t3", "2026-03-02", 80.0), (1, "charge", "t2", "2026-02-20", -169.0)]
+    matches = group_linked_rows([1, 2], joined)
+    assert matches[1].charge_pairs() == [("2026-02-20", 169.0)]
+    assert matches[1].contribution_pairs() == [("2026-03-02", 80.0)]
+    assert matches[2].charges == []
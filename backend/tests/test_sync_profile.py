@@ -0,0 +1,79 @@
+"""services/sync_profile.py — fáze syncu a agregace pro /sync/perf."""
+import asyncio
+
+from services.sync_profile import (
+    SyncProfile, endpoint_template, profile_sync, record_http, summarize_phases,
+)
+
+
+def test_span_and_add_accumulate_per_phase():
+    profile = SyncProfile()
+    for n in (3, 4):
+        with profile.span("bank.fetch") as phase:
+            phase.items += n
+    profile.add("bank.parse", 0.25, items=7, nbytes=1000)
+    profile.add("bank.parse", 0.25, items=1, nbytes=24)
+
+    phases = {p["name"]: p for p in profile.to_json()}
+    assert list(phases) == ["bank.fetch", "bank.parse"]
+    assert phases["bank.fetch"]["calls"] == 2
+    assert phases["bank.fetch"]["items"] == 7
+    assert phases["bank.parse"] == {"name": "bank.parse", "ms": 500.0, "calls": 2, "items": 8, "bytes": 1024}
+
+
+def test_span_records_time_even_when_block_raises():
+    profile = SyncProfile()
+    try:
+        with profile.span("transfers"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert profile.phases["transfers"].calls == 1
+    assert profile.phases["transfers"].seconds >= 0
+
+
+def test_endpoint_template_strips_ids():
+    assert endpoint_template("/accounts/3fa85f64-5717-4562-b3fc-2c963f66afa6/transactions/") == \
+        "/accounts/{id}/transactions/"
+    assert endpoint_template("/equity/pies/12345") == "/equity/pies/{id}"
+    assert endpoint_template("/accounts/acc-2-0/balances/") == "/accounts/{id}/balances/"
+    assert endpoint_template("/equity/account/cash") == "/equity/account/cash"
+
+
+def test_record_http_only_inside_profiled_sync():
+    record_http("t212", "/equity/pies", 0.1, 10)  # mimo sync — no-op
+
+    async def fetch(pie_id):
+        record_http("t212", f"/equity/pies/{pie_id}", 0.1, 100)
+
+    async def run():
+        with profile_sync() as profile:
+            await asyncio.gather(fetch(1), fetch(2))
+        return profile
+
+    phases = asyncio.run(run()).to_json()
+    assert phases == [{"name": "t212 /equity/pies/{id}", "ms": 200.0, "calls": 2, "items": 2, "bytes": 200}]
+
+
+def test_summarize_phases_percentiles_and_order():
+    runs = [
+        [{"name": "bank.fetch", "ms": ms, "items": 10}, {"name": "notify", "ms": 1.0}]
+        for ms in (100.0, 200.0, 300.0, 400.0, 5000.0)
+    ]
+    runs.append([{"name": "t212 /equity/portfolio", "ms": 50.0, "bytes": 2048}])
+
+    summary = summarize_phases(runs)
+    assert [s["name"] for s in summary] == ["bank.fetch", "t212 /equity/portfolio", "notify"]
+    fetch = summary[0]
+    assert fetch["runs"] == 5
+    assert fetch["p50_ms"] == 300.0
+    assert fetch["p95_ms"] == 5000.0
+    assert fetch["avg_items"] == 10.0
+    assert summary[1] == {
+        "name": "t212 /equity/portfolio", "runs": 1, "p50_ms": 50.0, "p95_ms": 50.0,
+        "max_ms": 50.0, "avg_items": 0.0, "avg_bytes": 2048,
+    }
+
+
+def test_summarize_tolerates_missing_phases():
+    assert summarize_phases([None, [], [{"ms": 3}]]) == []
@@ -0,0 +1,30 @@
+"""Testy generátoru syntetických dat pro benchmarky (benchmarks/synthetic.py).
+
+Baseline benchmarků má smysl jen nad stejnými daty — stejný seed musí dát
+stejné transakce i v jiném procesu (žádné hash() ani globální random).
+"""
+import json
+
+from benchmarks.synthetic import generate_dataset
+
+
+def test_same_seed_same_data():
+    first = generate_dataset(transactions=1500, accounts=2, seed=7)
+    second = generate_dataset(transactions=1500, accounts=2, seed=7)
+    assert [(t.id, t.date, t.amount, t.raw_json) for t in first.transactions] == \
+        [(t.id, t.date, t.amount, t.raw_json) for t in second.transactions]
+    assert generate_dataset(transactions=1500, accounts=2, seed=8).transactions[0].raw_json != \
+        first.transactions[0].raw_json
+
+
+def test_dataset_shape():
+    data = generate_dataset(transactions=3000, accounts=3)
+    assert len(data.transactions) == 3000
+    assert {t.account_id for t in data.transactions} == {a.id for a in data.accounts}
+    raw = json.loads(data.transactions[0].raw_json)
+    assert raw["transactionAmount"]["currency"] == "CZK"
+    # Převody mezi vlastními účty, nájem dělený napůl a vypořádání
+    own = set(data.own_ibans)
+    assert any((t.raw.get("creditorAccount") or {}).get("iban") in own for t in data.transactions)
+    assert any(t.my_share_amount for t in data.transactions)
+    assert any(t.settlement_flag for t in data.transactions)
@@ -0,0 +1,48 @@
+"""services/tracing.py — vypnutý tracing je no-op, trace_id v logu."""
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import pytest
+
+from services import tracing
+
+
+def test_disabled_tracing_is_noop():
+    assert tracing.setup_tracing(app=None, engines=None, settings=SimpleNamespace(otel_exporter="")) is False
+    with tracing.span("anything", a=1) as current:
+        assert current is None
+
+
+def test_traced_passes_result_through():
+    @tracing.traced("test.op")
+    async def op(x, y=1):
+        return x + y
+
+    assert asyncio.run(op(1, y=2)) == 3
+    assert op.__name__ == "op"
+
+
+def test_unknown_exporter_is_rejected():
+    pytest.importorskip("opentelemetry.sdk")
+    with pytest.raises(ValueError, match="OTEL_EXPORTER"):
+        tracing._exporter(SimpleNamespace(otel_exporter="zipkin"))
+
+
+def test_log_filter_adds_trace_ids_inside_span():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+
+    tracer = TracerProvider().get_tracer("test")
+    log_filter = tracing.TraceContextLogFilter()
+
+    outside = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+    log_filter.filter(outside)
+    assert not hasattr(outside, "trace_id")
+
+    with tracer.start_as_current_span("request") as current:
+        record = logging.LogRecord("x", logging.INFO, __file__, 1, "msg", None, None)
+        log_filter.filter(record)
+    context = current.get_span_context()
+    assert record.trace_id == format(context.trace_id, "032x")
+    assert record.span_id == format(context.span_id, "016x")
@@ -0,0 +1,28 @@
+"""services/transfers.py — čisté části detekce převodů."""
+import json
+
+from services.transfers import extract_account_number, parse_counterparties
+
+
+def test_extract_account_number_variants():
+    ids = extract_account_number("CZ6508000000192000145399")
+    assert {"CZ6508000000192000145399", "192000145399", "192000145399/0800"} <= ids
+    assert extract_account_number("000123/0100") >= {"000123/0100", "123", "000123"}
+    assert extract_account_number("") == set()
+
+
+def test_parse_counterparties_parses_each_transaction_once():
+    rows = [
+        ("a", json.dumps({
+            "creditorAccount": {"iban": "CZ6508000000192000145399"},
+            "debtorAccount": {"bban": "123/0100", "iban": None},
+        })),
+        ("b", None),
+        ("c", "not json"),
+        ("d", json.dumps(["list"])),
+    ]
+    parsed = parse_counterparties(rows)
+    creditor, debtor = parsed["a"]
+    assert "192000145399/0800" in creditor
+    assert debtor == {"123/0100", "123"}
+    assert parsed["b"] == parsed["c"] == parsed["d"] == (set(), set())
@@ -25,6 +25,7 @@ export interface AnnualData {
     months: Array<{ month: number; year_month: string; income: number; expenses: number; investments: number; savings: number; remaining: number; }>;
     totals: { income: number; expenses: number; investments: number; savings: number; net: number; };
     previous_year?: { income: number; expenses: number; investments: number; savings: number; net: number; };
+    comparison?: Array<{ year: number; income: number; expenses: number; investments: number; savings: number; net: number; }>;
     expense_breakdown: Record<string, number>;
     averages: { income: number; expenses: number; investments: number; };
 }
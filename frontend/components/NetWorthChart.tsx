@@ -22,6 +22,8 @@ const PERIODS = [
     { label: '3M', days: 90 },
     { label: '6M', days: 180 },
     { label: '1Y', days: 365 },
+    { label: '5Y', days: 1825 },
+    { label: '10Y', days: 3650 },
 ];
 
 export default function NetWorthChart({ currency = 'CZK' }: NetWorthChartProps) {
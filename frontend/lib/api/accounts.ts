@@ -17,11 +17,15 @@ export interface Account {
 export interface Institution {
     id: string;
     name: string;
+    bic?: string | null;
     logo?: string;
 }
 
-export async function getInstitutions(country: string = 'CZ'): Promise<{ institutions: Institution[] }> {
-    return fetchApi<{ institutions: Institution[] }>(`/accounts/institutions?country=${country}`);
+// Katalog jde z cache na backendu (ETag → 304); `q` filtruje podle názvu / BIC na serveru.
+export async function getInstitutions(country: string = 'CZ', q?: string): Promise<{ institutions: Institution[] }> {
+    const params = new URLSearchParams({ country });
+    if (q) params.set('q', q);
+    return fetchApi<{ institutions: Institution[] }>(`/accounts/institutions?${params}`);
 }
 
 export async function connectBank(institutionId: string, redirectUrl: string): Promise<{ link: string; requisition_id: string }> {
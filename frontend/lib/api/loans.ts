@@ -96,3 +96,44 @@ export async function toggleLoanPayment(loanId: number, paymentId: number, isPai
     if (!r.ok) throw new Error('Failed to update payment');
     return r.json();
 }
+
+export interface LoanScenarioInput {
+    name: string;
+    extra_payments?: Array<{ installment_number: number; amount: number }>;
+    rate_changes?: Array<{ installment_number: number; interest_rate: number }>;
+    monthly_extra?: number;
+    strategy?: 'reduce_term' | 'reduce_payment';
+}
+
+export interface LoanScenarioResult {
+    name: string;
+    installments: number;
+    end_date: string | null;
+    total_interest: number;
+    total_paid: number;
+    monthly_payment: number;
+    interest_saved: number;
+    months_saved: number;
+    schedule?: Array<LoanPaymentRow & { extra_principal?: number }> | null;
+}
+
+type LoanPaymentRow = Omit<LoanPayment, 'id' | 'is_paid' | 'matched_transaction_id'>;
+
+export async function compareLoanScenarios(
+    loanId: number,
+    scenarios: LoanScenarioInput[],
+    includeSchedule = false,
+): Promise<{ baseline: LoanScenarioResult; scenarios: LoanScenarioResult[] }> {
+    const r = await apiFetch(`/loans/${loanId}/scenarios`, {
+        method: 'POST',
+        body: JSON.stringify({ scenarios, include_schedule: includeSchedule }),
+    });
+    if (!r.ok) throw new Error('Failed to compare loan scenarios');
+    return r.json();
+}
+
+export async function matchLoanPayments(): Promise<{ matched: number }> {
+    const r = await apiFetch('/loans/match-payments', { method: 'POST' });
+    if (!r.ok) throw new Error('Failed to match loan payments');
+    return r.json();
+}
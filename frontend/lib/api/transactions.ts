@@ -163,3 +163,32 @@ export interface SettlementSummary {
 export async function getSettlementSummary(months = 12): Promise<SettlementSummary> {
     return fetchApi<SettlementSummary>(`/transactions/settlement-summary?months=${months}`);
 }
+
+export interface CategoryRulePreview {
+    pattern: string | null;
+    learnable: boolean;
+    matching: number;
+    background: boolean;  // víc transakcí než jde změnit v requestu → poběží na pozadí
+}
+
+export interface CategoryRetroJob {
+    id: string;
+    pattern: string;
+    category: string;
+    status: 'running' | 'completed' | 'failed';
+    total: number;
+    done: number;
+    error: string | null;
+}
+
+export async function previewCategoryRule(id: string, category: string): Promise<CategoryRulePreview> {
+    const response = await apiFetch(`/transactions/${id}/category/preview?category=${encodeURIComponent(category)}`);
+    if (!response.ok) throw new Error('Failed to preview category rule');
+    return response.json();
+}
+
+export async function getCategoryRetroJob(jobId: string): Promise<CategoryRetroJob> {
+    const response = await apiFetch(`/transactions/category-jobs/${jobId}`);
+    if (!response.ok) throw new Error('Failed to load category job');
+    return response.json();
+}